@@ -0,0 +1,133 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from games.models import Categoria, Juego
+from playhub.testing import PresupuestoConsultasTestCase
+from reviews.models import Reseña
+
+
+class ApiTests(PresupuestoConsultasTestCase):
+    """
+    Proyecciones, paginación y respuestas condicionales de la API
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.juego = Juego.objects.order_by('pk').first()
+        self.usuario = User.objects.get(username='usuario1')
+
+    def test_presupuestos(self):
+        # página + tabla intermedia de categorías
+        self.assertPresupuestoConsultas(reverse('api:juego_list'), 2)
+        self.assertPresupuestoConsultas(reverse('api:juego_detail', args=[self.juego.pk]), 2)
+        self.assertPresupuestoConsultas(reverse('api:categoria_list'), 1)
+        self.assertPresupuestoConsultas(reverse('api:reseña_list') + f'?juego={self.juego.pk}', 1)
+        self.assertPresupuestoConsultas(reverse('api:perfil_detail', args=[self.usuario.pk]), 1)
+
+    def test_fields_y_cursor(self):
+        url = reverse('api:juego_list') + '?fields=id,titulo&limit=5'
+        datos = self.client.get(url).json()
+        self.assertEqual(len(datos['results']), 5)
+        self.assertEqual(set(datos['results'][0]), {'id', 'titulo'})
+        siguiente = self.client.get(datos['next']).json()
+        vistos = {fila['id'] for fila in datos['results']}
+        self.assertFalse(vistos & {fila['id'] for fila in siguiente['results']})
+
+        response = self.client.get(reverse('api:juego_list') + '?fields=id,contraseña')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('contraseña', response.json()['error'])
+
+    def test_parametros_no_numericos(self):
+        # '²'.isdigit() es True pero int('²') falla: tiene que ser un 400
+        for url, parametros in [
+            (reverse('api:juego_list'), {'limit': '²'}),
+            (reverse('api:juego_list'), {'limit': '0'}),
+            (reverse('api:juego_autocompletar'), {'q': 'ab', 'limit': '²'}),
+            (reverse('api:reseña_list'), {'juego': '²'}),
+            (reverse('api:reseña_list'), {'usuario': 'x'}),
+        ]:
+            response = self.client.get(url, parametros)
+            self.assertEqual(response.status_code, 400, parametros)
+            self.assertIn('error', response.json())
+
+    def test_respuesta_condicional(self):
+        url = reverse('api:juego_detail', args=[self.juego.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(consultas), 0)
+
+        # Una reseña nueva cambia la versión del juego
+        Reseña.objects.create(
+            juego=self.juego, usuario=User.objects.create_user('nuevo'), puntuacion=9,
+            comentario='Comentario de prueba lo bastante largo para pasar la validación.',
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['total_reseñas'], self.juego.total_reseñas + 1)
+
+    def test_sin_last_modified(self):
+        # Un alta en el mismo segundo no puede dar 304 con datos antiguos
+        url = reverse('api:categoria_list')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        Categoria.objects.create(nombre='Categoría recién creada')
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Categoría recién creada', [fila['nombre'] for fila in response.json()['results']])
+
+    def test_reseña_tras_operaciones_masivas(self):
+        reseña = Reseña.objects.order_by('pk').first()
+        url = reverse('api:reseña_detail', args=[reseña.pk])
+        etag = self.client.get(url)['ETag']
+        Reseña.objects.filter(pk=reseña.pk).update(comentario='Comentario editado en bloque, con longitud de sobra.')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comentario'], 'Comentario editado en bloque, con longitud de sobra.')
+        reseña.puntuacion = 11 - reseña.puntuacion
+        Reseña.objects.bulk_update([reseña], ['puntuacion'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['puntuacion'], reseña.puntuacion)
+
+    def test_cambio_de_nombre(self):
+        # Las reseñas muestran el nombre del autor: renombrarlo caduca sus ETag
+        reseña = Reseña.objects.filter(usuario=self.usuario).order_by('pk').first()
+        urls = [reverse('api:reseña_list'), reverse('api:reseña_detail', args=[reseña.pk])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.usuario.username = 'renombrado'
+        self.usuario.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['usuario_nombre'], 'renombrado')
+
+    def test_perfil_sin_crear(self):
+        # Los perfiles se crean al usarse: la API muestra los valores por defecto
+        nuevo = User.objects.create_user('sin_perfil')
+        response = self.assertPresupuestoConsultas(reverse('api:perfil_detail', args=[nuevo.pk]), 1)
+        self.assertEqual(response.json(), {
+            'usuario': nuevo.pk, 'usuario_nombre': 'sin_perfil', 'bio': '',
+            'plataforma_favorita': 'PC', 'avatar_url': '',
+        })
+        datos = self.client.get(reverse('api:perfil_list'), {'limit': 100}).json()
+        self.assertIn(nuevo.pk, [fila['usuario'] for fila in datos['results']])
+
+    def test_autocompletar(self):
+        url = reverse('api:juego_autocompletar')
+        self.assertPresupuestoConsultas(url + '?q=J', 0)
+        datos = self.client.get(url, {'q': 'juego 12'}).json()
+        self.assertEqual(len(datos['results']), 10)
+        titulos = []
+        while True:
+            titulos += [fila['titulo'] for fila in datos['results']]
+            if datos['next'] is None:
+                break
+            datos = self.client.get(datos['next']).json()
+        esperados = Juego.objects.filter(titulo__regex=r'^Juego 12[0-9]*$').values_list('titulo', flat=True)
+        self.assertEqual(sorted(titulos), sorted(esperados))
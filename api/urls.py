@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('juegos/', views.JuegoApiView.as_view(), name='juego_list'),
+    path('juegos/<int:pk>/', views.JuegoApiView.as_view(), name='juego_detail'),
+    path('juegos/autocompletar/', views.JuegoAutocompletarApiView.as_view(), name='juego_autocompletar'),
+    path('categorias/', views.CategoriaApiView.as_view(), name='categoria_list'),
+    path('categorias/<int:pk>/', views.CategoriaApiView.as_view(), name='categoria_detail'),
+    path('reseñas/', views.ReseñaApiView.as_view(), name='reseña_list'),
+    path('reseñas/<int:pk>/', views.ReseñaApiView.as_view(), name='reseña_detail'),
+    path('perfiles/', views.PerfilUsuarioApiView.as_view(), name='perfil_list'),
+    path('perfiles/<int:pk>/', views.PerfilUsuarioApiView.as_view(), name='perfil_detail'),
+]
@@ -0,0 +1,314 @@
+import hashlib
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, TextField, Value
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views import View
+from games import busqueda
+from games.forms import JuegoFiltroForm
+from games.models import Categoria, Juego
+from playhub import cache
+from playhub.paginacion import CursorInvalido, CursorPaginator
+from reviews.models import PerfilUsuario, Reseña
+
+
+class ParametroInvalido(ValueError):
+    """
+    Parámetro GET no válido: se responde 400 con el mensaje
+    """
+
+
+def _entero(valor, mensaje):
+    """
+    int() de un parámetro GET o ParametroInvalido (isdigit() acepta '²')
+    """
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(mensaje)
+
+
+class ApiView(View):
+    """
+    Vista base de la API de solo lectura.
+
+    Las filas se obtienen con .values() (sin instanciar modelos) y solo con
+    los campos pedidos en ?fields=. Las respuestas llevan un ETag calculado
+    a partir de las versiones de caché de los datos (playhub/cache.py), así
+    que una petición condicional sobre datos sin cambios responde 304 sin
+    consultar la base de datos. No llevan Last-Modified: las versiones no
+    son fechas fiables (se recrean al perderse la clave y dos cambios en el
+    mismo segundo darían la misma fecha).
+
+    Las subclases definen:
+        campos            {nombre en la respuesta: campo o expresión del ORM}
+        campos_defecto    campos devueltos si no se indica ?fields=
+        cursor_ordering   ordenación del listado (el último campo único)
+        lookup            campo por el que se busca el objeto en el detalle
+    """
+    campos = {}
+    campos_defecto = None
+    cursor_ordering = ('id',)
+    lookup = 'pk'
+    limite_defecto = 20
+    limite_maximo = 100
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        return self.model._default_manager.order_by()
+
+    def get_versiones(self, pk=None):
+        """
+        Claves de versión de las que depende la respuesta. Por defecto
+        ('catalogo', None), que cambia con cualquier juego, categoría o reseña
+        """
+        return [('catalogo', None)]
+
+    def get_campos(self):
+        pedidos = self.request.GET.get('fields')
+        if not pedidos:
+            return list(self.campos_defecto or self.campos)
+        nombres = [nombre.strip() for nombre in pedidos.split(',') if nombre.strip()]
+        desconocidos = [nombre for nombre in nombres if nombre not in self.campos]
+        if desconocidos:
+            raise ParametroInvalido(
+                f'Campos desconocidos: {", ".join(desconocidos)}. '
+                f'Disponibles: {", ".join(self.campos)}'
+            )
+        return nombres
+
+    def proyectar(self, queryset, campos, extra=()):
+        """
+        .values() con los campos pedidos (y los de `extra`, que se quitan
+        de la respuesta en serializar())
+        """
+        simples, expresiones = [], {}
+        for nombre in [*campos, *extra]:
+            origen = self.campos.get(nombre, nombre)
+            if origen is None:
+                continue  # campo calculado en completar()
+            if isinstance(origen, str) and origen == nombre:
+                simples.append(nombre)
+            else:
+                expresiones[nombre] = F(origen) if isinstance(origen, str) else origen
+        return queryset.values(*dict.fromkeys(simples), **expresiones)
+
+    def completar(self, filas, campos):
+        """
+        Añadir a las filas los campos que no salen de .values() (p. ej. M2M)
+        """
+
+    def serializar(self, filas, campos):
+        self.completar(filas, campos)
+        return [{nombre: fila[nombre] for nombre in campos} for fila in filas]
+
+    def error(self, mensaje, status=400):
+        return JsonResponse({'error': mensaje}, status=status)
+
+    def get(self, request, pk=None):
+        try:
+            campos = self.get_campos()
+            versiones = cache.versiones(self.get_versiones(pk))
+        except ParametroInvalido as e:
+            return self.error(str(e))
+
+        # Respuesta condicional antes de tocar la base de datos
+        huella = hashlib.md5(
+            f'{request.get_full_path()}|{sorted(versiones.items(), key=str)}'.encode()
+        ).hexdigest()
+        etag = quote_etag(huella)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                response = self.listado(campos) if pk is None else self.detalle(pk, campos)
+            except ParametroInvalido as e:
+                return self.error(str(e))
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            # Los clientes pueden guardar la respuesta pero deben revalidarla
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    def detalle(self, pk, campos):
+        fila = self.proyectar(self.get_queryset().filter(**{self.lookup: pk}), campos).first()
+        if fila is None:
+            return self.error('No encontrado', status=404)
+        return self.json(self.serializar([fila], campos)[0])
+
+    def listado(self, campos):
+        mensaje = 'limit debe ser un número positivo'
+        limite = _entero(self.request.GET.get('limit', self.limite_defecto), mensaje)
+        if limite < 1:
+            raise ParametroInvalido(mensaje)
+        limite = min(limite, self.limite_maximo)
+        ordenacion = [campo.lstrip('-') for campo in self.cursor_ordering]
+        queryset = self.proyectar(self.get_queryset(), campos, extra=ordenacion)
+        paginator = CursorPaginator(queryset, limite, self.cursor_ordering)
+        try:
+            pagina = paginator.page(self.request.GET.get('cursor'))
+        except CursorInvalido:
+            raise ParametroInvalido('Cursor no válido')
+        return self.json({
+            'results': self.serializar(pagina.object_list, campos),
+            'next': self.url_cursor(pagina.next_cursor),
+            'previous': self.url_cursor(pagina.previous_cursor),
+        })
+
+    def url_cursor(self, cursor):
+        if cursor is None:
+            return None
+        parametros = self.request.GET.copy()
+        parametros['cursor'] = cursor
+        return self.request.build_absolute_uri(f'{self.request.path}?{parametros.urlencode()}')
+
+    def json(self, datos):
+        return JsonResponse(
+            datos, safe=False, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False}
+        )
+
+
+class JuegoApiView(ApiView):
+    """
+    /api/juegos/ y /api/juegos/<pk>/. El listado admite los mismos
+    filtros que el catálogo (q, plataforma, categorias, precio_min...)
+    """
+    model = Juego
+    campos = {
+        'id': 'id',
+        'referencia': 'referencia',
+        'titulo': 'titulo',
+        'plataforma': 'plataforma',
+        'precio': 'precio',
+        'fecha_lanzamiento': 'fecha_lanzamiento',
+        'total_reseñas': 'total_reseñas',
+        'puntuacion_promedio': 'puntuacion_promedio',
+        'categorias': None,
+    }
+    cursor_ordering = ('-fecha_lanzamiento', '-id')
+
+    def get_queryset(self):
+        formulario = JuegoFiltroForm(self.request.GET)
+        filtros = formulario.cleaned_data if formulario.is_valid() else {}
+        return Juego.objects.filtrar(**filtros).order_by()
+
+    def get_versiones(self, pk=None):
+        return [('catalogo', None)] if pk is None else [('juego', pk)]
+
+    def completar(self, filas, campos):
+        if 'categorias' not in campos:
+            return
+        # Una consulta a la tabla intermedia para toda la página
+        por_juego = {fila['id']: [] for fila in filas}
+        relaciones = Juego.categorias.through.objects.filter(juego_id__in=list(por_juego))
+        for juego_id, categoria_id in relaciones.values_list('juego_id', 'categoria_id'):
+            por_juego[juego_id].append(categoria_id)
+        for fila in filas:
+            fila['categorias'] = sorted(por_juego[fila['id']])
+
+    def proyectar(self, queryset, campos, extra=()):
+        # completar() necesita el id aunque no se haya pedido
+        return super().proyectar(queryset, campos, extra=[*extra, 'id'])
+
+
+class JuegoAutocompletarApiView(ApiView):
+    """
+    /api/juegos/autocompletar/?q=zel: juegos con alguna palabra del título
+    que empieza por cada palabra de q (índice FTS5), en páginas de 10.
+    Lo usa el widget de games/widgets.py.
+
+    Se ordena por id, el orden en que el índice devuelve las coincidencias:
+    cualquier otro orden tendría que ordenar todas, y con un prefijo de
+    dos letras pueden ser miles
+    """
+    model = Juego
+    campos = {'id': 'id', 'titulo': 'titulo', 'plataforma': 'plataforma'}
+    cursor_ordering = ('id',)
+    limite_defecto = 10
+    limite_maximo = 20
+    longitud_minima = 2
+
+    def get_queryset(self):
+        texto = self.request.GET.get('q', '').strip()
+        if len(texto) < self.longitud_minima or not busqueda.consulta_fts(texto):
+            return Juego.objects.none()
+        return Juego.objects.buscar(texto).order_by()
+
+
+class CategoriaApiView(ApiView):
+    """
+    /api/categorias/ y /api/categorias/<pk>/
+    """
+    model = Categoria
+    campos = {'id': 'id', 'nombre': 'nombre'}
+    cursor_ordering = ('nombre', 'id')
+
+    def get_versiones(self, pk=None):
+        return [('categorias', None)]
+
+
+class ReseñaApiView(ApiView):
+    """
+    /api/reseñas/ y /api/reseñas/<pk>/. El listado se puede filtrar
+    con ?juego=<id> y ?usuario=<id>
+    """
+    model = Reseña
+    campos = {
+        'id': 'id',
+        'juego': 'juego',
+        'juego_titulo': 'juego__titulo',
+        'usuario': 'usuario',
+        'usuario_nombre': 'usuario__username',
+        'puntuacion': 'puntuacion',
+        'comentario': 'comentario',
+        'fecha': 'fecha',
+    }
+    campos_defecto = ['id', 'juego', 'usuario', 'usuario_nombre', 'puntuacion', 'comentario', 'fecha']
+    cursor_ordering = ('-fecha', '-id')
+
+    def get_queryset(self):
+        queryset = Reseña.objects.order_by()
+        for parametro in ('juego', 'usuario'):
+            valor = self.request.GET.get(parametro)
+            if valor:
+                valor = _entero(valor, f'{parametro} debe ser un id numérico')
+                queryset = queryset.filter(**{f'{parametro}_id': valor})
+        return queryset
+
+    def get_versiones(self, pk=None):
+        versiones = [('catalogo', None)] if pk is None else [('resena', pk)]
+        if pk is not None and 'juego_titulo' in self.request.GET.get('fields', ''):
+            # El título depende del juego, cuyo id no se conoce sin consultar
+            versiones.append(('catalogo', None))
+        return versiones
+
+
+def _campo_perfil(nombre):
+    """
+    Campo del perfil o, si el usuario aún no tiene, su valor por defecto
+    (los mismos que perfil_de())
+    """
+    campo = PerfilUsuario._meta.get_field(nombre)
+    return Coalesce(f'perfil__{nombre}', Value(campo.get_default()), output_field=TextField())
+
+
+class PerfilUsuarioApiView(ApiView):
+    """
+    /api/perfiles/ y /api/perfiles/<id de usuario>/. Se lee de los usuarios
+    con LEFT JOIN al perfil: los perfiles se crean al usarse, y quien aún no
+    tiene aparece con los valores por defecto, como en su página de perfil
+    """
+    model = User
+    campos = {
+        'usuario': 'id',
+        'usuario_nombre': 'username',
+        'bio': _campo_perfil('bio'),
+        'plataforma_favorita': _campo_perfil('plataforma_favorita'),
+        'avatar_url': _campo_perfil('avatar_url'),
+    }
+    cursor_ordering = ('id',)
+
+    def get_versiones(self, pk=None):
+        return [('perfiles', None)] if pk is None else [('perfil', pk)]
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class EstadisticasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'estadisticas'
+    verbose_name = 'Estadísticas'
+    
+    def ready(self):
+        """
+        Importar signals y construir las estadísticas tras la primera migración
+        """
+        import estadisticas.signals
+        from .calculo import construir_post_migrate
+        post_migrate.connect(construir_post_migrate, sender=self)
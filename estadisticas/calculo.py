@@ -0,0 +1,447 @@
+"""
+Estadísticas materializadas por corte (EstadisticaCorte).
+
+Cortes: el catálogo entero, cada plataforma y cada categoría. Cada juego
+aporta a los suyos (cortes()) una unidad, su precio y el histograma de sus
+reseñas. Los signals (estadisticas/signals.py) traducen cada cambio en
+aportaciones con signo (+1 lo que aparece, -1 lo que desaparece) sobre un
+Cambios, y aplicar() las escribe: un UPDATE relativo por grupo de cortes
+con el mismo cambio (una reseña nueva es un único UPDATE para el catálogo,
+su plataforma y sus categorías).
+
+Percentiles del precio: PrecioCorte guarda cuántos juegos del corte tienen
+cada precio, y cada percentil se guarda con los juegos de precio menor. Al
+cambiar el corte el percentil se desplaza por los precios vecinos (una
+búsqueda en el índice (corte, precio) por paso; un juego más o menos
+mueve cada percentil como mucho un precio), sin releer la distribución.
+
+Las operaciones masivas de reseñas (update, bulk_update y bulk_create de
+ReseñaQuerySet) avisan con reseñas_modificadas y se aplican igual.
+
+reconstruir() lo recalcula todo (comando rebuild_stats). Se ejecuta tras
+la primera migración (construir_post_migrate) y al final de import_catalog
+y populate_test_data, que escriben juegos sin signals. Sin la fila del
+catálogo los signals no escriben nada.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Q
+from games.models import Categoria, Juego
+from playhub import cache
+from reviews.models import Reseña
+from .models import PERCENTILES, EstadisticaCorte, PrecioCorte
+
+CATALOGO = ('', None)
+
+
+def cortes(plataforma, categorias):
+    """
+    (plataforma, categoria_id) de todos los cortes en los que cuenta un juego
+    """
+    return [CATALOGO, (plataforma, None), *(('', categoria_id) for categoria_id in categorias)]
+
+
+def rango(percentil, n):
+    """
+    Posición (desde 1) del percentil entre n valores ordenados, por rango más cercano
+    """
+    return max(1, (percentil * n + 99) // 100)
+
+
+def percentiles(precios):
+    """
+    {percentil: (precio, juegos de precio menor)} de una distribución
+    [(precio, juegos)] ordenada por precio
+    """
+    n = sum(juegos for _, juegos in precios)
+    resultado = {}
+    for q in PERCENTILES:
+        k, bajo = rango(q, n), 0
+        resultado[q] = (None, 0)
+        for precio, juegos in precios:
+            if bajo + juegos >= k:
+                resultado[q] = (precio, bajo)
+                break
+            bajo += juegos
+    return resultado
+
+
+class Cambios:
+    """
+    Cambios pendientes por corte: juegos, {precio: juegos} y {puntuacion: reseñas}
+    """
+    
+    def __init__(self):
+        self.juegos = Counter()
+        self.precios = defaultdict(Counter)
+        self.puntuaciones = defaultdict(Counter)
+    
+    def juego(self, cortes_juego, precio, signo, histograma=None):
+        """
+        Aportación de un juego completo (con sus reseñas) a sus cortes
+        """
+        for corte in cortes_juego:
+            self.juegos[corte] += signo
+            self.precios[corte][precio] += signo
+            for puntuacion, n in (histograma or {}).items():
+                self.puntuaciones[corte][puntuacion] += signo * n
+    
+    def reseña(self, cortes_juego, puntuacion, signo):
+        for corte in cortes_juego:
+            self.puntuaciones[corte][puntuacion] += signo
+    
+    def precios_de(self, corte):
+        return {precio: n for precio, n in self.precios[corte].items() if n}
+    
+    def histograma_de(self, corte):
+        return {puntuacion: n for puntuacion, n in self.puntuaciones[corte].items() if n}
+    
+    def cortes(self):
+        """
+        Cortes con algún cambio neto
+        """
+        return [
+            corte for corte in {*self.juegos, *self.precios, *self.puntuaciones}
+            if self.juegos[corte] or self.precios_de(corte) or self.histograma_de(corte)
+        ]
+    
+    def clave(self, corte):
+        """
+        Lo que se suma a la fila del corte: los cortes con la misma clave
+        se actualizan con un único UPDATE
+        """
+        return (
+            self.juegos[corte],
+            sum(precio * n for precio, n in self.precios_de(corte).items()),
+            tuple(sorted(self.histograma_de(corte).items())),
+        )
+
+
+def _juegos(juego_ids):
+    """
+    {juego_id: (plataforma, precio, [categoria_id])} de los juegos que existen
+    """
+    juegos = {
+        pk: (plataforma, precio, [])
+        for pk, plataforma, precio in Juego.objects.filter(pk__in=juego_ids).values_list('pk', 'plataforma', 'precio')
+    }
+    Through = Juego.categorias.through
+    for juego_id, categoria_id in Through.objects.filter(juego_id__in=juegos).values_list('juego_id', 'categoria_id'):
+        juegos[juego_id][2].append(categoria_id)
+    return juegos
+
+
+def _histogramas(juego_ids):
+    """
+    {juego_id: Counter({puntuacion: reseñas})}
+    """
+    histogramas = defaultdict(Counter)
+    for juego_id, puntuacion, n in (
+        Reseña.objects.filter(juego_id__in=juego_ids).order_by()
+        .values('juego_id', 'puntuacion').annotate(n=Count('pk')).values_list('juego_id', 'puntuacion', 'n')
+    ):
+        histogramas[juego_id][puntuacion] = n
+    return histogramas
+
+
+def asegurar_cortes(lista):
+    """
+    {corte: pk} de los cortes indicados (y del catálogo), creando las filas
+    que falten. None si aún no se han construido las estadísticas
+    """
+    plataformas = {plataforma for plataforma, categoria_id in lista if categoria_id is None}
+    categorias = {categoria_id for _, categoria_id in lista if categoria_id is not None}
+
+    def leer():
+        return {
+            (plataforma, categoria_id): pk
+            for pk, plataforma, categoria_id in EstadisticaCorte.objects.filter(
+                Q(categoria__isnull=True, plataforma__in={'', *plataformas})
+                | Q(plataforma='', categoria_id__in=categorias)
+            ).values_list('pk', 'plataforma', 'categoria_id')
+        }
+
+    ids = leer()
+    if CATALOGO not in ids:
+        return None
+    faltan = [corte for corte in lista if corte not in ids]
+    if faltan:
+        EstadisticaCorte.objects.bulk_create(
+            [EstadisticaCorte(plataforma=plataforma, categoria_id=categoria_id) for plataforma, categoria_id in faltan],
+            ignore_conflicts=True,
+        )
+        ids = leer()
+    return ids
+
+
+def aplicar(cambios):
+    """
+    Escribir los cambios en sus cortes en una transacción
+    """
+    lista = cambios.cortes()
+    if not lista:
+        return
+    with transaction.atomic():
+        ids = asegurar_cortes(lista)
+        if ids is None:
+            return
+        # Un corte cuya categoría acaba de borrarse ya no tiene fila
+        lista = [corte for corte in lista if corte in ids]
+        grupos = defaultdict(list)
+        for corte in lista:
+            grupos[cambios.clave(corte)].append(ids[corte])
+        for (juegos, suma_precios, histograma), pks in grupos.items():
+            EstadisticaCorte.objects.filter(pk__in=pks).ajustar(juegos, suma_precios, dict(histograma))
+        con_precios = {ids[corte]: cambios.precios_de(corte) for corte in lista if cambios.precios_de(corte)}
+        if con_precios:
+            ajustar_precios(con_precios)
+            mover_percentiles(con_precios)
+    cache.invalidar('estadisticas')
+
+
+def ajustar_precios(con_precios):
+    """
+    Sumar {pk del corte: {precio: juegos}} a las distribuciones: un UPDATE
+    por precio y cambio, altas de los precios nuevos y un DELETE de los
+    que se quedan sin juegos
+    """
+    por_cambio = defaultdict(list)
+    for pk, precios in con_precios.items():
+        for precio, n in precios.items():
+            por_cambio[(precio, n)].append(pk)
+    for (precio, n), pks in por_cambio.items():
+        filas = PrecioCorte.objects.filter(estadistica_id__in=pks, precio=precio)
+        actualizadas = filas.update(juegos=F('juegos') + n)
+        if actualizadas < len(pks) and n > 0:
+            existentes = set(filas.values_list('estadistica_id', flat=True))
+            PrecioCorte.objects.bulk_create([
+                PrecioCorte(estadistica_id=pk, precio=precio, juegos=n) for pk in pks if pk not in existentes
+            ])
+    PrecioCorte.objects.filter(estadistica_id__in=list(con_precios), juegos__lte=0).delete()
+
+
+def mover_percentiles(con_precios):
+    """
+    Recolocar los percentiles de los cortes cuyos precios han cambiado
+    ({pk del corte: {precio: juegos}}, ya aplicados a PrecioCorte)
+    """
+    filas = list(
+        EstadisticaCorte.objects.filter(pk__in=list(con_precios))
+        .only('pk', 'total_juegos', *EstadisticaCorte.CAMPOS_PERCENTILES)
+    )
+    # Juegos en los precios actuales de los percentiles, de una vez
+    actuales = {getattr(fila, f'precio_p{q}') for fila in filas for q in PERCENTILES} - {None}
+    juegos_en = {
+        (pk, precio): juegos
+        for pk, precio, juegos in PrecioCorte.objects.filter(
+            estadistica_id__in=list(con_precios), precio__in=actuales,
+        ).values_list('estadistica_id', 'precio', 'juegos')
+    }
+    for fila in filas:
+        for q in PERCENTILES:
+            precio, bajo = getattr(fila, f'precio_p{q}'), getattr(fila, f'bajo_p{q}')
+            if precio is not None:
+                bajo += sum(n for otro, n in con_precios[fila.pk].items() if otro < precio)
+            precio, bajo = desplazar(fila.pk, q, fila.total_juegos, precio, bajo, juegos_en)
+            setattr(fila, f'precio_p{q}', precio)
+            setattr(fila, f'bajo_p{q}', bajo)
+    EstadisticaCorte.objects.bulk_update(filas, EstadisticaCorte.CAMPOS_PERCENTILES)
+
+
+def desplazar(pk, q, total, precio, bajo, juegos_en):
+    """
+    (precio, juegos de precio menor) del percentil q de un corte con `total`
+    juegos, partiendo de un precio del que se sabe cuántos quedan por debajo.
+    `juegos_en` guarda los juegos de cada (corte, precio) ya leído
+    """
+    if not total:
+        return None, 0
+    k = rango(q, total)
+    distribucion = PrecioCorte.objects.filter(estadistica_id=pk)
+    if precio is None:
+        precio, bajo = distribucion.order_by('precio').values_list('precio', flat=True).first(), 0
+    while precio is not None:
+        if k <= bajo:
+            anterior = distribucion.filter(precio__lt=precio).order_by('-precio').values_list('precio', 'juegos').first()
+            if anterior is None:
+                break
+            precio, juegos = anterior
+            juegos_en[(pk, precio)] = juegos
+            bajo -= juegos
+            continue
+        if (pk, precio) not in juegos_en:
+            juegos_en[(pk, precio)] = distribucion.filter(precio=precio).values_list('juegos', flat=True).first() or 0
+        juegos = juegos_en[(pk, precio)]
+        if k <= bajo + juegos:
+            return precio, bajo
+        siguiente = distribucion.filter(precio__gt=precio).order_by('precio').values_list('precio', 'juegos').first()
+        if siguiente is None:
+            break
+        bajo += juegos
+        precio = siguiente[0]
+        juegos_en[(pk, precio)] = siguiente[1]
+    # La distribución no cuadra con total_juegos (operaciones masivas sin
+    # reconstruir): se recalcula desde la distribución completa
+    return percentiles(list(distribucion.order_by('precio').values_list('precio', 'juegos')))[q]
+
+
+def añadir_juego(juego_id):
+    """
+    Un juego nuevo: cuenta en el catálogo y su plataforma (aún sin
+    categorías ni reseñas, que llegan con sus propios signals)
+    """
+    cambios = Cambios()
+    for plataforma, precio, categorias in _juegos([juego_id]).values():
+        cambios.juego(cortes(plataforma, categorias), precio, 1)
+    aplicar(cambios)
+
+
+def mover_juego(juego_id, anterior):
+    """
+    Un juego guardado con otra plataforma o precio: su aportación sale de
+    los cortes de `anterior` (plataforma, precio) y entra en los nuevos.
+    Las reseñas solo se mueven si cambia la plataforma
+    """
+    juego = _juegos([juego_id]).get(juego_id)
+    if juego is None or juego[:2] == tuple(anterior):
+        return
+    plataforma, precio, categorias = juego
+    histograma = _histogramas([juego_id])[juego_id] if plataforma != anterior[0] else None
+    cambios = Cambios()
+    cambios.juego(cortes(anterior[0], categorias), anterior[1], -1, histograma)
+    cambios.juego(cortes(plataforma, categorias), precio, 1, histograma)
+    aplicar(cambios)
+
+
+def quitar_juego(juego_id):
+    """
+    Un juego que se va a borrar, con todas sus reseñas: se descuenta antes
+    del DELETE, mientras aún se conocen sus categorías
+    """
+    cambios = Cambios()
+    histogramas = _histogramas([juego_id])
+    for pk, (plataforma, precio, categorias) in _juegos([juego_id]).items():
+        cambios.juego(cortes(plataforma, categorias), precio, -1, histogramas.get(pk))
+    aplicar(cambios)
+
+
+def mover_categorias(pares, signo):
+    """
+    Altas (signo 1) o bajas (-1) de pares (juego_id, categoria_id): la
+    aportación del juego entra o sale del corte de la categoría
+    """
+    pares = list(pares)
+    if not pares:
+        return
+    juego_ids = {juego_id for juego_id, _ in pares}
+    juegos, histogramas = _juegos(juego_ids), _histogramas(juego_ids)
+    cambios = Cambios()
+    for juego_id, categoria_id in pares:
+        if juego_id in juegos:
+            cambios.juego([('', categoria_id)], juegos[juego_id][1], signo, histogramas.get(juego_id))
+    aplicar(cambios)
+
+
+def ajustar_reseñas(lista):
+    """
+    Reseñas que aparecen o desaparecen: tuplas (juego_id, puntuacion, signo).
+    Una edición son dos tuplas que, si no cambia nada de lo que cuenta,
+    se anulan y no se escribe nada
+    """
+    netos = Counter()
+    for juego_id, puntuacion, signo in lista:
+        netos[(juego_id, puntuacion)] += signo
+    netos = {clave: signo for clave, signo in netos.items() if signo}
+    if not netos:
+        return
+    juegos = _juegos({juego_id for juego_id, _ in netos})
+    cambios = Cambios()
+    for (juego_id, puntuacion), signo in netos.items():
+        if juego_id in juegos:
+            plataforma, _, categorias = juegos[juego_id]
+            cambios.reseña(cortes(plataforma, categorias), puntuacion, signo)
+    aplicar(cambios)
+
+
+def añadir_categoria(categoria_id):
+    """
+    Fila vacía para una categoría nueva, para que aparezca en las páginas
+    """
+    with transaction.atomic():
+        if asegurar_cortes([('', categoria_id)]) is not None:
+            cache.invalidar('estadisticas')
+
+
+def reconstruir(tamaño_lote=5000):
+    """
+    Recalcular todas las estadísticas: recorre los juegos una vez sumando
+    su aportación a un Cambios y sustituye las tablas en una transacción.
+    Todas las plataformas y categorías tienen fila, aunque estén vacías.
+    Devuelve el número de cortes
+    """
+    categorias = defaultdict(list)
+    for juego_id, categoria_id in Juego.categorias.through.objects.values_list('juego_id', 'categoria_id'):
+        categorias[juego_id].append(categoria_id)
+    histogramas = defaultdict(Counter)
+    reseñas = (
+        Reseña.objects.order_by().values('juego_id', 'puntuacion')
+        .annotate(n=Count('pk')).values_list('juego_id', 'puntuacion', 'n')
+    )
+    for juego_id, puntuacion, n in reseñas.iterator(chunk_size=tamaño_lote):
+        histogramas[juego_id][puntuacion] = n
+    cambios = Cambios()
+    juegos = Juego.objects.order_by().values_list('pk', 'plataforma', 'precio')
+    for juego_id, plataforma, precio in juegos.iterator(chunk_size=tamaño_lote):
+        cambios.juego(cortes(plataforma, categorias.get(juego_id, ())), precio, 1, histogramas.get(juego_id))
+
+    todos = {
+        CATALOGO,
+        *((plataforma, None) for plataforma, _ in Juego.PLATAFORMA_CHOICES),
+        *(('', categoria_id) for categoria_id in Categoria.objects.values_list('pk', flat=True)),
+        *cambios.cortes(),
+    }
+    filas, distribuciones = [], []
+    for plataforma, categoria_id in todos:
+        corte = (plataforma, categoria_id)
+        juegos_corte, suma_precios, histograma = cambios.clave(corte)
+        histograma = dict(histograma)
+        fila = EstadisticaCorte(
+            plataforma=plataforma, categoria_id=categoria_id,
+            total_juegos=juegos_corte, suma_precios=suma_precios,
+            total_reseñas=sum(histograma.values()),
+            suma_puntuaciones=sum(puntuacion * n for puntuacion, n in histograma.items()),
+            **{f'puntuaciones_{puntuacion}': histograma.get(puntuacion, 0) for puntuacion in range(1, 11)},
+        )
+        distribucion = sorted(cambios.precios_de(corte).items())
+        for q, (precio, bajo) in percentiles(distribucion).items():
+            setattr(fila, f'precio_p{q}', precio)
+            setattr(fila, f'bajo_p{q}', bajo)
+        filas.append(fila)
+        distribuciones.append(distribucion)
+
+    with transaction.atomic():
+        PrecioCorte.objects.all().delete()
+        EstadisticaCorte.objects.all().delete()
+        EstadisticaCorte.objects.bulk_create(filas, batch_size=tamaño_lote)
+        PrecioCorte.objects.bulk_create([
+            PrecioCorte(estadistica_id=fila.pk, precio=precio, juegos=n)
+            for fila, distribucion in zip(filas, distribuciones)
+            for precio, n in distribucion
+        ], batch_size=tamaño_lote)
+    cache.invalidar('estadisticas')
+    return len(filas)
+
+
+def construir_post_migrate(sender, using='default', **kwargs):
+    """
+    Receptor de post_migrate (ver EstadisticasConfig.ready). Si la base de
+    datos aún no tiene estadísticas se construyen: sin la fila del catálogo
+    los signals no escriben nada
+    """
+    if not router.allow_migrate_model(using, EstadisticaCorte):
+        return
+    if EstadisticaCorte._meta.db_table not in connections[using].introspection.table_names():
+        return  # migrate hacia atrás
+    if not EstadisticaCorte.objects.using(using).exists():
+        reconstruir()
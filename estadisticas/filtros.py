@@ -0,0 +1,54 @@
+"""
+Filtros del admin que sacan sus opciones de las estadísticas materializadas.
+
+El filtro por defecto de un ManyToMany (RelatedFieldListFilter) vuelve a
+leer todas las categorías en cada carga del changelist y filtra con un
+JOIN sobre la tabla intermedia. CategoriaFiltro muestra cuántos juegos tiene
+cada categoría, cachea sus opciones con las versiones ('estadisticas',
+'categorias') y filtra con la misma subconsulta que el catálogo
+(JuegoQuerySet.filtrar)
+"""
+from django.contrib import admin
+from django.db.models import OuterRef, Subquery
+from games.models import Categoria
+from playhub import cache
+from .models import EstadisticaCorte
+
+
+def opciones_categorias():
+    """
+    [(id, 'nombre (juegos)')] de las categorías con algún juego, por nombre.
+    Sin estadísticas construidas, todas las categorías sin recuento.
+    Una sola consulta: el recuento es una subconsulta por el índice único
+    (plataforma, categoria)
+    """
+    dependencias = [('estadisticas', None), ('categorias', None)]
+    clave = cache.clave_fragmento('filtro_categorias', dependencias, cache.versiones(dependencias))
+    opciones = cache.get_cache().get(clave)
+    if opciones is None:
+        juegos = EstadisticaCorte.objects.filter(plataforma='', categoria=OuterRef('pk')).values('total_juegos')
+        categorias = list(
+            Categoria.objects.annotate(total_juegos=Subquery(juegos))
+            .order_by('nombre').values_list('pk', 'nombre', 'total_juegos')
+        )
+        if any(n is not None for _, _, n in categorias):
+            opciones = [(pk, f'{nombre} ({n})') for pk, nombre, n in categorias if n]
+        else:
+            opciones = [(pk, nombre) for pk, nombre, _ in categorias]
+        cache.get_cache().set(clave, opciones)
+    return opciones
+
+
+class CategoriaFiltro(admin.SimpleListFilter):
+    title = 'categorías'
+    parameter_name = 'categoria'
+    
+    def lookups(self, request, model_admin):
+        return [(str(pk), etiqueta) for pk, etiqueta in opciones_categorias()]
+    
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if not self.value().isdecimal():
+            return queryset.none()
+        return queryset.filtrar(categorias=[self.value()])
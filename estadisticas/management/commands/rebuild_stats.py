@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from estadisticas import calculo
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruir las estadísticas por plataforma y categoría (juegos, precios '
+        'y valoraciones). Necesario tras las cargas masivas, que no envían signals'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas leídas por consulta')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruyendo estadísticas...')
+        inicio = time.perf_counter()
+        cortes = calculo.reconstruir(tamaño_lote=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ {cortes} cortes en {time.perf_counter() - inicio:.1f}s'
+        ))
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('games', '0006_indice_plataforma_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaCorte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plataforma', models.CharField(blank=True, max_length=20, verbose_name='Plataforma')),
+                ('total_juegos', models.IntegerField(default=0, verbose_name='Juegos')),
+                ('suma_precios', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Suma de Precios')),
+                ('precio_p25', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio P25')),
+                ('bajo_p25', models.IntegerField(default=0, verbose_name='Juegos bajo el P25')),
+                ('precio_p50', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio Mediano')),
+                ('bajo_p50', models.IntegerField(default=0, verbose_name='Juegos bajo la Mediana')),
+                ('precio_p75', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio P75')),
+                ('bajo_p75', models.IntegerField(default=0, verbose_name='Juegos bajo el P75')),
+                ('total_reseñas', models.IntegerField(default=0, verbose_name='Reseñas')),
+                ('suma_puntuaciones', models.BigIntegerField(default=0, verbose_name='Suma de Puntuaciones')),
+                ('puntuaciones_1', models.IntegerField(default=0, verbose_name='Reseñas con 1')),
+                ('puntuaciones_2', models.IntegerField(default=0, verbose_name='Reseñas con 2')),
+                ('puntuaciones_3', models.IntegerField(default=0, verbose_name='Reseñas con 3')),
+                ('puntuaciones_4', models.IntegerField(default=0, verbose_name='Reseñas con 4')),
+                ('puntuaciones_5', models.IntegerField(default=0, verbose_name='Reseñas con 5')),
+                ('puntuaciones_6', models.IntegerField(default=0, verbose_name='Reseñas con 6')),
+                ('puntuaciones_7', models.IntegerField(default=0, verbose_name='Reseñas con 7')),
+                ('puntuaciones_8', models.IntegerField(default=0, verbose_name='Reseñas con 8')),
+                ('puntuaciones_9', models.IntegerField(default=0, verbose_name='Reseñas con 9')),
+                ('puntuaciones_10', models.IntegerField(default=0, verbose_name='Reseñas con 10')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='games.categoria', verbose_name='Categoría')),
+            ],
+            options={
+                'verbose_name': 'Estadística de Corte',
+                'verbose_name_plural': 'Estadísticas de Corte',
+            },
+        ),
+        migrations.CreateModel(
+            name='PrecioCorte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio')),
+                ('juegos', models.IntegerField(verbose_name='Juegos')),
+                ('estadistica', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='precios', to='estadisticas.estadisticacorte', verbose_name='Corte')),
+            ],
+            options={
+                'verbose_name': 'Precio de Corte',
+                'verbose_name_plural': 'Precios de Corte',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='estadisticacorte',
+            constraint=models.UniqueConstraint(fields=('plataforma', 'categoria'), name='estadistica_corte_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='estadisticacorte',
+            constraint=models.UniqueConstraint(condition=models.Q(('categoria__isnull', True)), fields=('plataforma',), name='estadistica_plataforma_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='preciocorte',
+            constraint=models.UniqueConstraint(fields=('estadistica', 'precio'), name='precio_corte_unico'),
+        ),
+    ]
@@ -0,0 +1,163 @@
+from django.db import models
+from django.db.models import F, Q
+from games.models import Categoria
+
+# Percentiles del precio que se mantienen en cada corte
+PERCENTILES = (25, 50, 75)
+
+
+class EstadisticaCorteQuerySet(models.QuerySet):
+    
+    def catalogo(self):
+        """
+        La fila de todo el catálogo (None hasta el primer rebuild_stats)
+        """
+        return self.filter(plataforma='', categoria__isnull=True).first()
+    
+    def por_categoria(self):
+        return self.filter(plataforma='', categoria__isnull=False).select_related('categoria')
+    
+    def ajustar(self, juegos=0, suma_precios=0, histograma=None):
+        """
+        Sumar juegos, precios y el histograma {puntuacion: reseñas} (negativos
+        para lo que desaparece) en un único UPDATE. Devuelve las filas
+        actualizadas, o None si no hay nada que escribir
+        """
+        campos = {}
+        if juegos:
+            campos['total_juegos'] = F('total_juegos') + juegos
+        if suma_precios:
+            campos['suma_precios'] = F('suma_precios') + suma_precios
+        histograma = histograma or {}
+        for puntuacion, n in histograma.items():
+            if n:
+                campo = f'puntuaciones_{puntuacion}'
+                campos[campo] = F(campo) + n
+        reseñas = sum(histograma.values())
+        puntos = sum(puntuacion * n for puntuacion, n in histograma.items())
+        if reseñas:
+            campos['total_reseñas'] = F('total_reseñas') + reseñas
+        if puntos:
+            campos['suma_puntuaciones'] = F('suma_puntuaciones') + puntos
+        return self.update(**campos) if campos else None
+
+
+class EstadisticaCorte(models.Model):
+    """
+    Agregados materializados de un corte del catálogo: el catálogo entero
+    (plataforma '' y sin categoría), una plataforma o una categoría.
+    
+    Guarda los juegos del corte, la suma y los percentiles de sus precios, y
+    el número, la suma y el histograma de las puntuaciones de sus reseñas.
+    estadisticas/calculo.py los reconstruye y los mantiene con los signals
+    de juegos, categorías y reseñas. Los contadores no tienen CHECK >= 0:
+    si una operación masiva sin reconstruir los deja desfasados, la
+    escritura que lo destapa no debe fallar por ello
+    """
+    
+    # '' = todas las plataformas
+    plataforma = models.CharField(max_length=20, blank=True, verbose_name='Plataforma')
+    # NULL = todas las categorías
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Categoría'
+    )
+    total_juegos = models.IntegerField(default=0, verbose_name='Juegos')
+    suma_precios = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Suma de Precios')
+    # Cada percentil junto con los juegos de precio menor (ver calculo.mover_percentiles)
+    precio_p25 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Precio P25')
+    bajo_p25 = models.IntegerField(default=0, verbose_name='Juegos bajo el P25')
+    precio_p50 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Precio Mediano')
+    bajo_p50 = models.IntegerField(default=0, verbose_name='Juegos bajo la Mediana')
+    precio_p75 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Precio P75')
+    bajo_p75 = models.IntegerField(default=0, verbose_name='Juegos bajo el P75')
+    total_reseñas = models.IntegerField(default=0, verbose_name='Reseñas')
+    suma_puntuaciones = models.BigIntegerField(default=0, verbose_name='Suma de Puntuaciones')
+    puntuaciones_1 = models.IntegerField(default=0, verbose_name='Reseñas con 1')
+    puntuaciones_2 = models.IntegerField(default=0, verbose_name='Reseñas con 2')
+    puntuaciones_3 = models.IntegerField(default=0, verbose_name='Reseñas con 3')
+    puntuaciones_4 = models.IntegerField(default=0, verbose_name='Reseñas con 4')
+    puntuaciones_5 = models.IntegerField(default=0, verbose_name='Reseñas con 5')
+    puntuaciones_6 = models.IntegerField(default=0, verbose_name='Reseñas con 6')
+    puntuaciones_7 = models.IntegerField(default=0, verbose_name='Reseñas con 7')
+    puntuaciones_8 = models.IntegerField(default=0, verbose_name='Reseñas con 8')
+    puntuaciones_9 = models.IntegerField(default=0, verbose_name='Reseñas con 9')
+    puntuaciones_10 = models.IntegerField(default=0, verbose_name='Reseñas con 10')
+    
+    CAMPOS_PERCENTILES = [campo for q in PERCENTILES for campo in (f'precio_p{q}', f'bajo_p{q}')]
+    
+    objects = EstadisticaCorteQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Estadística de Corte'
+        verbose_name_plural = 'Estadísticas de Corte'
+        constraints = [
+            models.UniqueConstraint(fields=['plataforma', 'categoria'], name='estadistica_corte_unico'),
+            # NULL no se repite en la restricción anterior: una fila por plataforma
+            models.UniqueConstraint(
+                fields=['plataforma'],
+                condition=Q(categoria__isnull=True),
+                name='estadistica_plataforma_unico',
+            ),
+        ]
+    
+    def __str__(self):
+        if self.categoria_id:
+            return f"Categoría {self.categoria_id}"
+        return f"Plataforma {self.plataforma}" if self.plataforma else "Catálogo"
+    
+    @property
+    def precio_medio(self):
+        if not self.total_juegos:
+            return None
+        return self.suma_precios / self.total_juegos
+    
+    @property
+    def puntuacion_media(self):
+        if not self.total_reseñas:
+            return None
+        return self.suma_puntuaciones / self.total_reseñas
+    
+    @property
+    def histograma(self):
+        """
+        [(puntuacion, reseñas, porcentaje)] de 10 a 1, para las barras
+        """
+        filas = []
+        for puntuacion in range(10, 0, -1):
+            n = getattr(self, f'puntuaciones_{puntuacion}')
+            filas.append((puntuacion, n, round(100 * n / self.total_reseñas) if self.total_reseñas else 0))
+        return filas
+
+
+class PrecioCorte(models.Model):
+    """
+    Juegos de un corte con cada precio: la distribución de la que salen
+    los percentiles. Solo hay filas para los precios con algún juego
+    """
+    
+    estadistica = models.ForeignKey(
+        EstadisticaCorte,
+        on_delete=models.CASCADE,
+        related_name='precios',
+        verbose_name='Corte',
+        # Cubierto por la restricción única
+        db_index=False
+    )
+    precio = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Precio')
+    juegos = models.IntegerField(verbose_name='Juegos')
+    
+    class Meta:
+        verbose_name = 'Precio de Corte'
+        verbose_name_plural = 'Precios de Corte'
+        constraints = [
+            # También es el índice por el que se desplazan los percentiles
+            models.UniqueConstraint(fields=['estadistica', 'precio'], name='precio_corte_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.juegos} juegos a {self.precio}"
@@ -0,0 +1,120 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from games.models import Categoria, Juego
+from reviews.cola import reseñas_volcadas
+from reviews.models import Reseña, reseñas_modificadas
+from . import calculo
+
+Through = Juego.categorias.through
+
+
+def borrado_de_juego(origin):
+    """
+    Si un borrado parte de juegos (instancia o queryset), sus reseñas ya
+    se descontaron con el juego en quitar_estadisticas_juego
+    """
+    return isinstance(origin, Juego) or getattr(origin, 'model', None) is Juego
+
+
+@receiver(pre_save, sender=Juego)
+def recordar_juego(sender, instance, update_fields=None, **kwargs):
+    """
+    Plataforma y precio guardados, para mover la aportación del juego si cambian
+    """
+    instance._estadisticas_original = None
+    if instance.pk is None or (update_fields is not None and not {'plataforma', 'precio'} & set(update_fields)):
+        return
+    instance._estadisticas_original = (
+        Juego.objects.filter(pk=instance.pk).values_list('plataforma', 'precio').first()
+    )
+
+
+@receiver(post_save, sender=Juego)
+def actualizar_estadisticas_juego(sender, instance, created, **kwargs):
+    anterior = instance.__dict__.pop('_estadisticas_original', None)
+    if created:
+        calculo.añadir_juego(instance.pk)
+    elif anterior is not None:
+        calculo.mover_juego(instance.pk, anterior)
+
+
+@receiver(pre_delete, sender=Juego)
+def quitar_estadisticas_juego(sender, instance, **kwargs):
+    """
+    Antes del DELETE: después sus categorías ya no existen
+    """
+    calculo.quitar_juego(instance.pk)
+
+
+@receiver(m2m_changed, sender=Through)
+def actualizar_estadisticas_categorias(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Altas y bajas de categorías en cualquiera de los dos sentidos. Las bajas
+    se leen antes (pre_remove, pre_clear) porque pk_set puede incluir pares
+    que no existían y clear() no dice cuáles había
+    """
+    campo, otro = ('categoria_id', 'juego_id') if reverse else ('juego_id', 'categoria_id')
+    if action in ('pre_remove', 'pre_clear'):
+        pares = Through.objects.filter(**{campo: instance.pk})
+        if action == 'pre_remove':
+            pares = pares.filter(**{f'{otro}__in': pk_set})
+        instance._estadisticas_quitadas = list(pares.values_list('juego_id', 'categoria_id'))
+    elif action in ('post_remove', 'post_clear'):
+        calculo.mover_categorias(instance.__dict__.pop('_estadisticas_quitadas', ()), -1)
+    elif action == 'post_add' and pk_set:
+        calculo.mover_categorias(
+            [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set], 1
+        )
+
+
+@receiver(post_save, sender=Categoria)
+def crear_estadisticas_categoria(sender, instance, created, **kwargs):
+    if created:
+        calculo.añadir_categoria(instance.pk)
+
+
+@receiver(pre_save, sender=Reseña)
+def recordar_reseña(sender, instance, **kwargs):
+    """
+    Juego y puntuación guardados. Se toman antes de que los receivers
+    post_save de reviews dejen _valoracion_original con los valores nuevos
+    """
+    original = getattr(instance, '_valoracion_original', None)
+    if not instance._state.adding and (original is None or None in original):
+        original = Reseña.objects.filter(pk=instance.pk).values_list('juego_id', 'puntuacion').first()
+    instance._estadisticas_original = original
+
+
+@receiver(post_save, sender=Reseña)
+def actualizar_estadisticas_reseña(sender, instance, created, **kwargs):
+    original = instance.__dict__.pop('_estadisticas_original', None)
+    cambios = [(instance.juego_id, instance.puntuacion, 1)]
+    if not created and original is not None:
+        cambios.append((*original, -1))
+    calculo.ajustar_reseñas(cambios)
+
+
+@receiver(post_delete, sender=Reseña)
+def quitar_estadisticas_reseña(sender, instance, origin=None, **kwargs):
+    if borrado_de_juego(origin):
+        return
+    juego_id, puntuacion = getattr(instance, '_valoracion_original', (None, None))
+    if juego_id is None or puntuacion is None:
+        juego_id, puntuacion = instance.juego_id, instance.puntuacion
+    calculo.ajustar_reseñas([(juego_id, puntuacion, -1)])
+
+
+@receiver(reseñas_volcadas)
+def actualizar_estadisticas_volcado(sender, reseñas, **kwargs):
+    """
+    Lotes de la cola de reseñas en diferido (bulk_create, sin post_save)
+    """
+    calculo.ajustar_reseñas((reseña.juego_id, reseña.puntuacion, 1) for reseña in reseñas)
+
+
+@receiver(reseñas_modificadas)
+def actualizar_estadisticas_masivas(sender, cambios, **kwargs):
+    """
+    update(), bulk_update() y bulk_create() de ReseñaQuerySet
+    """
+    calculo.ajustar_reseñas(cambios)
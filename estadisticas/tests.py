@@ -0,0 +1,163 @@
+import random
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from games.models import Categoria, Juego
+from playhub.testing import PresupuestoConsultasTestCase
+from reviews.models import Reseña
+from . import calculo
+from .models import PERCENTILES, EstadisticaCorte, PrecioCorte
+
+
+def instantanea():
+    """
+    Todas las estadísticas y distribuciones de precios, por corte
+    """
+    campos = [
+        campo.attname for campo in EstadisticaCorte._meta.concrete_fields
+        if campo.attname not in ('id', 'plataforma', 'categoria_id')
+    ]
+    filas = {
+        (e.plataforma, e.categoria_id): {campo: getattr(e, campo) for campo in campos}
+        for e in EstadisticaCorte.objects.all()
+    }
+    for pk, plataforma, categoria_id, precio, juegos in PrecioCorte.objects.values_list(
+        'estadistica_id', 'estadistica__plataforma', 'estadistica__categoria_id', 'precio', 'juegos'
+    ):
+        filas[(plataforma, categoria_id)].setdefault('precios', {})[precio] = juegos
+    return filas
+
+
+class EstadisticasTests(PresupuestoConsultasTestCase):
+    """
+    Reconstrucción, mantenimiento incremental y lectura de las estadísticas
+    """
+    
+    def setUp(self):
+        super().setUp()
+        calculo.reconstruir()
+    
+    def test_reconstruir(self):
+        categoria = Categoria.objects.order_by('pk').first()
+        for plataforma, categoria_id, juegos in (
+            ('', None, Juego.objects.all()),
+            ('PC', None, Juego.objects.filter(plataforma='PC')),
+            ('', categoria.pk, categoria.juegos.all()),
+        ):
+            estadistica = EstadisticaCorte.objects.get(plataforma=plataforma, categoria_id=categoria_id)
+            precios = sorted(juegos.values_list('precio', flat=True))
+            self.assertEqual(estadistica.total_juegos, len(precios))
+            self.assertEqual(estadistica.suma_precios, sum(precios))
+            for q in PERCENTILES:
+                self.assertEqual(getattr(estadistica, f'precio_p{q}'), precios[calculo.rango(q, len(precios)) - 1])
+            puntuaciones = Counter(Reseña.objects.filter(juego__in=juegos).values_list('puntuacion', flat=True))
+            self.assertEqual(estadistica.total_reseñas, sum(puntuaciones.values()))
+            self.assertEqual(
+                [(p, n) for p, n, _ in estadistica.histograma],
+                [(p, puntuaciones[p]) for p in range(10, 0, -1)],
+            )
+    
+    def test_actualizacion_incremental(self):
+        rnd = random.Random(7)
+        categorias = list(Categoria.objects.order_by('pk'))
+        nueva = Categoria.objects.create(nombre='Categoría nueva')
+        juego = Juego.objects.create(
+            titulo='Juego incremental', plataforma='Xbox', precio=Decimal('19.99'), fecha_lanzamiento=date(2020, 1, 1),
+        )
+        juego.categorias.add(categorias[0], nueva)
+        autor = User.objects.create_user('autor_estadisticas')
+        reseña = Reseña.objects.create(
+            juego=juego, usuario=autor, puntuacion=9,
+            comentario='Comentario de prueba lo bastante largo para pasar la validación.',
+        )
+        reseña.puntuacion = 3
+        reseña.save()
+        reseña.juego = Juego.objects.exclude(pk=juego.pk).order_by('pk').first()
+        reseña.save()
+        Reseña.objects.create(
+            juego=juego, usuario=User.objects.create_user('otro_autor'), puntuacion=10,
+            comentario='Comentario de prueba lo bastante largo para pasar la validación.',
+        )
+        juego.refresh_from_db()
+        juego.plataforma = 'PC'
+        juego.save()
+        # Precios y plataformas: los percentiles se desplazan por los vecinos
+        otros = rnd.sample(list(Juego.objects.exclude(pk=juego.pk).order_by('pk')), 20)
+        for otro in otros:
+            otro.precio = Decimal(rnd.randint(499, 6999)) / 100
+            if rnd.random() < 0.3:
+                otro.plataforma = rnd.choice(Juego.PLATAFORMA_CHOICES)[0]
+            otro.save()
+        otros[0].categorias.set([categorias[1], nueva])
+        categorias[2].juegos.remove(*otros[1:5])
+        categorias[3].juegos.add(*otros[5:10])
+        nueva.juegos.clear()
+        otros[10].delete()
+        Juego.objects.filter(pk__in=[o.pk for o in otros[11:13]]).delete()
+        User.objects.filter(username='usuario1').delete()
+        reseña.delete()
+        juego.delete()
+
+        incremental = instantanea()
+        calculo.reconstruir()
+        self.assertEqual(incremental, instantanea())
+    
+    def test_operaciones_masivas(self):
+        juego = Juego.objects.order_by('pk').first()
+        Reseña.objects.filter(juego=juego).update(puntuacion=10)
+        reseñas = list(Reseña.objects.order_by('pk')[:5])
+        for reseña in reseñas:
+            reseña.puntuacion = 1
+        Reseña.objects.bulk_update(reseñas, ['puntuacion'])
+        autor = User.objects.create_user('autor_masivo')
+        Reseña.objects.bulk_create([
+            Reseña(juego=juego, usuario=autor, puntuacion=7, comentario='x' * 60),
+            Reseña(juego=reseñas[0].juego, usuario=reseñas[0].usuario, puntuacion=5, comentario='y' * 60),
+        ], update_conflicts=True, unique_fields=['juego', 'usuario'], update_fields=['puntuacion'])
+
+        incremental = instantanea()
+        calculo.reconstruir()
+        self.assertEqual(incremental, instantanea())
+    
+    def test_post_migrate(self):
+        """
+        Una base de datos recién migrada ya tiene estadísticas
+        """
+        EstadisticaCorte.objects.all().delete()
+        calculo.construir_post_migrate(sender=None)
+        self.assertEqual(EstadisticaCorte.objects.catalogo().total_juegos, Juego.objects.count())
+    
+    def test_sin_reconstruir(self):
+        """
+        Antes del primer rebuild_stats los signals no escriben nada
+        """
+        EstadisticaCorte.objects.all().delete()
+        juego = Juego.objects.create(
+            titulo='Juego sin estadísticas', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1),
+        )
+        juego.categorias.add(Categoria.objects.first())
+        self.assertFalse(EstadisticaCorte.objects.exists())
+    
+    def test_presupuesto_vistas(self):
+        response = self.assertPresupuestoConsultas(reverse('estadisticas:panel'), 2)
+        self.assertEqual(response.context['catalogo'].total_juegos, Juego.objects.count())
+        self.assertEqual(len(response.context['plataformas']), len(Juego.PLATAFORMA_CHOICES))
+        response = self.assertPresupuestoConsultas(reverse('estadisticas:categorias') + '?orden=valoracion', 1)
+        medias = [e.puntuacion_media for e in response.context['estadisticas']]
+        self.assertEqual(len(medias), Categoria.objects.count())
+        self.assertEqual(medias, sorted(medias, reverse=True))
+    
+    def test_filtro_admin(self):
+        categoria = Categoria.objects.order_by('pk').first()
+        url = reverse('admin:games_juego_changelist')
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertContains(response, f'{categoria.nombre} ({categoria.juegos.count()})')
+        response = self.client.get(url + f'?categoria={categoria.pk}')
+        self.assertEqual(response.context['cl'].result_count, categoria.juegos.count())
+        # '²'.isdigit() es True pero no es un id: sin resultados, no un 500
+        response = self.client.get(url, {'categoria': '²'})
+        self.assertEqual(response.context['cl'].result_count, 0)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'estadisticas'
+
+urlpatterns = [
+    path('', views.PanelEstadisticasView.as_view(), name='panel'),
+    path('categorias/', views.CategoriaEstadisticasView.as_view(), name='categorias'),
+]
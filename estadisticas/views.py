@@ -0,0 +1,65 @@
+from django.views.generic import ListView, TemplateView
+from playhub.cache import CachePaginaAnonimaMixin
+from .models import EstadisticaCorte
+
+
+class EstadisticasCacheMixin(CachePaginaAnonimaMixin):
+    
+    def get_versiones_cache(self):
+        return [('estadisticas', None), ('categorias', None)]
+
+
+class CategoriaEstadisticasView(EstadisticasCacheMixin, ListView):
+    """
+    Categorías del catálogo con sus juegos, precios y valoraciones. Lee
+    solo las estadísticas materializadas (una fila por categoría); el
+    orden se elige con ?orden= y se aplica en memoria
+    """
+    template_name = 'estadisticas/categorias.html'
+    context_object_name = 'estadisticas'
+    ORDENES = {
+        'nombre': ('Nombre', lambda e: e.categoria.nombre.lower(), False),
+        'juegos': ('Juegos', lambda e: e.total_juegos, True),
+        'valoracion': ('Valoración', lambda e: e.puntuacion_media or 0, True),
+        'reseñas': ('Reseñas', lambda e: e.total_reseñas, True),
+        'precio': ('Precio mediano', lambda e: e.precio_p50 or 0, False),
+    }
+    
+    def get_orden(self):
+        orden = self.request.GET.get('orden')
+        return orden if orden in self.ORDENES else 'nombre'
+    
+    def get_queryset(self):
+        _, clave, descendente = self.ORDENES[self.get_orden()]
+        estadisticas = sorted(EstadisticaCorte.objects.por_categoria(), key=lambda e: e.categoria.nombre.lower())
+        return sorted(estadisticas, key=clave, reverse=descendente)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['orden'] = self.get_orden()
+        context['ordenes'] = [(valor, etiqueta) for valor, (etiqueta, _, _) in self.ORDENES.items()]
+        return context
+
+
+class PanelEstadisticasView(EstadisticasCacheMixin, TemplateView):
+    """
+    Panel del catálogo: totales, precios y valoraciones por plataforma y las
+    categorías destacadas. Dos consultas sobre las estadísticas materializadas
+    """
+    template_name = 'estadisticas/panel.html'
+    categorias_destacadas = 5
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        sin_categoria = list(EstadisticaCorte.objects.filter(categoria__isnull=True).order_by('plataforma'))
+        categorias = list(EstadisticaCorte.objects.por_categoria())
+        context['catalogo'] = next((e for e in sin_categoria if not e.plataforma), None)
+        context['plataformas'] = [e for e in sin_categoria if e.plataforma]
+        context['mas_juegos'] = sorted(
+            categorias, key=lambda e: (-e.total_juegos, e.categoria.nombre)
+        )[:self.categorias_destacadas]
+        context['mejor_valoradas'] = sorted(
+            (e for e in categorias if e.total_reseñas),
+            key=lambda e: (-e.puntuacion_media, e.categoria.nombre),
+        )[:self.categorias_destacadas]
+        return context
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from estadisticas.filtros import CategoriaFiltro
+from playhub.admin import TablaGrandeAdminMixin
 from .models import Categoria, Juego
 
 
@@ -13,14 +15,17 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 
 @admin.register(Juego)
-class JuegoAdmin(admin.ModelAdmin):
+class JuegoAdmin(TablaGrandeAdminMixin, admin.ModelAdmin):
     """
     Configuración del panel de administración para Juegos
     FASE B: Ahora incluye filter_horizontal para categorías
+    Su búsqueda (FTS5) sirve también al autocompletado de ReseñaAdmin.
+    Las opciones del filtro de categorías salen de las estadísticas (estadisticas/filtros.py)
     """
-    list_display = ('titulo', 'plataforma', 'precio', 'fecha_lanzamiento', 'get_categorias')
+    list_display = ('titulo', 'plataforma', 'precio', 'fecha_lanzamiento', 'get_categorias',
+                    'puntuacion_promedio', 'total_reseñas')
     search_fields = ('titulo',)
-    list_filter = ('plataforma', 'fecha_lanzamiento', 'categorias')
+    list_filter = ('plataforma', 'fecha_lanzamiento', CategoriaFiltro)
     ordering = ('-fecha_lanzamiento',)
     filter_horizontal = ('categorias',)  # UI mejorada para ManyToMany
     
@@ -36,6 +41,20 @@ class JuegoAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """
+        Precargar las categorías de toda la página en una sola consulta
+        """
+        return super().get_queryset(request).prefetch_related('categorias')
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Buscar por título con el índice FTS5 en lugar de LIKE %x%
+        """
+        if not search_term:
+            return queryset, False
+        return queryset.buscar(search_term), False
+    
     def get_categorias(self, obj):
         """
         Mostrar categorías en list_display
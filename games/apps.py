@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class GamesConfig(AppConfig):
     name = 'games'
+    
+    def ready(self):
+        """
+        Importar signals y mantener el índice de búsqueda FTS5 tras cada migración
+        """
+        import games.signals
+        from .busqueda import instalar_fts_post_migrate
+        post_migrate.connect(instalar_fts_post_migrate, sender=self)
@@ -0,0 +1,94 @@
+"""
+Búsqueda de texto completo sobre Juego.titulo.
+
+En SQLite se usa una tabla virtual FTS5 de contenido externo
+(`games_juego_fts`) que se mantiene sincronizada con `games_juego`
+mediante triggers. En otros motores se recurre a `icontains`.
+"""
+import re
+
+from django.db import connections
+
+TABLA_FTS = 'games_juego_fts'
+
+SQL_TABLA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+    titulo,
+    content='games_juego',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+SQL_TRIGGERS = {
+    f'{TABLA_FTS}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON games_juego BEGIN
+            INSERT INTO {TABLA_FTS}(rowid, titulo) VALUES (new.id, new.titulo);
+        END
+    """,
+    f'{TABLA_FTS}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON games_juego BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, titulo) VALUES ('delete', old.id, old.titulo);
+        END
+    """,
+    f'{TABLA_FTS}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF titulo ON games_juego BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, titulo) VALUES ('delete', old.id, old.titulo);
+            INSERT INTO {TABLA_FTS}(rowid, titulo) VALUES (new.id, new.titulo);
+        END
+    """,
+}
+
+
+def usa_fts(using='default'):
+    """
+    Indicar si la base de datos tiene el índice FTS5 disponible
+    """
+    return connections[using].vendor == 'sqlite'
+
+
+def instalar_indice(using, tabla, sql_tabla, sql_triggers):
+    """
+    Crear una tabla FTS5 y sus triggers si no existen.
+
+    SQLite descarta los triggers cada vez que una migración reconstruye
+    la tabla indexada, por eso se llama tras cada `migrate` (post_migrate)
+    y se reindexa todo cuando alguno de ellos faltaba.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{tabla}_%'],
+        )
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        cursor.execute(sql_tabla)
+        for nombre, sql in sql_triggers.items():
+            cursor.execute(sql)
+        if existentes != set(sql_triggers):
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
+
+
+def instalar_fts(using='default'):
+    """
+    Índice del título de los juegos (ver instalar_indice)
+    """
+    instalar_indice(using, TABLA_FTS, SQL_TABLA, SQL_TRIGGERS)
+
+
+def consulta_fts(texto):
+    """
+    Convertir el texto del usuario en una consulta MATCH segura:
+    cada palabra se cita y se busca por prefijo ("zel"* encuentra Zelda)
+    """
+    palabras = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def instalar_fts_post_migrate(sender, using='default', **kwargs):
+    """
+    Receptor de post_migrate (ver GamesConfig.ready)
+    """
+    instalar_fts(using)
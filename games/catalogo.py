@@ -0,0 +1,185 @@
+"""
+Formatos de intercambio del catálogo (import_catalog / export_catalog).
+
+CSV: una fila por juego, categorías separadas por '|'.
+JSONL: un objeto por línea; admite además la lista de reseñas del juego.
+
+    {"referencia": "VND-1", "titulo": "...", "plataforma": "PC",
+     "precio": "19.99", "fecha_lanzamiento": "2024-03-01",
+     "categorias": ["RPG", "Indie"],
+     "reseñas": [{"usuario": "ana", "puntuacion": 8, "comentario": "..."}]}
+
+Las filas se validan con las mismas reglas que el formulario: los
+validadores de cada campo (clean_fields) y Juego.clean() / Reseña.clean().
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from reviews.models import Reseña
+from .models import Categoria, Juego
+
+COLUMNAS = ['referencia', 'id', 'titulo', 'plataforma', 'precio', 'fecha_lanzamiento', 'categorias']
+
+SEPARADOR_CATEGORIAS = '|'
+
+FORMATOS = ('csv', 'jsonl')
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+def detectar_formato(ruta, formato=None):
+    if formato:
+        return formato
+    for candidato in FORMATOS:
+        if ruta.endswith(f'.{candidato}'):
+            return candidato
+    raise ValueError(f'No se reconoce el formato de {ruta}: usa --format csv|jsonl')
+
+
+def leer_filas(fichero, formato):
+    """
+    Iterar (número de línea, dict) sin cargar el fichero en memoria
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(fichero)
+        for fila in lector:
+            fila['categorias'] = [
+                c for c in (fila.get('categorias') or '').split(SEPARADOR_CATEGORIAS)
+            ]
+            yield lector.line_num, fila
+        return
+    for linea, texto in enumerate(fichero, 1):
+        if not texto.strip():
+            continue
+        try:
+            fila = json.loads(texto)
+        except json.JSONDecodeError as e:
+            yield linea, FilaInvalida(f'JSON no válido: {e.msg}')
+            continue
+        if not isinstance(fila, dict):
+            yield linea, FilaInvalida('Se esperaba un objeto JSON')
+            continue
+        yield linea, fila
+
+
+def _mensaje(error):
+    if hasattr(error, 'message_dict'):
+        return '; '.join(f'{campo}: {" ".join(msgs)}' for campo, msgs in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+def juego_desde_fila(fila, clave):
+    """
+    Construir y validar un Juego (sin guardar) y la lista de nombres de
+    categoría. Lanza FilaInvalida con el motivo
+    """
+    valor_clave = str(fila.get(clave) or '').strip()
+    if not valor_clave:
+        raise FilaInvalida(f'Falta la clave "{clave}"')
+    juego = Juego(
+        referencia=str(fila.get('referencia') or '').strip() or None,
+        titulo=str(fila.get('titulo') or '').strip(),
+        plataforma=fila.get('plataforma') or '',
+        precio=fila.get('precio'),
+        fecha_lanzamiento=fila.get('fecha_lanzamiento'),
+    )
+    if clave == 'id':
+        juego.pk = valor_clave
+    try:
+        juego.clean_fields(exclude=['categorias'])
+        juego.clean()
+    except ValidationError as e:
+        raise FilaInvalida(_mensaje(e))
+
+    categorias = fila.get('categorias') or []
+    if not isinstance(categorias, list):
+        raise FilaInvalida('categorias debe ser una lista')
+    nombres = []
+    longitud = Categoria._meta.get_field('nombre').max_length
+    for nombre in categorias:
+        nombre = str(nombre).strip()
+        if not nombre:
+            continue
+        if len(nombre) > longitud:
+            raise FilaInvalida(f'Categoría demasiado larga: {nombre[:30]}...')
+        nombres.append(nombre)
+    return juego, nombres
+
+
+def reseñas_desde_fila(fila):
+    """
+    Validar las reseñas de una fila JSONL. Devuelve [(usuario, Reseña)]
+    con la Reseña aún sin juego ni usuario
+    """
+    reseñas = fila.get('reseñas') or []
+    if not isinstance(reseñas, list):
+        raise FilaInvalida('reseñas debe ser una lista')
+    resultado = []
+    for datos in reseñas:
+        if not isinstance(datos, dict):
+            raise FilaInvalida('Cada reseña debe ser un objeto JSON')
+        usuario = str(datos.get('usuario') or '').strip()
+        if not usuario:
+            raise FilaInvalida('Reseña sin usuario')
+        reseña = Reseña(puntuacion=datos.get('puntuacion'), comentario=datos.get('comentario') or '')
+        try:
+            reseña.clean_fields(exclude=['juego', 'usuario', 'fecha'])
+            reseña.clean()
+        except ValidationError as e:
+            raise FilaInvalida(f'Reseña de {usuario}: {_mensaje(e)}')
+        resultado.append((usuario, reseña))
+    return resultado
+
+
+def fila_desde_juego(juego, con_reseñas=False):
+    """
+    Serializar un juego (con categorías, y reseñas si se pidieron,
+    ya precargadas) como dict de la fila JSONL
+    """
+    fila = {
+        'referencia': juego.referencia,
+        'id': juego.pk,
+        'titulo': juego.titulo,
+        'plataforma': juego.plataforma,
+        'precio': str(juego.precio),
+        'fecha_lanzamiento': juego.fecha_lanzamiento.isoformat(),
+        'categorias': [c.nombre for c in juego.categorias.all()],
+    }
+    if con_reseñas:
+        fila['reseñas'] = [
+            {
+                'usuario': r.usuario.username,
+                'puntuacion': r.puntuacion,
+                'comentario': r.comentario,
+                'fecha': r.fecha.isoformat(),
+            }
+            for r in juego.reseñas.all()
+        ]
+    return fila
+
+
+class EscritorCSV:
+    def __init__(self, fichero):
+        self.escritor = csv.DictWriter(fichero, fieldnames=COLUMNAS)
+        self.escritor.writeheader()
+
+    def escribir(self, fila):
+        self.escritor.writerow({
+            **fila,
+            'referencia': fila['referencia'] or '',
+            'categorias': SEPARADOR_CATEGORIAS.join(fila['categorias']),
+        })
+
+
+class EscritorJSONL:
+    def __init__(self, fichero):
+        self.fichero = fichero
+
+    def escribir(self, fila):
+        self.fichero.write(json.dumps(fila, ensure_ascii=False) + '\n')
+
+
+ESCRITORES = {'csv': EscritorCSV, 'jsonl': EscritorJSONL}
@@ -1,5 +1,62 @@
 from django import forms
-from .models import Juego
+from django.utils.choices import BaseChoiceIterator
+from playhub import cache
+from .models import Categoria, Juego
+
+
+def _clave_categorias():
+    valores = cache.versiones([('categorias', None)])
+    return cache.clave_fragmento('opciones_categorias', [('categorias', None)], valores)
+
+
+def opciones_categorias():
+    """
+    [(id, nombre)] de todas las categorías, cacheado con la versión
+    ('categorias', None): ni los formularios ni las facetas del catálogo
+    consultan Categoria mientras no cambie ninguna
+    """
+    clave = _clave_categorias()
+    opciones = cache.get_cache().get(clave)
+    if opciones is None:
+        opciones = list(Categoria.objects.order_by('nombre').values_list('pk', 'nombre'))
+        cache.get_cache().set(clave, opciones)
+    return opciones
+
+
+async def aopciones_categorias():
+    """
+    opciones_categorias() con el ORM asíncrono (modo ASGI)
+    """
+    clave = _clave_categorias()
+    opciones = cache.get_cache().get(clave)
+    if opciones is None:
+        opciones = [fila async for fila in Categoria.objects.order_by('nombre').values_list('pk', 'nombre')]
+        cache.get_cache().set(clave, opciones)
+    return opciones
+
+
+class OpcionesCategoriasIterator(BaseChoiceIterator):
+    """
+    Opciones de CategoriasField, sacadas de la caché y no del queryset.
+    Como ModelChoiceIterator, no se evalúa hasta que se recorre
+    """
+    
+    def __init__(self, field):
+        self.field = field
+    
+    def __iter__(self):
+        return iter(opciones_categorias())
+    
+    def __len__(self):
+        return len(opciones_categorias())
+
+
+class CategoriasField(forms.ModelMultipleChoiceField):
+    """
+    Selección de categorías que se pinta sin consultar la base de datos;
+    validar sigue siendo una consulta pk__in sobre el queryset
+    """
+    iterator = OpcionesCategoriasIterator
 
 
 class JuegoForm(forms.ModelForm):
@@ -11,6 +68,7 @@ class JuegoForm(forms.ModelForm):
     class Meta:
         model = Juego
         fields = ['titulo', 'plataforma', 'precio', 'fecha_lanzamiento', 'categorias']
+        field_classes = {'categorias': CategoriasField}
         widgets = {
             'titulo': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -41,3 +99,65 @@ class JuegoForm(forms.ModelForm):
         if precio is not None and precio <= 0:
             raise forms.ValidationError('El precio debe ser mayor que 0')
         return precio
+
+
+class JuegoFiltroForm(forms.Form):
+    """
+    Formulario (GET) de búsqueda y filtrado del catálogo
+    """
+    q = forms.CharField(
+        required=False,
+        label='Título',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Buscar por título...'
+        })
+    )
+    plataforma = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todas')] + Juego.PLATAFORMA_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    categorias = CategoriasField(
+        required=False,
+        queryset=Categoria.objects.all(),
+        label='Categorías',
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'})
+    )
+    precio_min = forms.DecimalField(
+        required=False,
+        min_value=0,
+        label='Precio mínimo',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    precio_max = forms.DecimalField(
+        required=False,
+        min_value=0,
+        label='Precio máximo',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    fecha_desde = forms.DateField(
+        required=False,
+        label='Desde',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    fecha_hasta = forms.DateField(
+        required=False,
+        label='Hasta',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    
+    def clean(self):
+        """
+        Validación personalizada: los rangos no pueden estar invertidos
+        """
+        cleaned_data = super().clean()
+        precio_min = cleaned_data.get('precio_min')
+        precio_max = cleaned_data.get('precio_max')
+        if precio_min is not None and precio_max is not None and precio_min > precio_max:
+            self.add_error('precio_max', 'El precio máximo debe ser mayor que el mínimo')
+        fecha_desde = cleaned_data.get('fecha_desde')
+        fecha_hasta = cleaned_data.get('fecha_hasta')
+        if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
+            self.add_error('fecha_hasta', 'La fecha final debe ser posterior a la inicial')
+        return cleaned_data
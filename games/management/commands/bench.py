@@ -0,0 +1,313 @@
+import io
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from estadisticas import urls as estadisticas_urls
+from games import urls as games_urls
+from games.models import Categoria, Juego
+from middleware.request_logger import ContadorSQL
+from playhub import cache
+from playhub.plantillas import PerfilPlantillas
+from rankings import urls as rankings_urls
+from reviews import urls as reviews_urls
+from reviews.models import PerfilUsuario, Reseña
+
+# Variantes con parámetros GET que también interesa medir
+CONSULTAS_EXTRA = [
+    ('games:juego_list', '?q=legend'),
+    ('games:juego_list', '?plataforma=PC&precio_max=30'),
+    ('admin:reviews_reseña_changelist', '?q=legend'),
+    ('rankings:ranking', '?tipo=tendencia&plataforma=Switch'),
+    ('reviews:reseña_buscar', '?q=historia&plataforma=PC&puntuacion_min=8'),
+    ('reviews:reseña_buscar', '?plataforma=Switch&puntuacion_min=9'),
+]
+
+# Peticiones promediadas en el perfilado de plantillas y filas que se imprimen
+PASADAS_PERFIL = 5
+FILAS_PERFIL = 6
+
+
+def percentil(valores, p):
+    """
+    Percentil por rango más cercano sobre una lista ordenada
+    """
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores) + 0.5) - 1))
+    return valores[indice]
+
+
+def preparar_usuario():
+    """
+    Superusuario de benchmark con una reseña propia (para editar/eliminar)
+    """
+    usuario, created = User.objects.get_or_create(
+        username='bench_admin', defaults={'is_staff': True, 'is_superuser': True}
+    )
+    PerfilUsuario.objects.get_or_create(user=usuario)
+    juego = Juego.objects.order_by('pk').first()
+    if juego is None:
+        raise CommandError('No hay juegos: ejecuta populate_test_data o quita --use-existing-db')
+    reseña, created = Reseña.objects.get_or_create(
+        juego=juego, usuario=usuario,
+        defaults={'puntuacion': 7, 'comentario': 'Reseña del benchmark con el mínimo de cincuenta caracteres.'},
+    )
+    return usuario, juego, reseña
+
+
+def casos_vistas(usuario, juego, reseña, modulos=(games_urls, reviews_urls, rankings_urls, estadisticas_urls),
+                 extra=CONSULTAS_EXTRA):
+    """
+    Recorrer las URLs de los módulos indicados, los changelists del admin y
+    las variantes de `extra`. Devuelve tuplas (nombre, url, autenticado)
+    """
+    pk_por_modelo = {
+        Juego: juego.pk, Reseña: reseña.pk, PerfilUsuario: usuario.pk, User: usuario.pk,
+        Categoria: Categoria.objects.values_list('pk', flat=True).first(),
+    }
+    casos = []
+    for modulo in modulos:
+        for patron in modulo.urlpatterns:
+            if not isinstance(patron, URLPattern) or not patron.name:
+                continue
+            nombre = f'{modulo.app_name}:{patron.name}'
+            vista = getattr(patron.callback, 'view_class', None)
+            kwargs = {}
+            if 'pk' in patron.pattern.converters:
+                kwargs['pk'] = pk_por_modelo[vista.model]
+            url = reverse(nombre, kwargs=kwargs)
+            publica = vista is None or not issubclass(vista, LoginRequiredMixin)
+            if publica:
+                casos.append((nombre, url, False))
+            casos.append((nombre, url, True))
+    for modelo in admin.site._registry:
+        nombre = f'admin:{modelo._meta.app_label}_{modelo._meta.model_name}_changelist'
+        casos.append((nombre, reverse(nombre), True))
+    for nombre, consulta in extra:
+        casos.append((nombre + consulta, reverse(nombre) + consulta, nombre.startswith('admin:')))
+        if not nombre.startswith('admin:'):
+            casos.append((nombre + consulta, reverse(nombre) + consulta, True))
+    return casos
+
+
+class Command(BaseCommand):
+    help = (
+        'Medir latencia (p50/p95/p99), consultas y memoria de todas las vistas '
+        'de games, reviews, rankings, estadísticas y los changelists del admin sobre datos sintéticos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=2000, help='Juegos sintéticos')
+        parser.add_argument('--users', type=int, default=1000, help='Usuarios sintéticos')
+        parser.add_argument('--reviews-per-game-dist', default='poisson:10', help='Ver populate_test_data')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=30, help='Peticiones medidas por vista')
+        parser.add_argument('--warmup', type=int, default=3, help='Peticiones de calentamiento por vista')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Vaciar la caché de fragmentos antes de cada petición')
+        parser.add_argument('--use-existing-db', action='store_true',
+                            help='Medir sobre la base de datos configurada en lugar de una de prueba')
+        parser.add_argument('--filter', default='', help='Medir solo las vistas cuyo nombre contenga este texto')
+        parser.add_argument('--profile-templates', action='store_true',
+                            help='Medir también el tiempo de render por plantilla y por etiqueta')
+        parser.add_argument('--output', help='Fichero JSON donde guardar los resultados')
+        parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Empeoramiento de p95 tolerado frente a la línea base (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        if not options['use_existing_db']:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if not options['use_existing_db']:
+                self.stdout.write('Generando datos sintéticos...')
+                call_command(
+                    'populate_test_data',
+                    games=options['games'],
+                    users=options['users'],
+                    reviews_per_game_dist=options['reviews_per_game_dist'],
+                    seed=options['seed'],
+                    stdout=io.StringIO(),
+                )
+                call_command('rebuild_rankings', stdout=io.StringIO())
+                call_command('rebuild_stats', stdout=io.StringIO())
+                call_command('build_recommendations', stdout=io.StringIO())
+                call_command('build_similar_games', stdout=io.StringIO())
+            resultados = self.medir_todo()
+        finally:
+            if not options['use_existing_db']:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        informe = {
+            'meta': {
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'base_de_datos': connection.vendor,
+                'juegos': Juego.objects.count() if options['use_existing_db'] else options['games'],
+                'usuarios': options['users'],
+                'distribucion': options['reviews_per_game_dist'],
+                'iteraciones': options['iterations'],
+                'cache_fria': options['cold_cache'],
+                'plantillas_produccion': settings.PLANTILLAS_PRODUCCION,
+            },
+            'resultados': resultados,
+        }
+        self.imprimir(resultados)
+        if options['profile_templates']:
+            self.imprimir_plantillas(resultados)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'\nResultados guardados en {options["output"]}'))
+        if options['baseline']:
+            self.comparar(resultados, options['baseline'], options['threshold'])
+
+    def casos(self, usuario, juego, reseña):
+        filtro = self.options['filter']
+        return [caso for caso in casos_vistas(usuario, juego, reseña) if filtro in caso[0]]
+
+    def medir_todo(self):
+        # El log de peticiones se sigue generando (forma parte del coste
+        # medido) pero no se imprime
+        logging.getLogger('middleware.request_logger').setLevel(logging.WARNING)
+        usuario, juego, reseña = preparar_usuario()
+        anonimo, autenticado = Client(), Client()
+        autenticado.force_login(usuario)
+        resultados = {}
+        casos = self.casos(usuario, juego, reseña)
+        self.stdout.write(f'Midiendo {len(casos)} vistas ({self.options["iterations"]} iteraciones)...\n')
+        for nombre, url, con_sesion in casos:
+            clave = f'{nombre} [{"auth" if con_sesion else "anon"}]'
+            resultados[clave] = self.medir(autenticado if con_sesion else anonimo, url)
+        return resultados
+
+    def medir(self, client, url):
+        """
+        Medir una URL: latencias, consultas y memoria asignada
+        """
+        frio = self.options['cold_cache']
+        for _ in range(self.options['warmup']):
+            client.get(url)
+        tiempos, consultas, tiempo_sql = [], [], []
+        for _ in range(self.options['iterations']):
+            if frio:
+                cache.get_cache().clear()
+            contador = ContadorSQL()
+            with connection.execute_wrapper(contador):
+                inicio = time.perf_counter_ns()
+                response = client.get(url)
+                tiempos.append((time.perf_counter_ns() - inicio) / 1e6)
+            consultas.append(contador.total)
+            tiempo_sql.append(contador.ns / 1e6)
+        # Memoria en una pasada aparte: tracemalloc distorsiona los tiempos
+        if frio:
+            cache.get_cache().clear()
+        tracemalloc.start()
+        client.get(url)
+        actual, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        tiempos.sort()
+        resultado = {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'consultas': max(consultas),
+            'tiempo_sql_ms': round(sum(tiempo_sql) / len(tiempo_sql), 3),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+        if self.options['profile_templates']:
+            resultado['plantillas'], resultado['etiquetas'] = self.perfilar(client, url)
+        return resultado
+
+    def perfilar(self, client, url):
+        """
+        Tiempo de render por plantilla y por etiqueta, de media por petición.
+        En otra pasada: el perfilado encarece cada nodo
+        """
+        with PerfilPlantillas() as perfil:
+            for _ in range(PASADAS_PERFIL):
+                if self.options['cold_cache']:
+                    cache.get_cache().clear()
+                client.get(url)
+
+        def media(grupos):
+            return {
+                nombre: {'ms': round(ms / PASADAS_PERFIL, 3), 'veces': veces // PASADAS_PERFIL}
+                for nombre, (ms, veces) in grupos.items()
+            }
+        return media(perfil.por_plantilla()), media(perfil.por_etiqueta())
+
+    def imprimir(self, resultados):
+        ancho = max(len(clave) for clave in resultados) if resultados else 10
+        self.stdout.write(
+            f'{"vista":<{ancho}}  {"st":>3}  {"p50":>8}  {"p95":>8}  {"p99":>8}  {"SQL":>4}  {"t.SQL":>7}  {"mem KB":>8}'
+        )
+        for clave, r in resultados.items():
+            self.stdout.write(
+                f'{clave:<{ancho}}  {r["status"]:>3}  {r["p50_ms"]:>8.2f}  {r["p95_ms"]:>8.2f}  '
+                f'{r["p99_ms"]:>8.2f}  {r["consultas"]:>4}  {r["tiempo_sql_ms"]:>7.2f}  {r["memoria_pico_kb"]:>8.1f}'
+            )
+
+    def imprimir_plantillas(self, resultados):
+        """
+        Las plantillas y etiquetas más caras de cada vista (tiempo propio)
+        """
+        for clave, r in resultados.items():
+            total = sum(p['ms'] for p in r['plantillas'].values())
+            if not total:
+                continue
+            self.stdout.write(f'\n{clave}: render {total:.2f} ms')
+            for titulo in ('plantillas', 'etiquetas'):
+                for nombre, p in list(r[titulo].items())[:FILAS_PERFIL]:
+                    self.stdout.write(f'  {nombre:<44}  {p["ms"]:>7.2f} ms  {p["veces"]:>5}x')
+
+    def comparar(self, resultados, ruta_base, umbral):
+        """
+        Comparar con una ejecución guardada: una vista empeora si su p95 sube
+        más que el umbral o si ejecuta más consultas
+        """
+        with open(ruta_base, encoding='utf-8') as f:
+            base = json.load(f)['resultados']
+        regresiones = []
+        self.stdout.write(f'\nComparación con {ruta_base}:')
+        for clave, r in resultados.items():
+            anterior = base.get(clave)
+            if anterior is None:
+                self.stdout.write(f'  (nueva) {clave}')
+                continue
+            delta = (r['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] if anterior['p95_ms'] else 0
+            linea = (
+                f'  {clave}: p95 {anterior["p95_ms"]:.2f} -> {r["p95_ms"]:.2f} ms ({delta:+.0%}), '
+                f'consultas {anterior["consultas"]} -> {r["consultas"]}'
+            )
+            if delta > umbral or r['consultas'] > anterior['consultas']:
+                regresiones.append(clave)
+                self.stdout.write(self.style.ERROR(linea))
+            else:
+                self.stdout.write(linea)
+        if regresiones:
+            raise CommandError(f'{len(regresiones)} vista(s) han empeorado respecto a la línea base')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones'))
@@ -0,0 +1,201 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from games.models import Juego
+from reviews.models import Reseña
+
+from .bench import percentil
+
+
+def columna(modelo, campo):
+    return modelo._meta.get_field(campo).column
+
+
+class Perfil:
+    """
+    Cómo abre cada hilo su conexión y empieza sus transacciones de escritura
+    """
+
+    def __init__(self, nombre, pragmas, timeout, begin):
+        self.nombre = nombre
+        self.pragmas = pragmas
+        self.timeout = timeout
+        self.begin = begin
+
+    def conectar(self, ruta):
+        conexion = sqlite3.connect(ruta, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        for pragma in self.pragmas.split(';'):
+            if pragma.strip():
+                conexion.execute(pragma)
+        return conexion
+
+
+PERFILES = [
+    # Lo que hace Django sin OPTIONS: diario de rollback, timeout de 5 s del
+    # módulo sqlite3 y BEGIN diferido en transaction.atomic()
+    Perfil('por defecto', 'PRAGMA journal_mode=DELETE', 5, 'BEGIN'),
+    Perfil('producción', settings.SQLITE_PRAGMAS, 20, 'BEGIN IMMEDIATE'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Medir lecturas y escrituras concurrentes sobre una copia de la base de datos '
+        'con la configuración por defecto de SQLite y con el perfil de producción '
+        '(PLAYHUB_SQLITE_PRODUCCION)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Hilos que leen el catálogo')
+        parser.add_argument('--writers', type=int, default=4, help='Hilos que publican y borran reseñas')
+        parser.add_argument('--seconds', type=float, default=10, help='Duración de cada medición')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        origen = str(settings.DATABASES['default']['NAME'])
+        if not os.path.exists(origen):
+            raise CommandError(f'No existe {origen}: ejecuta migrate y populate_test_data')
+        self.options = options
+        with tempfile.TemporaryDirectory() as carpeta:
+            for perfil in PERFILES:
+                ruta = os.path.join(carpeta, f'{perfil.nombre}.sqlite3')
+                self.copiar(origen, ruta)
+                self.preparar(ruta, perfil)
+                resultado = self.medir(ruta, perfil)
+                self.informar(perfil, resultado)
+
+    def copiar(self, origen, destino):
+        with sqlite3.connect(origen) as fuente, sqlite3.connect(destino) as copia:
+            fuente.backup(copia)
+        fuente.close()
+        copia.close()
+
+    def preparar(self, ruta, perfil):
+        conexion = perfil.conectar(ruta)
+        self.juego_ids = [fila[0] for fila in conexion.execute(f'SELECT id FROM {Juego._meta.db_table}')]
+        if not self.juego_ids:
+            raise CommandError('La base de datos no tiene juegos: ejecuta populate_test_data')
+        # Un usuario por escritor: cada uno publica y borra sus propias reseñas
+        self.usuario_ids = []
+        for i in range(self.options['writers']):
+            cursor = conexion.execute(
+                "INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, "
+                "is_staff, is_active, date_joined) VALUES ('', 0, ?, '', '', '', 0, 1, '2026-01-01')",
+                [f'bench_sqlite_{i}'],
+            )
+            self.usuario_ids.append(cursor.lastrowid)
+        conexion.close()
+
+    def medir(self, ruta, perfil):
+        resultado = {'lecturas': [], 'escrituras': [], 'errores': 0}
+        cerrojo = threading.Lock()
+        fin = time.perf_counter() + self.options['seconds']
+        hilos = [
+            threading.Thread(target=self.lector, args=(ruta, perfil, fin, resultado, cerrojo, i))
+            for i in range(self.options['readers'])
+        ] + [
+            threading.Thread(target=self.escritor, args=(ruta, perfil, fin, resultado, cerrojo, usuario_id))
+            for usuario_id in self.usuario_ids
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultado
+
+    def lector(self, ruta, perfil, fin, resultado, cerrojo, semilla):
+        """
+        Una página del catálogo y las reseñas de un juego, en autocommit
+        """
+        rnd = random.Random(self.options['seed'] + semilla)
+        conexion = perfil.conectar(ruta)
+        juegos, reseñas = Juego._meta.db_table, Reseña._meta.db_table
+        tiempos, errores = [], 0
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                conexion.execute(
+                    f'SELECT * FROM {juegos} ORDER BY fecha_lanzamiento DESC, id DESC LIMIT 12 OFFSET ?',
+                    [rnd.randrange(max(1, len(self.juego_ids) - 12))],
+                ).fetchall()
+                conexion.execute(
+                    f'SELECT * FROM {reseñas} WHERE juego_id = ? ORDER BY fecha DESC LIMIT 20',
+                    [rnd.choice(self.juego_ids)],
+                ).fetchall()
+            except sqlite3.OperationalError:
+                errores += 1
+                continue
+            tiempos.append(time.perf_counter() - inicio)
+        conexion.close()
+        with cerrojo:
+            resultado['lecturas'] += tiempos
+            resultado['errores'] += errores
+
+    def escritor(self, ruta, perfil, fin, resultado, cerrojo, usuario_id):
+        """
+        Publicar o borrar una reseña y ajustar las valoraciones del juego en
+        una transacción que, como las de Django, empieza leyendo
+        """
+        rnd = random.Random(self.options['seed'] + usuario_id)
+        conexion = perfil.conectar(ruta)
+        juegos, reseñas = Juego._meta.db_table, Reseña._meta.db_table
+        total, suma = columna(Juego, 'total_reseñas'), columna(Juego, 'suma_puntuaciones')
+        tiempos, errores, publicada = [], 0, None
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                conexion.execute(perfil.begin)
+                if publicada is None:
+                    juego_id = rnd.choice(self.juego_ids)
+                    conexion.execute(
+                        f'SELECT 1 FROM {reseñas} WHERE juego_id = ? AND usuario_id = ?', [juego_id, usuario_id]
+                    ).fetchall()
+                    conexion.execute(
+                        f'INSERT INTO {reseñas} (juego_id, usuario_id, puntuacion, comentario, fecha) '
+                        f"VALUES (?, ?, 7, 'Reseña de prueba de concurrencia', datetime('now'))",
+                        [juego_id, usuario_id],
+                    )
+                    conexion.execute(
+                        f'UPDATE {juegos} SET "{total}" = "{total}" + 1, "{suma}" = "{suma}" + 7 WHERE id = ?',
+                        [juego_id],
+                    )
+                    siguiente = juego_id
+                else:
+                    conexion.execute(
+                        f'DELETE FROM {reseñas} WHERE juego_id = ? AND usuario_id = ?', [publicada, usuario_id]
+                    )
+                    conexion.execute(
+                        f'UPDATE {juegos} SET "{total}" = "{total}" - 1, "{suma}" = "{suma}" - 7 WHERE id = ?',
+                        [publicada],
+                    )
+                    siguiente = None
+                conexion.execute('COMMIT')
+            except sqlite3.OperationalError:
+                # "database is locked": la petición habría fallado
+                if conexion.in_transaction:
+                    conexion.execute('ROLLBACK')
+                errores += 1
+                continue
+            publicada = siguiente
+            tiempos.append(time.perf_counter() - inicio)
+        conexion.close()
+        with cerrojo:
+            resultado['escrituras'] += tiempos
+            resultado['errores'] += errores
+
+    def informar(self, perfil, resultado):
+        segundos = self.options['seconds']
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil {perfil.nombre}:'))
+        for nombre in ('lecturas', 'escrituras'):
+            tiempos = sorted(resultado[nombre])
+            self.stdout.write(
+                f'  {nombre:<11} {len(tiempos) / segundos:>8.0f}/s   '
+                f'p50 {percentil(tiempos, 50) * 1000:>7.2f} ms   p99 {percentil(tiempos, 99) * 1000:>8.2f} ms'
+            )
+        self.stdout.write(f'  errores (database is locked): {resultado["errores"]}')
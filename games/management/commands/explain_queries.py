@@ -0,0 +1,173 @@
+import io
+import re
+from urllib.parse import urlencode
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from api import urls as api_urls
+from estadisticas import urls as estadisticas_urls
+from games import urls as games_urls
+from playhub import cache
+from rankings import urls as rankings_urls
+from reviews import cola
+from reviews import urls as reviews_urls
+from reviews.models import Reseña
+
+from .bench import CONSULTAS_EXTRA, casos_vistas, preparar_usuario
+
+# Inicio del año en curso con zona horaria, como los enlaces de
+# DateFieldListFilter: una fecha sin zona en un DateTimeField avisa
+INICIO_AÑO = timezone.localtime().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+# Además de las variantes del benchmark: los filtros de los changelists y de
+# la API, que cambian el WHERE y con él el índice que conviene
+CONSULTAS_FILTROS = CONSULTAS_EXTRA + [
+    ('admin:games_juego_changelist', '?plataforma__exact=PC'),
+    ('admin:games_juego_changelist', f'?fecha_lanzamiento__gte={INICIO_AÑO.date()}'),
+    ('admin:reviews_reseña_changelist', '?puntuacion=7'),
+    ('admin:reviews_reseña_changelist', '?' + urlencode({'fecha__gte': INICIO_AÑO})),
+    ('admin:reviews_reseña_changelist', '?plataforma=PC'),
+    ('admin:reviews_reseña_changelist', '?q=sintetico42_1'),
+    ('admin:reviews_perfilusuario_changelist', '?plataforma_favorita__exact=PC'),
+    ('admin:reviews_perfilusuario_changelist', '?q=sintetico42_1'),
+    ('admin:auth_user_changelist', '?q=sintetico42_1'),
+    ('api:juego_autocompletar', '?q=le'),
+    ('admin:autocomplete', '?app_label=reviews&model_name=reseña&field_name=juego&term=legend'),
+    ('admin:autocomplete', '?app_label=reviews&model_name=reseña&field_name=usuario&term=sintetico42_1'),
+]
+
+SENTENCIAS = ('SELECT', 'UPDATE', 'DELETE')
+
+# "SCAN games_juego" o "SCAN games_juego USING INDEX ...", pero no las
+# subconsultas materializadas ("SCAN (subquery-1)") ni la tabla virtual FTS5
+RECORRIDO = re.compile(r'^SCAN (?!\()(?!CONSTANT ROW)(\S+)(?!.*VIRTUAL TABLE)')
+ORDEN_TEMPORAL = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def consultas_registradas(usuario, juego):
+    """
+    Consultas calientes que no salen de ninguna vista: (nombre, función)
+    """
+    return [
+        # Comprobación de unicidad de cada lote de la cola de reseñas en diferido
+        ('cola.volcar_lote', lambda: list(
+            Reseña.objects.filter(usuario_id__in=[usuario.pk], juego_id__in=[juego.pk])
+            .values_list('usuario_id', 'juego_id', 'puntuacion', 'comentario')
+        )),
+        ('cola.pendientes', cola.pendientes),
+    ]
+
+
+def capturar(filtro=''):
+    """
+    Ejecutar vistas y consultas registradas guardando cada sentencia con
+    sus parámetros. Devuelve {(sql, params): [nombres de origen]}
+    """
+    consultas = {}
+    origen = None
+
+    def registrar(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(SENTENCIAS):
+            consultas.setdefault((sql, tuple(params or ())), []).append(origen)
+        return execute(sql, params, many, context)
+
+    usuario, juego, reseña = preparar_usuario()
+    anonimo, autenticado = Client(), Client()
+    autenticado.force_login(usuario)
+    casos = casos_vistas(
+        usuario, juego, reseña,
+        modulos=(games_urls, reviews_urls, rankings_urls, estadisticas_urls, api_urls), extra=CONSULTAS_FILTROS,
+    )
+    with connection.execute_wrapper(registrar):
+        for nombre, url, con_sesion in casos:
+            if filtro not in nombre:
+                continue
+            # Sin caché: una página o fragmento cacheado ocultaría sus consultas
+            cache.get_cache().clear()
+            origen = f'{nombre} [{"auth" if con_sesion else "anon"}]'
+            response = (autenticado if con_sesion else anonimo).get(url)
+            if response.status_code >= 400:
+                # Una petición rechazada no ejecuta las consultas que se quieren analizar
+                raise CommandError(f'{origen}: respuesta {response.status_code}')
+        for nombre, funcion in consultas_registradas(usuario, juego):
+            if filtro in nombre:
+                origen = nombre
+                funcion()
+    return consultas
+
+
+def plan(cursor, sql, params):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    return [fila[3] for fila in cursor.fetchall()]
+
+
+def recorre_y_ordena(pasos):
+    """
+    Un recorrido completo de una tabla seguido de una ordenación en memoria:
+    el coste crece con la tabla aunque la página muestre 20 filas
+    """
+    return any(map(RECORRIDO.match, pasos)) and ORDEN_TEMPORAL in pasos
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecutar EXPLAIN QUERY PLAN sobre las consultas de todas las vistas (y las '
+        'consultas registradas) y fallar si alguna recorre una tabla entera y además '
+        'ordena en un B-tree temporal'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=1000, help='Juegos sintéticos')
+        parser.add_argument('--users', type=int, default=500, help='Usuarios sintéticos')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--use-existing-db', action='store_true',
+                            help='Analizar la base de datos configurada en lugar de una de prueba')
+        parser.add_argument('--filter', default='', help='Solo las vistas cuyo nombre contenga este texto')
+        parser.add_argument('--show-plans', action='store_true', help='Imprimir el plan de cada consulta')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN solo está disponible en SQLite')
+        self.options = options
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        if not options['use_existing_db']:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if not options['use_existing_db']:
+                self.stdout.write('Generando datos sintéticos...')
+                call_command('populate_test_data', games=options['games'], users=options['users'],
+                             seed=options['seed'], stdout=io.StringIO())
+                call_command('rebuild_rankings', stdout=io.StringIO())
+                call_command('rebuild_stats', stdout=io.StringIO())
+                call_command('build_recommendations', stdout=io.StringIO())
+                call_command('build_similar_games', stdout=io.StringIO())
+            consultas = capturar(options['filter'])
+            problemas = self.analizar(consultas)
+        finally:
+            if not options['use_existing_db']:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+        if problemas:
+            raise CommandError(f'{problemas} consulta(s) recorren una tabla entera y ordenan en un B-tree temporal')
+        self.stdout.write(self.style.SUCCESS('Ningún recorrido completo con ordenación temporal'))
+
+    def analizar(self, consultas):
+        problemas = 0
+        with connection.cursor() as cursor:
+            for (sql, params), origenes in consultas.items():
+                pasos = plan(cursor, sql, params)
+                malo = recorre_y_ordena(pasos)
+                if malo or self.options['show_plans']:
+                    estilo = self.style.ERROR if malo else self.style.NOTICE
+                    self.stdout.write(estilo(f'\n{", ".join(sorted(set(origenes)))}'))
+                    self.stdout.write(f'  {sql}')
+                    for paso in pasos:
+                        self.stdout.write(f'    {paso}')
+                problemas += malo
+        self.stdout.write(f'\n{len(consultas)} consultas distintas analizadas')
+        return problemas
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from games import catalogo
+from games.models import Categoria, Juego
+from reviews.models import Reseña
+
+
+class Command(BaseCommand):
+    help = (
+        'Exportar el catálogo (juegos con categorías y, en JSONL, reseñas) a CSV o JSONL. '
+        'Recorre la tabla por lotes, con memoria constante'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help="Fichero de salida ('-' para la salida estándar)")
+        parser.add_argument('--format', choices=catalogo.FORMATOS,
+                            help='Formato (por defecto, según la extensión)')
+        parser.add_argument('--reviews', action='store_true', help='Incluir las reseñas (solo JSONL)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Juegos leídos por consulta')
+
+    def handle(self, *args, **options):
+        ruta = options['ruta']
+        try:
+            formato = catalogo.detectar_formato(ruta, options['format'] or ('jsonl' if ruta == '-' else None))
+        except ValueError as e:
+            raise CommandError(e)
+        if options['reviews'] and formato != 'jsonl':
+            raise CommandError('Las reseñas solo se pueden exportar en JSONL')
+
+        juegos = Juego.objects.order_by('pk').prefetch_related(
+            Prefetch('categorias', queryset=Categoria.objects.only('nombre'))
+        )
+        if options['reviews']:
+            juegos = juegos.prefetch_related(
+                Prefetch('reseñas', queryset=Reseña.objects.select_related('usuario').order_by('pk'))
+            )
+
+        fichero = self.stdout if ruta == '-' else open(ruta, 'w', encoding='utf-8', newline='')
+        try:
+            escritor = catalogo.ESCRITORES[formato](fichero)
+            inicio = time.perf_counter()
+            total = 0
+            # iterator(chunk_size) hace un prefetch por cada bloque de juegos
+            for juego in juegos.iterator(chunk_size=options['batch_size']):
+                escritor.escribir(catalogo.fila_desde_juego(juego, options['reviews']))
+                total += 1
+        finally:
+            if fichero is not self.stdout:
+                fichero.close()
+
+        if ruta != '-':
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {total} juegos exportados a {ruta} en {duracion:.1f}s '
+                f'({total / duracion if duracion else 0:,.0f} filas/s)'
+            ))
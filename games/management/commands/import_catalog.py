@@ -0,0 +1,204 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from games import catalogo
+from games.models import Categoria, Juego
+from playhub import cache
+from reviews.models import Reseña
+
+CAMPOS_ACTUALIZABLES = ['titulo', 'plataforma', 'precio', 'fecha_lanzamiento']
+
+# Errores que se muestran uno a uno; del resto solo se informa el total
+MAX_ERRORES_MOSTRADOS = 20
+
+# Tablas derivadas que se reconstruyen al terminar: los juegos y sus
+# categorías se escriben con bulk_create y SQL directo, sin signals
+RECONSTRUCCIONES = ['rebuild_rankings', 'build_similar_games', 'rebuild_stats']
+
+
+class Command(BaseCommand):
+    help = (
+        'Importar juegos (con categorías y, en JSONL, reseñas) desde CSV o JSONL. '
+        'Lee el fichero en streaming y hace upsert por lotes sobre la referencia del proveedor'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help="Fichero a importar ('-' para la entrada estándar)")
+        parser.add_argument('--format', choices=catalogo.FORMATOS,
+                            help='Formato (por defecto, según la extensión)')
+        parser.add_argument('--clave', choices=['referencia', 'id'], default='referencia',
+                            help="Campo con el que se identifican los juegos existentes "
+                                 "('id' para reimportar una exportación propia)")
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por lote')
+        parser.add_argument('--dry-run', action='store_true', help='Solo validar, sin escribir')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='No reconstruir rankings, similares ni estadísticas al terminar '
+                                 '(p. ej. al encadenar varias importaciones)')
+
+    def handle(self, *args, **options):
+        ruta = options['ruta']
+        try:
+            formato = catalogo.detectar_formato(ruta, options['format'] or ('jsonl' if ruta == '-' else None))
+        except ValueError as e:
+            raise CommandError(e)
+        self.clave = options['clave']
+        self.dry_run = options['dry_run']
+        self.categorias = dict(Categoria.objects.values_list('nombre', 'pk'))
+        self.errores = 0
+        self.totales = {'juegos': 0, 'reseñas': 0, 'categorias': 0}
+        inicio = self.inicio_lote = time.perf_counter()
+        if connection.vendor == 'sqlite' and not self.dry_run:
+            # Caché de páginas amplia: los índices de plataforma, fecha, precio,
+            # referencia y FTS reciben inserciones en orden aleatorio
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+
+        fichero = sys.stdin if ruta == '-' else open(ruta, encoding='utf-8', newline='')
+        try:
+            lote, numero = [], 0
+            for linea, fila in catalogo.leer_filas(fichero, formato):
+                elemento = self.validar(linea, fila)
+                if elemento is not None:
+                    lote.append(elemento)
+                if len(lote) >= options['batch_size']:
+                    numero += 1
+                    self.procesar_lote(numero, lote)
+                    lote = []
+            if lote:
+                numero += 1
+                self.procesar_lote(numero, lote)
+        finally:
+            if fichero is not sys.stdin:
+                fichero.close()
+
+        if not self.dry_run and self.totales['juegos']:
+            cache.invalidar('catalogo')
+            if self.totales['categorias']:
+                cache.invalidar('categorias')
+
+        duracion = time.perf_counter() - inicio
+        resumen = (
+            f'{self.totales["juegos"]} juegos, {self.totales["reseñas"]} reseñas y '
+            f'{self.totales["categorias"]} categorías nuevas en {duracion:.1f}s '
+            f'({self.totales["juegos"] / duracion if duracion else 0:,.0f} juegos/s)'
+        )
+        if self.dry_run:
+            resumen = f'[dry-run] {resumen} (sin escribir)'
+        self.stdout.write(self.style.SUCCESS(f'✓ {resumen}'))
+        if self.errores:
+            self.stdout.write(self.style.WARNING(f'  {self.errores} filas descartadas por errores'))
+        if not self.dry_run and self.totales['juegos'] and not options['no_rebuild']:
+            for comando in RECONSTRUCCIONES:
+                call_command(comando, stdout=self.stdout, stderr=self.stderr)
+
+    def error(self, linea, mensaje):
+        self.errores += 1
+        if self.errores <= MAX_ERRORES_MOSTRADOS:
+            self.stderr.write(f'  línea {linea}: {mensaje}')
+
+    def validar(self, linea, fila):
+        """
+        Devolver (linea, juego, categorías, reseñas) o None si la fila no es válida
+        """
+        try:
+            if isinstance(fila, catalogo.FilaInvalida):
+                raise fila
+            juego, categorias = catalogo.juego_desde_fila(fila, self.clave)
+            reseñas = catalogo.reseñas_desde_fila(fila)
+        except catalogo.FilaInvalida as e:
+            self.error(linea, e)
+            return None
+        return linea, juego, categorias, reseñas
+
+    def procesar_lote(self, numero, lote):
+        # Si una clave se repite en el lote, gana la última fila
+        por_clave = {}
+        for elemento in lote:
+            juego = elemento[1]
+            por_clave[juego.referencia if self.clave == 'referencia' else juego.pk] = elemento
+        lote = list(por_clave.values())
+        if self.dry_run:
+            reseñas = sum(len(e[3]) for e in lote)
+        else:
+            with transaction.atomic():
+                self.guardar_categorias(lote)
+                juegos = self.guardar_juegos(lote)
+                reseñas = self.guardar_reseñas(lote, juegos)
+            cache.invalidar_varios('juego', [j.pk for j in juegos])
+        self.totales['juegos'] += len(lote)
+        self.totales['reseñas'] += reseñas
+        # Incluye la lectura y validación de las filas del lote
+        ahora = time.perf_counter()
+        duracion, self.inicio_lote = ahora - self.inicio_lote, ahora
+        self.stdout.write(
+            f'  Lote {numero}: {len(lote)} juegos, {reseñas} reseñas en {duracion:.2f}s '
+            f'({len(lote) / duracion if duracion else 0:,.0f} juegos/s)'
+        )
+
+    def guardar_categorias(self, lote):
+        """
+        Crear de una vez las categorías que aún no existen
+        """
+        nuevas = {nombre for _, _, categorias, _ in lote for nombre in categorias} - self.categorias.keys()
+        if not nuevas:
+            return
+        Categoria.objects.bulk_create([Categoria(nombre=n) for n in nuevas], ignore_conflicts=True)
+        self.categorias.update(Categoria.objects.filter(nombre__in=nuevas).values_list('nombre', 'pk'))
+        self.totales['categorias'] += len(nuevas)
+
+    def guardar_juegos(self, lote):
+        """
+        Upsert de los juegos y sustitución de sus categorías
+        """
+        campos = CAMPOS_ACTUALIZABLES + (['referencia'] if self.clave == 'id' else [])
+        juegos = Juego.objects.bulk_create(
+            [juego for _, juego, _, _ in lote],
+            update_conflicts=True,
+            unique_fields=[self.clave],
+            update_fields=campos,
+        )
+        Through = Juego.categorias.through
+        Through.objects.filter(juego_id__in=[juego.pk for juego in juegos]).delete()
+        # Sentencia preparada en lugar de bulk_create: son varias filas por
+        # juego y no necesitan validación ni objetos del ORM
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {qn(Through._meta.db_table)} (juego_id, categoria_id) VALUES (%s, %s)',
+                [
+                    (juego.pk, self.categorias[nombre])
+                    for juego, (_, _, categorias, _) in zip(juegos, lote)
+                    for nombre in set(categorias)
+                ],
+            )
+        return juegos
+
+    def guardar_reseñas(self, lote, juegos):
+        """
+        Upsert de las reseñas por (juego, usuario). Las valoraciones de los
+        juegos afectados se recalculan una vez por lote (ReseñaQuerySet)
+        """
+        nombres = {usuario for _, _, _, reseñas in lote for usuario, _ in reseñas}
+        if not nombres:
+            return 0
+        usuarios = dict(User.objects.filter(username__in=nombres).values_list('username', 'pk'))
+        por_clave = {}
+        for juego, (linea, _, _, reseñas) in zip(juegos, lote):
+            for usuario, reseña in reseñas:
+                if usuario not in usuarios:
+                    self.error(linea, f'Usuario desconocido en reseña: {usuario}')
+                    continue
+                reseña.juego_id = juego.pk
+                reseña.usuario_id = usuarios[usuario]
+                por_clave[(juego.pk, reseña.usuario_id)] = reseña
+        Reseña.objects.bulk_create(
+            list(por_clave.values()),
+            update_conflicts=True,
+            unique_fields=['juego', 'usuario'],
+            update_fields=['puntuacion', 'comentario'],
+        )
+        return len(por_clave)
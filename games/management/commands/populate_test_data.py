@@ -1,20 +1,279 @@
-from django.core.management.base import BaseCommand
-from games.models import Categoria, Juego
-from reviews.models import Reseña, PerfilUsuario
+import math
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from datetime import date
+from django.db import connection, transaction
+from django.utils import timezone
+from games.models import Categoria, Juego
+from playhub import cache
+from reviews.models import Reseña, PerfilUsuario, perfil_de, recalcular_estadisticas
+
+
+CATEGORIAS_BASE = ['Acción', 'RPG', 'Aventura', 'Deportes', 'Estrategia', 'Indie']
+
+PALABRAS_TITULO = [
+    ['Legend', 'Chronicles', 'Saga', 'Tales', 'Rise', 'Shadow', 'Echoes', 'Dawn', 'Kingdom', 'Quest'],
+    ['of the', 'beyond the', 'under the', 'across the', 'from the'],
+    ['Lost', 'Iron', 'Crimson', 'Silent', 'Forgotten', 'Eternal', 'Hidden', 'Frozen', 'Golden', 'Broken'],
+    ['Realm', 'Stars', 'Abyss', 'Empire', 'Islands', 'Machine', 'Throne', 'Valley', 'Storm', 'City'],
+]
+
+FRASES_RESEÑA = [
+    'La jugabilidad es fluida y los controles responden muy bien en todo momento.',
+    'El apartado gráfico cumple, aunque algunas texturas se ven algo anticuadas.',
+    'La historia engancha desde el principio y los personajes están bien escritos.',
+    'La dificultad está bien ajustada y la curva de aprendizaje es razonable.',
+    'Se hace algo repetitivo en la segunda mitad, pero compensa con su duración.',
+    'La banda sonora acompaña perfectamente a cada zona del mapa.',
+    'Tiene algunos errores técnicos que esperemos se corrijan con parches.',
+    'El multijugador da muchas horas extra de diversión con amigos.',
+]
+
+# Distribución de puntuaciones (1-10) sesgada hacia notas altas
+PESOS_PUNTUACION = [1, 1, 2, 3, 5, 8, 12, 14, 10, 6]
+
+# Tablas derivadas que la carga sintética deja sin actualizar: juegos y
+# reseñas se escriben sin signals. Los vecinos por reseñas van antes que
+# los similares, que los usan
+RECONSTRUCCIONES = ['rebuild_rankings', 'build_recommendations', 'build_similar_games', 'rebuild_stats']
+
+
+def parsear_distribucion(spec):
+    """
+    Convertir 'fixed:K', 'uniform:MIN:MAX', 'poisson:MEDIA' o 'pareto:ALFA[:MAX]'
+    en una función rnd -> número de reseñas de un juego
+    """
+    nombre, *args = spec.split(':')
+    try:
+        args = [float(a) for a in args]
+        if nombre == 'fixed' and len(args) == 1:
+            return lambda rnd: int(args[0])
+        if nombre == 'uniform' and len(args) == 2:
+            return lambda rnd: rnd.randint(int(args[0]), int(args[1]))
+        if nombre == 'poisson' and len(args) == 1:
+            return lambda rnd: _poisson(rnd, args[0])
+        if nombre == 'pareto' and len(args) in (1, 2):
+            maximo = int(args[1]) if len(args) == 2 else None
+            def pareto(rnd):
+                valor = int(rnd.paretovariate(args[0])) - 1
+                return min(valor, maximo) if maximo is not None else valor
+            return pareto
+    except ValueError:
+        pass
+    raise CommandError(
+        f'Distribución no válida: "{spec}". Usa fixed:K, uniform:MIN:MAX, poisson:MEDIA o pareto:ALFA[:MAX]'
+    )
+
+
+def _poisson(rnd, media):
+    """
+    Muestra de Poisson (Knuth para medias pequeñas, aproximación normal para grandes)
+    """
+    if media > 30:
+        return max(0, int(round(rnd.gauss(media, math.sqrt(media)))))
+    limite, k, p = math.exp(-media), 0, 1.0
+    while True:
+        p *= rnd.random()
+        if p <= limite:
+            return k
+        k += 1
+
+
+def insertar_reseñas(filas):
+    """
+    Insertar tuplas (juego_id, usuario_id, puntuacion, comentario, fecha)
+    con un único executemany del INSERT que generaría bulk_create.
+    
+    Para la tabla de reseñas (millones de filas) compilar el INSERT del ORM
+    por cada lote limita la carga a unas 8.000 filas/s en SQLite; la
+    sentencia preparada supera las 100.000. Las valoraciones, la caché y
+    las tablas derivadas (RECONSTRUCCIONES) se actualizan al final de la carga.
+    """
+    meta = Reseña._meta
+    qn = connection.ops.quote_name
+    columnas = ', '.join(
+        qn(meta.get_field(nombre).column)
+        for nombre in ('juego', 'usuario', 'puntuacion', 'comentario', 'fecha')
+    )
+    sql = f'INSERT INTO {qn(meta.db_table)} ({columnas}) VALUES (%s, %s, %s, %s, %s)'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+    return len(filas)
 
 
 class Command(BaseCommand):
-    help = 'Poblar la base de datos con datos de prueba para Fase B'
+    help = (
+        'Poblar la base de datos con datos de prueba para Fase B. '
+        'Con --games genera un conjunto sintético masivo con bulk_create'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, help='Número de juegos sintéticos a generar')
+        parser.add_argument('--users', type=int, default=1000, help='Número de usuarios sintéticos')
+        parser.add_argument(
+            '--reviews-per-game-dist', default='poisson:10',
+            help='Reseñas por juego: fixed:K, uniform:MIN:MAX, poisson:MEDIA o pareto:ALFA[:MAX]'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semilla para que los datos sean reproducibles')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por lote de bulk_create')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='No reconstruir rankings, recomendaciones, similares ni estadísticas al terminar')
+    
+    def handle(self, *args, **options):
+        if options['games'] is not None:
+            return self.generar_sintetico(
+                juegos=options['games'],
+                usuarios=options['users'],
+                distribucion=parsear_distribucion(options['reviews_per_game_dist']),
+                semilla=options['seed'],
+                lote=options['batch_size'],
+                reconstruir=not options['no_rebuild'],
+            )
+        self.poblar_ejemplo()
+    
+    def progreso(self, etiqueta, filas, inicio):
+        """
+        Informar de filas creadas y rendimiento (filas/s)
+        """
+        segundos = time.perf_counter() - inicio
+        velocidad = filas / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ {filas:,} {etiqueta} en {segundos:.1f}s ({velocidad:,.0f} filas/s)'
+        ))
+    
+    def generar_sintetico(self, juegos, usuarios, distribucion, semilla, lote, reconstruir=True):
+        """
+        Generar juegos, usuarios, perfiles y reseñas en lotes con bulk_create.
+        Valoraciones y estadísticas de los perfiles se recalculan una sola vez
+        al final, y después las tablas derivadas (salvo con reconstruir=False)
+        """
+        rnd = random.Random(semilla)
+        inicio_total = time.perf_counter()
+        prefijo = f'sintetico{semilla}_'
+        
+        if connection.vendor == 'sqlite':
+            # Caché de páginas amplia para la carga: los índices de reseñas
+            # reciben inserciones en orden aleatorio
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        
+        with transaction.atomic():
+            self.stdout.write('Creando categorías...')
+            for nombre in CATEGORIAS_BASE:
+                Categoria.objects.get_or_create(nombre=nombre)
+            categoria_ids = list(Categoria.objects.values_list('pk', flat=True))
+            
+            self.stdout.write(f'\nCreando {juegos:,} juegos...')
+            inicio = time.perf_counter()
+            plataformas = [valor for valor, _ in Juego.PLATAFORMA_CHOICES]
+            juego_ids = []
+            Through = Juego.categorias.through
+            for desde in range(0, juegos, lote):
+                nuevos = Juego.objects.bulk_create([
+                    Juego(
+                        titulo=' '.join(rnd.choice(palabras) for palabras in PALABRAS_TITULO) + f' {i}',
+                        plataforma=rnd.choice(plataformas),
+                        precio=Decimal(rnd.choice([499, 999, 1499, 1999, 2999, 3999, 4999, 5999, 6999])) / 100,
+                        fecha_lanzamiento=date(1990, 1, 1) + timedelta(days=rnd.randint(0, 12500)),
+                    )
+                    for i in range(desde, min(desde + lote, juegos))
+                ])
+                # Tabla intermedia de categorías en bloque (1-3 por juego)
+                Through.objects.bulk_create([
+                    Through(juego_id=juego.pk, categoria_id=categoria_id)
+                    for juego in nuevos
+                    for categoria_id in rnd.sample(categoria_ids, rnd.randint(1, min(3, len(categoria_ids))))
+                ], batch_size=lote)
+                juego_ids.extend(juego.pk for juego in nuevos)
+            self.progreso('juegos', juegos, inicio)
+            
+            self.stdout.write(f'\nCreando {usuarios:,} usuarios...')
+            inicio = time.perf_counter()
+            # Un único hash para todos: set_password por usuario tardaría horas
+            password = make_password('test123')
+            desplazamiento = User.objects.filter(username__startswith=prefijo).count()
+            usuario_ids = []
+            for desde in range(0, usuarios, lote):
+                nuevos = User.objects.bulk_create([
+                    User(username=f'{prefijo}{desplazamiento + i}', email=f'{prefijo}{desplazamiento + i}@test.com',
+                         password=password)
+                    for i in range(desde, min(desde + lote, usuarios))
+                ])
+                # bulk_create no envía post_save: los perfiles se crean aquí
+                PerfilUsuario.objects.bulk_create([
+                    PerfilUsuario(user_id=usuario.pk, plataforma_favorita=rnd.choice(plataformas))
+                    for usuario in nuevos
+                ])
+                usuario_ids.extend(usuario.pk for usuario in nuevos)
+            self.progreso('usuarios', usuarios, inicio)
+            
+            self.stdout.write('\nCreando reseñas...')
+            inicio = time.perf_counter()
+            # Valores precalculados: elegir de una lista es mucho más barato
+            # que generar fecha, comentario y puntuación fila a fila
+            ahora = timezone.now()
+            fechas = [
+                connection.ops.adapt_datetimefield_value(
+                    ahora - timedelta(seconds=rnd.randint(0, 730 * 24 * 3600))
+                )
+                for _ in range(min(100000, juegos * 10 + 1))
+            ]
+            comentarios = [f'{a} {b}' for a in FRASES_RESEÑA for b in FRASES_RESEÑA if a != b]
+            puntuaciones = [p for p, peso in enumerate(PESOS_PUNTUACION, 1) for _ in range(peso)]
+            total, pendientes = 0, []
+            for juego_id in juego_ids:
+                cantidad = min(max(distribucion(rnd), 0), len(usuario_ids))
+                for usuario_id in rnd.sample(usuario_ids, cantidad):
+                    pendientes.append((
+                        juego_id, usuario_id, rnd.choice(puntuaciones),
+                        rnd.choice(comentarios), rnd.choice(fechas),
+                    ))
+                if len(pendientes) >= lote:
+                    total += insertar_reseñas(pendientes)
+                    pendientes = []
+                    if total % (lote * 20) < lote:
+                        self.progreso('reseñas', total, inicio)
+            if pendientes:
+                total += insertar_reseñas(pendientes)
+            self.progreso('reseñas', total, inicio)
+            
+            self.stdout.write('\nRecalculando valoraciones...')
+            inicio = time.perf_counter()
+            actualizados = Juego.objects.recalcular_valoraciones()
+            self.progreso('juegos actualizados', actualizados, inicio)
+            
+            self.stdout.write('\nRecalculando estadísticas de los perfiles...')
+            inicio = time.perf_counter()
+            recalcular_estadisticas(usuario_ids)
+            self.progreso('perfiles actualizados', len(usuario_ids), inicio)
+        
+        cache.invalidar('catalogo')
+        cache.invalidar('categorias')
+        cache.invalidar('perfiles')
+        if reconstruir:
+            for comando in RECONSTRUCCIONES:
+                call_command(comando, stdout=self.stdout, stderr=self.stderr)
+        segundos = time.perf_counter() - inicio_total
+        self.stdout.write(self.style.SUCCESS(
+            f'\n¡Datos sintéticos creados en {segundos:.1f}s! '
+            f'({juegos:,} juegos, {usuarios:,} usuarios, {total:,} reseñas)'
+        ))
     
-    def handle(self, *args, **kwargs):
+    def poblar_ejemplo(self):
+        """
+        Datos de ejemplo originales de la Fase B
+        """
         self.stdout.write('Creando categorías...')
         
         # Crear categorías
-        categorias_nombres = ['Acción', 'RPG', 'Aventura', 'Deportes', 'Estrategia', 'Indie']
         categorias = {}
-        for nombre in categorias_nombres:
+        for nombre in CATEGORIAS_BASE:
             cat, created = Categoria.objects.get_or_create(nombre=nombre)
             categorias[nombre] = cat
             if created:
@@ -89,9 +348,9 @@ class Command(BaseCommand):
         
         self.stdout.write('\nActualizando perfiles de usuario...')
         
-        # Actualizar perfiles (se crean automáticamente por signal)
-        for user in User.objects.all():
-            perfil = user.perfil
+        # Actualizar perfiles (los que aún no existen se crean al guardarlos)
+        for user in User.objects.select_related('perfil'):
+            perfil = perfil_de(user)
             if user.username == 'admin':
                 perfil.bio = 'Administrador de PlayHub. Amante de los videojuegos desde 1990.'
                 perfil.plataforma_favorita = 'PC'
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from games.models import Juego
+from reviews.models import PerfilUsuario, recalcular_estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir las valoraciones desnormalizadas de todos los juegos y las estadísticas de los perfiles'
+    
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Recalculando valoraciones...')
+        
+        # Un único UPDATE con subconsultas correlacionadas sobre las reseñas
+        actualizados = Juego.objects.recalcular_valoraciones()
+        
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {actualizados} juegos actualizados'))
+        
+        self.stdout.write('Recalculando estadísticas de los perfiles...')
+        
+        # Dos GROUP BY y un bulk_update por lote de perfiles
+        recalcular_estadisticas()
+        
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {PerfilUsuario.objects.count()} perfiles actualizados'))
@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import hmac
+import os
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from playhub.estaticos import MAPA_FUENTE
+
+ALGORITMOS_SRI = ('sha256', 'sha384', 'sha512')
+
+
+def integridad(datos, algoritmo='sha384'):
+    """
+    Valor SRI ('sha384-...') de unos bytes
+    """
+    return f'{algoritmo}-{base64.b64encode(hashlib.new(algoritmo, datos).digest()).decode()}'
+
+
+def comprobar_integridad(datos, esperada):
+    """
+    Indicar si `datos` coincide con alguno de los valores SRI de `esperada`
+    (separados por espacios, como en el atributo integrity)
+    """
+    for valor in esperada.split():
+        algoritmo = valor.partition('-')[0]
+        if algoritmo in ALGORITMOS_SRI and hmac.compare_digest(integridad(datos, algoritmo), valor):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Descargar a static/vendor las dependencias de terceros de settings.ESTATICOS_VENDOR '
+        '(Bootstrap y Bootstrap Icons) para empaquetarlas con collectstatic en lugar de usar el CDN. '
+        'Cada descarga se comprueba con el valor SRI fijado junto a su URL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Descargar también los que ya existen')
+        parser.add_argument('--timeout', type=float, default=30, help='Segundos por descarga')
+        parser.add_argument('--allow-unpinned', action='store_true',
+                            help='Descargar también los ficheros sin SRI fijado y mostrar el valor para fijarlo')
+
+    def handle(self, *args, **options):
+        destino = settings.STATICFILES_DIRS[0]
+        sin_fijar = [nombre for nombre, (_, esperada) in settings.ESTATICOS_VENDOR.items() if not esperada]
+        if sin_fijar and not options['allow_unpinned']:
+            raise CommandError(
+                f'Sin integridad SRI en settings.ESTATICOS_VENDOR: {", ".join(sin_fijar)}. '
+                'Fíjala o usa --allow-unpinned tras verificar el origen'
+            )
+        for nombre, (url, esperada) in settings.ESTATICOS_VENDOR.items():
+            ruta = os.path.join(destino, *nombre.split('/'))
+            if os.path.exists(ruta) and not options['force']:
+                self.stdout.write(f'  {nombre} (ya descargado)')
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=options['timeout']) as respuesta:
+                    datos = respuesta.read()
+            except OSError as e:
+                raise CommandError(f'No se pudo descargar {url}: {e}')
+            # El SRI es el del fichero del CDN, antes de quitarle el source map
+            obtenida = integridad(datos)
+            if esperada and not comprobar_integridad(datos, esperada):
+                raise CommandError(f'{url}: la integridad no coincide (esperada {esperada}, obtenida {obtenida})')
+            if nombre.endswith(('.css', '.js')):
+                # El .map no se descarga: la referencia daría un 404 en cada carga
+                datos = MAPA_FUENTE.sub('', datos.decode()).encode()
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'wb') as f:
+                f.write(datos)
+            estado = 'verificado' if esperada else self.style.WARNING('sin verificar')
+            self.stdout.write(f'  {nombre} ({len(datos):,} bytes, {obtenida}, {estado})')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(settings.ESTATICOS_VENDOR)} ficheros en {os.path.join(destino, "vendor")}'
+        ))
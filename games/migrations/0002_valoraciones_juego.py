@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='juego',
+            name='puntuacion_promedio',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Puntuación Media'),
+        ),
+        migrations.AddField(
+            model_name='juego',
+            name='suma_puntuaciones',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Suma de Puntuaciones'),
+        ),
+        migrations.AddField(
+            model_name='juego',
+            name='total_reseñas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Reseñas'),
+        ),
+    ]
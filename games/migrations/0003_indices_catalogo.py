@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_valoraciones_juego'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='juego',
+            index=models.Index(fields=['plataforma', '-fecha_lanzamiento'], name='juego_plataforma_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='juego',
+            index=models.Index(fields=['-fecha_lanzamiento'], name='juego_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='juego',
+            index=models.Index(fields=['precio'], name='juego_precio_idx'),
+        ),
+    ]
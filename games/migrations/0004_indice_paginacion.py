@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='juego',
+            options={'ordering': ['-fecha_lanzamiento', '-id'], 'verbose_name': 'Juego', 'verbose_name_plural': 'Juegos'},
+        ),
+        migrations.RemoveIndex(
+            model_name='juego',
+            name='juego_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='juego',
+            index=models.Index(fields=['-fecha_lanzamiento', '-id'], name='juego_fecha_id_idx'),
+        ),
+    ]
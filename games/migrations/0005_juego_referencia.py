@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_indice_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='juego',
+            name='referencia',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Referencia Externa'),
+        ),
+    ]
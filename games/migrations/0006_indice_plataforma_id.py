@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_juego_referencia'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='juego',
+            name='juego_plataforma_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='juego',
+            index=models.Index(fields=['plataforma', '-fecha_lanzamiento', '-id'], name='juego_plataforma_fecha_idx'),
+        ),
+    ]
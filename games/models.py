@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.core.exceptions import ValidationError
+from . import busqueda
 
 
 class Categoria(models.Model):
@@ -17,6 +21,118 @@ class Categoria(models.Model):
         return self.nombre
 
 
+class JuegoQuerySet(models.QuerySet):
+    """
+    QuerySet de Juego con el mantenimiento de las valoraciones desnormalizadas
+    """
+
+    def ajustar_valoraciones(self, reseñas, puntos):
+        """
+        Sumar `reseñas` al contador y `puntos` a la suma de puntuaciones
+        en un único UPDATE, recalculando la media en la propia consulta
+        """
+        total = F('total_reseñas') + reseñas
+        suma = F('suma_puntuaciones') + puntos
+        return self.update(
+            total_reseñas=total,
+            suma_puntuaciones=suma,
+            puntuacion_promedio=Cast(suma, FloatField()) / NullIf(total, 0),
+        )
+
+    def buscar(self, texto):
+        """
+        Filtrar por título usando el índice FTS5 en SQLite
+        (o `icontains` en otros motores)
+        """
+        consulta = busqueda.consulta_fts(texto)
+        if not consulta:
+            return self
+        if busqueda.usa_fts(self.db):
+            return self.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {busqueda.TABLA_FTS} WHERE {busqueda.TABLA_FTS} MATCH %s',
+                [consulta],
+            ))
+        return self.filter(titulo__icontains=texto.strip())
+    
+    def filtrar(self, q=None, plataforma=None, categorias=None, precio_min=None,
+                precio_max=None, fecha_desde=None, fecha_hasta=None):
+        """
+        Aplicar los filtros del catálogo. Los valores vacíos se ignoran.
+        Con varias categorías se devuelven los juegos que tengan alguna.
+        """
+        qs = self.buscar(q) if q else self
+        if plataforma:
+            qs = qs.filter(plataforma=plataforma)
+        if categorias:
+            # Subconsulta sobre la tabla intermedia: evita el JOIN + DISTINCT
+            Through = self.model.categorias.through
+            qs = qs.filter(pk__in=Through.objects.filter(categoria__in=categorias).values('juego_id'))
+        if precio_min is not None:
+            qs = qs.filter(precio__gte=precio_min)
+        if precio_max is not None:
+            qs = qs.filter(precio__lte=precio_max)
+        if fecha_desde:
+            qs = qs.filter(fecha_lanzamiento__gte=fecha_desde)
+        if fecha_hasta:
+            qs = qs.filter(fecha_lanzamiento__lte=fecha_hasta)
+        return qs
+    
+    def _consulta_facetas(self, **filtros):
+        Through = self.model.categorias.through
+        por_plataforma = (
+            self.filtrar(**{**filtros, 'plataforma': None}).order_by()
+            .annotate(faceta=Value('plataforma'), valor=F('plataforma'))
+            .values('faceta', 'valor')
+            .annotate(total=Count('pk'))
+        )
+        por_categoria = (
+            Through.objects.filter(
+                juego__in=self.filtrar(**{**filtros, 'categorias': None}).order_by().values('pk')
+            )
+            .annotate(faceta=Value('categoria'), valor=Cast('categoria_id', models.CharField()))
+            .values('faceta', 'valor')
+            .annotate(total=Count('pk'))
+        )
+        return por_plataforma.union(por_categoria, all=True)
+    
+    @staticmethod
+    def _agrupar_facetas(filas):
+        resultado = {'plataforma': {}, 'categoria': {}}
+        for fila in filas:
+            valor = fila['valor'] if fila['faceta'] == 'plataforma' else int(fila['valor'])
+            resultado[fila['faceta']][valor] = fila['total']
+        return resultado
+    
+    def facetas(self, **filtros):
+        """
+        Contar juegos por plataforma y por categoría en una sola consulta
+        (UNION ALL de dos GROUP BY). Cada faceta ignora su propio filtro
+        para que el usuario vea cuántos resultados daría cada opción.
+        
+        Devuelve {'plataforma': {valor: total}, 'categoria': {id: total}}
+        """
+        return self._agrupar_facetas(self._consulta_facetas(**filtros))
+    
+    async def afacetas(self, **filtros):
+        """
+        Versión asíncrona de facetas()
+        """
+        return self._agrupar_facetas([fila async for fila in self._consulta_facetas(**filtros)])
+    
+    def recalcular_valoraciones(self):
+        """
+        Reconstruir las valoraciones a partir de las reseñas en un solo UPDATE
+        con subconsultas correlacionadas (usa el índice de reseña.juego_id)
+        """
+        Reseña = self.model.reseñas.field.model
+        reseñas = Reseña.objects.filter(juego=OuterRef('pk')).order_by().values('juego')
+        return self.update(
+            total_reseñas=Coalesce(Subquery(reseñas.annotate(n=Count('pk')).values('n')), 0),
+            suma_puntuaciones=Coalesce(Subquery(reseñas.annotate(s=Sum('puntuacion')).values('s')), 0),
+            puntuacion_promedio=Subquery(reseñas.annotate(m=Avg('puntuacion')).values('m')),
+        )
+
+
 class Juego(models.Model):
     """
     Modelo para representar un juego en el catálogo.
@@ -30,6 +146,14 @@ class Juego(models.Model):
         ('Switch', 'Switch'),
     ]
     
+    # Identificador del proveedor: clave de las importaciones (import_catalog)
+    referencia = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Referencia Externa'
+    )
     titulo = models.CharField(max_length=200, verbose_name='Título')
     plataforma = models.CharField(
         max_length=20,
@@ -49,14 +173,48 @@ class Juego(models.Model):
         verbose_name='Categorías'
     )
     
+    # Valoraciones desnormalizadas: se mantienen desde reviews/signals.py
+    # y se pueden reconstruir con `manage.py recompute_ratings`
+    total_reseñas = models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Reseñas')
+    suma_puntuaciones = models.PositiveIntegerField(default=0, editable=False, verbose_name='Suma de Puntuaciones')
+    puntuacion_promedio = models.FloatField(null=True, blank=True, editable=False, verbose_name='Puntuación Media')
+    
+    CAMPOS_VALORACIONES = ['total_reseñas', 'suma_puntuaciones', 'puntuacion_promedio']
+    
+    objects = JuegoQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Juego'
         verbose_name_plural = 'Juegos'
-        ordering = ['-fecha_lanzamiento']
+        ordering = ['-fecha_lanzamiento', '-id']
+        indexes = [
+            # Filtros del catálogo (JuegoListView) y del admin, con el mismo
+            # desempate por id que Meta.ordering para no ordenar en memoria
+            models.Index(fields=['plataforma', '-fecha_lanzamiento', '-id'], name='juego_plataforma_fecha_idx'),
+            # Paginación por cursor sobre (fecha_lanzamiento, id)
+            models.Index(fields=['-fecha_lanzamiento', '-id'], name='juego_fecha_id_idx'),
+            models.Index(fields=['precio'], name='juego_precio_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} ({self.plataforma})"
     
+    def save(self, **kwargs):
+        """
+        Un juego ya guardado no escribe las valoraciones salvo que
+        update_fields las nombre: se mantienen con UPDATE relativos y una
+        instancia leída antes de una reseña las devolvería a su valor antiguo
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key
+                and campo.name not in self.CAMPOS_VALORACIONES
+                and campo.attname not in diferidos
+            ]
+        super().save(**kwargs)
+    
     def clean(self):
         """
         Validación personalizada: el precio debe ser mayor que 0
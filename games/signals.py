@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from playhub import cache
+from .models import Categoria, Juego
+
+
+@receiver(post_save, sender=Juego)
+@receiver(post_delete, sender=Juego)
+def invalidar_cache_juego(sender, instance, **kwargs):
+    """
+    Invalidar los fragmentos del juego y las páginas del catálogo
+    """
+    cache.invalidar('juego', instance.pk)
+    cache.invalidar('catalogo')
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_cache_categoria(sender, instance, **kwargs):
+    """
+    Un cambio de categoría afecta a las insignias de todos sus juegos
+    """
+    cache.invalidar('categorias')
+    cache.invalidar('catalogo')
+
+
+@receiver(m2m_changed, sender=Juego.categorias.through)
+def invalidar_cache_categorias_juego(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidar los juegos cuyas categorías han cambiado, en cualquiera
+    de los dos sentidos de la relación
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        cache.invalidar('juego', instance.pk)
+    elif pk_set:
+        for pk in pk_set:
+            cache.invalidar('juego', pk)
+    else:
+        # categoria.juegos.clear(): no sabemos qué juegos tenía
+        cache.invalidar('categorias')
+    cache.invalidar('catalogo')
@@ -0,0 +1,60 @@
+from django import template
+from playhub import cache
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    """
+    Nodo de {% fragmento %}: renderiza el contenido una sola vez por versión
+    """
+    
+    def __init__(self, nodelist, nombre, objeto, globales):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.objeto = objeto
+        self.globales = globales
+    
+    def render(self, context):
+        objeto = self.objeto.resolve(context)
+        dependencias = [(objeto._meta.model_name, objeto.pk)]
+        dependencias += [(g.resolve(context), None) for g in self.globales]
+        # Versiones precargadas por la vista con una sola lectura (get_many)
+        valores = dict(context.get('versiones_cache') or {})
+        faltan = [dep for dep in dependencias if dep not in valores]
+        if faltan:
+            valores.update(cache.versiones(faltan))
+        clave = cache.clave_fragmento(self.nombre.resolve(context), dependencias, valores)
+        backend = cache.get_cache()
+        contenido = backend.get(clave)
+        if contenido is None:
+            contenido = self.nodelist.render(context)
+            backend.set(clave, contenido)
+        return contenido
+
+
+@register.tag
+def fragmento(parser, token):
+    """
+    Cachear un fragmento de plantilla ligado a la versión de un objeto:
+    
+        {% load fragmentos %}
+        {% fragmento 'tarjeta' juego %} ... {% endfragmento %}
+        {% fragmento 'categorias_juego' juego 'categorias' %} ... {% endfragmento %}
+    
+    Los argumentos tras el objeto son versiones globales adicionales
+    (ver playhub/cache.py). El contenido no debe depender del usuario.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' requiere al menos un nombre y un objeto"
+        )
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(b) for b in bits[3:]],
+    )
@@ -0,0 +1,16 @@
+from django import template
+from playhub.plantillas import url_objeto
+
+register = template.Library()
+
+
+@register.simple_tag
+def ruta(nombre, pk):
+    """
+    {% url %} para rutas con un único pk, con el prefijo precalculado
+    (ver playhub/plantillas.py):
+
+        {% load rutas %}
+        <a href="{% ruta 'games:juego_detail' juego.pk %}">
+    """
+    return url_objeto(nombre, pk)
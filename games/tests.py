@@ -1,3 +1,760 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.staticfiles import finders
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from estadisticas.models import EstadisticaCorte
+from middleware.estaticos import EstaticosMiddleware
+from middleware.lectura import es_lectura
+from middleware.metricas import registro
+from playhub import cache
+from playhub.paginacion import CursorPaginator
+from playhub.plantillas import PerfilPlantillas
+from playhub.routers import LecturaRouter, solo_lectura
+from playhub.testing import PresupuestoConsultasTestCase
+from rankings.models import EntradaRanking
+from recomendaciones.models import JuegoSimilar, VecinoJuego
+from reviews.models import Reseña
+from reviews.views import PerfilUsuarioDetailAsyncView, ReseñaListAsyncView
+from .management.commands import explain_queries
+from .models import Categoria, Juego
+from .views import JuegoDetailAsyncView, JuegoListAsyncView
+
+COMENTARIO = 'Comentario de prueba lo bastante largo para pasar la validación.'
+
+
+class JuegoPresupuestoConsultasTests(PresupuestoConsultasTestCase):
+    """
+    Número máximo de consultas por vista, independiente del número de filas
+    """
+    
+    def setUp(self):
+        super().setUp()
+        self.juego = Juego.objects.order_by('pk').first()
+        self.usuario = User.objects.get(username='usuario1')
+    
+    def test_juego_list_anonimo(self):
+        # facetas + página + recuento acotado + categorías del formulario
+        self.assertPresupuestoConsultas(reverse('games:juego_list'), 4)
+    
+    def test_juego_list_autenticado(self):
+        # + sesión y usuario
+        self.assertPresupuestoConsultas(reverse('games:juego_list'), 6, self.usuario)
+    
+    def test_juego_list_filtrado(self):
+        categoria = self.juego.categorias.first()
+        url = reverse('games:juego_list') + f'?q=juego&plataforma=PC&categorias={categoria.pk}&precio_min=10'
+        # + validación de las categorías elegidas
+        self.assertPresupuestoConsultas(url, 5)
+    
+    def test_juego_detail(self):
+        # juego + categorías + similares + reseñas con sus usuarios
+        self.assertPresupuestoConsultas(reverse('games:juego_detail', args=[self.juego.pk]), 4)
+    
+    def test_juego_detail_cacheado(self):
+        url = reverse('games:juego_detail', args=[self.juego.pk])
+        self.client.get(url)
+        self.assertPresupuestoConsultas(url, 0)
+    
+    def test_juego_forms(self):
+        self.assertPresupuestoConsultas(reverse('games:juego_create'), 3, self.usuario)
+        # Las categorías del formulario salen de la caché
+        self.assertPresupuestoConsultas(reverse('games:juego_create'), 2, self.usuario)
+        self.assertPresupuestoConsultas(reverse('games:juego_update', args=[self.juego.pk]), 4, self.usuario)
+        self.assertPresupuestoConsultas(reverse('games:juego_delete', args=[self.juego.pk]), 3, self.usuario)
+    
+    def test_admin_changelists(self):
+        self.assertPresupuestoConsultas(reverse('admin:games_juego_changelist'), 7, self.admin)
+        self.assertPresupuestoConsultas(reverse('admin:games_categoria_changelist'), 5, self.admin)
+        self.assertPresupuestoConsultas(
+            reverse('admin:games_juego_change', args=[self.juego.pk]), 6, self.admin
+        )
+
+
+class ValoracionesJuegoTests(TestCase):
+    """
+    Valoraciones desnormalizadas de Juego: cada forma de escribir reseñas
+    deja lo mismo que recompute_ratings
+    """
+    
+    def setUp(self):
+        self.a, self.b = [
+            Juego.objects.create(titulo=t, plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+            for t in ('A', 'B')
+        ]
+        self.usuarios = [User.objects.create_user(f'critico{i}') for i in range(3)]
+    
+    def reseña(self, usuario, juego, puntuacion):
+        return Reseña.objects.create(usuario=usuario, juego=juego, puntuacion=puntuacion, comentario=COMENTARIO)
+    
+    def valoraciones(self):
+        return [
+            (juego.total_reseñas, juego.suma_puntuaciones, juego.puntuacion_promedio)
+            for juego in Juego.objects.filter(pk__in=[self.a.pk, self.b.pk]).order_by('pk')
+        ]
+    
+    def assertValoraciones(self, a, b):
+        self.assertEqual(self.valoraciones(), [a, b])
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.assertEqual(self.valoraciones(), [a, b])
+    
+    def test_incrementales(self):
+        r1 = self.reseña(self.usuarios[0], self.a, 8)
+        r2 = self.reseña(self.usuarios[1], self.a, 6)
+        self.assertValoraciones((2, 14, 7.0), (0, 0, None))
+        
+        r1.puntuacion = 10
+        r1.save()
+        self.assertValoraciones((2, 16, 8.0), (0, 0, None))
+        
+        # Cambiar de juego resta en uno y suma en el otro
+        r2.juego = self.b
+        r2.save()
+        self.assertValoraciones((1, 10, 10.0), (1, 6, 6.0))
+        
+        r1.delete()
+        self.assertValoraciones((0, 0, None), (1, 6, 6.0))
+    
+    def test_operaciones_masivas(self):
+        usuario = self.usuarios[2]
+        Reseña.objects.bulk_create([
+            Reseña(usuario=usuario, juego=self.a, puntuacion=4, comentario=COMENTARIO),
+            Reseña(usuario=usuario, juego=self.b, puntuacion=2, comentario=COMENTARIO),
+        ])
+        self.reseña(self.usuarios[0], self.b, 7)
+        self.assertValoraciones((1, 4, 4.0), (2, 9, 4.5))
+        
+        Reseña.objects.filter(usuario=usuario).update(puntuacion=6)
+        self.assertValoraciones((1, 6, 6.0), (2, 13, 6.5))
+        
+        reseñas = list(Reseña.objects.filter(juego=self.b))
+        for reseña in reseñas:
+            reseña.puntuacion = 9
+        Reseña.objects.bulk_update(reseñas, ['puntuacion'])
+        self.assertValoraciones((1, 6, 6.0), (2, 18, 9.0))
+        
+        # Borrar el usuario borra sus reseñas en cascada
+        usuario.delete()
+        self.assertValoraciones((0, 0, None), (1, 9, 9.0))
+    
+    def test_recompute_ratings(self):
+        self.reseña(self.usuarios[0], self.a, 8)
+        Juego.objects.filter(pk=self.a.pk).update(total_reseñas=5, suma_puntuaciones=1, puntuacion_promedio=0.2)
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.assertEqual(self.valoraciones(), [(1, 8, 8.0), (0, 0, None)])
+    
+    def test_guardar_instancia_antigua(self):
+        # Leído antes de la reseña (formulario de edición, admin): guardarlo
+        # no puede devolver las valoraciones a cero
+        antiguo = Juego.objects.get(pk=self.a.pk)
+        reseña = self.reseña(self.usuarios[0], self.a, 8)
+        antiguo.titulo = 'A2'
+        antiguo.save()
+        self.assertValoraciones((1, 8, 8.0), (0, 0, None))
+        self.assertEqual(Juego.objects.get(pk=self.a.pk).titulo, 'A2')
+        
+        reseña.delete()
+        self.assertValoraciones((0, 0, None), (0, 0, None))
+        
+        # Nombrándolas en update_fields sí se escriben
+        antiguo.total_reseñas = 3
+        antiguo.save(update_fields=['total_reseñas'])
+        self.assertEqual(Juego.objects.get(pk=self.a.pk).total_reseñas, 3)
+
+
+class BusquedaCatalogoTests(TestCase):
+    """
+    Filtros del catálogo, búsqueda FTS5 del título y facetas
+    """
+    
+    def setUp(self):
+        self.rpg, self.accion = Categoria.objects.bulk_create([Categoria(nombre='RPG'), Categoria(nombre='Acción')])
+        datos = [
+            ('The Legend of Zelda', 'Switch', '59.99', date(2017, 3, 3), [self.rpg, self.accion]),
+            ('Elden Ring', 'PC', '49.99', date(2022, 2, 25), [self.rpg]),
+            ('Halo Infinite', 'Xbox', '19.99', date(2021, 12, 8), [self.accion]),
+            ('Pokémon Escarlata', 'Switch', '39.99', date(2022, 11, 18), [self.rpg]),
+        ]
+        self.juegos = {}
+        for titulo, plataforma, precio, fecha, categorias in datos:
+            juego = Juego.objects.create(
+                titulo=titulo, plataforma=plataforma, precio=Decimal(precio), fecha_lanzamiento=fecha,
+            )
+            juego.categorias.set(categorias)
+            self.juegos[titulo.split()[-1]] = juego
+    
+    def titulos(self, **filtros):
+        return sorted(Juego.objects.filtrar(**filtros).values_list('titulo', flat=True))
+    
+    def test_busqueda_fts(self):
+        self.assertEqual(self.titulos(q='zel'), ['The Legend of Zelda'])
+        # Sin distinguir tildes ni mayúsculas, con varias palabras
+        self.assertEqual(self.titulos(q='POKEMON esc'), ['Pokémon Escarlata'])
+        self.assertEqual(self.titulos(q='ring elden'), ['Elden Ring'])
+        # La sintaxis de FTS5 del usuario no llega a MATCH
+        self.assertEqual(self.titulos(q='"zelda" OR NEAR(*'), [])
+        
+        # Los triggers siguen los cambios de título y los borrados
+        halo = self.juegos['Infinite']
+        halo.titulo = 'Halo Zelda Edition'
+        halo.save()
+        self.assertEqual(self.titulos(q='infinite'), [])
+        self.assertEqual(self.titulos(q='zelda'), ['Halo Zelda Edition', 'The Legend of Zelda'])
+        halo.delete()
+        self.assertEqual(self.titulos(q='zelda'), ['The Legend of Zelda'])
+    
+    def test_filtros(self):
+        self.assertEqual(self.titulos(plataforma='Switch'), ['Pokémon Escarlata', 'The Legend of Zelda'])
+        # Con varias categorías basta con tener alguna, sin duplicados
+        self.assertEqual(len(self.titulos(categorias=[self.rpg, self.accion])), 4)
+        self.assertEqual(self.titulos(categorias=[self.accion]), ['Halo Infinite', 'The Legend of Zelda'])
+        self.assertEqual(
+            self.titulos(precio_min=Decimal('20'), precio_max=Decimal('49.99')),
+            ['Elden Ring', 'Pokémon Escarlata'],
+        )
+        self.assertEqual(
+            self.titulos(fecha_desde=date(2021, 1, 1), fecha_hasta=date(2022, 3, 1)),
+            ['Elden Ring', 'Halo Infinite'],
+        )
+        self.assertEqual(
+            self.titulos(q='e', plataforma='Switch', categorias=[self.rpg], precio_max=Decimal('40')),
+            ['Pokémon Escarlata'],
+        )
+    
+    def test_facetas(self):
+        with self.assertNumQueries(1):
+            facetas = Juego.objects.facetas(plataforma='Switch')
+        # Cada faceta ignora su propio filtro
+        self.assertEqual(facetas['plataforma'], {'Switch': 2, 'PC': 1, 'Xbox': 1})
+        self.assertEqual(facetas['categoria'], {self.rpg.pk: 2, self.accion.pk: 1})
+        facetas = Juego.objects.facetas(categorias=[self.accion], precio_min=Decimal('20'))
+        self.assertEqual(facetas['plataforma'], {'Switch': 1})
+        self.assertEqual(facetas['categoria'], {self.rpg.pk: 3, self.accion.pk: 1})
+    
+    def test_vista(self):
+        url = reverse('games:juego_list') + f'?q=zelda&plataforma=Switch&categorias={self.rpg.pk}'
+        response = self.client.get(url)
+        self.assertEqual([juego.titulo for juego in response.context['juegos']], ['The Legend of Zelda'])
+        # Parámetros no válidos: se ignoran los filtros en lugar de fallar
+        response = self.client.get(reverse('games:juego_list') + '?precio_min=abc')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['juegos']), 4)
+
+
+class CacheInvalidacionTests(TestCase):
+    """
+    Las páginas y fragmentos cacheados cambian en cuanto cambian sus datos,
+    para anónimos (página entera) y usuarios con sesión (fragmentos)
+    """
+    
+    def setUp(self):
+        cache.get_cache().clear()
+        self.rpg = Categoria.objects.create(nombre='RPG')
+        self.juego = Juego.objects.create(
+            titulo='Juego cacheado', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1),
+        )
+        self.juego.categorias.add(self.rpg)
+        self.usuario = User.objects.create_user('critico')
+        self.clientes = [self.client, self.client_class()]
+        self.clientes[1].force_login(self.usuario)
+        self.detalle = reverse('games:juego_detail', args=[self.juego.pk])
+    
+    def assertEnPaginas(self, url, texto, presente=True):
+        for cliente in self.clientes:
+            response = cliente.get(url)
+            if presente:
+                self.assertContains(response, texto)
+            else:
+                self.assertNotContains(response, texto)
+    
+    def test_pagina_anonima_cacheada(self):
+        self.client.get(self.detalle)
+        with self.assertNumQueries(0):
+            self.client.get(self.detalle)
+        # Solo se invalidan las versiones de las que depende
+        otro = Juego.objects.create(titulo='Otro', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+        otro.titulo = 'Otro más'
+        otro.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.detalle)
+    
+    def test_juego_y_categorias(self):
+        self.assertEnPaginas(self.detalle, 'Juego cacheado')
+        self.assertEnPaginas(reverse('games:juego_list'), 'Juego cacheado')
+        self.juego.titulo = 'Título nuevo'
+        self.juego.save()
+        self.assertEnPaginas(self.detalle, 'Título nuevo')
+        self.assertEnPaginas(reverse('games:juego_list'), 'Título nuevo')
+        
+        self.rpg.nombre = 'Rol'
+        self.rpg.save()
+        self.assertEnPaginas(self.detalle, '>Rol</span>')
+        
+        # m2m en los dos sentidos de la relación
+        accion = Categoria.objects.create(nombre='Acción')
+        self.juego.categorias.add(accion)
+        self.assertEnPaginas(self.detalle, '>Acción</span>')
+        estrategia = Categoria.objects.create(nombre='Estrategia')
+        estrategia.juegos.add(self.juego)
+        self.assertEnPaginas(self.detalle, '>Estrategia</span>')
+        self.rpg.juegos.clear()
+        self.assertEnPaginas(self.detalle, '>Rol</span>', presente=False)
+        estrategia.delete()
+        self.assertEnPaginas(self.detalle, '>Estrategia</span>', presente=False)
+    
+    def test_reseñas(self):
+        self.assertEnPaginas(self.detalle, COMENTARIO, presente=False)
+        reseña = Reseña.objects.create(usuario=self.usuario, juego=self.juego, puntuacion=7, comentario=COMENTARIO)
+        self.assertEnPaginas(self.detalle, COMENTARIO)
+        reseña.puntuacion = 3
+        reseña.save()
+        self.assertEnPaginas(self.detalle, '3/10')
+        
+        # Operaciones masivas, sin post_save
+        Reseña.objects.filter(pk=reseña.pk).update(comentario=COMENTARIO.upper())
+        self.assertEnPaginas(self.detalle, COMENTARIO.upper())
+        Reseña.objects.filter(pk=reseña.pk).update(puntuacion=9)
+        self.assertEnPaginas(self.detalle, '9/10')
+        
+        reseña.delete()
+        self.assertEnPaginas(self.detalle, COMENTARIO.upper(), presente=False)
+    
+    def test_nombre_usuario(self):
+        Reseña.objects.create(usuario=self.usuario, juego=self.juego, puntuacion=7, comentario=COMENTARIO)
+        self.assertEnPaginas(self.detalle, 'critico')
+        self.usuario.username = 'renombrado'
+        self.usuario.save()
+        self.assertEnPaginas(self.detalle, 'renombrado')
+        self.assertEnPaginas(reverse('reviews:reseña_list'), 'renombrado')
+    
+    def test_fragmento(self):
+        plantilla = Template("{% load fragmentos %}{% fragmento 'prueba' juego %}{{ juego.titulo }}{% endfragmento %}")
+        self.assertEqual(plantilla.render(Context({'juego': self.juego})), 'Juego cacheado')
+        # Sin cambio de versión se sirve el fragmento guardado
+        self.juego.titulo = 'Sin guardar'
+        self.assertEqual(plantilla.render(Context({'juego': self.juego})), 'Juego cacheado')
+        cache.invalidar('juego', self.juego.pk)
+        self.assertEqual(plantilla.render(Context({'juego': self.juego})), 'Sin guardar')
+        # Invalidar en bloque tampoco repite una versión anterior
+        anterior = cache.version('juego', self.juego.pk)
+        cache.invalidar_varios('juego', [self.juego.pk])
+        self.assertNotEqual(cache.version('juego', self.juego.pk), anterior)
+
+
+class MetricasPeticionesTests(TestCase):
+    """
+    Histogramas por nombre de URL en /metrics/
+    """
+    
+    def test_metricas_por_ruta(self):
+        registro.reiniciar()
+        self.client.get(reverse('games:juego_list'))
+        contenido = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('playhub_request_duration_seconds_count{route="games:juego_list"} 1', contenido)
+        self.assertRegex(contenido, r'playhub_db_queries_total\{route="games:juego_list"\} [1-9]')
+    
+    def test_metricas_solo_locales(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 404)
+
+
+class PlanesConsultasTests(PresupuestoConsultasTestCase):
+    """
+    Sin estadísticas (ANALYZE) el planificador de SQLite elige el mismo plan
+    con 150 juegos que con millones: lo que aquí recorre la tabla entera y
+    ordena en memoria también lo hará en producción
+    """
+    
+    def test_sin_recorridos_con_ordenacion(self):
+        consultas = explain_queries.capturar()
+        with connection.cursor() as cursor:
+            malas = [
+                (origenes, sql) for (sql, params), origenes in consultas.items()
+                if explain_queries.recorre_y_ordena(explain_queries.plan(cursor, sql, params))
+            ]
+        self.assertEqual(malas, [])
+
+
+class PaginacionCursorTests(PresupuestoConsultasTestCase):
+    """
+    CursorPaginator: recorrido completo en los dos sentidos, plan de las
+    páginas profundas y páginas vacías
+    """
+    
+    def recorrer(self, paginator):
+        """
+        Ir hasta la última página con next_cursor y volver con previous_cursor
+        """
+        ida = [paginator.page()]
+        while ida[-1].has_next():
+            ida.append(paginator.page(ida[-1].next_cursor))
+        vuelta = [ida[-1]]
+        while vuelta[-1].has_previous():
+            vuelta.append(paginator.page(vuelta[-1].previous_cursor))
+        return [list(p) for p in ida], [list(p) for p in reversed(vuelta)]
+    
+    def test_ida_y_vuelta(self):
+        for ordering in [('-fecha_lanzamiento', '-id'), ('plataforma', '-id')]:
+            with self.subTest(ordering=ordering):
+                paginator = CursorPaginator(Juego.objects.all(), 12, ordering)
+                ida, vuelta = self.recorrer(paginator)
+                self.assertEqual(ida, vuelta)
+                self.assertEqual(
+                    [juego for pagina in ida for juego in pagina],
+                    list(Juego.objects.order_by(*ordering)),
+                )
+                self.assertTrue(all(len(pagina) == 12 for pagina in ida[:-1]))
+    
+    def test_comparacion_de_filas(self):
+        paginator = CursorPaginator(Juego.objects.all(), 12, ('-fecha_lanzamiento', '-id'))
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as consultas:
+            paginator.page(cursor)
+        self.assertIn('("games_juego"."fecha_lanzamiento", "games_juego"."id") <', consultas[0]['sql'])
+    
+    def test_plan_paginas_profundas(self):
+        """
+        Una página profunda se lee como un rango del índice compuesto, sin
+        recorrer la tabla ni ordenar en memoria
+        """
+        usuario = User.objects.get(username='usuario1')
+        casos = [
+            (Juego.objects.all(), ('-fecha_lanzamiento', '-id'), 'juego_fecha_id_idx'),
+            (Reseña.objects.filter(usuario=usuario), ('-fecha', '-id'), 'resena_usuario_fecha_idx'),
+        ]
+        for queryset, ordering, indice in casos:
+            with self.subTest(indice=indice):
+                paginator = CursorPaginator(queryset, 5, ordering)
+                profunda = queryset.order_by(*ordering)[queryset.count() // 2]
+                for direccion in ('n', 'p'):
+                    with CaptureQueriesContext(connection) as consultas:
+                        paginator.page(paginator.codificar(direccion, profunda))
+                    with connection.cursor() as cursor:
+                        pasos = explain_queries.plan(cursor, consultas[0]['sql'], None)
+                    self.assertEqual(len(pasos), 1, pasos)
+                    self.assertRegex(pasos[0], rf'^SEARCH \S+ USING (COVERING )?INDEX {indice} ')
+    
+    def test_pagina_vacia(self):
+        """
+        Un cursor que ya no tiene filas detrás (p. ej. tras borrar) sigue
+        enlazando a la primera página
+        """
+        ultimo = Juego.objects.order_by('fecha_lanzamiento', 'id').first()
+        paginator = CursorPaginator(Juego.objects.all(), 12, ('-fecha_lanzamiento', '-id'))
+        cursor = paginator.codificar('n', ultimo)
+        pagina = paginator.page(cursor)
+        self.assertEqual(list(pagina), [])
+        self.assertFalse(pagina.es_primera)
+        self.assertTrue(pagina.has_other_pages())
+        self.assertTrue(paginator.page().es_primera)
+        response = self.client.get(reverse('games:juego_list') + f'?cursor={cursor}')
+        self.assertContains(response, 'Volver a la primera')
+        self.assertContains(response, f'href="{reverse("games:juego_list")}"')
+
+
+class LecturaRouterTests(SimpleTestCase):
+    """
+    Perfil de producción: qué peticiones leen de la conexión 'lectura'
+    """
+    
+    def test_vistas_de_lectura(self):
+        factory = RequestFactory()
+        self.assertTrue(es_lectura(factory.get(reverse('games:juego_list'))))
+        self.assertTrue(es_lectura(factory.get(reverse('reviews:perfil_detail', args=[1]))))
+        self.assertFalse(es_lectura(factory.post(reverse('games:juego_list'))))
+        self.assertFalse(es_lectura(factory.get(reverse('games:juego_create'))))
+        self.assertFalse(es_lectura(factory.get(reverse('games:juego_delete', args=[1]))))
+        self.assertFalse(es_lectura(factory.get('/no-existe/')))
+    
+    def test_router(self):
+        router = LecturaRouter()
+        self.assertEqual(router.db_for_read(Juego), 'default')
+        with solo_lectura():
+            self.assertEqual(router.db_for_read(Juego), 'lectura')
+            self.assertEqual(router.db_for_write(Juego), 'default')
+        self.assertFalse(router.allow_migrate('lectura', 'games'))
+
+
+class VistasAsyncTests(PresupuestoConsultasTestCase):
+    """
+    Las vistas asíncronas (modo ASGI) generan la misma página que las síncronas
+    """
+    
+    async def renderizar_async(self, vista, url, usuario, **kwargs):
+        request = AsyncRequestFactory().get(url)
+        request.user = usuario
+        cache.get_cache().clear()
+        response = await vista.as_view()(request, **kwargs)
+        await sync_to_async(response.render)()
+        return response
+    
+    async def test_mismo_html_que_sync(self):
+        juego = await Juego.objects.order_by('pk').afirst()
+        usuario = await User.objects.aget(username='usuario1')
+        categoria = await juego.categorias.afirst()
+        casos = [
+            (JuegoListAsyncView, reverse('games:juego_list'), {}),
+            (JuegoListAsyncView, reverse('games:juego_list') + f'?categorias={categoria.pk}&q=juego', {}),
+            (JuegoDetailAsyncView, reverse('games:juego_detail', args=[juego.pk]), {'pk': juego.pk}),
+            (ReseñaListAsyncView, reverse('reviews:reseña_list'), {}),
+            (PerfilUsuarioDetailAsyncView, reverse('reviews:perfil_detail', args=[usuario.pk]), {'pk': usuario.pk}),
+        ]
+        for vista, url, kwargs in casos:
+            with self.subTest(url=url):
+                esperado = await sync_to_async(self.client.get)(url)
+                response = await self.renderizar_async(vista, url, AnonymousUser(), **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, esperado.content)
+
+
+class ImportarCatalogoTests(TestCase):
+    """
+    import_catalog: validación, upsert por referencia y reseñas
+    """
+    
+    def importar(self, filas):
+        ruta = os.path.join(self.tmp, 'catalogo.jsonl')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(fila, ensure_ascii=False) + '\n' for fila in filas)
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('import_catalog', ruta, stdout=salida, stderr=errores)
+        return errores.getvalue()
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.usuario = User.objects.create_user('ana', password='x')
+    
+    def test_upsert(self):
+        fila = {
+            'referencia': 'VND-1', 'titulo': 'Juego importado', 'plataforma': 'PC',
+            'precio': '19.99', 'fecha_lanzamiento': '2024-03-01', 'categorias': ['RPG', 'Indie'],
+            'reseñas': [{'usuario': 'ana', 'puntuacion': 8, 'comentario': 'x' * 60}],
+        }
+        errores = self.importar([
+            fila,
+            {**fila, 'referencia': 'VND-2', 'precio': '0'},
+            {**fila, 'referencia': 'VND-3', 'plataforma': 'Wii'},
+        ])
+        self.assertIn('línea 2', errores)
+        self.assertIn('línea 3', errores)
+        juego = Juego.objects.get(referencia='VND-1')
+        self.assertEqual(sorted(c.nombre for c in juego.categorias.all()), ['Indie', 'RPG'])
+        self.assertEqual((juego.total_reseñas, juego.puntuacion_promedio), (1, 8.0))
+        
+        self.importar([{
+            **fila, 'titulo': 'Juego renombrado', 'categorias': ['RPG'],
+            'reseñas': [{'usuario': 'ana', 'puntuacion': 4, 'comentario': 'y' * 60}],
+        }])
+        juego = Juego.objects.get(referencia='VND-1')
+        self.assertEqual(Juego.objects.count(), 1)
+        self.assertEqual(juego.titulo, 'Juego renombrado')
+        self.assertEqual([c.nombre for c in juego.categorias.all()], ['RPG'])
+        self.assertEqual((juego.total_reseñas, juego.puntuacion_promedio), (1, 4.0))
+    
+    def test_reseña_no_objeto(self):
+        fila = {
+            'referencia': 'VND-1', 'titulo': 'Juego importado', 'plataforma': 'PC',
+            'precio': '19.99', 'fecha_lanzamiento': '2024-03-01', 'categorias': ['RPG'],
+        }
+        errores = self.importar([{**fila, 'reseñas': ['foo']}, {**fila, 'referencia': 'VND-2'}])
+        self.assertIn('línea 1: Cada reseña debe ser un objeto JSON', errores)
+        self.assertEqual(list(Juego.objects.values_list('referencia', flat=True)), ['VND-2'])
+    
+    def test_reconstruye_derivados(self):
+        fila = {
+            'referencia': 'VND-1', 'titulo': 'Juego importado', 'plataforma': 'PC',
+            'precio': '19.99', 'fecha_lanzamiento': '2024-03-01', 'categorias': ['RPG'],
+            'reseñas': [{'usuario': 'ana', 'puntuacion': 8, 'comentario': 'x' * 60}],
+        }
+        self.importar([fila, {**fila, 'referencia': 'VND-2', 'titulo': 'Otro juego importado'}])
+        juego = Juego.objects.get(referencia='VND-1')
+        self.assertTrue(EntradaRanking.objects.filter(juego=juego).exists())
+        self.assertTrue(JuegoSimilar.objects.filter(juego=juego).exists())
+        catalogo = EstadisticaCorte.objects.catalogo()
+        self.assertEqual((catalogo.total_juegos, catalogo.total_reseñas), (2, 2))
+
+
+class PoblarDatosTests(TestCase):
+    """
+    populate_test_data --games: la carga sin signals deja al día las
+    valoraciones, los perfiles y todas las tablas derivadas
+    """
+    
+    def poblar(self, *args):
+        call_command(
+            'populate_test_data', '--games', '40', '--users', '25',
+            '--reviews-per-game-dist', 'fixed:8', *args, stdout=io.StringIO(),
+        )
+    
+    def test_reconstruye_derivados(self):
+        self.poblar()
+        self.assertEqual(Reseña.objects.count(), 320)
+        valoraciones = list(Juego.objects.order_by('pk').values_list('total_reseñas', 'suma_puntuaciones'))
+        Juego.objects.recalcular_valoraciones()
+        self.assertEqual(list(Juego.objects.order_by('pk').values_list('total_reseñas', 'suma_puntuaciones')), valoraciones)
+        self.assertEqual(EntradaRanking.objects.values('juego').distinct().count(), 40)
+        self.assertTrue(VecinoJuego.objects.exists())
+        self.assertEqual(JuegoSimilar.objects.values('juego').distinct().count(), 40)
+        catalogo = EstadisticaCorte.objects.catalogo()
+        self.assertEqual((catalogo.total_juegos, catalogo.total_reseñas), (40, 320))
+        self.assertEqual(catalogo.suma_puntuaciones, sum(suma for _, suma in valoraciones))
+    
+    def test_sin_reconstruir(self):
+        self.poblar('--no-rebuild')
+        self.assertFalse(EntradaRanking.objects.exists())
+        self.assertFalse(JuegoSimilar.objects.exists())
+
+
+class EstaticosTests(SimpleTestCase):
+    """
+    collectstatic con EstaticosStorage y middleware.estaticos
+    """
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        # Dependencias de terceros falsas, como las deja vendor_static (sin source maps)
+        vendor = os.path.join(self.tmp, 'fuentes', 'vendor')
+        ficheros = {
+            'bootstrap/bootstrap.min.css': '/* bootstrap */\n.btn  {\n  color : red;\n}\n',
+            'bootstrap/bootstrap.bundle.min.js': 'var bootstrap={}\n',
+            'bootstrap-icons/bootstrap-icons.css': '@font-face { src: url("./fonts/bootstrap-icons.woff2?24e3eb") }',
+            'bootstrap-icons/fonts/bootstrap-icons.woff2': 'woff2',
+        }
+        for nombre, contenido in ficheros.items():
+            ruta = os.path.join(vendor, *nombre.split('/'))
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'w') as f:
+                f.write(contenido)
+        raiz = os.path.join(self.tmp, 'staticfiles')
+        ajustes = override_settings(
+            STATICFILES_DIRS=[settings.STATICFILES_DIRS[0], os.path.join(self.tmp, 'fuentes')],
+            STATIC_ROOT=raiz,
+            ESTATICOS_PRODUCCION=True,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'playhub.estaticos.EstaticosStorage'},
+            },
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        finders.get_finder.cache_clear()
+        self.addCleanup(finders.get_finder.cache_clear)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(raiz, 'staticfiles.json')) as f:
+            self.manifiesto = json.load(f)['paths']
+        self.raiz = raiz
+    
+    def test_paquetes(self):
+        css = self.manifiesto['css/playhub.css']
+        self.assertRegex(css, r'^css/playhub\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.raiz, css)) as f:
+            contenido = f.read()
+        self.assertIn('.btn{color : red}', contenido)
+        # La url() relativa del CSS de iconos apunta a la fuente con hash
+        fuente = self.manifiesto['vendor/bootstrap-icons/fonts/bootstrap-icons.woff2']
+        self.assertIn(f'url("../{fuente}?24e3eb")', contenido)
+        self.assertTrue(os.path.exists(os.path.join(self.raiz, css + '.gz')))
+        with open(os.path.join(self.raiz, self.manifiesto['js/playhub.js'])) as f:
+            self.assertEqual(f.read(), 'var bootstrap={};\n')
+    
+    def test_middleware(self):
+        middleware = EstaticosMiddleware(lambda request: 'siguiente')
+        css = self.manifiesto['css/playhub.css']
+        
+        request = RequestFactory().get(f'/static/{css}', headers={'accept-encoding': 'gzip, br;q=0'})
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('Content-Disposition', response)
+        response.close()
+        
+        request = RequestFactory().get(f'/static/{css}', headers={'if-none-match': response['ETag']})
+        self.assertEqual(middleware(request).status_code, 200)
+        request = RequestFactory().get(
+            f'/static/{css}', headers={'if-none-match': response['ETag'], 'accept-encoding': 'gzip'}
+        )
+        self.assertEqual(middleware(request).status_code, 304)
+        
+        # Sin hash en el nombre: caché corta; fuera de STATIC_ROOT: sigue la cadena
+        response = middleware(RequestFactory().get('/static/css/playhub.css'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+        self.assertEqual(middleware(RequestFactory().get('/static/no/existe.css')), 'siguiente')
+        self.assertEqual(middleware(RequestFactory().get('/juegos/')), 'siguiente')
+
+
+class VendorStaticTests(SimpleTestCase):
+    """
+    vendor_static solo guarda descargas que coinciden con el SRI fijado
+    """
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.origen = os.path.join(self.tmp, 'cdn.js')
+        self.contenido = b'var bootstrap={};\n//# sourceMappingURL=bootstrap.bundle.min.js.map'
+        with open(self.origen, 'wb') as f:
+            f.write(self.contenido)
+        self.destino = os.path.join(self.tmp, 'static')
+        self.ruta = os.path.join(self.destino, 'vendor', 'bootstrap.js')
+    
+    def descargar(self, esperada, *args):
+        vendor = {'vendor/bootstrap.js': (f'file://{self.origen}', esperada)}
+        with override_settings(STATICFILES_DIRS=[self.destino], ESTATICOS_VENDOR=vendor):
+            call_command('vendor_static', *args, stdout=io.StringIO())
+    
+    def test_integridad(self):
+        esperada = 'sha384-' + base64.b64encode(hashlib.sha384(self.contenido).digest()).decode()
+        self.descargar(f'sha512-otro {esperada}')
+        with open(self.ruta, 'rb') as f:
+            self.assertEqual(f.read(), b'var bootstrap={};\n')
+    
+    def test_no_coincide(self):
+        with self.assertRaisesMessage(CommandError, 'la integridad no coincide'):
+            self.descargar('sha384-' + base64.b64encode(hashlib.sha384(b'otro').digest()).decode())
+        self.assertFalse(os.path.exists(self.ruta))
+    
+    def test_sin_fijar(self):
+        with self.assertRaisesMessage(CommandError, 'Sin integridad SRI'):
+            self.descargar(None)
+        self.assertFalse(os.path.exists(self.ruta))
+        self.descargar(None, '--allow-unpinned')
+        self.assertTrue(os.path.exists(self.ruta))
+
+
+class PlantillasTests(SimpleTestCase):
+    """
+    {% ruta %} con prefijos precalculados y el perfilado de plantillas
+    """
+    
+    def test_ruta(self):
+        plantilla = Template(
+            "{% load rutas %}{% for pk in pks %}{% ruta 'games:juego_update' pk %} {% endfor %}"
+            "{% ruta 'reviews:perfil_detail' '7' %}"
+        )
+        with PerfilPlantillas() as perfil:
+            salida = plantilla.render(Context({'pks': [1, 25, 3000]}))
+        esperado = [reverse('games:juego_update', args=[pk]) for pk in (1, 25, 3000)]
+        self.assertEqual(salida, ' '.join(esperado) + ' ' + reverse('reviews:perfil_detail', args=['7']))
+        etiquetas = perfil.por_etiqueta()
+        self.assertEqual(etiquetas['{% ruta %}'][1], 4)
+        self.assertEqual(etiquetas['{% for %}'][1], 1)
+        self.assertIn('(sin nombre)', perfil.por_plantilla())
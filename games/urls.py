@@ -1,11 +1,18 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'games'
 
+# Con ASGI (ver playhub/asgi.py) las vistas de lectura son asíncronas
+if settings.VISTAS_ASYNC:
+    ListaView, DetalleView = views.JuegoListAsyncView, views.JuegoDetailAsyncView
+else:
+    ListaView, DetalleView = views.JuegoListView, views.JuegoDetailView
+
 urlpatterns = [
-    path('', views.JuegoListView.as_view(), name='juego_list'),
-    path('<int:pk>/', views.JuegoDetailView.as_view(), name='juego_detail'),
+    path('', ListaView.as_view(), name='juego_list'),
+    path('<int:pk>/', DetalleView.as_view(), name='juego_detail'),
     path('crear/', views.JuegoCreateView.as_view(), name='juego_create'),
     path('<int:pk>/editar/', views.JuegoUpdateView.as_view(), name='juego_update'),
     path('<int:pk>/eliminar/', views.JuegoDeleteView.as_view(), name='juego_delete'),
@@ -1,41 +1,129 @@
+from asgiref.sync import sync_to_async
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Avg
-from .models import Juego
-from .forms import JuegoForm
+from playhub import cache
+from playhub.asincrono import AsyncDetailMixin, AsyncListMixin
+from playhub.cache import CachePaginaAnonimaAsyncMixin, CachePaginaAnonimaMixin
+from playhub.paginacion import CursorPaginationMixin
+from recomendaciones.models import JuegoSimilar
+from .models import Categoria, Juego
+from .forms import JuegoForm, JuegoFiltroForm, aopciones_categorias, opciones_categorias
 
 
-class JuegoListView(ListView):
+class JuegoListView(CachePaginaAnonimaMixin, CursorPaginationMixin, ListView):
     """
-    Vista para listar todos los juegos
+    Vista para listar todos los juegos.
+    Admite búsqueda por título y filtros por plataforma, categorías,
+    precio y fecha (parámetros GET de JuegoFiltroForm), con el recuento
+    de resultados por plataforma y categoría (facetas).
+    Paginación por cursor sobre (fecha_lanzamiento, id).
+    Los anónimos reciben la página desde caché; el resto, las tarjetas cacheadas
     """
     model = Juego
     template_name = 'games/juego_list.html'
     context_object_name = 'juegos'
     paginate_by = 12
+    cursor_ordering = ('-fecha_lanzamiento', '-id')
+    
+    def get_filtros(self):
+        """
+        Validar los parámetros GET y devolver los filtros aplicables
+        """
+        if not hasattr(self, '_filtros'):
+            self.filtro_form = JuegoFiltroForm(self.request.GET or None)
+            if self.filtro_form.is_valid():
+                self._filtros = self.filtro_form.cleaned_data
+            else:
+                self._filtros = {}
+        return self._filtros
+    
+    def get_queryset(self):
+        return Juego.objects.filtrar(**self.get_filtros())
+    
+    def get_facetas(self):
+        if not hasattr(self, '_facetas'):
+            self._facetas = Juego.objects.facetas(**self.get_filtros())
+        return self._facetas
+    
+    def get_categorias(self):
+        """
+        Categorías que se muestran como facetas (de la lista cacheada)
+        """
+        if not hasattr(self, '_categorias'):
+            self._categorias = [Categoria(pk=pk, nombre=nombre) for pk, nombre in opciones_categorias()]
+        return self._categorias
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filtros = self.get_filtros()
+        facetas = self.get_facetas()
+        context['filtro_form'] = self.filtro_form
+        context['hay_filtros'] = any(filtros.values())
+        context['facetas_plataforma'] = [
+            (valor, etiqueta, facetas['plataforma'].get(valor, 0))
+            for valor, etiqueta in Juego.PLATAFORMA_CHOICES
+        ]
+        seleccionadas = {c.pk for c in filtros.get('categorias') or []}
+        context['facetas_categoria'] = [
+            (categoria, facetas['categoria'].get(categoria.pk, 0), categoria.pk in seleccionadas)
+            for categoria in self.get_categorias()
+        ]
+        # Versiones de las tarjetas en una sola lectura de caché
+        context['versiones_cache'] = cache.versiones([('juego', j.pk) for j in context['juegos']])
+        return context
 
 
-class JuegoDetailView(DetailView):
+class JuegoDetailView(CachePaginaAnonimaMixin, DetailView):
     """
     Vista para mostrar los detalles de un juego.
     FASE B: Ahora incluye reseñas relacionadas y categorías
-    RETO OPCIONAL: Calcula la media de puntuación con ORM
+    La media y el total de reseñas se leen de los campos desnormalizados
+    de Juego, sin consultas de agregación. Categorías, reseñas y juegos
+    similares se sirven como fragmentos cacheados
     """
     model = Juego
     template_name = 'games/juego_detail.html'
     context_object_name = 'juego'
     
+    def get_versiones_cache(self):
+        return [('juego', self.kwargs['pk']), ('categorias', None), ('similares', None)]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Obtener reseñas relacionadas con este juego
         context['reseñas'] = self.object.reseñas.all().select_related('usuario')
-        # Calcular puntuación promedio usando agregación de Django ORM
-        puntuacion_avg = self.object.reseñas.aggregate(Avg('puntuacion'))['puntuacion__avg']
+        # Valoraciones precalculadas (ver reviews/signals.py)
+        puntuacion_avg = self.object.puntuacion_promedio
         context['puntuacion_promedio'] = round(puntuacion_avg, 1) if puntuacion_avg else None
-        context['total_reseñas'] = self.object.reseñas.count()
+        context['total_reseñas'] = self.object.total_reseñas
+        # Precalculados por build_similar_games (recomendaciones/similares.py)
+        context['similares'] = JuegoSimilar.objects.para_juego(self.object.pk)
+        context['versiones_cache'] = cache.versiones(self.get_versiones_cache())
         return context
 
 
+class JuegoListAsyncView(CachePaginaAnonimaAsyncMixin, AsyncListMixin, JuegoListView):
+    """
+    JuegoListView con el ORM asíncrono (modo ASGI)
+    """
+    
+    async def aprecargar(self):
+        if 'categorias' in self.request.GET:
+            # Validar las categorías elegidas consulta la base de datos
+            await sync_to_async(self.get_filtros)()
+        filtros = self.get_filtros()
+        self._facetas = await Juego.objects.afacetas(**filtros)
+        self._categorias = [Categoria(pk=pk, nombre=nombre) for pk, nombre in await aopciones_categorias()]
+
+
+class JuegoDetailAsyncView(CachePaginaAnonimaAsyncMixin, AsyncDetailMixin, JuegoDetailView):
+    """
+    JuegoDetailView con el ORM asíncrono (modo ASGI).
+    Categorías, reseñas y similares siguen siendo perezosos: solo se consultan al
+    renderizar si su fragmento no está en caché
+    """
+
+
 class JuegoCreateView(CreateView):
     """
     Vista para crear un nuevo juego
@@ -0,0 +1,43 @@
+from django import forms
+from django.forms.utils import flatatt
+from django.urls import reverse_lazy
+from django.utils.html import format_html
+from .models import Juego
+
+
+class JuegoAutocompletarWidget(forms.Widget):
+    """
+    Campo oculto con el id del juego y un cuadro de texto que sugiere
+    títulos con /api/juegos/autocompletar/ (static/js/autocompletar.js).
+    A diferencia de forms.Select no recorre las opciones del campo: solo
+    se consulta el título del juego ya elegido
+    """
+    url = reverse_lazy('api:juego_autocompletar')
+
+    class Media:
+        js = ('js/autocompletar.js',)
+
+    def texto(self, valor):
+        """
+        Texto visible del juego elegido ("Título (Plataforma)")
+        """
+        if not valor.isdecimal():
+            return ''
+        juego = Juego.objects.filter(pk=valor).only('titulo', 'plataforma').first()
+        return str(juego) if juego else ''
+
+    def id_for_label(self, id_):
+        return f'{id_}_texto' if id_ else id_
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        id_ = attrs.pop('id', f'id_{name}')
+        attrs.setdefault('placeholder', 'Escribe el título del juego...')
+        valor = self.format_value(value) or ''
+        return format_html(
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="search" id="{}_texto" value="{}" list="{}_opciones" autocomplete="off"'
+            ' data-autocompletar="{}" data-destino="{}"{}>'
+            '<datalist id="{}_opciones"></datalist>',
+            name, id_, valor, id_, self.texto(valor), id_, self.url, id_, flatatt(attrs), id_,
+        )
@@ -0,0 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import empty
+
+from reviews import cola
+
+
+class AvisosReseñasMiddleware:
+    """
+    Pasar a django.contrib.messages los avisos de reseñas rechazadas al
+    volcar la cola (reviews/cola.py). Solo se mira si la vista ya ha
+    cargado al usuario, así que no añade consultas; el mensaje aparece en
+    la siguiente página. Sin RESEÑAS_DIFERIDAS no se instala.
+
+    Debe ir después de MessageMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.RESEÑAS_DIFERIDAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.entregar(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.entregar(request)
+        return response
+
+    def entregar(self, request):
+        # Mismo criterio que request_logger.usuario_cargado()
+        user = getattr(request, 'user', None)
+        user = getattr(user, '_wrapped', user)
+        if user is None or user is empty or not user.is_authenticated:
+            return
+        for mensaje in cola.recoger_avisos(request.user.pk):
+            messages.warning(request, mensaje)
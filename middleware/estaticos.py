@@ -0,0 +1,148 @@
+"""
+Servidor de estáticos en el propio proceso (PLAYHUB_ESTATICOS_PRODUCCION=1).
+
+Sirve STATIC_ROOT (generado por `collectstatic`, ver playhub/estaticos.py)
+antes que el resto del middleware, así que una petición de estáticos no
+carga sesión ni usuario:
+
+- Al arrancar se recorre STATIC_ROOT una vez: cada petición es una búsqueda
+  en un diccionario, sin stat() ni acceso a disco hasta abrir el fichero
+- Elige la variante .br o .gz según Accept-Encoding (con Vary)
+- Los nombres con hash del manifiesto llevan Cache-Control de un año e
+  immutable; el resto, una caché corta. ETag y Last-Modified responden 304
+- El cuerpo es un FileResponse: con WSGI, el servidor lo envía con su
+  wsgi.file_wrapper (gunicorn usa sendfile, sin copiar el fichero a Python)
+"""
+import json
+import mimetypes
+import os
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_CORTA = 'public, max-age=60'
+
+# Preferencia de codificación: (token de Accept-Encoding, extensión)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+@dataclass
+class Fichero:
+    ruta: str
+    tipo: str
+    inmutable: bool
+    modificado: str
+    etag: str
+    # {token de Accept-Encoding: (ruta, tamaño)}, incluida '' para el original
+    variantes: dict = field(default_factory=dict)
+
+
+def indexar(raiz):
+    """
+    {ruta URL relativa: Fichero} de todo `raiz`
+    """
+    try:
+        with open(os.path.join(raiz, 'staticfiles.json'), encoding='utf-8') as f:
+            con_hash = set(json.load(f)['paths'].values())
+    except FileNotFoundError:
+        con_hash = set()
+    indice = {}
+    for carpeta, _, ficheros in os.walk(raiz):
+        for nombre in ficheros:
+            if nombre.endswith(('.gz', '.br')):
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            relativa = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+            datos = os.stat(ruta)
+            tipo, _ = mimetypes.guess_type(nombre)
+            if tipo and (tipo.startswith('text/') or tipo in ('application/javascript', 'image/svg+xml')):
+                tipo += '; charset=utf-8'
+            fichero = Fichero(
+                ruta=ruta,
+                tipo=tipo or 'application/octet-stream',
+                inmutable=relativa in con_hash,
+                modificado=http_date(datos.st_mtime),
+                etag=f'{int(datos.st_mtime):x}-{datos.st_size:x}',
+            )
+            fichero.variantes[''] = (ruta, datos.st_size)
+            for token, extension in CODIFICACIONES:
+                if os.path.exists(ruta + extension):
+                    fichero.variantes[token] = (ruta + extension, os.path.getsize(ruta + extension))
+            indice[relativa] = fichero
+    return indice
+
+
+def aceptadas(request):
+    """
+    Tokens de Accept-Encoding, sin los marcados con q=0
+    """
+    tokens = set()
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, parametros = parte.partition(';')
+        try:
+            peso = float(parametros.strip().removeprefix('q=') or 1)
+        except ValueError:
+            peso = 1
+        if peso > 0:
+            tokens.add(token.strip().lower())
+    return tokens
+
+
+class EstaticosMiddleware:
+    """
+    Responder las peticiones GET/HEAD bajo STATIC_URL que existan en
+    STATIC_ROOT. Fuera del modo de producción no se instala
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.ESTATICOS_PRODUCCION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefijo = '/' + settings.STATIC_URL.lstrip('/')
+        self.ficheros = indexar(settings.STATIC_ROOT)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.servir(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.servir(request) or await self.get_response(request)
+
+    def servir(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefijo):
+            return None
+        fichero = self.ficheros.get(request.path_info[len(self.prefijo):])
+        if fichero is None:
+            return None
+        tokens = aceptadas(request)
+        codificacion = next((token for token, _ in CODIFICACIONES if token in tokens and token in fichero.variantes), '')
+        etag = f'"{fichero.etag}{"-" + codificacion if codificacion else ""}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=fichero.tipo)
+            response['Content-Length'] = fichero.variantes[codificacion][1]
+        else:
+            ruta, _ = fichero.variantes[codificacion]
+            response = FileResponse(open(ruta, 'rb'), content_type=fichero.tipo)
+            # FileResponse lo añade con el nombre de la variante (.gz, .br)
+            del response['Content-Disposition']
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        if len(fichero.variantes) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = fichero.modificado
+        response['Cache-Control'] = CACHE_INMUTABLE if fichero.inmutable else CACHE_CORTA
+        return response
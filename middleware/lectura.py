@@ -0,0 +1,52 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from django.views.generic import DetailView, ListView
+
+from playhub.routers import ALIAS_LECTURA, solo_lectura
+
+
+def es_lectura(request):
+    """
+    GET/HEAD a una vista de listado o detalle (no a formularios ni borrados)
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    try:
+        vista = getattr(resolve(request.path_info).func, 'view_class', None)
+    except Resolver404:
+        return False
+    return vista is not None and issubclass(vista, (ListView, DetailView))
+
+
+class LecturaMiddleware:
+    """
+    Ejecutar las vistas de solo lectura con sus consultas en la conexión
+    'lectura' (playhub/routers.py). Sin ese alias (fuera del perfil de
+    producción) no se instala
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if ALIAS_LECTURA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not es_lectura(request):
+            return self.get_response(request)
+        with solo_lectura():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not es_lectura(request):
+            return await self.get_response(request)
+        with solo_lectura():
+            return await self.get_response(request)
@@ -0,0 +1,156 @@
+"""
+Métricas de peticiones agregadas por ruta.
+
+RequestLoggerMiddleware solo mete una tupla en una cola por petición; un
+hilo en segundo plano la saca, escribe el log y actualiza los histogramas
+de latencia y los contadores de consultas de cada ruta (nombre de URL, no
+la ruta cruda, para que /juegos/1/ y /juegos/2/ cuenten juntas).
+
+Las métricas se exponen en formato Prometheus en /metrics/ (solo desde
+localhost o INTERNAL_IPS).
+"""
+import bisect
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger('middleware.request_logger')
+
+# Límites superiores de los cubos del histograma, en milisegundos
+LIMITES_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_LIMITES_NS = tuple(int(limite * 1_000_000) for limite in LIMITES_MS)
+
+
+class MetricasRuta:
+    """
+    Histograma de latencia y contadores de una ruta
+    """
+    __slots__ = ('cubos', 'peticiones', 'suma_ns', 'consultas', 'sql_ns', 'errores')
+
+    def __init__(self):
+        self.cubos = [0] * (len(LIMITES_MS) + 1)
+        self.peticiones = 0
+        self.suma_ns = 0
+        self.consultas = 0
+        self.sql_ns = 0
+        self.errores = 0
+
+
+class RegistroMetricas:
+    """
+    Cola de registros de petición + agregados por ruta.
+    `registrar()` es lo único que se ejecuta en el hilo de la petición.
+    """
+
+    def __init__(self):
+        self.cola = queue.SimpleQueue()
+        self.rutas = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def iniciar(self):
+        """
+        Arrancar el hilo consumidor (una sola vez por proceso)
+        """
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name='playhub-metricas', daemon=True
+                )
+                self._hilo.start()
+
+    def registrar(self, registro):
+        """
+        (metodo, ruta, path, usuario, status, duracion_ns, consultas, sql_ns)
+        """
+        self.cola.put(registro)
+
+    def _bucle(self):
+        while True:
+            self._procesar(self.cola.get())
+
+    def procesar_pendientes(self):
+        """
+        Vaciar la cola en el hilo actual (antes de exportar o en tests)
+        """
+        while True:
+            try:
+                registro = self.cola.get_nowait()
+            except queue.Empty:
+                return
+            self._procesar(registro)
+
+    def _procesar(self, registro):
+        metodo, ruta, path, usuario, status, duracion_ns, consultas, sql_ns = registro
+        with self._lock:
+            metricas = self.rutas.get(ruta)
+            if metricas is None:
+                metricas = self.rutas[ruta] = MetricasRuta()
+            metricas.cubos[bisect.bisect_left(_LIMITES_NS, duracion_ns)] += 1
+            metricas.peticiones += 1
+            metricas.suma_ns += duracion_ns
+            metricas.consultas += consultas
+            metricas.sql_ns += sql_ns
+            if status >= 500:
+                metricas.errores += 1
+        logger.info(
+            '[%s] %s - User: %s - Time: %.2fms - SQL: %d (%.2fms)',
+            metodo, path, usuario, duracion_ns / 1e6, consultas, sql_ns / 1e6,
+            extra={
+                'metodo': metodo, 'ruta': ruta, 'path': path, 'usuario': usuario,
+                'status': status, 'duracion_ms': duracion_ns / 1e6,
+                'consultas': consultas, 'sql_ms': sql_ns / 1e6,
+            },
+        )
+
+    def reiniciar(self):
+        self.procesar_pendientes()
+        with self._lock:
+            self.rutas.clear()
+
+    def exportar_prometheus(self):
+        """
+        Texto en el formato de exposición de Prometheus
+        """
+        self.procesar_pendientes()
+        lineas = [
+            '# TYPE playhub_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            rutas = sorted(self.rutas.items())
+            for ruta, m in rutas:
+                acumulado = 0
+                for limite, cantidad in zip(LIMITES_MS + ('+Inf',), m.cubos):
+                    acumulado += cantidad
+                    le = limite if limite == '+Inf' else f'{limite / 1000:g}'
+                    lineas.append(
+                        f'playhub_request_duration_seconds_bucket{{route="{ruta}",le="{le}"}} {acumulado}'
+                    )
+                lineas.append(f'playhub_request_duration_seconds_sum{{route="{ruta}"}} {m.suma_ns / 1e9:.6f}')
+                lineas.append(f'playhub_request_duration_seconds_count{{route="{ruta}"}} {m.peticiones}')
+            lineas.append('# TYPE playhub_db_queries_total counter')
+            lineas += [f'playhub_db_queries_total{{route="{r}"}} {m.consultas}' for r, m in rutas]
+            lineas.append('# TYPE playhub_db_query_seconds_total counter')
+            lineas += [f'playhub_db_query_seconds_total{{route="{r}"}} {m.sql_ns / 1e9:.6f}' for r, m in rutas]
+            lineas.append('# TYPE playhub_request_errors_total counter')
+            lineas += [f'playhub_request_errors_total{{route="{r}"}} {m.errores}' for r, m in rutas]
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+
+def metricas_view(request):
+    """
+    Exponer las métricas solo a peticiones locales
+    """
+    ips_permitidas = {'127.0.0.1', '::1', *getattr(settings, 'INTERNAL_IPS', ())}
+    if request.META.get('REMOTE_ADDR') not in ips_permitidas:
+        raise Http404
+    return HttpResponse(
+        registro.exportar_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,37 +1,133 @@
 import time
-import logging
+from contextvars import ContextVar
 
-logger = logging.getLogger(__name__)
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import empty
+
+from .metricas import registro
+
+# Contador de la petición en curso. El execute_wrapper se instala una vez por
+# conexión (connection.execute_wrapper() por petición cuesta varios µs solo
+# en buscar la conexión del hilo) y suma en el contador activo, si lo hay
+_contador_actual = ContextVar('contador_sql', default=None)
+
+
+class ContadorSQL:
+    """
+    execute_wrapper que acumula el número de consultas y su tiempo
+    """
+    __slots__ = ('total', 'ns')
+
+    def __init__(self):
+        self.total = 0
+        self.ns = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.ns += time.perf_counter_ns() - inicio
+            self.total += 1
+
+
+def medir_sql(execute, sql, params, many, context):
+    contador = _contador_actual.get()
+    if contador is None:
+        return execute(sql, params, many, context)
+    return contador(execute, sql, params, many, context)
+
+
+def instalar_medicion_sql(sender, connection, **kwargs):
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, medir_sql)
+
+
+def usuario_cargado(request):
+    """
+    Nombre del usuario solo si la petición ya lo ha resuelto: request.user es
+    un SimpleLazyObject y evaluarlo aquí costaría la consulta de sesión y la
+    de usuario en vistas que no lo necesitan. '-' si no se ha cargado
+    """
+    user = getattr(request, 'user', None)
+    if user is None:
+        return '-'
+    wrapped = getattr(user, '_wrapped', user)
+    if wrapped is empty:
+        return '-'
+    return wrapped.username if wrapped.is_authenticated else 'Anonymous'
 
 
 class RequestLoggerMiddleware:
     """
     Middleware personalizado que registra información de cada petición:
-    - Ruta
+    - Ruta (y nombre de URL)
     - Método HTTP
-    - Usuario autenticado
+    - Usuario autenticado (si la vista lo ha cargado)
     - Tiempo de ejecución
+    - Número de consultas SQL y su tiempo
+
+    En el hilo de la petición solo se mide y se encola una tupla; el log y
+    los histogramas por ruta los procesa un hilo en segundo plano
+    (ver middleware/metricas.py).
+
+    Admite cadenas síncronas (WSGI) y asíncronas (ASGI) sin adaptadores.
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(instalar_medicion_sql, dispatch_uid='playhub_medir_sql')
+        # Conexiones ya abiertas en este hilo (tests, shell)
+        for conexion in connections.all(initialized_only=True):
+            instalar_medicion_sql(None, conexion)
+        registro.iniciar()
+
     def __call__(self, request):
-        # Registrar tiempo de inicio
-        start_time = time.time()
-        
-        # Procesar la petición
-        response = self.get_response(request)
-        
-        # Calcular tiempo de ejecución
-        execution_time = (time.time() - start_time) * 1000  # en milisegundos
-        
-        # Obtener información del usuario
-        user = request.user.username if request.user.is_authenticated else "Anonymous"
-        
-        # Registrar en consola
-        log_message = f"[{request.method}] {request.path} - User: {user} - Time: {execution_time:.2f}ms"
-        logger.info(log_message)
-        print(log_message)  # También imprimir en consola
-        
+        if self.async_mode:
+            return self.__acall__(request)
+        contador = ContadorSQL()
+        token = _contador_actual.set(contador)
+        inicio = time.perf_counter_ns()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _contador_actual.reset(token)
+
+        self.registrar(request, response, time.perf_counter_ns() - inicio, contador)
+        return response
+
+    async def __acall__(self, request):
+        # sync_to_async copia el contexto: las consultas del ORM asíncrono
+        # se ejecutan en otro hilo pero suman en el mismo contador
+        contador = ContadorSQL()
+        token = _contador_actual.set(contador)
+        inicio = time.perf_counter_ns()
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _contador_actual.reset(token)
+
+        self.registrar(request, response, time.perf_counter_ns() - inicio, contador)
         return response
+
+    def registrar(self, request, response, duracion, contador):
+        match = request.resolver_match
+        registro.registrar((
+            request.method,
+            match.view_name if match is not None else '<sin_ruta>',
+            request.path,
+            usuario_cargado(request),
+            response.status_code,
+            duracion,
+            contador.total,
+            contador.ns,
+        ))
@@ -0,0 +1,58 @@
+"""
+Modo "tabla grande" para el admin (juegos, reseñas, usuarios y perfiles).
+
+El changelist por defecto de Django no escala a millones de filas:
+
+- El paginador hace COUNT(*) de la consulta filtrada y, para el texto
+  "N resultados (M en total)", otro COUNT(*) de la tabla entera
+- search_fields se traduce en LIKE '%x%' sobre cada campo, sin índice
+- AllValuesFieldListFilter calcula sus opciones con un SELECT DISTINCT
+- Las ForeignKey del formulario se pintan como <select> con todas las filas
+
+TablaGrandeAdminMixin sustituye los recuentos; cada ModelAdmin define su
+búsqueda con índices (get_search_results), filtros de opciones fijas y
+autocomplete_fields para las ForeignKey.
+"""
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+LIMITE_RECUENTO = 10000
+
+
+def prefijo(campo, texto):
+    """
+    Valores de `campo` que empiezan por `texto` como rango
+    (campo >= texto AND campo < texto + U+10FFFF), que a diferencia de
+    LIKE 'x%' sí usa el índice del campo. Distingue mayúsculas
+    """
+    return Q(**{f'{campo}__gte': texto, f'{campo}__lt': texto + '\U0010ffff'})
+
+
+class RecuentoEstimadoPaginator(Paginator):
+    """
+    Paginador que nunca cuenta más de LIMITE_RECUENTO filas:
+
+    - Sin filtros: MAX(pk), una búsqueda en la clave primaria (SQLite solo
+      la optimiza con un único MIN o MAX). Sobreestima en las filas
+      borradas; por debajo del límite se cuenta
+    - Con filtros o búsqueda: COUNT(*) de como mucho LIMITE_RECUENTO + 1
+      filas; las páginas más allá del límite no se enlazan
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list.order_by()
+        if not qs.query.where:
+            estimado = qs.aggregate(maximo=Max('pk'))['maximo'] or 0
+            if estimado > LIMITE_RECUENTO:
+                return estimado
+        return min(qs[:LIMITE_RECUENTO + 1].count(), LIMITE_RECUENTO)
+
+
+class TablaGrandeAdminMixin:
+    """
+    Recuento estimado o acotado, y sin el COUNT(*) de la tabla entera
+    """
+    paginator = RecuentoEstimadoPaginator
+    show_full_result_count = False
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'playhub.settings')
+# Servir catálogo, reseñas y perfiles con las vistas asíncronas
+os.environ.setdefault('PLAYHUB_ASGI', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,66 @@
+"""
+Base de las vistas asíncronas de lectura (servidas con ASGI).
+
+Las vistas genéricas de Django son síncronas: bajo ASGI cada petición
+salta a un hilo con sync_to_async. Estas clases sustituyen `get()` por una
+corrutina que carga con el ORM asíncrono (aget, aiterator, acount...) todo
+lo que la plantilla necesita; después se reutiliza el get_context_data()
+síncrono de la vista, que ya no consulta la base de datos.
+
+Las subclases definen `aprecargar()` para lo que su contexto necesite
+además del objeto o la página (se ejecuta antes de get_queryset()).
+"""
+from django.http import Http404
+from django.utils.functional import empty
+
+
+async def cargar_usuario(request):
+    """
+    Resolver request.user con request.auser() y dejarlo fijado en la
+    petición, para que plantillas y middleware no vuelvan a cargarlo
+    de forma síncrona
+    """
+    user = request.user
+    if getattr(user, '_wrapped', None) is empty:
+        user = await request.auser()
+        request.user = user
+    return user
+
+
+class AsyncListMixin:
+    """
+    ListView asíncrona. Requiere CursorPaginationMixin
+    """
+
+    async def aprecargar(self):
+        pass
+
+    async def get(self, request, *args, **kwargs):
+        await cargar_usuario(request)
+        await self.aprecargar()
+        self.object_list = self.get_queryset()
+        await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return self.render_to_response(self.get_context_data())
+
+
+class AsyncDetailMixin:
+    """
+    DetailView asíncrona
+    """
+
+    async def aprecargar(self):
+        pass
+
+    async def aget_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs.get(self.pk_url_kwarg))
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No se encontró {queryset.model._meta.verbose_name}')
+
+    async def get(self, request, *args, **kwargs):
+        await cargar_usuario(request)
+        self.object = await self.aget_object()
+        await self.aprecargar()
+        return self.render_to_response(self.get_context_data(object=self.object))
@@ -0,0 +1,172 @@
+"""
+Caché de fragmentos y páginas con invalidación por versiones.
+
+Cada objeto cacheable tiene un número de versión guardado en la propia caché
+(`version:juego:42`). Las claves de los fragmentos incluyen esa versión, así
+que invalidar es tan barato como incrementarla: los fragmentos antiguos dejan
+de encontrarse y caducan solos. Los signals de games/signals.py y
+reviews/signals.py incrementan las versiones al cambiar los datos.
+
+Versiones usadas:
+    ('catalogo', None)   cualquier cambio en juegos, categorías o reseñas
+    ('categorias', None) altas, bajas o cambios de nombre de categorías
+    ('juego', pk)        cambios en el juego, sus categorías o sus reseñas
+    ('resena', pk)       cambios en la reseña
+    ('perfiles', None)   cualquier cambio en perfiles
+    ('perfil', user_id)  cambios en el perfil
+    ('estadisticas', None) cambios en las estadísticas por plataforma y categoría
+
+El backend se configura con el alias CACHE_FRAGMENTOS de settings.CACHES
+(locmem por defecto; FileBasedCache o RedisCache en producción).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from playhub.asincrono import cargar_usuario
+
+ALIAS = getattr(settings, 'CACHE_FRAGMENTOS', 'default')
+
+
+def get_cache():
+    return caches[ALIAS]
+
+
+def _clave_version(nombre, pk=None):
+    return f'version:{nombre}' if pk is None else f'version:{nombre}:{pk}'
+
+
+def _version_inicial():
+    # Si la clave de versión se pierde (desalojo, reinicio), partir de la hora
+    # actual garantiza no reutilizar una versión con fragmentos antiguos
+    return int(time.time() * 1000)
+
+
+def versiones(claves):
+    """
+    Obtener varias versiones de una vez: `claves` es una lista de (nombre, pk).
+    Devuelve {(nombre, pk): version}
+    """
+    cache = get_cache()
+    nombres = {_clave_version(nombre, pk): (nombre, pk) for nombre, pk in claves}
+    encontradas = cache.get_many(list(nombres))
+    resultado = {}
+    for clave, nombre_pk in nombres.items():
+        if clave not in encontradas:
+            cache.add(clave, _version_inicial(), timeout=None)
+            encontradas[clave] = cache.get(clave)
+        resultado[nombre_pk] = encontradas[clave]
+    return resultado
+
+
+def version(nombre, pk=None):
+    return versiones([(nombre, pk)])[(nombre, pk)]
+
+
+def invalidar(nombre, pk=None):
+    """
+    Cambiar la versión para que los fragmentos que dependen de ella caduquen.
+    La nueva versión es la hora actual en ms (o la anterior + 1 si fuera
+    mayor): nunca repite una anterior aunque la clave se haya perdido
+    """
+    cache = get_cache()
+    clave = _clave_version(nombre, pk)
+    actual = cache.get(clave)
+    nueva = _version_inicial() if actual is None else max(actual + 1, _version_inicial())
+    cache.set(clave, nueva, timeout=None)
+
+
+def invalidar_varios(nombre, pks):
+    """
+    Invalidar muchas versiones con una lectura y una escritura (importaciones
+    y operaciones masivas), con el mismo cálculo que invalidar()
+    """
+    cache = get_cache()
+    claves = [_clave_version(nombre, pk) for pk in pks]
+    if not claves:
+        return
+    actuales = cache.get_many(claves)
+    inicial = _version_inicial()
+    cache.set_many(
+        {clave: max(actuales[clave] + 1, inicial) if clave in actuales else inicial for clave in claves},
+        timeout=None,
+    )
+
+
+def clave_fragmento(nombre, dependencias, valores_versiones, *extra):
+    """
+    Clave de un fragmento: nombre + versiones de las que depende + extras
+    """
+    partes = [
+        f'{dep}={valores_versiones[(dep, pk)]}' if pk is None else f'{dep}.{pk}={valores_versiones[(dep, pk)]}'
+        for dep, pk in dependencias
+    ]
+    partes += [str(e) for e in extra]
+    return f'fragmento:{nombre}:' + ':'.join(partes)
+
+
+def _clave_pagina(vista, request, valores):
+    ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return clave_fragmento(
+        f'pagina:{vista.__class__.__name__}', list(valores), valores, ruta
+    )
+
+
+def _guardar_al_renderizar(response, clave, timeout):
+    if response.status_code == 200:
+        cache = get_cache()
+        response.add_post_render_callback(
+            lambda r: cache.set(clave, (r.content, r['Content-Type']), timeout)
+        )
+    return response
+
+
+class CachePaginaAnonimaMixin:
+    """
+    Mixin para vistas que sirve la página completa desde la caché a los
+    usuarios anónimos (la mayor parte del tráfico del catálogo), sin tocar
+    la base de datos. Las vistas definen `get_versiones_cache()`.
+
+    Solo es válido para plantillas que no generan contenido distinto por
+    petición para anónimos (p. ej. {% csrf_token %}).
+    """
+    cache_timeout = 300
+
+    def get_versiones_cache(self):
+        return [('catalogo', None)]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        clave = _clave_pagina(self, request, versiones(self.get_versiones_cache()))
+        guardada = get_cache().get(clave)
+        if guardada is not None:
+            contenido, content_type = guardada
+            return HttpResponse(contenido, content_type=content_type)
+        response = super().get(request, *args, **kwargs)
+        return _guardar_al_renderizar(response, clave, self.cache_timeout)
+
+
+class CachePaginaAnonimaAsyncMixin(CachePaginaAnonimaMixin):
+    """
+    Igual que CachePaginaAnonimaMixin para las vistas asíncronas.
+
+    La caché se consulta con los métodos síncronos: los backends de Django
+    solo implementan aget()/aset() con sync_to_async, y un salto de hilo
+    cuesta más que una lectura de locmem o Redis
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = await cargar_usuario(request)
+        if user.is_authenticated:
+            return await super().get(request, *args, **kwargs)
+        clave = _clave_pagina(self, request, versiones(self.get_versiones_cache()))
+        guardada = get_cache().get(clave)
+        if guardada is not None:
+            contenido, content_type = guardada
+            return HttpResponse(contenido, content_type=content_type)
+        response = await super().get(request, *args, **kwargs)
+        return _guardar_al_renderizar(response, clave, self.cache_timeout)
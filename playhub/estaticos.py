@@ -0,0 +1,142 @@
+"""
+Estáticos de producción (PLAYHUB_ESTATICOS_PRODUCCION=1).
+
+En desarrollo Bootstrap y sus iconos vienen de un CDN y static/ se sirve
+tal cual. En producción `collectstatic` con EstaticosStorage:
+
+1. Construye los paquetes de settings.ESTATICOS_PAQUETES: concatena y
+   minifica las dependencias de terceros (static/vendor, descargadas con
+   `manage.py vendor_static`) y los estilos propios, reescribiendo las
+   url() relativas para que sigan apuntando al mismo fichero
+2. Añade a cada nombre el hash de su contenido (ManifestStaticFilesStorage),
+   así que un fichero publicado no cambia nunca y se puede cachear un año
+3. Guarda junto a cada fichero comprimible su versión .gz y, si está
+   instalado el paquete `brotli`, .br
+
+middleware.estaticos sirve después STATIC_ROOT desde el propio proceso.
+"""
+import gzip
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensiones que merece la pena comprimir (las fuentes woff2 e imágenes ya lo están)
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml', '.ttf', '.eot', '.ico')
+# Ahorro mínimo para guardar una variante comprimida
+AHORRO_MINIMO = 0.95
+
+COMENTARIO = re.compile(r'/\*.*?\*/', re.S)
+ESPACIOS = re.compile(r'\s+')
+ALREDEDOR = re.compile(r'\s*([{};,>])\s*')
+URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+# Ruta, separador y query string o fragmento ("fuente.woff2?v=1")
+SUFIJO_URL = re.compile(r'([^?#]*)([?#]?)(.*)', re.S)
+# Referencia al source map ("//# ..." en JS, "/*# ... */" en CSS)
+MAPA_FUENTE = re.compile(r'^(?://|/\*)# sourceMappingURL=.*$', re.M)
+
+
+def minificar_css(texto):
+    """
+    Quitar comentarios y espacios sobrantes. No toca los selectores con
+    ':' (en "a :hover" el espacio cuenta)
+    """
+    texto = COMENTARIO.sub('', texto)
+    texto = ESPACIOS.sub(' ', texto)
+    texto = ALREDEDOR.sub(r'\1', texto)
+    return texto.replace(';}', '}').strip()
+
+
+def rebasar_urls(texto, origen, destino):
+    """
+    Reescribir las url() relativas de un CSS que estaba en `origen` para
+    que funcionen desde `destino` (rutas dentro de STATIC_ROOT)
+    """
+    def reescribir(coincidencia):
+        url = coincidencia.group(2)
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return coincidencia.group(0)
+        ruta, separador, sufijo = SUFIJO_URL.match(url).groups()
+        absoluta = posixpath.normpath(posixpath.join(posixpath.dirname(origen), ruta))
+        relativa = posixpath.relpath(absoluta, posixpath.dirname(destino))
+        return f'url("{relativa}{separador}{sufijo}")'
+    return URL.sub(reescribir, texto)
+
+
+def empaquetar(nombre, fuentes, leer):
+    """
+    Contenido del paquete `nombre` a partir de sus fuentes; `leer(ruta)`
+    devuelve el texto de cada una
+    """
+    partes = []
+    for fuente in fuentes:
+        texto = leer(fuente)
+        if nombre.endswith('.css'):
+            partes.append(minificar_css(rebasar_urls(texto, fuente, nombre)))
+        else:
+            # Los .js de terceros ya vienen minificados; sus mapas no se publican
+            partes.append(MAPA_FUENTE.sub('', texto).strip() + ';')
+    return '\n'.join(partes) + '\n'
+
+
+def comprimir(ruta):
+    """
+    Escribir ruta.gz (y ruta.br) si reducen el tamaño lo suficiente
+    """
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    variantes = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for extension, compresor in variantes:
+        comprimido = compresor(datos)
+        if len(comprimido) < len(datos) * AHORRO_MINIMO:
+            with open(ruta + extension, 'wb') as f:
+                f.write(comprimido)
+
+
+class EstaticosStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que además construye los paquetes antes de
+    calcular los hashes y comprime el resultado
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+        for nombre, fuentes in settings.ESTATICOS_PAQUETES.items():
+            faltan = [fuente for fuente in fuentes if not self.exists(fuente)]
+            if faltan:
+                raise ValueError(
+                    f'Faltan {", ".join(faltan)} para el paquete {nombre}: ejecuta manage.py vendor_static'
+                )
+            contenido = empaquetar(nombre, fuentes, self.leer)
+            if self.exists(nombre):
+                self.delete(nombre)
+            self._save(nombre, ContentFile(contenido.encode()))
+            paths[nombre] = (self, nombre)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        for carpeta, _, ficheros in os.walk(self.location):
+            for fichero in ficheros:
+                if fichero.endswith(COMPRIMIBLES):
+                    comprimir(os.path.join(carpeta, fichero))
+
+    def leer(self, nombre):
+        with self.open(nombre) as f:
+            return f.read().decode()
+
+
+def contexto(request):
+    """
+    Procesador de contexto: base.html enlaza los paquetes en lugar del CDN
+    """
+    return {'estaticos_empaquetados': settings.ESTATICOS_PRODUCCION}
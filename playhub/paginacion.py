@@ -0,0 +1,277 @@
+"""
+Paginación por cursor (keyset) para las vistas de listado.
+
+En lugar de `OFFSET n` + `COUNT(*)`, cada página se pide a partir de los
+valores de ordenación del último (o primer) elemento de la anterior:
+
+    WHERE (fecha, id) < (:fecha, :id) ORDER BY fecha DESC, id DESC LIMIT 13
+
+Con un índice compuesto sobre los campos de ordenación el coste de cualquier
+página es el mismo, sin importar lo profunda que sea.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Q, Value
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class CursorInvalido(InvalidPage):
+    pass
+
+
+def _comparacion_filas(connection):
+    """
+    Django desactiva supports_tuple_lookups en SQLite por otros usos de las
+    tuplas, pero SQLite compara filas desde la 3.15 (Django exige 3.31)
+    """
+    return connection.features.supports_tuple_lookups or connection.vendor == 'sqlite'
+
+
+class ComparacionFilas(Expression):
+    """
+    Comparación de filas (a, b) < (x, y) para usar en filter()
+    """
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, campos, valores, operador):
+        super().__init__()
+        self.columnas = [F(campo.name) for campo in campos]
+        self.valores = [
+            Value(valor, output_field=campo) for campo, valor in zip(campos, valores)
+        ]
+        self.operador = operador
+
+    def get_source_expressions(self):
+        return [*self.columnas, *self.valores]
+
+    def set_source_expressions(self, exprs):
+        n = len(self.columnas)
+        self.columnas, self.valores = exprs[:n], exprs[n:]
+
+    def as_sql(self, compiler, connection):
+        partes = []
+        params = []
+        for lado in (self.columnas, self.valores):
+            sqls = []
+            for expresion in lado:
+                sql, p = compiler.compile(expresion)
+                sqls.append(sql)
+                params.extend(p)
+            partes.append(f'({", ".join(sqls)})')
+        return f'{partes[0]} {self.operador} {partes[1]}', params
+
+
+class CursorPaginator:
+    """
+    Paginador por cursor. `ordering` son los campos de ordenación, el último
+    de ellos único (normalmente '-id'), p. ej. ('-fecha', '-id').
+
+    `limite_total` acota el recuento aproximado: se cuentan como mucho
+    ese número de filas, así que `total` nunca recorre la tabla entera.
+    """
+
+    def __init__(self, queryset, per_page, ordering, limite_total=1000):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.limite_total = limite_total
+        self.campos = [
+            queryset.model._meta.get_field(campo.lstrip('-'))
+            for campo in self.ordering
+        ]
+
+    @cached_property
+    def _total(self):
+        limite = self.limite_total + 1
+        return self.queryset.order_by()[:limite].count()
+
+    @property
+    def total(self):
+        """
+        Número de resultados, acotado a `limite_total`
+        """
+        return min(self._total, self.limite_total)
+
+    @property
+    def total_exacto(self):
+        """
+        Indica si `total` es exacto o solo una cota inferior
+        """
+        return self._total <= self.limite_total
+
+    def codificar(self, direccion, obj):
+        """
+        Generar el token opaco que apunta a `obj` en la `direccion` dada ('n' o 'p')
+        """
+        valores = []
+        for nombre, campo in zip(self.ordering, self.campos):
+            # Instancias del modelo o filas de .values()
+            valor = obj[nombre.lstrip('-')] if isinstance(obj, dict) else getattr(obj, campo.attname)
+            valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else str(valor))
+        datos = json.dumps([direccion, valores], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        """
+        Recuperar (direccion, valores) de un token. Lanza CursorInvalido
+        si el token está mal formado
+        """
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            direccion, valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            if direccion not in ('n', 'p') or len(valores) != len(self.campos):
+                raise ValueError
+            return direccion, [
+                campo.to_python(valor) for campo, valor in zip(self.campos, valores)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError) as e:
+            raise CursorInvalido('Cursor no válido') from e
+
+    def _filtro(self, valores, hacia_atras):
+        """
+        Construir la condición (a, b) < (x, y). Si todos los campos van en
+        el mismo sentido se compara como fila, que la base de datos resuelve
+        como un rango sobre el índice compuesto; si no, se expande como
+        a < x OR (a = x AND b < y), respetando el sentido de cada campo
+        """
+        sentidos = {
+            campo.startswith('-') != hacia_atras for campo in self.ordering
+        }
+        if len(sentidos) == 1 and _comparacion_filas(connections[self.queryset.db]):
+            return ComparacionFilas(self.campos, valores, '<' if sentidos.pop() else '>')
+        condicion = Q()
+        for i, campo in enumerate(self.ordering):
+            descendente = campo.startswith('-')
+            if hacia_atras:
+                descendente = not descendente
+            lookup = 'lt' if descendente else 'gt'
+            iguales = {
+                self.ordering[j].lstrip('-'): valores[j] for j in range(i)
+            }
+            condicion |= Q(**iguales, **{f'{campo.lstrip("-")}__{lookup}': valores[i]})
+        return condicion
+
+    def _consulta(self, cursor):
+        """
+        Queryset de la página (con un elemento extra para saber si hay más)
+        """
+        direccion, valores = self.decodificar(cursor) if cursor else ('n', None)
+        hacia_atras = direccion == 'p'
+        qs = self.queryset
+        if valores is not None:
+            qs = qs.filter(self._filtro(valores, hacia_atras))
+        if hacia_atras:
+            ordering = [c[1:] if c.startswith('-') else f'-{c}' for c in self.ordering]
+        else:
+            ordering = list(self.ordering)
+        return qs.order_by(*ordering)[:self.per_page + 1], hacia_atras, valores is not None
+
+    def _pagina(self, filas, hacia_atras, con_cursor):
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+        if hacia_atras:
+            filas.reverse()
+            # Volviendo hacia atrás se llega a la primera si no hay más filas
+            return CursorPage(self, filas, has_next=True, has_previous=hay_mas, es_primera=bool(filas) and not hay_mas)
+        return CursorPage(self, filas, has_next=hay_mas, has_previous=con_cursor, es_primera=not con_cursor)
+
+    def page(self, cursor=None):
+        """
+        Devolver la página indicada por el cursor (o la primera si no hay)
+        """
+        qs, hacia_atras, con_cursor = self._consulta(cursor)
+        return self._pagina(list(qs), hacia_atras, con_cursor)
+
+    async def apage(self, cursor=None, contar=True):
+        """
+        Versión asíncrona de page(). Si hay más de una página también se
+        cuenta el total, para que la plantilla no tenga que consultarlo
+        (salvo con contar=False, si la plantilla no muestra el total)
+        """
+        qs, hacia_atras, con_cursor = self._consulta(cursor)
+        pagina = self._pagina([obj async for obj in qs], hacia_atras, con_cursor)
+        if contar and pagina.has_other_pages() and '_total' not in self.__dict__:
+            self.__dict__['_total'] = await self.queryset.order_by()[:self.limite_total + 1].acount()
+        return pagina
+
+
+class CursorPage:
+    """
+    Página de resultados con la misma interfaz básica que django.core.paginator.Page.
+    `es_primera` es falso en cualquier página pedida con cursor, también si
+    ha quedado vacía (p. ej. se borraron sus elementos): la plantilla sigue
+    ofreciendo volver a la primera
+    """
+
+    def __init__(self, paginator, object_list, has_next, has_previous, es_primera=True):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+        self.es_primera = es_primera
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous or not self.es_primera
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.codificar('n', self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.codificar('p', self.object_list[0])
+        return None
+
+
+class CursorPaginationMixin:
+    """
+    Mixin para ListView que sustituye el Paginator por CursorPaginator.
+    La vista debe definir `cursor_ordering`; el cursor llega en ?cursor=
+    """
+    cursor_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if getattr(self, '_pagina_precargada', None) is not None:
+            return self._pagina_precargada
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except CursorInvalido:
+            raise Http404('Cursor de paginación no válido')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        Cargar la página con el ORM asíncrono; paginate_queryset() la
+        reutiliza después al construir el contexto
+        """
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except CursorInvalido:
+            raise Http404('Cursor de paginación no válido')
+        self._pagina_precargada = (paginator, page, page.object_list, page.has_other_pages())
+        return self._pagina_precargada
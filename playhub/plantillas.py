@@ -0,0 +1,118 @@
+"""
+Rendimiento de plantillas.
+
+- Rutas precalculadas: {% url 'games:juego_detail' juego.pk %} recorre el
+  resolver en cada tarjeta. url_objeto() resuelve la ruta una vez con un
+  identificador centinela, guarda el prefijo y el sufijo, y después solo
+  concatena el pk (ver games/templatetags/rutas.py)
+- Perfilado: PerfilPlantillas mide el tiempo propio de cada nodo renderizado
+  y lo agrupa por plantilla y por etiqueta (lo usa `bench --profile-templates`)
+"""
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.template.base import Node, TokenType
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+# Un entero que no puede aparecer en el resto de la ruta
+CENTINELA = 918273645
+
+_plantillas_url = {}
+
+
+def plantilla_url(nombre):
+    """
+    (prefijo, sufijo) de la ruta `nombre`, que recibe un único argumento
+    entero, o None si no se puede partir por el centinela
+    """
+    clave = (nombre, get_script_prefix(), get_urlconf() or settings.ROOT_URLCONF)
+    if clave not in _plantillas_url:
+        url = reverse(nombre, args=[CENTINELA])
+        partes = url.split(str(CENTINELA))
+        _plantillas_url[clave] = tuple(partes) if len(partes) == 2 else None
+    return _plantillas_url[clave]
+
+
+def url_objeto(nombre, pk):
+    """
+    Lo mismo que reverse(nombre, args=[pk]) para un pk entero, sin pasar
+    por el resolver salvo la primera vez
+    """
+    plantilla = plantilla_url(nombre)
+    if plantilla is None or type(pk) is not int:
+        return reverse(nombre, args=[pk])
+    prefijo, sufijo = plantilla
+    return f'{prefijo}{pk}{sufijo}'
+
+
+def nombre_etiqueta(node):
+    token = getattr(node, 'token', None)
+    if token is None:
+        return type(node).__name__
+    if token.token_type == TokenType.VAR:
+        return '{{ variable }}'
+    return '{% ' + token.contents.split(None, 1)[0] + ' %}'
+
+
+def nombre_plantilla(node):
+    origin = getattr(node, 'origin', None)
+    return getattr(origin, 'template_name', None) or '(sin nombre)'
+
+
+class PerfilPlantillas:
+    """
+    Medir el render de plantillas mientras está activo:
+
+        with PerfilPlantillas() as perfil:
+            client.get(url)
+        perfil.por_plantilla()   # {plantilla: (ms propios, nodos renderizados)}
+        perfil.por_etiqueta()    # {etiqueta: (ms propios, veces renderizada)}
+
+    Cada nodo cuenta su tiempo menos el de los nodos que renderiza dentro:
+    un {% for %} no incluye sus {{ variables }} y la suma de todo es el
+    tiempo total de render. Los TextNode no se miden (se suman a su padre).
+    Añade sobrecoste a cada nodo: no usar junto a mediciones de latencia
+    """
+
+    def __enter__(self):
+        self.tiempos = defaultdict(int)
+        self.llamadas = Counter()
+        pila = []
+        original = self.original = Node.render_annotated
+        tiempos, llamadas = self.tiempos, self.llamadas
+
+        def render_annotated(node, context):
+            pila.append(0)
+            inicio = time.perf_counter_ns()
+            try:
+                return original(node, context)
+            finally:
+                total = time.perf_counter_ns() - inicio
+                hijos = pila.pop()
+                if pila:
+                    pila[-1] += total
+                tiempos[node] += total - hijos
+                llamadas[node] += 1
+
+        Node.render_annotated = render_annotated
+        return self
+
+    def __exit__(self, *exc):
+        Node.render_annotated = self.original
+
+    def agrupar(self, clave):
+        grupos, veces = defaultdict(int), Counter()
+        for node, ns in self.tiempos.items():
+            grupos[clave(node)] += ns
+            veces[clave(node)] += self.llamadas[node]
+        return {
+            nombre: (ns / 1e6, veces[nombre])
+            for nombre, ns in sorted(grupos.items(), key=lambda g: -g[1])
+        }
+
+    def por_plantilla(self):
+        return self.agrupar(nombre_plantilla)
+
+    def por_etiqueta(self):
+        return self.agrupar(nombre_etiqueta)
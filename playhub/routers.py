@@ -0,0 +1,43 @@
+"""
+Router de base de datos para el perfil de producción de SQLite (settings.py).
+
+Con PLAYHUB_SQLITE_PRODUCCION=1 hay dos alias sobre el mismo fichero en
+modo WAL: 'default', que escribe, y 'lectura', abierto con query_only. Las
+consultas de las vistas de listado y detalle (middleware.lectura las marca)
+van a 'lectura'; el resto, incluidos formularios, admin y comandos, a
+'default'. Al ser el mismo fichero no hay retraso de réplica: una lectura
+ve todo lo confirmado antes de empezar.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+ALIAS_LECTURA = 'lectura'
+
+# sync_to_async copia el contexto, así que también lo ven las vistas asíncronas
+_en_lectura = ContextVar('playhub_en_lectura', default=False)
+
+
+@contextmanager
+def solo_lectura():
+    token = _en_lectura.set(True)
+    try:
+        yield
+    finally:
+        _en_lectura.reset(token)
+
+
+class LecturaRouter:
+    # Se devuelve siempre un alias: si no, Django usaría el de la instancia
+    # (p. ej. guardaría en 'lectura' un objeto leído desde allí)
+
+    def db_for_read(self, model, **hints):
+        return ALIAS_LECTURA if _en_lectura.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,10 +40,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'games',
     'reviews',
+    'rankings',
+    'estadisticas',
+    'recomendaciones',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'middleware.estaticos.EstaticosMiddleware',
+    'middleware.lectura.LecturaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'middleware.request_logger.RequestLoggerMiddleware',
+    'middleware.avisos.AvisosReseñasMiddleware',
 ]
 
 ROOT_URLCONF = 'playhub.urls'
@@ -64,11 +71,29 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'playhub.estaticos.contexto',
             ],
         },
     },
 ]
 
+# Plantillas de producción (PLAYHUB_PLANTILLAS_PRODUCCION=1, o DEBUG apagado):
+# cargador cacheado explícito, sin recarga al editar, y sin el modo debug del
+# motor, que guarda la posición de cada token al compilar y envuelve cada
+# nodo para anotar errores. Con DEBUG las plantillas se releen si cambian
+PLANTILLAS_PRODUCCION = os.environ.get('PLAYHUB_PLANTILLAS_PRODUCCION') == '1' or not DEBUG
+if PLANTILLAS_PRODUCCION:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS'].update({
+        'debug': False,
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    })
+
 WSGI_APPLICATION = 'playhub.wsgi.application'
 
 
@@ -82,6 +107,63 @@ DATABASES = {
     }
 }
 
+# Perfil de producción para SQLite (PLAYHUB_SQLITE_PRODUCCION=1):
+# - WAL: los lectores no bloquean al escritor ni al revés. Con WAL,
+#   synchronous=NORMAL no corrompe la base de datos (un corte de luz puede
+#   perder las últimas transacciones, no dejarlas a medias)
+# - mmap de 256 MB y 64 MB de caché de páginas por conexión
+# - timeout: esperar al cerrojo de escritura en vez de fallar al momento
+# - transacciones IMMEDIATE: toman el cerrojo al empezar, así que dos
+#   escritores se esperan en lugar de fallar con "database is locked" al
+#   pasar de lectura a escritura
+# - conexiones persistentes con comprobación antes de reutilizarlas
+# - alias 'lectura' (mismo fichero, query_only) para las vistas de listado
+#   y detalle: ver playhub/routers.py y middleware/lectura.py
+# `manage.py bench_sqlite` compara lecturas y escrituras concurrentes con
+# y sin este perfil
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; '
+    'PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536; PRAGMA temp_store=MEMORY'
+)
+SQLITE_PRODUCCION = os.environ.get('PLAYHUB_SQLITE_PRODUCCION') == '1'
+if SQLITE_PRODUCCION:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+    })
+    DATABASES['lectura'] = {
+        **DATABASES['default'],
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS + '; PRAGMA query_only=ON', 'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['playhub.routers.LecturaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# 'fragmentos' guarda las páginas y fragmentos HTML del catálogo (playhub/cache.py).
+# En producción se puede apuntar a un backend compartido, p. ej.:
+#   PLAYHUB_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   PLAYHUB_CACHE_LOCATION=/var/tmp/playhub_cache
+# o django.core.cache.backends.redis.RedisCache con LOCATION=redis://...
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragmentos': {
+        'BACKEND': os.environ.get('PLAYHUB_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('PLAYHUB_CACHE_LOCATION', 'playhub-fragmentos'),
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+CACHE_FRAGMENTOS = 'fragmentos'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -119,6 +201,57 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Estáticos de producción (PLAYHUB_ESTATICOS_PRODUCCION=1, ver playhub/estaticos.py):
+# `collectstatic` construye los paquetes, añade el hash del contenido a cada
+# nombre y comprime con gzip (y brotli si está instalado); middleware.estaticos
+# los sirve con caché de un año. Las dependencias de terceros se descargan una
+# vez con `manage.py vendor_static` a static/vendor (versiones fijadas aquí)
+ESTATICOS_PRODUCCION = os.environ.get('PLAYHUB_ESTATICOS_PRODUCCION') == '1'
+# nombre -> (url, integridad SRI del fichero tal como lo sirve el CDN).
+# vendor_static rechaza cualquier descarga que no coincida. Los de Bootstrap
+# son los publicados en getbootstrap.com; Bootstrap Icons no publica SRI: se
+# fijan tras verificar una descarga (vendor_static --allow-unpinned muestra
+# el valor) y mientras sean None no se descargan sin esa opción
+ESTATICOS_VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+        'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM',
+    ),
+    'vendor/bootstrap/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+        'sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz',
+    ),
+    'vendor/bootstrap-icons/bootstrap-icons.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+        None,
+    ),
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': (
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff2',
+        None,
+    ),
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': (
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff',
+        None,
+    ),
+}
+# Un CSS y un JS por página en lugar de tres CSS y un JS
+ESTATICOS_PAQUETES = {
+    'css/playhub.css': [
+        'vendor/bootstrap/bootstrap.min.css',
+        'vendor/bootstrap-icons/bootstrap-icons.css',
+        'css/estilos.css',
+    ],
+    'js/playhub.js': [
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+    ],
+}
+if ESTATICOS_PRODUCCION:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'playhub.estaticos.EstaticosStorage'},
+    }
 
 # Login settings
 LOGIN_URL = 'login'
@@ -127,3 +260,42 @@ LOGOUT_REDIRECT_URL = '/'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Métricas por ruta en /metrics/ (además de localhost)
+INTERNAL_IPS = ['127.0.0.1']
+
+# Log de peticiones (middleware.request_logger): lo escribe un hilo en segundo
+# plano, así que no bloquea la respuesta. PLAYHUB_LOG_PETICIONES=WARNING lo silencia
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'middleware.request_logger': {
+            'handlers': ['console'],
+            'level': os.environ.get('PLAYHUB_LOG_PETICIONES', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Vistas de lectura asíncronas (JuegoListAsyncView...). playhub/asgi.py lo
+# activa; con WSGI las versiones síncronas evitan el bucle de eventos por petición
+VISTAS_ASYNC = os.environ.get('PLAYHUB_ASGI') == '1'
+
+# Rankings (rankings/calculo.py): posiciones guardadas por corte, reseñas con
+# las que la media bayesiana se acerca a la propia del juego y ventana de la
+# tendencia. Se reconstruyen con `manage.py rebuild_rankings`
+RANKING_LONGITUD = 100
+RANKING_VOTOS_MINIMOS = 10
+RANKING_VENTANA_DIAS = 30
+
+# Reseñas en diferido (reviews/cola.py): con PLAYHUB_RESENAS_DIFERIDAS=1 las
+# reseñas nuevas se encolan en disco y `manage.py flush_reviews` las guarda
+# por lotes. Para picos de envíos con SQLite (un único escritor)
+RESEÑAS_DIFERIDAS = os.environ.get('PLAYHUB_RESENAS_DIFERIDAS') == '1'
+RESEÑAS_COLA_DIR = os.environ.get('PLAYHUB_RESENAS_COLA_DIR', BASE_DIR / 'cola_resenas')
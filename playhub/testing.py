@@ -0,0 +1,108 @@
+"""
+Utilidades de test compartidas por las apps.
+
+PresupuestoConsultasTestCase comprueba que una vista ejecuta como mucho un
+número fijo de consultas SQL. Los datos de prueba son lo bastante grandes
+(más filas que cualquier página) para que un N+1 se note: si una plantilla
+o un changelist lanzan una consulta por fila, el recuento supera el
+presupuesto y el test falla mostrando las consultas.
+
+El tamaño se ajusta con la variable de entorno PLAYHUB_TEST_ESCALA (por
+defecto 1): con 1 hay 150 juegos, 60 usuarios y unas 1500 reseñas.
+"""
+import os
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from games.models import Categoria, Juego
+from playhub import cache
+from reviews.models import PerfilUsuario, Reseña, recalcular_estadisticas
+
+ESCALA = int(os.environ.get('PLAYHUB_TEST_ESCALA', '1'))
+
+
+def sembrar_datos(juegos=150, usuarios=60, reseñas_por_usuario=25, semilla=1234):
+    """
+    Crear un conjunto de datos con bulk_create (sin signals por fila)
+    """
+    rnd = random.Random(semilla)
+    categorias = Categoria.objects.bulk_create(
+        [Categoria(nombre=f'Categoría {i}') for i in range(8)]
+    )
+    lista_juegos = Juego.objects.bulk_create([
+        Juego(
+            titulo=f'Juego {i}',
+            plataforma=rnd.choice(Juego.PLATAFORMA_CHOICES)[0],
+            precio=Decimal(rnd.randint(499, 6999)) / 100,
+            fecha_lanzamiento=date(2000, 1, 1) + timedelta(days=rnd.randint(0, 9000)),
+        )
+        for i in range(juegos)
+    ])
+    Through = Juego.categorias.through
+    Through.objects.bulk_create([
+        Through(juego_id=juego.pk, categoria_id=categoria.pk)
+        for juego in lista_juegos
+        for categoria in rnd.sample(categorias, 2)
+    ])
+    lista_usuarios = User.objects.bulk_create(
+        [User(username=f'usuario{i}', password='!') for i in range(usuarios)]
+    )
+    PerfilUsuario.objects.bulk_create(
+        [PerfilUsuario(user=usuario) for usuario in lista_usuarios]
+    )
+    Reseña.objects.bulk_create([
+        Reseña(
+            juego=juego,
+            usuario=usuario,
+            puntuacion=rnd.randint(1, 10),
+            comentario='Comentario de prueba lo bastante largo para pasar la validación.',
+        )
+        for usuario in lista_usuarios
+        for juego in rnd.sample(lista_juegos, min(reseñas_por_usuario, len(lista_juegos)))
+    ], recalcular=False)
+    Juego.objects.recalcular_valoraciones()
+    recalcular_estadisticas([usuario.pk for usuario in lista_usuarios])
+
+
+class PresupuestoConsultasTestCase(TestCase):
+    """
+    TestCase con datos sembrados y assertPresupuestoConsultas()
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_datos(
+            juegos=150 * ESCALA,
+            usuarios=60 * ESCALA,
+            reseñas_por_usuario=25,
+        )
+        cls.admin = User.objects.create_superuser('admin_test', 'admin@test.com', 'x')
+
+    def setUp(self):
+        # Medir siempre el camino sin caché de fragmentos
+        cache.get_cache().clear()
+
+    def assertPresupuestoConsultas(self, url, presupuesto, usuario=None):
+        """
+        GET a `url` (opcionalmente autenticado) y comprobar que responde 200
+        con como mucho `presupuesto` consultas
+        """
+        if usuario is not None:
+            self.client.force_login(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        if len(consultas) > presupuesto:
+            detalle = '\n'.join(
+                f'{i}. {q["sql"]}' for i, q in enumerate(consultas.captured_queries, 1)
+            )
+            self.fail(
+                f'{url}: {len(consultas)} consultas, presupuesto {presupuesto}\n{detalle}'
+            )
+        return response
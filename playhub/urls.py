@@ -17,11 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
+from middleware.metricas import metricas_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='/juegos/', permanent=False)),
     path('juegos/', include('games.urls')),
     path('reseñas/', include('reviews.urls')),
+    path('rankings/', include('rankings.urls')),
+    path('estadisticas/', include('estadisticas.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
+    path('api/', include('api.urls')),
+    path('metrics/', metricas_view, name='metrics'),
 ]
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RankingsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rankings'
+    verbose_name = 'Rankings'
+    
+    def ready(self):
+        """
+        Importar signals cuando la app esté lista
+        """
+        import rankings.signals
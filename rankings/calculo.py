@@ -0,0 +1,173 @@
+"""
+Cálculo de los rankings (EntradaRanking).
+
+Tipos:
+    valoracion   media bayesiana: (suma + m·C) / (total + m), con C la media
+                 global y m = RANKING_VOTOS_MINIMOS. Un juego con pocas
+                 reseñas queda cerca de la media global en lugar de encabezar
+                 la lista con un único 10
+    volumen      número total de reseñas
+    tendencia    reseñas en los últimos RANKING_VENTANA_DIAS días
+
+Cada juego cuenta en cuatro tipos de corte: global, su plataforma, cada una
+de sus categorías y cada combinación plataforma + categoría.
+
+reconstruir() recalcula todo desde cero (comando rebuild_rankings, p. ej.
+cada hora desde cron). actualizar_juego() recoloca un solo juego tras una
+reseña: entra en un corte si supera al último guardado o si el corte no
+está lleno. No saca a nadie, así que un juego que baja puede dejar sitio a
+otro que no estaba guardado y la ventana de tendencia avanza sin recalcular
+al resto: ambas derivas se corrigen en la siguiente reconstrucción.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from games.models import Juego
+from playhub import cache
+from reviews.models import Reseña
+from .models import EntradaRanking, EstadoRanking
+
+
+def valoracion_bayesiana(total, suma, media_global, votos_minimos):
+    return (suma + votos_minimos * media_global) / (total + votos_minimos)
+
+
+def cortes(plataforma, categorias):
+    """
+    (plataforma, categoria_id) de todos los rankings en los que cuenta un juego
+    """
+    for p in ('', plataforma):
+        yield p, None
+        for categoria_id in categorias:
+            yield p, categoria_id
+
+
+def inicio_ventana(ahora=None):
+    return (ahora or timezone.now()) - timedelta(days=settings.RANKING_VENTANA_DIAS)
+
+
+def _valores(total, suma, tendencia, estado):
+    """
+    Valor del juego en cada tipo; los tipos en los que no puntúa se omiten
+    """
+    if not total:
+        return {}
+    valores = {
+        'valoracion': valoracion_bayesiana(total, suma, estado.media_global, estado.votos_minimos),
+        'volumen': total,
+    }
+    if tendencia:
+        valores['tendencia'] = tendencia
+    return valores
+
+
+def reconstruir(tamaño_lote=5000):
+    """
+    Recalcular todos los rankings. Recorre los juegos una vez manteniendo un
+    montículo con los mejores de cada corte y sustituye la tabla en una
+    transacción. Devuelve el número de entradas escritas
+    """
+    ahora = timezone.now()
+    longitud = settings.RANKING_LONGITUD
+    totales = Juego.objects.aggregate(total=Sum('total_reseñas'), suma=Sum('suma_puntuaciones'))
+    estado = EstadoRanking(
+        pk=1,
+        media_global=totales['suma'] / totales['total'] if totales['total'] else 0,
+        votos_minimos=settings.RANKING_VOTOS_MINIMOS,
+        actualizado=ahora,
+    )
+    tendencias = dict(
+        Reseña.objects.filter(fecha__gte=inicio_ventana(ahora)).order_by()
+        .values('juego').annotate(n=Count('pk')).values_list('juego', 'n')
+    )
+    categorias = defaultdict(list)
+    for juego_id, categoria_id in Juego.categorias.through.objects.values_list('juego_id', 'categoria_id'):
+        categorias[juego_id].append(categoria_id)
+
+    # (tipo, plataforma, categoria_id) -> montículo de (valor, -juego_id):
+    # a igual valor gana el id menor, como en EntradaRankingQuerySet.top()
+    mejores = defaultdict(list)
+    juegos = (
+        Juego.objects.filter(total_reseñas__gt=0).order_by()
+        .values_list('pk', 'plataforma', 'total_reseñas', 'suma_puntuaciones')
+    )
+    for juego_id, plataforma, total, suma in juegos.iterator(chunk_size=tamaño_lote):
+        valores = _valores(total, suma, tendencias.get(juego_id, 0), estado)
+        for corte in cortes(plataforma, categorias.get(juego_id, ())):
+            for tipo, valor in valores.items():
+                monticulo = mejores[(tipo, *corte)]
+                elemento = (valor, -juego_id)
+                if len(monticulo) < longitud:
+                    heapq.heappush(monticulo, elemento)
+                elif elemento > monticulo[0]:
+                    heapq.heapreplace(monticulo, elemento)
+
+    entradas = [
+        EntradaRanking(tipo=tipo, plataforma=plataforma, categoria_id=categoria_id,
+                       juego_id=-juego_negativo, valor=valor)
+        for (tipo, plataforma, categoria_id), monticulo in mejores.items()
+        for valor, juego_negativo in monticulo
+    ]
+    with transaction.atomic():
+        EntradaRanking.objects.all().delete()
+        EntradaRanking.objects.bulk_create(entradas, batch_size=tamaño_lote)
+        estado.save()
+    cache.invalidar('rankings')
+    return len(entradas)
+
+
+def actualizar_juego(juego_id):
+    """
+    Recolocar un juego en los rankings tras un cambio en sus reseñas,
+    su plataforma o sus categorías (rankings/signals.py)
+    """
+    estado = EstadoRanking.objects.first()
+    if estado is None:
+        # Aún no se ha ejecutado rebuild_rankings
+        return
+    Through = Juego.categorias.through
+    with transaction.atomic():
+        EntradaRanking.objects.filter(juego_id=juego_id).delete()
+        juego = (
+            Juego.objects.filter(pk=juego_id)
+            .values('plataforma', 'total_reseñas', 'suma_puntuaciones').first()
+        )
+        if juego is not None and juego['total_reseñas']:
+            categorias = list(Through.objects.filter(juego_id=juego_id).values_list('categoria_id', flat=True))
+            tendencia = Reseña.objects.filter(juego_id=juego_id, fecha__gte=inicio_ventana()).count()
+            valores = _valores(juego['total_reseñas'], juego['suma_puntuaciones'], tendencia, estado)
+            EntradaRanking.objects.bulk_create(
+                _entradas_nuevas(juego_id, juego['plataforma'], categorias, valores)
+            )
+    cache.invalidar('rankings')
+
+
+def _entradas_nuevas(juego_id, plataforma, categorias, valores):
+    """
+    Entradas del juego en los cortes donde le corresponde estar, según el
+    tamaño y el último valor de cada corte (una consulta para todos)
+    """
+    limites = {
+        (tipo, p, categoria_id): (n, minimo)
+        for tipo, p, categoria_id, n, minimo in (
+            EntradaRanking.objects
+            .filter(Q(categoria__isnull=True) | Q(categoria__in=categorias), plataforma__in=['', plataforma])
+            .order_by().values('tipo', 'plataforma', 'categoria')
+            .annotate(n=Count('pk'), minimo=Min('valor'))
+            .values_list('tipo', 'plataforma', 'categoria', 'n', 'minimo')
+        )
+    }
+    nuevas = []
+    for corte in cortes(plataforma, categorias):
+        for tipo, valor in valores.items():
+            n, minimo = limites.get((tipo, *corte), (0, None))
+            if n < settings.RANKING_LONGITUD or valor > minimo:
+                nuevas.append(EntradaRanking(
+                    tipo=tipo, plataforma=corte[0], categoria_id=corte[1], juego_id=juego_id, valor=valor,
+                ))
+    return nuevas
@@ -0,0 +1,34 @@
+from django import forms
+from django.conf import settings
+from games.models import Categoria, Juego
+from .models import EntradaRanking
+
+
+class RankingFiltroForm(forms.Form):
+    """
+    Formulario (GET) para elegir el ranking y el corte
+    """
+    tipo = forms.ChoiceField(
+        required=False,
+        choices=EntradaRanking.TIPO_CHOICES,
+        widget=forms.HiddenInput()
+    )
+    plataforma = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todas')] + Juego.PLATAFORMA_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    categoria = forms.ModelChoiceField(
+        required=False,
+        queryset=Categoria.objects.all(),
+        empty_label='Todas',
+        label='Categoría',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    n = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.RANKING_LONGITUD,
+        label='Posiciones',
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rankings import calculo
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruir los rankings (valoración bayesiana, volumen y tendencia) '
+        'de todos los cortes. Pensado para ejecutarse periódicamente (cron)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Juegos leídos por consulta')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruyendo rankings...')
+        inicio = time.perf_counter()
+        entradas = calculo.reconstruir(tamaño_lote=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ {entradas} entradas en {time.perf_counter() - inicio:.1f}s'
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('games', '0005_juego_referencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_global', models.FloatField(default=0, verbose_name='Media Global')),
+                ('votos_minimos', models.PositiveIntegerField(verbose_name='Votos Mínimos')),
+                ('actualizado', models.DateTimeField(verbose_name='Última Reconstrucción')),
+            ],
+            options={
+                'verbose_name': 'Estado de los Rankings',
+                'verbose_name_plural': 'Estado de los Rankings',
+            },
+        ),
+        migrations.CreateModel(
+            name='EntradaRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('valoracion', 'Mejor valorados'), ('volumen', 'Más reseñados'), ('tendencia', 'En tendencia')], max_length=20, verbose_name='Tipo')),
+                ('plataforma', models.CharField(blank=True, max_length=20, verbose_name='Plataforma')),
+                ('valor', models.FloatField(verbose_name='Valor')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='games.categoria', verbose_name='Categoría')),
+                ('juego', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='games.juego', verbose_name='Juego')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Ranking',
+                'verbose_name_plural': 'Entradas de Ranking',
+                'indexes': [models.Index(fields=['tipo', 'plataforma', 'categoria', '-valor', 'juego'], name='ranking_corte_valor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import models
+from games.models import Categoria, Juego
+
+
+class EntradaRankingQuerySet(models.QuerySet):
+    
+    def top(self, tipo, plataforma='', categoria=None, n=20):
+        """
+        Las n primeras posiciones de un ranking: se leen n filas del índice
+        (tipo, plataforma, categoria, -valor), sin agregar reseñas
+        """
+        return (
+            self.filter(tipo=tipo, plataforma=plataforma, categoria=categoria)
+            .select_related('juego')
+            .order_by('-valor', 'juego_id')[:n]
+        )
+
+
+class EntradaRanking(models.Model):
+    """
+    Posición precalculada de un juego en un ranking.
+    
+    Cada ranking es un tipo (valoración bayesiana, volumen de reseñas o
+    tendencia) en un corte: todas las plataformas o una, y todas las
+    categorías o una. De cada corte se guardan los mejores juegos
+    (settings.RANKING_LONGITUD); rankings/calculo.py los reconstruye y los
+    mantiene al escribir reseñas
+    """
+    
+    TIPO_CHOICES = [
+        ('valoracion', 'Mejor valorados'),
+        ('volumen', 'Más reseñados'),
+        ('tendencia', 'En tendencia'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    # '' = todas las plataformas
+    plataforma = models.CharField(max_length=20, blank=True, verbose_name='Plataforma')
+    # NULL = todas las categorías
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Categoría'
+    )
+    juego = models.ForeignKey(
+        Juego,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Juego'
+    )
+    valor = models.FloatField(verbose_name='Valor')
+    
+    objects = EntradaRankingQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Entrada de Ranking'
+        verbose_name_plural = 'Entradas de Ranking'
+        indexes = [
+            # Lectura del top-N de un corte (EntradaRankingQuerySet.top)
+            models.Index(
+                fields=['tipo', 'plataforma', 'categoria', '-valor', 'juego'],
+                name='ranking_corte_valor_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.juego_id} ({self.valor:.2f})"
+
+
+class EstadoRanking(models.Model):
+    """
+    Parámetros con los que se calcularon los rankings (fila única).
+    Las actualizaciones incrementales reutilizan la media global de la
+    última reconstrucción para que los valores sean comparables
+    """
+    media_global = models.FloatField(default=0, verbose_name='Media Global')
+    votos_minimos = models.PositiveIntegerField(verbose_name='Votos Mínimos')
+    actualizado = models.DateTimeField(verbose_name='Última Reconstrucción')
+    
+    class Meta:
+        verbose_name = 'Estado de los Rankings'
+        verbose_name_plural = 'Estado de los Rankings'
+    
+    def __str__(self):
+        return f"Rankings del {self.actualizado:%Y-%m-%d %H:%M}"
@@ -0,0 +1,57 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from games.models import Juego
+from reviews.cola import reseñas_volcadas
+from reviews.models import Reseña, reseñas_modificadas
+from .calculo import actualizar_juego
+
+
+def actualizar_al_confirmar(juego_id):
+    """
+    Recolocar el juego cuando termine la transacción: para entonces las
+    valoraciones de Juego ya están al día (reviews/signals.py), sea cual
+    sea el orden de los receivers
+    """
+    transaction.on_commit(partial(actualizar_juego, juego_id))
+
+
+@receiver(post_save, sender=Reseña)
+@receiver(post_delete, sender=Reseña)
+def actualizar_rankings_reseña(sender, instance, **kwargs):
+    juego_anterior = getattr(instance, '_valoracion_original', (None, None))[0]
+    if juego_anterior is not None and juego_anterior != instance.juego_id:
+        actualizar_al_confirmar(juego_anterior)
+    actualizar_al_confirmar(instance.juego_id)
+
+
+@receiver(reseñas_volcadas)
+@receiver(reseñas_modificadas)
+def actualizar_rankings_volcado(sender, juego_ids, **kwargs):
+    """
+    Lotes de la cola de reseñas en diferido y operaciones masivas de
+    ReseñaQuerySet (sin post_save)
+    """
+    for juego_id in juego_ids:
+        actualizar_al_confirmar(juego_id)
+
+
+@receiver(post_save, sender=Juego)
+def actualizar_rankings_juego(sender, instance, created, **kwargs):
+    """
+    Un cambio de plataforma mueve el juego de corte (uno nuevo no tiene reseñas)
+    """
+    if not created:
+        actualizar_al_confirmar(instance.pk)
+
+
+@receiver(m2m_changed, sender=Juego.categorias.through)
+def actualizar_rankings_categorias(sender, instance, action, reverse, pk_set, **kwargs):
+    # En categoria.juegos.clear() no se sabe qué juegos tenía: queda
+    # para la siguiente reconstrucción
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for juego_id in (pk_set or ()) if reverse else [instance.pk]:
+        actualizar_al_confirmar(juego_id)
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from games.models import Categoria, Juego
+from playhub.testing import PresupuestoConsultasTestCase
+from reviews.models import Reseña
+from . import calculo
+from .models import EntradaRanking, EstadoRanking
+
+
+class RankingTests(PresupuestoConsultasTestCase):
+    """
+    Reconstrucción, actualización incremental y lectura de los rankings
+    """
+    
+    def setUp(self):
+        super().setUp()
+        calculo.reconstruir()
+        self.estado = EstadoRanking.objects.get()
+    
+    def esperado(self, tipo, plataforma, categoria, n=10):
+        """
+        El ranking calculado por fuerza bruta sobre las reseñas
+        """
+        juegos = Juego.objects.filter(plataforma=plataforma, categorias=categoria)
+        if tipo == 'volumen':
+            valores = {j.pk: j.total_reseñas for j in juegos if j.total_reseñas}
+        else:
+            valores = {
+                j.pk: calculo.valoracion_bayesiana(
+                    j.total_reseñas, j.suma_puntuaciones, self.estado.media_global, self.estado.votos_minimos
+                )
+                for j in juegos if j.total_reseñas
+            }
+        return sorted(valores, key=lambda pk: (-valores[pk], pk))[:n]
+    
+    def test_reconstruir(self):
+        categoria = Categoria.objects.order_by('pk').first()
+        for tipo in ('valoracion', 'volumen'):
+            top = EntradaRanking.objects.top(tipo, 'PC', categoria, n=10)
+            self.assertEqual([e.juego_id for e in top], self.esperado(tipo, 'PC', categoria))
+        # Sembrar_datos fecha todas las reseñas ahora: la tendencia es el volumen
+        top = EntradaRanking.objects.top('tendencia', n=5)
+        por_volumen = EntradaRanking.objects.top('volumen', n=5)
+        self.assertEqual([e.juego_id for e in top], [e.juego_id for e in por_volumen])
+    
+    def test_actualizacion_incremental(self):
+        juego = (
+            Juego.objects.filter(total_reseñas__gt=0).annotate(n=Count('categorias'))
+            .filter(n__gt=0).order_by('puntuacion_promedio', 'pk').first()
+        )
+        categoria = juego.categorias.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(30):
+                Reseña.objects.create(
+                    juego=juego, usuario=User.objects.create_user(f'fan{i}'), puntuacion=10,
+                    comentario='Comentario de prueba lo bastante largo para pasar la validación.',
+                )
+        self.assertEqual(
+            [e.juego_id for e in EntradaRanking.objects.top('valoracion', juego.plataforma, categoria)],
+            self.esperado('valoracion', juego.plataforma, categoria, n=20),
+        )
+        self.assertTrue(EntradaRanking.objects.filter(juego=juego, tipo='tendencia', plataforma='').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            juego.delete()
+        self.assertFalse(EntradaRanking.objects.filter(juego_id=juego.pk).exists())
+    
+    def test_presupuesto_vista(self):
+        categoria = Categoria.objects.order_by('pk').first()
+        response = self.assertPresupuestoConsultas(reverse('rankings:ranking'), 3)
+        self.assertEqual(len(response.context['entradas']), 20)
+        self.assertPresupuestoConsultas(
+            reverse('rankings:ranking') + f'?tipo=tendencia&plataforma=Switch&categoria={categoria.pk}&n=50', 4
+        )
+        self.assertEqual(self.estado.actualizado.date(), timezone.now().date())
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'rankings'
+
+urlpatterns = [
+    path('', views.RankingView.as_view(), name='ranking'),
+]
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.views.generic import ListView
+from playhub.cache import CachePaginaAnonimaMixin
+from .forms import RankingFiltroForm
+from .models import EntradaRanking, EstadoRanking
+
+
+class RankingView(CachePaginaAnonimaMixin, ListView):
+    """
+    Vista de los rankings: mejor valorados, más reseñados y en tendencia,
+    por plataforma y categoría (parámetros GET de RankingFiltroForm).
+    Lee las posiciones precalculadas de EntradaRanking
+    """
+    template_name = 'rankings/ranking.html'
+    context_object_name = 'entradas'
+    posiciones_defecto = 20
+    
+    def get_versiones_cache(self):
+        return [('rankings', None)]
+    
+    def get_filtros(self):
+        if not hasattr(self, '_filtros'):
+            self.filtro_form = RankingFiltroForm(self.request.GET or None)
+            self._filtros = self.filtro_form.cleaned_data if self.filtro_form.is_valid() else {}
+        return self._filtros
+    
+    def get_queryset(self):
+        filtros = self.get_filtros()
+        return EntradaRanking.objects.top(
+            filtros.get('tipo') or 'valoracion',
+            plataforma=filtros.get('plataforma') or '',
+            categoria=filtros.get('categoria'),
+            n=filtros.get('n') or self.posiciones_defecto,
+        )
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tipo = self.get_filtros().get('tipo') or 'valoracion'
+        context['filtro_form'] = self.filtro_form
+        context['tipo'] = tipo
+        context['tipos'] = EntradaRanking.TIPO_CHOICES
+        context['estado'] = EstadoRanking.objects.first()
+        context['ventana_dias'] = settings.RANKING_VENTANA_DIAS
+        return context
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RecomendacionesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recomendaciones'
+    verbose_name = 'Recomendaciones'
+    
+    def ready(self):
+        """
+        Importar signals cuando la app esté lista
+        """
+        import recomendaciones.signals
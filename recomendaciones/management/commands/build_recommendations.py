@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recomendaciones import matriz
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcular los juegos vecinos (similitud item-item sobre la matriz de reseñas) '
+        'que usan las recomendaciones del perfil. Pensado para ejecutarse de noche (cron)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('-k', type=int, default=30, help='Vecinos guardados por juego')
+        parser.add_argument('--block-size', type=int, default=2000, help='Juegos por bloque (y por transacción)')
+        parser.add_argument('--max-user-reviews', type=int, default=200,
+                            help='Reseñas por usuario como máximo (las demás se muestrean)')
+        parser.add_argument('--min-common', type=int, default=3,
+                            help='Usuarios en común mínimos para considerar dos juegos vecinos')
+        parser.add_argument('--shrinkage', type=float, default=10,
+                            help='Encogimiento de la similitud con pocos usuarios en común')
+        parser.add_argument('--processes', type=int, default=1, help='Procesos de cálculo en paralelo')
+        parser.add_argument('--max-seconds', type=float,
+                            help='No empezar bloques nuevos pasado este tiempo (la siguiente ejecución sigue con --start-id)')
+        parser.add_argument('--start-id', type=int, help='Empezar por el primer juego con este id o mayor')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Cargando la matriz de reseñas...')
+        self.inicio = time.perf_counter()
+        resultado, guardados = matriz.construir(
+            k=options['k'],
+            tamaño_bloque=options['block_size'],
+            max_por_usuario=options['max_user_reviews'],
+            min_comunes=options['min_common'],
+            encogimiento=options['shrinkage'],
+            procesos=options['processes'],
+            progreso=self.progreso,
+            desde_id=options['start_id'],
+            tiempo_maximo=options['max_seconds'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {guardados:,} vecinos de {len(resultado.juego_ids):,} juegos '
+            f'({resultado.usuarios:,} usuarios, {resultado.reseñas:,} reseñas) '
+            f'en {time.perf_counter() - self.inicio:.1f}s'
+        ))
+        if resultado.siguiente_id is not None:
+            self.stdout.write(self.style.WARNING(
+                f'Tiempo agotado: continuar con --start-id {resultado.siguiente_id}'
+            ))
+    
+    def progreso(self, resultado, hechos, guardados):
+        segundos = time.perf_counter() - self.inicio
+        self.stdout.write(
+            f'  {hechos:,}/{len(resultado.juego_ids):,} juegos, {guardados:,} vecinos '
+            f'({segundos:.1f}s)'
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recomendaciones import similares
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcular los juegos similares de todo el catálogo (categorías, plataforma, '
+        'precio y vecinos por reseñas). Conviene ejecutarlo tras build_recommendations'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('-k', type=int, default=12, help='Similares guardados por juego')
+        parser.add_argument('--block-size', type=int, default=5000, help='Juegos por bloque (y por transacción)')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Calculando juegos similares...')
+        self.inicio = time.perf_counter()
+        guardados = similares.construir(
+            k=options['k'], tamaño_bloque=options['block_size'], progreso=self.progreso
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {guardados:,} similares en {time.perf_counter() - self.inicio:.1f}s'
+        ))
+    
+    def progreso(self, hechos, total, guardados):
+        self.stdout.write(
+            f'  {hechos:,}/{total:,} juegos, {guardados:,} similares '
+            f'({time.perf_counter() - self.inicio:.1f}s)'
+        )
@@ -0,0 +1,302 @@
+"""
+Similitud item-item a partir de la matriz de reseñas usuario × juego.
+
+La matriz se carga una vez como matriz dispersa de SciPy (valores float32
+e índices int32, 8 bytes por reseña en cada orientación) en dos formatos:
+
+    por usuario (CSR)  juegos y puntuaciones de cada usuario
+    por juego (CSC)    usuarios y puntuaciones de cada juego
+
+Las puntuaciones se centran restando la media de cada usuario, así que la
+similitud entre dos juegos es el coseno ajustado de sus columnas: cuánto
+coinciden los usuarios en que les gustan (o no) ambos más que su media.
+
+Los juegos se procesan en bloques de ids consecutivos. Los productos
+escalares de un grupo de juegos con todos los demás son un único producto
+disperso (sus columnas traspuestas, CSR, por la matriz por usuario), y los
+usuarios en común el mismo producto con las matrices binarias: el coste es
+Σ reseñas_por_usuario², por lo que los usuarios con muchas reseñas se
+muestrean (max_por_usuario). Cada bloque se escribe en su propia
+transacción; con procesos > 1 los bloques se calculan en paralelo (fork) y
+el proceso principal los guarda. Con un tiempo máximo la ejecución se corta
+entre bloques y la siguiente sigue desde el primer juego pendiente (desde_id).
+"""
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.db import connection, connections, transaction
+from games.models import Juego
+import numpy as np
+from reviews.models import Reseña
+from scipy import sparse
+from .models import VecinoJuego
+
+# Juegos por producto disperso: cada fila del resultado tiene todos los
+# juegos que comparten algún usuario con el suyo, así que se acota la memoria
+SUBBLOQUE = 256
+# Elementos como máximo de un sub-bloque denso (64 MB por matriz)
+MAX_DENSO = 2 ** 24
+
+
+class MatrizValoraciones:
+    """
+    Matriz dispersa de reseñas centradas por usuario
+    """
+
+    def __init__(self, juego_ids, por_usuario):
+        # Índices densos en orden de id: un bloque es un rango de ids
+        self.juego_ids = np.asarray(juego_ids, dtype=np.int64)
+        self.por_usuario = por_usuario
+        self.por_juego = por_usuario.tocsc()
+        # Las mismas matrices con unos: su producto cuenta los usuarios en común
+        self.binaria_usuario = self._binaria(self.por_usuario, sparse.csr_matrix)
+        self.binaria_juego = self._binaria(self.por_juego, sparse.csc_matrix)
+        cuadrados = self.por_juego.multiply(self.por_juego).sum(axis=0)
+        self.normas = np.sqrt(np.asarray(cuadrados, dtype=np.float64).ravel())
+
+    @staticmethod
+    def _binaria(matriz, formato):
+        return formato((np.ones(matriz.nnz, dtype=np.int32), matriz.indices, matriz.indptr), shape=matriz.shape)
+
+    @classmethod
+    def cargar(cls, max_por_usuario=200, tamaño_lote=20000):
+        """
+        Leer las reseñas ordenadas por usuario en streaming
+        """
+        juego_ids = Juego.objects.filter(total_reseñas__gt=0).order_by('pk').values_list('pk', flat=True)
+        juego_ids = np.fromiter(juego_ids.iterator(chunk_size=tamaño_lote), dtype=np.int64)
+        filas = (
+            Reseña.objects.order_by('usuario_id')
+            .values_list('usuario_id', 'juego_id', 'puntuacion')
+            .iterator(chunk_size=tamaño_lote)
+        )
+        reseñas = np.fromiter(filas, dtype=[('usuario', 'i8'), ('juego', 'i8'), ('puntuacion', 'i1')])
+        return cls.desde_reseñas(
+            juego_ids, reseñas['usuario'], reseñas['juego'], reseñas['puntuacion'], max_por_usuario,
+        )
+
+    @classmethod
+    def desde_reseñas(cls, juego_ids, usuarios, juegos, puntuaciones, max_por_usuario):
+        """
+        Construir la matriz a partir de las reseñas agrupadas por usuario
+        (ids de usuario y de juego y puntuación)
+        """
+        inicios = np.flatnonzero(np.diff(usuarios, prepend=usuarios[:1] - 1))
+        cuentas = np.diff(inicios, append=len(usuarios))
+        elegidas = np.ones(len(usuarios), dtype=bool)
+        for usuario in np.flatnonzero(cuentas > max_por_usuario):
+            # Muestra uniforme y determinista: posiciones int(i * n / max_por_usuario)
+            inicio, n = inicios[usuario], cuentas[usuario]
+            elegidas[inicio:inicio + n] = False
+            elegidas[inicio + np.arange(max_por_usuario) * n // max_por_usuario] = True
+        grupo = np.repeat(np.arange(len(inicios)), cuentas)[elegidas]
+        juegos, puntuaciones = juegos[elegidas], puntuaciones[elegidas]
+
+        medias = np.bincount(grupo, weights=puntuaciones) / np.bincount(grupo)
+        valores = puntuaciones - medias[grupo]
+        utiles = (valores != 0) & np.isin(juegos, juego_ids)
+        # Un usuario con una sola reseña útil no relaciona ningún par de juegos
+        por_usuario = np.bincount(grupo[utiles], minlength=len(inicios))
+        utiles &= por_usuario[grupo] >= 2
+        por_usuario = por_usuario[por_usuario >= 2]
+        # Las reseñas ya están agrupadas por usuario: son las filas de la CSR
+        matriz = sparse.csr_matrix(
+            (
+                valores[utiles].astype(np.float32),
+                np.searchsorted(juego_ids, juegos[utiles]).astype(np.int32),
+                np.concatenate(([0], np.cumsum(por_usuario))),
+            ),
+            shape=(len(por_usuario), len(juego_ids)),
+        )
+        return cls(juego_ids, matriz)
+
+    @property
+    def reseñas(self):
+        return self.por_usuario.nnz
+
+    @property
+    def usuarios(self):
+        return self.por_usuario.shape[0]
+
+    def vecinos_bloque(self, inicio, fin, k, min_comunes, encogimiento):
+        """
+        Los k juegos más parecidos a cada juego del rango (índices densos):
+        [(juego, [(similitud, comunes, vecino)])]. La similitud se encoge con
+        comunes / (comunes + encogimiento) para no fiarse de pocos usuarios
+        """
+        resultados = []
+        for desde in range(inicio, fin, SUBBLOQUE):
+            resultados += self._vecinos_subbloque(desde, min(desde + SUBBLOQUE, fin), k, min_comunes, encogimiento)
+        return resultados
+
+    def _pares(self, desde, hasta, min_comunes):
+        """
+        (juego, otro, producto escalar, usuarios en común) de los juegos del
+        rango con los demás con producto positivo y min_comunes usuarios en común
+        """
+        productos = self.por_juego[:, desde:hasta].T @ self.por_usuario
+        comunes = self.binaria_juego[:, desde:hasta].T @ self.binaria_usuario
+        elementos = comunes.shape[0] * comunes.shape[1]
+        if comunes.nnz * 4 > elementos and elementos <= MAX_DENSO:
+            # Casi todos los pares tienen usuarios en común: se comparan las
+            # dos matrices como arrays densos, sin ordenar sus índices
+            producto, n = productos.toarray(), comunes.toarray()
+            validos = (producto > 0) & (n >= min_comunes)
+            filas, otros = np.nonzero(validos)
+            juegos, producto, n = desde + filas, producto[filas, otros], n[filas, otros]
+        else:
+            # El producto no guarda los ceros exactos, así que sus elementos son
+            # un subconjunto de los de comunes: se buscan por fila × juegos + columna
+            productos.sort_indices()
+            comunes.sort_indices()
+            n_juegos = len(self.juego_ids)
+            filas = np.arange(desde, hasta, dtype=np.int64)
+            juegos = np.repeat(filas, np.diff(productos.indptr))
+            claves = np.repeat(filas, np.diff(comunes.indptr)) * n_juegos + comunes.indices
+            otros, producto = productos.indices, productos.data
+            n = comunes.data[np.searchsorted(claves, juegos * n_juegos + otros)]
+            validos = (producto > 0) & (n >= min_comunes)
+            juegos, otros, producto, n = juegos[validos], otros[validos], producto[validos], n[validos]
+        distintos = otros != juegos
+        return juegos[distintos], otros[distintos], producto[distintos].astype(np.float64), n[distintos]
+
+    def _vecinos_subbloque(self, desde, hasta, k, min_comunes, encogimiento):
+        juegos, otros, producto, n = self._pares(desde, hasta, min_comunes)
+        similitud = producto / (self.normas[juegos] * self.normas[otros]) * n / (n + encogimiento)
+
+        # La similitud del k-ésimo de cada juego, con un argsort sobre una sola
+        # clave (juego − similitud / 2, la similitud está en (0, 1]): lexsort
+        # con los desempates es mucho más lento y solo se aplica a los que
+        # llegan a ella (con margen para el redondeo de la clave)
+        fila = juegos - desde
+        orden = np.argsort(fila - similitud / 2)
+        posicion = np.arange(len(orden)) - np.searchsorted(fila[orden], fila[orden])
+        umbral = np.full(hasta - desde, -np.inf)
+        kesimos = orden[posicion == k - 1]
+        umbral[fila[kesimos]] = similitud[kesimos]
+        candidatos = similitud >= umbral[fila] - 1e-9
+        juegos, otros, n, similitud = juegos[candidatos], otros[candidatos], n[candidatos], similitud[candidatos]
+
+        # De más a menos parecido dentro de cada juego (desempate por comunes
+        # y vecino, de mayor a menor) y los k primeros de cada uno
+        orden = np.lexsort((-otros, -n, -similitud, juegos))
+        juegos, otros, n, similitud = juegos[orden], otros[orden], n[orden], similitud[orden]
+        elegidos = np.arange(len(juegos)) - np.searchsorted(juegos, juegos) < k
+        juegos = juegos[elegidos]
+        vecinos = list(zip(similitud[elegidos].tolist(), n[elegidos].tolist(), otros[elegidos].tolist()))
+        limites = np.searchsorted(juegos, np.arange(desde, hasta + 1)).tolist()
+        return [(juego, vecinos[limites[i]:limites[i + 1]]) for i, juego in enumerate(range(desde, hasta))]
+
+
+def insertar(modelo, columnas, filas):
+    """
+    INSERT con una sentencia preparada: son muchas filas sin validación ni
+    signals, y construir objetos del ORM costaría más que escribirlas
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {qn(modelo._meta.db_table)} ({", ".join(qn(c) for c in columnas)}) '
+        f'VALUES ({", ".join(["%s"] * len(columnas))})'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+# Matriz compartida con los procesos hijos (fork: se hereda sin copiarla)
+_matriz = None
+
+
+def _calcular_bloque(inicio, fin, k, min_comunes, encogimiento):
+    return inicio, fin, _matriz.vecinos_bloque(inicio, fin, k, min_comunes, encogimiento)
+
+
+def _guardar_bloque(matriz, inicio, fin, resultados):
+    """
+    Sustituir los vecinos de todos los juegos con id en el rango del bloque
+    (también los de juegos que ya no tienen reseñas)
+    """
+    ids = matriz.juego_ids.tolist()
+    filtro = {}
+    if inicio > 0:
+        filtro['juego_id__gte'] = ids[inicio]
+    if fin < len(ids):
+        filtro['juego_id__lt'] = ids[fin]
+    with transaction.atomic():
+        VecinoJuego.objects.filter(**filtro).delete()
+        insertar(VecinoJuego, ['juego_id', 'vecino_id', 'similitud', 'comunes'], [
+            (ids[juego], ids[otro], similitud, comunes)
+            for juego, vecinos in resultados
+            for similitud, comunes, otro in vecinos
+        ])
+        return sum(len(vecinos) for _, vecinos in resultados)
+
+
+def _en_plazo(bloques, limite):
+    """
+    Los bloques que empiezan antes de `limite` (time.monotonic()); el
+    primero siempre, para que cada ejecución avance
+    """
+    for i, bloque in enumerate(bloques):
+        if i and limite is not None and time.monotonic() >= limite:
+            return
+        yield bloque
+
+
+def construir(k=30, tamaño_bloque=2000, max_por_usuario=200, min_comunes=3, encogimiento=10,
+              procesos=1, progreso=None, desde_id=None, tiempo_maximo=None):
+    """
+    Calcular y guardar los vecinos de todos los juegos (con id >= desde_id).
+    progreso(matriz, juegos_hechos, vecinos_guardados) se llama tras cada bloque.
+
+    Con tiempo_maximo (segundos, contando la carga) no se empiezan bloques
+    nuevos una vez agotado: la ejecución nocturna tiene una duración acotada
+    y matriz.siguiente_id indica por dónde seguir (None si se terminó)
+    """
+    global _matriz
+    limite = None if tiempo_maximo is None else time.monotonic() + tiempo_maximo
+    matriz = _matriz = MatrizValoraciones.cargar(max_por_usuario)
+    matriz.siguiente_id = None
+    n = len(matriz.juego_ids)
+    primero = 0 if desde_id is None else int(np.searchsorted(matriz.juego_ids, desde_id))
+    bloques = [(inicio, min(inicio + tamaño_bloque, n)) for inicio in range(primero, n, tamaño_bloque)]
+    if not bloques:
+        if desde_id is None:
+            VecinoJuego.objects.all().delete()
+        return matriz, 0
+    parametros = (k, min_comunes, encogimiento)
+    guardados = hechos = 0
+    en_plazo = _en_plazo(bloques, limite)
+    try:
+        if procesos > 1:
+            # Los hijos no usan la base de datos: que no hereden la conexión abierta
+            connections.close_all()
+            with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('fork')) as pool:
+                # Solo unos pocos bloques por delante: al agotarse el tiempo
+                # no quedan muchos calculándose
+                futuros = deque(
+                    pool.submit(_calcular_bloque, *bloque, *parametros)
+                    for bloque in islice(en_plazo, 2 * procesos)
+                )
+                while futuros:
+                    inicio, fin, resultados = futuros.popleft().result()
+                    guardados += _guardar_bloque(matriz, inicio, fin, resultados)
+                    hechos += fin - inicio
+                    if progreso:
+                        progreso(matriz, hechos, guardados)
+                    for bloque in islice(en_plazo, 1):
+                        futuros.append(pool.submit(_calcular_bloque, *bloque, *parametros))
+        else:
+            for bloque in en_plazo:
+                inicio, fin, resultados = _calcular_bloque(*bloque, *parametros)
+                guardados += _guardar_bloque(matriz, inicio, fin, resultados)
+                hechos += fin - inicio
+                if progreso:
+                    progreso(matriz, hechos, guardados)
+    finally:
+        _matriz = None
+    if primero + hechos < n:
+        matriz.siguiente_id = int(matriz.juego_ids[primero + hechos])
+    return matriz, guardados
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('games', '0005_juego_referencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VecinoJuego',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similitud', models.FloatField(verbose_name='Similitud')),
+                ('comunes', models.PositiveIntegerField(verbose_name='Usuarios en Común')),
+                ('juego', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vecinos', to='games.juego', verbose_name='Juego')),
+                ('vecino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='games.juego', verbose_name='Vecino')),
+            ],
+            options={
+                'verbose_name': 'Vecino de Juego',
+                'verbose_name_plural': 'Vecinos de Juegos',
+                'indexes': [models.Index(fields=['juego', '-similitud'], name='vecino_juego_similitud_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_juego_referencia'),
+        ('recomendaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JuegoSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField(verbose_name='Puntuación')),
+                ('juego', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='games.juego', verbose_name='Juego')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='games.juego', verbose_name='Similar')),
+            ],
+            options={
+                'verbose_name': 'Juego Similar',
+                'verbose_name_plural': 'Juegos Similares',
+                'indexes': [models.Index(fields=['juego', '-puntuacion', 'similar'], name='similar_juego_puntuacion_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,156 @@
+from django.db import models
+from django.db.models import Avg, F, Subquery, Sum
+from games.models import Juego
+from rankings.models import EntradaRanking
+from reviews.models import Reseña
+
+
+class VecinoJuegoQuerySet(models.QuerySet):
+    
+    def recomendar(self, usuario_id, n=10):
+        """
+        Juegos recomendados para un usuario en una sola consulta.
+
+        Cada reseña del usuario vota por los vecinos de su juego con
+        similitud × (puntuación − media del usuario): lo que le gustó más
+        que su media suma, lo que le gustó menos resta. Se descartan los
+        juegos que ya ha reseñado. Devuelve dicts con el juego y su puntuación
+        """
+        media = Subquery(
+            Reseña.objects.filter(usuario_id=usuario_id)
+            .order_by().values('usuario').annotate(media=Avg('puntuacion')).values('media')
+        )
+        return (
+            self.filter(juego__reseñas__usuario_id=usuario_id)
+            .exclude(vecino__reseñas__usuario_id=usuario_id)
+            .values('vecino', 'vecino__titulo', 'vecino__plataforma', 'vecino__puntuacion_promedio')
+            .annotate(puntuacion=Sum(F('similitud') * (F('juego__reseñas__puntuacion') - media)))
+            .filter(puntuacion__gt=0)
+            .order_by('-puntuacion', 'vecino')[:n]
+        )
+    
+    def _consultas_perfil(self, perfil, n):
+        """
+        Recomendaciones y, para quien aún no tiene (sin reseñas o sin vecinos
+        calculados), los mejor valorados de su plataforma favorita que no ha reseñado
+        """
+        plataformas = dict(Juego.PLATAFORMA_CHOICES)
+        alternativa = (
+            EntradaRanking.objects
+            .filter(tipo='valoracion', categoria=None,
+                    plataforma=perfil.plataforma_favorita if perfil.plataforma_favorita in plataformas else '')
+            .exclude(juego__reseñas__usuario_id=perfil.user_id)
+            .select_related('juego')
+            .order_by('-valor', 'juego_id')[:n]
+        )
+        return self.recomendar(perfil.user_id, n), alternativa
+    
+    @staticmethod
+    def _normalizar(recomendados, alternativa):
+        if recomendados:
+            return [
+                {'pk': r['vecino'], 'titulo': r['vecino__titulo'], 'plataforma': r['vecino__plataforma'],
+                 'puntuacion_promedio': r['vecino__puntuacion_promedio']}
+                for r in recomendados
+            ]
+        return [
+            {'pk': e.juego_id, 'titulo': e.juego.titulo, 'plataforma': e.juego.plataforma,
+             'puntuacion_promedio': e.juego.puntuacion_promedio}
+            for e in alternativa
+        ]
+    
+    def para_perfil(self, perfil, n=8):
+        """
+        Lista de dicts (pk, titulo, plataforma, puntuacion_promedio) para el
+        bloque «Recomendados para ti»: una consulta, o dos sin recomendaciones
+        """
+        recomendados, alternativa = self._consultas_perfil(perfil, n)
+        # La alternativa solo se consulta si no hay recomendaciones
+        return self._normalizar(list(recomendados), alternativa)
+    
+    async def apara_perfil(self, perfil, n=8):
+        """
+        Versión asíncrona de para_perfil()
+        """
+        recomendados, alternativa = self._consultas_perfil(perfil, n)
+        recomendados = [r async for r in recomendados]
+        if not recomendados:
+            alternativa = [e async for e in alternativa]
+        return self._normalizar(recomendados, alternativa)
+
+
+class VecinoJuego(models.Model):
+    """
+    Juego parecido a otro según quién los reseña y cómo: similitud coseno
+    entre sus columnas de la matriz de reseñas (centradas por usuario).
+    Se guardan los k vecinos más parecidos de cada juego; los calcula el
+    comando build_recommendations (recomendaciones/matriz.py)
+    """
+    juego = models.ForeignKey(
+        Juego,
+        on_delete=models.CASCADE,
+        related_name='vecinos',
+        verbose_name='Juego'
+    )
+    vecino = models.ForeignKey(
+        Juego,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Vecino'
+    )
+    similitud = models.FloatField(verbose_name='Similitud')
+    comunes = models.PositiveIntegerField(verbose_name='Usuarios en Común')
+    
+    objects = VecinoJuegoQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Vecino de Juego'
+        verbose_name_plural = 'Vecinos de Juegos'
+        indexes = [
+            models.Index(fields=['juego', '-similitud'], name='vecino_juego_similitud_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.juego_id} → {self.vecino_id} ({self.similitud:.3f})"
+
+
+class JuegoSimilarQuerySet(models.QuerySet):
+    
+    def para_juego(self, juego_id, n=6):
+        """
+        Los n juegos más parecidos: una lectura del índice (juego, -puntuacion, similar)
+        """
+        return self.filter(juego_id=juego_id).select_related('similar').order_by('-puntuacion', 'similar_id')[:n]
+
+
+class JuegoSimilar(models.Model):
+    """
+    Juego parecido a otro por categorías, plataforma, precio y reseñas
+    (recomendaciones/similares.py). Lo calcula build_similar_games y se
+    recalcula al cambiar las categorías, la plataforma o el precio
+    """
+    juego = models.ForeignKey(
+        Juego,
+        on_delete=models.CASCADE,
+        related_name='similares',
+        verbose_name='Juego'
+    )
+    similar = models.ForeignKey(
+        Juego,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Similar'
+    )
+    puntuacion = models.FloatField(verbose_name='Puntuación')
+    
+    objects = JuegoSimilarQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Juego Similar'
+        verbose_name_plural = 'Juegos Similares'
+        indexes = [
+            models.Index(fields=['juego', '-puntuacion', 'similar'], name='similar_juego_puntuacion_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.juego_id} ~ {self.similar_id} ({self.puntuacion:.3f})"
@@ -0,0 +1,74 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, m2m_changed
+from django.dispatch import receiver
+from games.models import Juego
+from .similares import actualizar_juego
+
+
+def actualizar_al_confirmar(juego_id):
+    """
+    Recalcular cuando termine la transacción (el formulario guarda las
+    categorías después del juego). Cada juego se encola una vez por
+    transacción: guardar el formulario envía post_save y varios m2m_changed
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        actualizar_juego(juego_id)
+        return
+    # run_on_commit se sustituye al confirmar o deshacer la transacción (o
+    # un savepoint): los pendientes de una lista anterior ya no cuentan
+    lista, pendientes = getattr(conexion, 'similares_pendientes', (None, None))
+    if lista is not conexion.run_on_commit:
+        pendientes = set()
+        conexion.similares_pendientes = (conexion.run_on_commit, pendientes)
+    if juego_id in pendientes:
+        return
+    pendientes.add(juego_id)
+    transaction.on_commit(partial(_actualizar_pendiente, juego_id, pendientes))
+
+
+def _actualizar_pendiente(juego_id, pendientes):
+    pendientes.discard(juego_id)
+    actualizar_juego(juego_id)
+
+
+@receiver(pre_save, sender=Juego)
+def recordar_juego(sender, instance, update_fields=None, **kwargs):
+    """
+    Plataforma y precio guardados: si no cambian no hay que recalcular
+    """
+    instance._similares_original = None
+    if instance.pk is None or (update_fields is not None and not {'plataforma', 'precio'} & set(update_fields)):
+        return
+    instance._similares_original = (
+        Juego.objects.filter(pk=instance.pk).values_list('plataforma', 'precio').first()
+    )
+
+
+@receiver(post_save, sender=Juego)
+def actualizar_similares_juego(sender, instance, created, **kwargs):
+    """
+    La plataforma y el precio cuentan en la similitud. Un juego nuevo se
+    calcula al recibir sus categorías
+    """
+    anterior = instance.__dict__.pop('_similares_original', None)
+    if created or anterior is None:
+        return
+    precio = Juego._meta.get_field('precio').to_python(instance.precio)
+    if anterior != (instance.plataforma, precio):
+        actualizar_al_confirmar(instance.pk)
+
+
+@receiver(m2m_changed, sender=Juego.categorias.through)
+def actualizar_similares_categorias(sender, instance, action, reverse, pk_set, **kwargs):
+    # En categoria.juegos.clear() no se sabe qué juegos tenía: queda
+    # para el siguiente build_similar_games. post_add y post_remove sin
+    # ids (categorías que ya tenía o no tenía) no cambian nada
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+    for juego_id in (pk_set or ()) if reverse else [instance.pk]:
+        actualizar_al_confirmar(juego_id)
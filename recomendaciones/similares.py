@@ -0,0 +1,286 @@
+"""
+Juegos similares (bloque de la ficha de cada juego).
+
+La similitud entre dos juegos combina:
+
+    categorías   índice de Jaccard entre sus conjuntos de categorías
+    plataforma   1 si coinciden
+    precio       precio menor / precio mayor
+    reseñas      similitud por reseñas de VecinoJuego (build_recommendations)
+
+Son candidatos los juegos con alguna categoría en común y los vecinos por
+reseñas. Para no comparar cada juego con todos, el catálogo se agrupa en
+cubetas (plataforma, conjunto de categorías) ordenadas por precio: las dos
+primeras componentes valen lo mismo para toda la cubeta, así que se
+recorren las cubetas de mayor a menor valor y, en cada una, los juegos de
+precio más cercano, parando cuando ni el mejor candidato restante podría
+entrar entre los k mejores.
+
+El comando build_similar_games lo calcula todo; recomendaciones/signals.py
+recalcula un juego cuando cambian sus categorías, plataforma o precio. En
+ese caso los candidatos sin reseñas en común se puntúan con SQL y solo
+vuelven los k mejores.
+"""
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf
+from games.models import Juego
+from playhub import cache
+from .matriz import insertar
+from .models import JuegoSimilar, VecinoJuego
+
+PESO_CATEGORIAS = 0.5
+PESO_PLATAFORMA = 0.2
+PESO_PRECIO = 0.15
+PESO_RESEÑAS = 0.15
+
+COLUMNAS = ['juego_id', 'similar_id', 'puntuacion']
+
+
+def proximidad_precio(a, b):
+    mayor = max(a, b)
+    return min(a, b) / mayor if mayor > 0 else 1.0
+
+
+def base(plataforma_a, categorias_a, plataforma_b, categorias_b):
+    """
+    Parte de la puntuación que no depende del precio ni de las reseñas
+    """
+    union = len(categorias_a | categorias_b)
+    jaccard = len(categorias_a & categorias_b) / union if union else 0.0
+    return PESO_CATEGORIAS * jaccard + PESO_PLATAFORMA * (plataforma_a == plataforma_b)
+
+
+class Catalogo:
+    """
+    Plataforma, precio y categorías de los juegos, agrupados en cubetas
+    """
+
+    def __init__(self):
+        self.datos = {}
+
+    @classmethod
+    def cargar(cls, juegos=None, tamaño_lote=5000):
+        """
+        Catálogo de los juegos de `juegos` (un queryset; por defecto, todos)
+        """
+        catalogo = cls()
+        categorias = defaultdict(set)
+        Through = Juego.categorias.through
+        if juegos is None:
+            juegos, relaciones = Juego.objects.all(), Through.objects.all()
+        else:
+            relaciones = Through.objects.filter(juego__in=juegos.values('pk'))
+        for juego_id, categoria_id in relaciones.values_list('juego_id', 'categoria_id').iterator(chunk_size=tamaño_lote):
+            categorias[juego_id].add(categoria_id)
+        filas = juegos.order_by().values_list('pk', 'plataforma', 'precio').iterator(chunk_size=tamaño_lote)
+        for juego_id, plataforma, precio in filas:
+            catalogo.datos[juego_id] = (plataforma, float(precio), frozenset(categorias.get(juego_id, ())))
+        catalogo.preparar()
+        return catalogo
+
+    def preparar(self):
+        cubetas = defaultdict(list)
+        for juego_id, (plataforma, precio, categorias) in self.datos.items():
+            cubetas[(plataforma, categorias)].append((precio, juego_id))
+        self.cubetas = {}
+        self.por_categoria = defaultdict(set)
+        for clave, juegos in cubetas.items():
+            juegos.sort()
+            self.cubetas[clave] = ([p for p, _ in juegos], [j for _, j in juegos])
+            for categoria_id in clave[1]:
+                self.por_categoria[categoria_id].add(clave)
+        self._ordenadas = {}
+
+    def cubetas_ordenadas(self, plataforma, categorias):
+        """
+        Cubetas que comparten alguna categoría, de mayor a menor base()
+        (compartido por todos los juegos de la misma cubeta)
+        """
+        clave = (plataforma, categorias)
+        if clave not in self._ordenadas:
+            candidatas = set().union(*(self.por_categoria.get(c, ()) for c in categorias))
+            self._ordenadas[clave] = sorted(
+                ((base(plataforma, categorias, p, c), (p, c)) for p, c in candidatas),
+                key=lambda fila: (-fila[0], fila[1][0], sorted(fila[1][1])),
+            )
+        return self._ordenadas[clave]
+
+    def puntuacion(self, juego_id, otro, similitud=0.0):
+        plataforma, precio, categorias = self.datos[juego_id]
+        otra_plataforma, otro_precio, otras_categorias = self.datos[otro]
+        return (
+            base(plataforma, categorias, otra_plataforma, otras_categorias)
+            + PESO_PRECIO * proximidad_precio(precio, otro_precio) + PESO_RESEÑAS * similitud
+        )
+
+    def similares(self, juego_id, vecinos_reseñas, k):
+        """
+        Los k juegos más parecidos: [(puntuación, similar_id)], de mayor a menor.
+        vecinos_reseñas es {vecino_id: similitud} de VecinoJuego
+        """
+        if juego_id not in self.datos:
+            return []
+        plataforma, precio, categorias = self.datos[juego_id]
+        # Montículo de (puntuación, -id): a igual puntuación gana el id menor
+        mejores = []
+
+        def proponer(puntuacion, otro):
+            elemento = (puntuacion, -otro)
+            if len(mejores) < k:
+                heapq.heappush(mejores, elemento)
+            elif elemento > mejores[0]:
+                heapq.heapreplace(mejores, elemento)
+
+        for otro, similitud in vecinos_reseñas.items():
+            if otro != juego_id and otro in self.datos:
+                proponer(self.puntuacion(juego_id, otro, similitud), otro)
+        # El resto de candidatos no tiene componente de reseñas
+        for valor_base, clave in self.cubetas_ordenadas(plataforma, categorias):
+            if len(mejores) >= k and valor_base + PESO_PRECIO < mejores[0][0]:
+                break
+            precios, ids = self.cubetas[clave]
+            for proximidad, otro in _mas_cercanos(precios, ids, precio):
+                if otro == juego_id or otro in vecinos_reseñas:
+                    continue
+                puntuacion = valor_base + PESO_PRECIO * proximidad
+                if len(mejores) >= k and puntuacion < mejores[0][0]:
+                    break
+                proponer(puntuacion, otro)
+        return [(puntuacion, -otro) for puntuacion, otro in sorted(mejores, reverse=True)]
+
+
+def _mas_cercanos(precios, ids, precio):
+    """
+    Juegos de una cubeta (ordenada por precio) de más a menos cercano en precio
+    """
+    derecha = bisect_left(precios, precio)
+    izquierda = derecha - 1
+    while izquierda >= 0 or derecha < len(precios):
+        por_izquierda = proximidad_precio(precio, precios[izquierda]) if izquierda >= 0 else -1
+        por_derecha = proximidad_precio(precio, precios[derecha]) if derecha < len(precios) else -1
+        if por_izquierda >= por_derecha:
+            yield por_izquierda, ids[izquierda]
+            izquierda -= 1
+        else:
+            yield por_derecha, ids[derecha]
+            derecha += 1
+
+
+def _vecinos_reseñas(filtro):
+    vecinos = defaultdict(dict)
+    for juego_id, vecino_id, similitud in (
+        VecinoJuego.objects.filter(filtro).values_list('juego_id', 'vecino_id', 'similitud').iterator(chunk_size=5000)
+    ):
+        vecinos[juego_id][vecino_id] = similitud
+    return vecinos
+
+
+def construir(k=12, tamaño_bloque=5000, progreso=None):
+    """
+    Calcular los similares de todo el catálogo por bloques de ids
+    consecutivos (una transacción por bloque). Devuelve el número de filas
+    """
+    catalogo = Catalogo.cargar()
+    ids = sorted(catalogo.datos)
+    guardados = 0
+    if not ids:
+        JuegoSimilar.objects.all().delete()
+    for inicio in range(0, len(ids), tamaño_bloque):
+        bloque = ids[inicio:inicio + tamaño_bloque]
+        siguiente = ids[inicio + tamaño_bloque] if inicio + tamaño_bloque < len(ids) else None
+        rango = Q() if inicio == 0 else Q(juego_id__gte=bloque[0])
+        if siguiente is not None:
+            rango &= Q(juego_id__lt=siguiente)
+        vecinos = _vecinos_reseñas(rango)
+        filas = [
+            (juego_id, otro, puntuacion)
+            for juego_id in bloque
+            for puntuacion, otro in catalogo.similares(juego_id, vecinos.get(juego_id, {}), k)
+        ]
+        with transaction.atomic():
+            JuegoSimilar.objects.filter(rango).delete()
+            insertar(JuegoSimilar, COLUMNAS, filas)
+        guardados += len(filas)
+        if progreso:
+            progreso(inicio + len(bloque), len(ids), guardados)
+    cache.invalidar('similares')
+    return guardados
+
+
+def _mejores_sin_reseñas(plataforma, precio, categorias, excluidos, k):
+    """
+    Los k mejores candidatos que comparten categoría, sin componente de
+    reseñas: [(puntuación, id)]. Se puntúan en la base de datos con la misma
+    fórmula que base() y proximidad_precio() para no cargar todos en Python
+    """
+    if not categorias:
+        return []
+    Through = Juego.categorias.through
+    compartidas = Count('categorias', filter=Q(categorias__in=categorias))
+    jaccard = Cast(compartidas, FloatField()) / (Count('categorias') + len(categorias) - compartidas)
+    otro_precio = Cast('precio', FloatField())
+    mayor = Greatest(otro_precio, Value(precio))
+    proximidad = Coalesce(Least(otro_precio, Value(precio)) / NullIf(mayor, Value(0.0)), Value(1.0))
+    misma_plataforma = Case(When(plataforma=plataforma, then=Value(1.0)), default=Value(0.0))
+    return list(
+        Juego.objects
+        .filter(pk__in=Through.objects.filter(categoria_id__in=categorias).values('juego_id'))
+        .exclude(pk__in=excluidos)
+        .annotate(puntuacion=ExpressionWrapper(
+            PESO_CATEGORIAS * jaccard + PESO_PLATAFORMA * misma_plataforma + PESO_PRECIO * proximidad,
+            output_field=FloatField(),
+        ))
+        .order_by('-puntuacion', 'pk')
+        .values_list('puntuacion', 'pk')[:k]
+    )
+
+
+def actualizar_juego(juego_id, k=12):
+    """
+    Recalcular los similares de un juego tras cambiar sus categorías,
+    plataforma o precio. También se actualiza su puntuación en las listas
+    de otros juegos donde ya aparece; que entre en listas nuevas queda
+    para el siguiente build_similar_games
+    """
+    vecinos = _vecinos_reseñas(Q(juego_id=juego_id))[juego_id]
+    inversos = list(JuegoSimilar.objects.filter(similar_id=juego_id))
+    # Solo se cargan el juego, sus vecinos por reseñas y los juegos en cuya
+    # lista aparece; el resto de candidatos se puntúa en la base de datos
+    catalogo = Catalogo.cargar(Juego.objects.filter(
+        Q(pk=juego_id) | Q(pk__in=list(vecinos)) | Q(pk__in=[fila.juego_id for fila in inversos])
+    ))
+    if juego_id not in catalogo.datos:
+        return
+    plataforma, precio, categorias = catalogo.datos[juego_id]
+    candidatos = {
+        otro: puntuacion
+        for puntuacion, otro in _mejores_sin_reseñas(
+            plataforma, precio, sorted(categorias), [juego_id, *vecinos], k,
+        )
+    }
+    for otro, similitud in vecinos.items():
+        if otro in catalogo.datos:
+            candidatos[otro] = catalogo.puntuacion(juego_id, otro, similitud)
+    filas = [
+        (juego_id, otro, puntuacion)
+        for otro, puntuacion in heapq.nsmallest(k, candidatos.items(), key=lambda c: (-c[1], c[0]))
+    ]
+    if inversos:
+        similitudes = _vecinos_reseñas(
+            Q(juego_id__in=[fila.juego_id for fila in inversos], vecino_id=juego_id)
+        )
+        for fila in inversos:
+            fila.puntuacion = catalogo.puntuacion(
+                fila.juego_id, juego_id, similitudes[fila.juego_id].get(juego_id, 0.0)
+            )
+    with transaction.atomic():
+        JuegoSimilar.objects.filter(juego_id=juego_id).delete()
+        insertar(JuegoSimilar, COLUMNAS, filas)
+        if inversos:
+            JuegoSimilar.objects.bulk_update(inversos, ['puntuacion'])
+    cache.invalidar('similares')
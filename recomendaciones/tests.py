@@ -0,0 +1,183 @@
+import math
+from datetime import date
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from games.forms import JuegoForm
+from games.models import Categoria, Juego
+from playhub.testing import PresupuestoConsultasTestCase
+from reviews.models import Reseña
+from reviews.views import PerfilUsuarioDetailAsyncView
+from . import matriz, signals, similares
+from .models import JuegoSimilar, VecinoJuego
+
+COMENTARIO = 'Comentario de prueba lo bastante largo para pasar la validación.'
+
+
+class VecinosTests(PresupuestoConsultasTestCase):
+    """
+    Similitudes calculadas por bloques y recomendaciones del perfil
+    """
+    
+    def crear_matriz_pequeña(self):
+        """
+        Cuatro usuarios que puntúan igual A y B, y al revés C
+        """
+        self.a, self.b, self.c = [
+            Juego.objects.create(titulo=t, plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+            for t in ('A', 'B', 'C')
+        ]
+        puntuaciones = [(9, 8, 2), (8, 9, 3), (3, 2, 9), (2, 3, 8)]
+        for i, fila in enumerate(puntuaciones):
+            usuario = User.objects.create_user(f'critico{i}')
+            for juego, puntuacion in zip((self.a, self.b, self.c), fila):
+                Reseña.objects.create(juego=juego, usuario=usuario, puntuacion=puntuacion, comentario=COMENTARIO)
+        return puntuaciones
+    
+    def test_similitud(self):
+        puntuaciones = self.crear_matriz_pequeña()
+        Juego.objects.exclude(pk__in=[self.a.pk, self.b.pk, self.c.pk]).delete()
+        matriz.construir(k=5, tamaño_bloque=2, min_comunes=1, encogimiento=0)
+
+        centradas = [[p - sum(fila) / 3 for p in fila] for fila in puntuaciones]
+        columna_a, columna_b = [f[0] for f in centradas], [f[1] for f in centradas]
+        coseno = sum(x * y for x, y in zip(columna_a, columna_b)) / (
+            math.hypot(*columna_a) * math.hypot(*columna_b)
+        )
+        vecino = VecinoJuego.objects.get(juego=self.a)
+        self.assertEqual(vecino.vecino_id, self.b.pk)
+        self.assertAlmostEqual(vecino.similitud, coseno, places=5)
+        self.assertEqual(vecino.comunes, 4)
+        # Similitud negativa con C: no es vecino de nadie
+        self.assertFalse(VecinoJuego.objects.filter(vecino=self.c).exists())
+
+        # A un nuevo usuario al que le gusta A se le recomienda B
+        fan = User.objects.create_user('fan')
+        Reseña.objects.create(juego=self.a, usuario=fan, puntuacion=10, comentario=COMENTARIO)
+        Reseña.objects.create(juego=self.c, usuario=fan, puntuacion=4, comentario=COMENTARIO)
+        recomendados = VecinoJuego.objects.para_perfil(fan.perfil)
+        self.assertEqual([r['pk'] for r in recomendados], [self.b.pk])
+    
+    def test_muestreo(self):
+        # Usuario 1 con 7 reseñas y máximo 3: posiciones int(i * 7 / 3) = 0, 2, 4.
+        # El 2 solo tiene una reseña útil y el juego 99 no está en la matriz
+        usuarios = np.array([1] * 7 + [2, 2, 3, 3])
+        juegos = np.array([10, 11, 12, 13, 14, 15, 16, 10, 11, 10, 99])
+        puntuaciones = np.array([9, 1, 7, 1, 2, 1, 1, 5, 5, 8, 4])
+        resultado = matriz.MatrizValoraciones.desde_reseñas(
+            np.arange(10, 17), usuarios, juegos, puntuaciones, max_por_usuario=3,
+        )
+        self.assertEqual(resultado.usuarios, 1)
+        self.assertEqual(resultado.por_usuario.toarray().tolist(), [[3, 0, 1, 0, -4, 0, 0]])
+        vacia = matriz.MatrizValoraciones.desde_reseñas(np.arange(3), *[np.array([], dtype=np.int64)] * 3, 3)
+        self.assertEqual((vacia.usuarios, vacia.reseñas), (0, 0))
+        self.assertEqual(vacia.vecinos_bloque(0, 3, 5, 1, 0), [(0, []), (1, []), (2, [])])
+    
+    def test_tiempo_maximo(self):
+        matriz.construir(tamaño_bloque=20)
+        completo = list(VecinoJuego.objects.order_by('juego_id', 'vecino_id').values_list('juego_id', 'vecino_id', 'similitud', 'comunes'))
+        self.assertTrue(completo)
+        VecinoJuego.objects.all().delete()
+        # Agotado el tiempo se hace solo el primer bloque
+        resultado, _ = matriz.construir(tamaño_bloque=20, tiempo_maximo=0)
+        self.assertEqual(resultado.siguiente_id, resultado.juego_ids[20])
+        self.assertFalse(VecinoJuego.objects.filter(juego_id__gte=resultado.siguiente_id).exists())
+        resultado, _ = matriz.construir(tamaño_bloque=20, desde_id=resultado.siguiente_id)
+        self.assertIsNone(resultado.siguiente_id)
+        self.assertEqual(list(VecinoJuego.objects.order_by('juego_id', 'vecino_id').values_list('juego_id', 'vecino_id', 'similitud', 'comunes')), completo)
+    
+    def test_presupuesto_perfil(self):
+        matriz.construir()
+        self.assertTrue(VecinoJuego.objects.exists())
+        usuario = User.objects.get(username='usuario1')
+        url = reverse('reviews:perfil_detail', args=[usuario.pk])
+        # sesión + usuario + perfil + reseñas + categorías + recomendaciones
+        response = self.assertPresupuestoConsultas(url, 6, usuario)
+        recomendados = response.context['recomendados']
+        self.assertTrue(recomendados)
+        reseñados = set(Reseña.objects.filter(usuario=usuario).values_list('juego_id', flat=True))
+        self.assertFalse(reseñados & {r['pk'] for r in recomendados})
+
+        request = AsyncRequestFactory().get(url)
+        request.user = usuario
+        response = async_to_sync(PerfilUsuarioDetailAsyncView.as_view())(request, pk=usuario.pk)
+        self.assertEqual(response.context_data['recomendados'], recomendados)
+
+
+class SimilaresTests(PresupuestoConsultasTestCase):
+    """
+    Juegos similares: cálculo completo, recálculo de un juego y ficha
+    """
+    
+    def similares_de(self, juego_id):
+        return list(
+            JuegoSimilar.objects.filter(juego_id=juego_id)
+            .order_by('-puntuacion', 'similar_id').values_list('similar_id', 'puntuacion')
+        )
+    
+    def test_recalculo_igual_que_completo(self):
+        matriz.construir()
+        similares.construir(tamaño_bloque=40)
+        juego = Juego.objects.order_by('pk')[3]
+        with self.captureOnCommitCallbacks(execute=True):
+            juego.categorias.set(Categoria.objects.order_by('pk')[:3])
+        # Recalculado al confirmarse el cambio de categorías (recomendaciones/signals.py)
+        recalculado = self.similares_de(juego.pk)
+        inversos = dict(JuegoSimilar.objects.filter(similar=juego).values_list('juego_id', 'puntuacion'))
+        similares.construir(tamaño_bloque=40)
+        self.assertEqual(self.similares_de(juego.pk), recalculado)
+        # Las listas de otros juegos conservan su puntuación (si aún lo incluyen)
+        for juego_id, puntuacion in JuegoSimilar.objects.filter(similar=juego).values_list('juego_id', 'puntuacion'):
+            if juego_id in inversos:
+                self.assertAlmostEqual(inversos[juego_id], puntuacion, places=12)
+    
+    def recalculos(self, callbacks):
+        return [c.args[0] for c in callbacks if getattr(c, 'func', None) is signals._actualizar_pendiente]
+    
+    def guardar_formulario(self, juego, **cambios):
+        datos = {
+            'titulo': juego.titulo,
+            'plataforma': juego.plataforma,
+            'precio': juego.precio,
+            'fecha_lanzamiento': juego.fecha_lanzamiento,
+            'categorias': list(juego.categorias.values_list('pk', flat=True)),
+            **cambios,
+        }
+        form = JuegoForm(datos, instance=juego)
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                form.save()
+        return self.recalculos(callbacks)
+    
+    def test_recalculo_una_vez_por_transaccion(self):
+        juego = Juego.objects.order_by('pk')[3]
+        otras = Categoria.objects.exclude(juegos=juego).order_by('pk')[:2]
+        # post_save, post_remove y post_add del mismo formulario: un solo recálculo
+        self.assertEqual(
+            self.guardar_formulario(juego, precio=juego.precio + 1, categorias=[c.pk for c in otras]),
+            [juego.pk],
+        )
+        # Sin cambios en plataforma, precio ni categorías no se recalcula
+        self.assertEqual(self.guardar_formulario(juego, titulo='Otro título'), [])
+        # Deshecha la transacción, el siguiente cambio vuelve a encolarse
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                juego.categorias.add(Categoria.objects.exclude(juegos=juego).first())
+                raise ValueError
+            with transaction.atomic():
+                juego.categorias.remove(otras[0])
+        self.assertEqual(self.recalculos(callbacks), [juego.pk])
+    
+    def test_presupuesto_detalle(self):
+        similares.construir()
+        juego = Juego.objects.order_by('pk').first()
+        url = reverse('games:juego_detail', args=[juego.pk])
+        response = self.assertPresupuestoConsultas(url, 4)
+        self.assertContains(response, 'Juegos similares')
+        self.assertEqual(len(response.context['similares']), 6)
+        self.assertNotIn(juego.pk, [fila.similar_id for fila in response.context['similares']])
@@ -1,18 +1,61 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef, Q
+from games import busqueda
+from games.models import Juego
+from playhub.admin import TablaGrandeAdminMixin, prefijo
 from .models import Reseña, PerfilUsuario
 
 
+class PuntuacionFilter(admin.SimpleListFilter):
+    """
+    Opciones fijas (1-10) en lugar del SELECT DISTINCT de AllValuesFieldListFilter
+    """
+    title = 'puntuación'
+    parameter_name = 'puntuacion'
+    
+    def lookups(self, request, model_admin):
+        return [(str(i), str(i)) for i in range(1, 11)]
+    
+    def queryset(self, request, queryset):
+        if self.value() in {str(i) for i in range(1, 11)}:
+            return queryset.filter(puntuacion=int(self.value()))
+        return queryset
+
+
+class PlataformaJuegoFilter(admin.SimpleListFilter):
+    """
+    Plataforma del juego con EXISTS en lugar de JOIN: SQLite recorre las
+    reseñas por el índice de fecha (el orden del changelist) y se detiene
+    al llenar la página, en vez de ordenar todas las reseñas de la plataforma
+    """
+    title = 'plataforma del juego'
+    parameter_name = 'plataforma'
+    
+    def lookups(self, request, model_admin):
+        return Juego.PLATAFORMA_CHOICES
+    
+    def queryset(self, request, queryset):
+        if self.value() in dict(Juego.PLATAFORMA_CHOICES):
+            return queryset.filter(Exists(
+                Juego.objects.filter(pk=OuterRef('juego_id'), plataforma=self.value())
+            ))
+        return queryset
+
+
 @admin.register(Reseña)
-class ReseñaAdmin(admin.ModelAdmin):
+class ReseñaAdmin(TablaGrandeAdminMixin, admin.ModelAdmin):
     """
     Configuración del panel de administración para Reseñas
     FASE B: Ahora muestra ForeignKey a Juego y Usuario
     """
     list_display = ('get_juego', 'get_usuario', 'puntuacion', 'fecha')
-    search_fields = ('juego__titulo', 'usuario__username', 'comentario')
-    list_filter = ('puntuacion', 'fecha', 'juego__plataforma')
+    search_fields = ('juego__titulo', 'usuario__username')
+    search_help_text = 'Título del juego, principio del nombre de usuario o palabras del comentario'
+    list_filter = (PuntuacionFilter, 'fecha', PlataformaJuegoFilter)
+    list_select_related = ('juego', 'usuario')
+    autocomplete_fields = ('juego', 'usuario')
     ordering = ('-fecha',)
     readonly_fields = ('fecha',)
     
@@ -36,6 +79,22 @@ class ReseñaAdmin(admin.ModelAdmin):
     get_juego.short_description = 'Juego'
     get_juego.admin_order_field = 'juego__titulo'
     
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Juegos por el índice FTS5 del título, usuarios por el índice de
+        username (prefijo) y comentarios por su índice FTS5 (las
+        coincidencias más nuevas, ver reviews/busqueda.py), en lugar de
+        LIKE %x% sobre tres tablas
+        """
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        condicion = Q(usuario__in=User.objects.filter(prefijo('username', termino)))
+        if busqueda.consulta_fts(termino):
+            condicion |= Q(juego__in=Juego.objects.buscar(termino))
+            condicion |= Q(pk__in=Reseña.objects.ids_busqueda(termino))
+        return queryset.filter(condicion), False
+    
     def get_usuario(self, obj):
         """
         Mostrar nombre del usuario
@@ -46,13 +105,16 @@ class ReseñaAdmin(admin.ModelAdmin):
 
 
 @admin.register(PerfilUsuario)
-class PerfilUsuarioAdmin(admin.ModelAdmin):
+class PerfilUsuarioAdmin(TablaGrandeAdminMixin, admin.ModelAdmin):
     """
     Configuración del panel de administración para Perfiles de Usuario
     """
     list_display = ('get_username', 'plataforma_favorita')
-    search_fields = ('user__username', 'bio')
+    search_fields = ('user__username',)
+    search_help_text = 'Principio del nombre de usuario'
     list_filter = ('plataforma_favorita',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     ordering = ('user__username',)
     
     fieldsets = (
@@ -71,6 +133,14 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
         return obj.user.username
     get_username.short_description = 'Usuario'
     get_username.admin_order_field = 'user__username'
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Principio del nombre de usuario, por el índice de username
+        """
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(user__in=User.objects.filter(prefijo('username', search_term.strip()))), False
 
 
 # Inline para mostrar el perfil en el admin de User
@@ -86,11 +156,21 @@ class PerfilUsuarioInline(admin.StackedInline):
 
 
 # Extender el UserAdmin para incluir el perfil
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(TablaGrandeAdminMixin, BaseUserAdmin):
     """
     Admin personalizado para User que incluye el perfil inline
+    Su búsqueda sirve también al autocompletado de reseñas y perfiles
     """
     inlines = (PerfilUsuarioInline,)
+    search_help_text = 'Principio del nombre de usuario'
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Principio del nombre de usuario, por el índice único de username
+        """
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(prefijo('username', search_term.strip())), False
 
 
 # Desregistrar el UserAdmin original y registrar el personalizado
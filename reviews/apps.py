@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReviewsConfig(AppConfig):
@@ -8,6 +9,8 @@ class ReviewsConfig(AppConfig):
     
     def ready(self):
         """
-        Importar signals cuando la app esté lista
+        Importar signals y mantener el índice de búsqueda FTS5 tras cada migración
         """
         import reviews.signals
+        from .busqueda import instalar_fts_post_migrate
+        post_migrate.connect(instalar_fts_post_migrate, sender=self)
@@ -0,0 +1,223 @@
+"""
+Búsqueda de texto completo sobre Reseña.comentario.
+
+Como en games/busqueda.py, en SQLite se usa una tabla virtual FTS5 de
+contenido externo (`reviews_reseña_fts`) sincronizada con `reviews_reseña`
+mediante triggers: la alimentan igual save(), bulk_create, la cola de
+reseñas en diferido y los UPDATE masivos. En otros motores se recurre a
+`icontains` y los fragmentos se recortan en Python.
+
+El coste no depende del tamaño de la tabla:
+
+- Se buscan palabras completas (sin mayúsculas ni acentos), no prefijos:
+  un prefijo corto ("e"*) expande cientos de términos en cada consulta
+- Una palabra frecuente puede aparecer en millones de reseñas. Solo se
+  toman las VENTANA coincidencias más nuevas (FTS5 recorre el índice en
+  orden de rowid descendente y se detiene al llenarla) y se ordenan por
+  relevancia en Python (relevancia()). bm25() no sirve: calcula su IDF
+  contando todas las filas que contienen cada palabra
+- Con un juego elegido se parte de sus reseñas y cada una se busca en el
+  índice por rowid, en lugar de filtrar todas las coincidencias
+"""
+import json
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import connections
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from games.busqueda import instalar_indice, usa_fts
+
+TABLA_FTS = 'reviews_reseña_fts'
+
+# Coincidencias que se ordenan por relevancia (y resultados navegables)
+VENTANA = 1000
+# Parámetros de BM25: saturación de la frecuencia y peso de la longitud
+K1, B = 1.2, 0.75
+# Palabras de contexto en cada fragmento
+PALABRAS_FRAGMENTO = 24
+
+PALABRA = re.compile(r'\w+')
+# Marcas diacríticas combinables, separadas de su letra con NFD ("á" -> "a" + "´")
+DIACRITICO = re.compile('[\u0300-\u036f]')
+
+# Marcas de coincidencia en los fragmentos: no aparecen en el texto de
+# una reseña, así que se puede escapar el resto y cambiarlas por <mark>
+INICIO, FIN = '\x02', '\x03'
+
+SQL_TABLA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+    comentario,
+    content='reviews_reseña',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+SQL_TRIGGERS = {
+    f'{TABLA_FTS}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON reviews_reseña BEGIN
+            INSERT INTO {TABLA_FTS}(rowid, comentario) VALUES (new.id, new.comentario);
+        END
+    """,
+    f'{TABLA_FTS}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON reviews_reseña BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, comentario) VALUES ('delete', old.id, old.comentario);
+        END
+    """,
+    f'{TABLA_FTS}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF comentario ON reviews_reseña BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, comentario) VALUES ('delete', old.id, old.comentario);
+            INSERT INTO {TABLA_FTS}(rowid, comentario) VALUES (new.id, new.comentario);
+        END
+    """,
+}
+
+
+def instalar_fts(using='default'):
+    """
+    Índice de los comentarios de las reseñas (ver games.busqueda.instalar_indice)
+    """
+    instalar_indice(using, TABLA_FTS, SQL_TABLA, SQL_TRIGGERS)
+
+
+def instalar_fts_post_migrate(sender, using='default', **kwargs):
+    """
+    Receptor de post_migrate (ver ReviewsConfig.ready)
+    """
+    instalar_fts(using)
+
+
+def normalizar(texto):
+    """
+    Minúsculas y sin diacríticos, como el tokenizador del índice
+    (unicode61 remove_diacritics 2)
+    """
+    return DIACRITICO.sub('', unicodedata.normalize('NFD', texto.lower()))
+
+
+def palabras(texto):
+    """
+    Palabras normalizadas y sin repetir del texto buscado
+    """
+    return list(dict.fromkeys(PALABRA.findall(normalizar(texto or ''))))
+
+
+def consulta_fts(texto):
+    """
+    Consulta MATCH segura: todas las palabras, completas y citadas
+    """
+    return ' '.join(f'"{palabra}"' for palabra in palabras(texto))
+
+
+def coincidencias(consulta, juego=None, plataforma=None, puntuacion_min=None, using='default'):
+    """
+    (id, comentario) de las VENTANA reseñas más nuevas que coinciden con la
+    consulta MATCH y cumplen los filtros
+    """
+    condiciones, params = [f'{TABLA_FTS} MATCH %s'], [consulta]
+    if plataforma:
+        condiciones.append('EXISTS (SELECT 1 FROM games_juego j WHERE j.id = r.juego_id AND j.plataforma = %s)')
+        params.append(plataforma)
+    if puntuacion_min:
+        condiciones.append('r.puntuacion >= %s')
+        params.append(puntuacion_min)
+    if juego:
+        # CROSS JOIN fija el orden: primero las reseñas del juego (índice), y
+        # cada una se comprueba en el índice FTS por rowid
+        origen = f'reviews_reseña r CROSS JOIN {TABLA_FTS}'
+        condiciones += ['r.juego_id = %s', f'{TABLA_FTS}.rowid = r.id']
+        params.append(juego)
+    else:
+        origen = f'{TABLA_FTS} JOIN reviews_reseña r ON r.id = {TABLA_FTS}.rowid'
+    sql = f"""
+        SELECT r.id, r.comentario
+        FROM {origen}
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY {TABLA_FTS}.rowid DESC
+        LIMIT {VENTANA}
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def relevancia(filas, buscadas):
+    """
+    Ids de las filas (id, comentario) de más a menos relevante: BM25 sin el
+    factor IDF, que solo pondera unas palabras buscadas frente a otras
+    (todas las filas las contienen todas). Cuentan las veces que aparece
+    cada palabra, con rendimiento decreciente, y penaliza los comentarios
+    largos. A igual relevancia, primero la más nueva
+    """
+    if not filas:
+        return []
+    patron = re.compile(r'\b(?:' + '|'.join(map(re.escape, buscadas)) + r')\b')
+    longitudes, frecuencias = {}, {}
+    for pk, comentario in filas:
+        longitudes[pk] = comentario.count(' ') + 1
+        frecuencias[pk] = Counter(patron.findall(normalizar(comentario)))
+    media = sum(longitudes.values()) / len(longitudes) or 1
+    puntos = {}
+    for pk, cuenta in frecuencias.items():
+        norma = K1 * (1 - B + B * longitudes[pk] / media)
+        puntos[pk] = sum(f * (K1 + 1) / (f + norma) for f in cuenta.values())
+    return sorted(puntos, key=lambda pk: (-puntos[pk], -pk))
+
+
+def fragmentos_fts(consulta, ids, using='default'):
+    """
+    {id: fragmento con marcas} de las reseñas indicadas, cada una buscada
+    en el índice por rowid
+    """
+    sql = f"""
+        SELECT {TABLA_FTS}.rowid, snippet({TABLA_FTS}, 0, %s, %s, '…', {PALABRAS_FRAGMENTO})
+        FROM json_each(%s) AS v CROSS JOIN {TABLA_FTS}
+        WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = v.value
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [INICIO, FIN, json.dumps(list(ids)), consulta])
+        return dict(cursor.fetchall())
+
+
+def fragmento_local(texto, buscadas):
+    """
+    Fragmento con marcas sin índice FTS: PALABRAS_FRAGMENTO palabras
+    alrededor de la primera que coincide con alguna de `buscadas`
+    """
+    tokens = texto.split()
+    coincide = [bool(set(palabras(token)) & set(buscadas)) for token in tokens]
+    primera = coincide.index(True) if True in coincide else 0
+    inicio = max(0, primera - PALABRAS_FRAGMENTO // 2)
+    trozo = ' '.join(
+        f'{INICIO}{token}{FIN}' if marcado else token
+        for token, marcado in zip(tokens[inicio:inicio + PALABRAS_FRAGMENTO], coincide[inicio:])
+    )
+    return ('…' if inicio else '') + trozo + ('…' if inicio + PALABRAS_FRAGMENTO < len(tokens) else '')
+
+
+def marcar(fragmento):
+    """
+    HTML seguro del fragmento: el texto escapado y las coincidencias en <mark>
+    """
+    return mark_safe(escape(fragmento).replace(INICIO, '<mark>').replace(FIN, '</mark>'))
+
+
+def fragmentos(texto, reseñas):
+    """
+    Asignar a cada reseña `fragmento`: el trozo de su comentario con las
+    palabras de `texto` marcadas (HTML seguro). Una consulta para todas
+    """
+    buscadas = palabras(texto)
+    if not buscadas or not reseñas:
+        return reseñas
+    using = reseñas[0]._state.db
+    crudos = {}
+    if usa_fts(using):
+        crudos = fragmentos_fts(consulta_fts(texto), [reseña.pk for reseña in reseñas], using)
+    for reseña in reseñas:
+        # Sin índice, o si el comentario cambió entre las dos consultas
+        crudo = crudos.get(reseña.pk) or fragmento_local(reseña.comentario, buscadas)
+        reseña.fragmento = marcar(crudo)
+    return reseñas
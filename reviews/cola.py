@@ -0,0 +1,209 @@
+"""
+Reseñas en diferido para picos de carga (settings.RESEÑAS_DIFERIDAS).
+
+En SQLite cada reseña publicada es una transacción de escritura con el
+cerrojo de toda la base de datos: con miles de envíos en pocos minutos las
+peticiones esperan unas a otras y acaban en "database is locked". En modo
+diferido ReseñaCreateView valida el formulario y deja la reseña en una cola
+en disco, sin escribir en la base de datos:
+
+    <RESEÑAS_COLA_DIR>/pendientes/<hora en ns>-<uuid>.json   una por reseña
+    <RESEÑAS_COLA_DIR>/avisos/<usuario_id>/<mismo nombre>    rechazos
+
+Cada fichero se escribe en uno temporal que se sincroniza y se renombra,
+así que nunca queda a medias. El comando flush_reviews vuelca las
+pendientes en orden de llegada, por lotes y una transacción por lote:
+
+- La unicidad (juego, usuario) se comprueba al volcar, contra la base de
+  datos y dentro del lote, en la misma transacción que el INSERT. Las
+  rechazadas dejan un aviso que middleware.avisos muestra al usuario en
+  su siguiente petición
+- Una reseña publicada a la vez por otra vía (formulario, admin) entre la
+  lectura y el INSERT no rompe el lote: se inserta con ignore_conflicts y
+  las que no se han guardado se rechazan igual que las repetidas
+- La fecha de cada reseña es la del envío, no la del volcado
+- Las valoraciones de Juego se ajustan con un UPDATE por juego y lote, y
+  las estadísticas de los perfiles con uno por usuario y lote
+- Las versiones de caché se invalidan una vez por juego y lote, y la signal
+  reseñas_volcadas avisa de los juegos afectados (bulk_create no envía post_save)
+
+Los ficheros se borran después del COMMIT. Si el proceso muere entre ambos,
+el siguiente volcado encuentra las reseñas ya guardadas (mismo usuario,
+juego, puntuación y comentario) y las descarta sin aviso, igual que un
+doble envío del formulario.
+"""
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from games.models import Juego
+from playhub import cache
+from .models import LOTE_RECALCULO, Reseña, ajustar_estadisticas
+
+# Enviada dentro de la transacción de cada lote con juego_ids (conjunto) y
+# reseñas (las guardadas, con juego_id y puntuacion)
+reseñas_volcadas = Signal()
+
+
+def directorio():
+    return Path(settings.RESEÑAS_COLA_DIR)
+
+
+def _escribir(ruta, datos):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'.{ruta.name}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _leer(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _nombres(carpeta):
+    try:
+        return sorted(n for n in os.listdir(carpeta) if n.endswith('.json') and not n.startswith('.'))
+    except FileNotFoundError:
+        return []
+
+
+def _aviso_repetida(titulo):
+    return f'Ya habías reseñado «{titulo}»; no se ha publicado la nueva reseña.'
+
+
+def encolar(reseña):
+    """
+    Guardar en la cola una reseña ya validada (con juego y usuario asignados)
+    """
+    nombre = f'{time.time_ns():020d}-{uuid.uuid4().hex}.json'
+    _escribir(directorio() / 'pendientes' / nombre, {
+        'juego_id': reseña.juego_id,
+        'usuario_id': reseña.usuario_id,
+        'puntuacion': reseña.puntuacion,
+        'comentario': reseña.comentario,
+        'fecha': timezone.now().isoformat(),
+    })
+
+
+def pendientes():
+    return len(_nombres(directorio() / 'pendientes'))
+
+
+def volcar_lote(tamaño_lote=LOTE_RECALCULO):
+    """
+    Guardar hasta tamaño_lote reseñas de la cola en una transacción.
+    Devuelve (guardadas, rechazadas), o None si la cola está vacía
+    """
+    carpeta = directorio() / 'pendientes'
+    nombres = _nombres(carpeta)[:tamaño_lote]
+    if not nombres:
+        return None
+    entradas = [(nombre, _leer(carpeta / nombre)) for nombre in nombres]
+    juego_ids = {e['juego_id'] for _, e in entradas}
+    usuario_ids = {e['usuario_id'] for _, e in entradas}
+
+    # Lecturas e INSERT en la misma transacción: con el perfil de producción
+    # (transacciones IMMEDIATE) nadie escribe entre ambos
+    with transaction.atomic():
+        titulos = dict(Juego.objects.filter(pk__in=juego_ids).values_list('pk', 'titulo'))
+        usuarios = set(User.objects.filter(pk__in=usuario_ids).values_list('pk', flat=True))
+        existentes = {
+            (usuario_id, juego_id): (puntuacion, comentario)
+            for usuario_id, juego_id, puntuacion, comentario in Reseña.objects.filter(
+                usuario_id__in=usuarios, juego_id__in=titulos,
+            ).values_list('usuario_id', 'juego_id', 'puntuacion', 'comentario')
+        }
+
+        nuevas, avisos, en_lote = [], [], {}
+        for nombre, e in entradas:
+            clave = (e['usuario_id'], e['juego_id'])
+            if e['usuario_id'] not in usuarios:
+                continue
+            if e['juego_id'] not in titulos:
+                avisos.append((
+                    nombre, e['usuario_id'], 'El juego que reseñaste ya no existe; no se ha publicado tu reseña.',
+                ))
+                continue
+            contenido = (e['puntuacion'], e['comentario'])
+            anterior = existentes.get(clave) or en_lote.get(clave)
+            if anterior == contenido:
+                # Doble envío, o un volcado anterior que no llegó a borrar el fichero
+                continue
+            if anterior is not None:
+                avisos.append((nombre, e['usuario_id'], _aviso_repetida(titulos[e['juego_id']])))
+                continue
+            en_lote[clave] = contenido
+            nuevas.append((nombre, Reseña(
+                juego_id=e['juego_id'], usuario_id=e['usuario_id'],
+                puntuacion=e['puntuacion'], comentario=e['comentario'],
+                # Las entradas anteriores a guardar la hora del envío no la tienen
+                fecha=datetime.fromisoformat(e['fecha']) if 'fecha' in e else timezone.now(),
+            )))
+
+        Reseña.objects.bulk_create([reseña for _, reseña in nuevas], recalcular=False, ignore_conflicts=True)
+        if nuevas:
+            # Sin el cerrojo (otros motores, perfil por defecto) otra petición
+            # pudo publicar antes la misma (juego, usuario): esas no son nuestras
+            guardadas = {
+                (usuario_id, juego_id): fecha
+                for usuario_id, juego_id, fecha in Reseña.objects.filter(
+                    usuario_id__in={r.usuario_id for _, r in nuevas}, juego_id__in={r.juego_id for _, r in nuevas},
+                ).values_list('usuario_id', 'juego_id', 'fecha')
+            }
+            propias = []
+            for nombre, reseña in nuevas:
+                if guardadas.get((reseña.usuario_id, reseña.juego_id)) == reseña.fecha:
+                    propias.append(reseña)
+                else:
+                    avisos.append((nombre, reseña.usuario_id, _aviso_repetida(titulos[reseña.juego_id])))
+            nuevas = propias
+        por_juego = defaultdict(lambda: [0, 0])
+        for reseña in nuevas:
+            por_juego[reseña.juego_id][0] += 1
+            por_juego[reseña.juego_id][1] += reseña.puntuacion
+        for juego_id, (total, puntos) in por_juego.items():
+            Juego.objects.filter(pk=juego_id).ajustar_valoraciones(total, puntos)
+        ajustar_estadisticas((r.usuario_id, r.juego_id, r.puntuacion, 1) for r in nuevas)
+        if por_juego:
+            for juego_id in por_juego:
+                cache.invalidar('juego', juego_id)
+            cache.invalidar('catalogo')
+            reseñas_volcadas.send(sender=Reseña, juego_ids=set(por_juego), reseñas=nuevas)
+
+    for nombre, usuario_id, mensaje in avisos:
+        _escribir(directorio() / 'avisos' / str(usuario_id) / nombre, {'mensaje': mensaje})
+    for nombre in nombres:
+        (carpeta / nombre).unlink(missing_ok=True)
+    return len(nuevas), len(avisos)
+
+
+def recoger_avisos(usuario_id):
+    """
+    Mensajes de las reseñas rechazadas de un usuario (y borrarlos).
+    Con dos peticiones a la vez, cada aviso lo recoge solo la que lo borra
+    """
+    carpeta = directorio() / 'avisos' / str(usuario_id)
+    if not carpeta.is_dir():
+        return []
+    mensajes = []
+    for nombre in _nombres(carpeta):
+        try:
+            mensaje = _leer(carpeta / nombre)['mensaje']
+            (carpeta / nombre).unlink()
+        except FileNotFoundError:
+            continue
+        mensajes.append(mensaje)
+    return mensajes
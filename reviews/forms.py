@@ -1,4 +1,6 @@
 from django import forms
+from games.models import Juego
+from games.widgets import JuegoAutocompletarWidget
 from .models import Reseña, PerfilUsuario
 
 
@@ -6,6 +8,7 @@ class ReseñaForm(forms.ModelForm):
     """
     Formulario para crear y editar reseñas.
     FASE B: Ahora usa ForeignKey para seleccionar el juego.
+    El juego se elige con autocompletado, sin cargar el catálogo en un <select>.
     El usuario se asigna automáticamente desde request.user
     """
     
@@ -13,7 +16,7 @@ class ReseñaForm(forms.ModelForm):
         model = Reseña
         fields = ['juego', 'puntuacion', 'comentario']
         widgets = {
-            'juego': forms.Select(attrs={
+            'juego': JuegoAutocompletarWidget(attrs={
                 'class': 'form-control'
             }),
             'puntuacion': forms.NumberInput(attrs={
@@ -52,6 +55,41 @@ class ReseñaForm(forms.ModelForm):
         return comentario
 
 
+class ReseñaBusquedaForm(forms.Form):
+    """
+    Formulario (GET) de búsqueda de reseñas por su comentario
+    """
+    q = forms.CharField(
+        required=False,
+        label='Palabras',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Buscar en las reseñas...'
+        })
+    )
+    juego = forms.ModelChoiceField(
+        required=False,
+        queryset=Juego.objects.all(),
+        widget=JuegoAutocompletarWidget(attrs={
+            'class': 'form-control',
+            'placeholder': 'Cualquier juego'
+        })
+    )
+    plataforma = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todas')] + Juego.PLATAFORMA_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    puntuacion_min = forms.TypedChoiceField(
+        required=False,
+        label='Puntuación mínima',
+        coerce=int,
+        empty_value=None,
+        choices=[('', 'Cualquiera')] + [(i, f'{i}+') for i in range(1, 11)],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+
 class PerfilUsuarioForm(forms.ModelForm):
     """
     Formulario para editar el perfil de usuario.
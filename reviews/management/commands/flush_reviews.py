@@ -0,0 +1,47 @@
+import fcntl
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from reviews import cola
+
+
+class Command(BaseCommand):
+    help = (
+        'Guardar por lotes las reseñas de la cola en diferido (PLAYHUB_RESENAS_DIFERIDAS). '
+        'Con --interval se queda esperando reseñas nuevas'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Reseñas por lote (y por transacción)')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Segundos entre comprobaciones de la cola; 0 para vaciarla una vez y terminar'
+        )
+    
+    def handle(self, *args, **options):
+        directorio = cola.directorio()
+        directorio.mkdir(parents=True, exist_ok=True)
+        # Un único volcador a la vez: el orden de llegada decide qué reseña
+        # duplicada se guarda
+        with open(directorio / '.flush.lock', 'w') as cerrojo:
+            try:
+                fcntl.flock(cerrojo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise CommandError('Ya hay otro flush_reviews en marcha')
+            while True:
+                self.vaciar(options['batch_size'])
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+    
+    def vaciar(self, tamaño_lote):
+        while True:
+            inicio = time.perf_counter()
+            resultado = cola.volcar_lote(tamaño_lote)
+            if resultado is None:
+                return
+            guardadas, rechazadas = resultado
+            self.stdout.write(
+                f'  {guardadas} reseñas guardadas, {rechazadas} rechazadas '
+                f'({(time.perf_counter() - inicio) * 1000:.0f} ms)'
+            )
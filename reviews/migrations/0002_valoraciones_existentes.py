@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:25
+
+from django.db import migrations
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def recalcular_valoraciones(apps, schema_editor):
+    """
+    Rellenar las valoraciones desnormalizadas de los juegos ya existentes
+    """
+    Juego = apps.get_model('games', 'Juego')
+    Reseña = apps.get_model('reviews', 'Reseña')
+    reseñas = Reseña.objects.filter(juego=OuterRef('pk')).order_by().values('juego')
+    Juego.objects.update(
+        total_reseñas=Coalesce(Subquery(reseñas.annotate(n=Count('pk')).values('n')), 0),
+        suma_puntuaciones=Coalesce(Subquery(reseñas.annotate(s=Sum('puntuacion')).values('s')), 0),
+        puntuacion_promedio=Subquery(reseñas.annotate(m=Avg('puntuacion')).values('m')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_valoraciones_juego'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_valoraciones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_indice_paginacion'),
+        ('reviews', '0002_valoraciones_existentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='reseña',
+            options={'ordering': ['-fecha', '-id'], 'verbose_name': 'Reseña', 'verbose_name_plural': 'Reseñas'},
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['-fecha', '-id'], name='resena_fecha_id_idx'),
+        ),
+    ]
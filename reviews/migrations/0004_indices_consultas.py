@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def quitar_indice(columna, nombre):
+    """
+    Quitar el índice de una ForeignKey sin AlterField, que en SQLite
+    reconstruiría la tabla entera de reseñas
+    """
+    return migrations.RunSQL(
+        f'DROP INDEX IF EXISTS "{nombre}"',
+        f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "reviews_reseña" ("{columna}")',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_indice_plataforma_id'),
+        ('reviews', '0003_indice_paginacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfilusuario',
+            index=models.Index(fields=['plataforma_favorita', 'user'], name='perfil_plataforma_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['juego', '-fecha', '-id'], name='resena_juego_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='resena_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reseña',
+            index=models.Index(fields=['puntuacion', '-fecha', '-id'], name='resena_puntuacion_fecha_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='reseña',
+                    name='juego',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reseñas', to='games.juego', verbose_name='Juego'),
+                ),
+                migrations.AlterField(
+                    model_name='reseña',
+                    name='usuario',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reseñas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+                ),
+            ],
+            database_operations=[
+                quitar_indice('juego_id', 'reviews_reseña_juego_id_e495c87c'),
+                quitar_indice('usuario_id', 'reviews_reseña_usuario_id_39ee61ac'),
+            ],
+        ),
+    ]
@@ -0,0 +1,170 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:05
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# Campos nuevos del perfil y el valor de las filas ya existentes
+CAMPOS_ESTADISTICAS = [
+    ('total_reseñas', 0),
+    ('suma_puntuaciones', 0),
+    *[(f'puntuaciones_{puntuacion}', 0) for puntuacion in range(1, 11)],
+    ('categorias_favoritas', '[]'),
+]
+
+
+def añadir_columnas(apps, schema_editor):
+    """
+    Un ALTER TABLE ADD COLUMN con DEFAULT por campo: en SQLite AddField
+    de un campo NOT NULL reconstruye la tabla de perfiles, una vez por campo
+    """
+    PerfilUsuario = apps.get_model('reviews', 'PerfilUsuario')
+    qn = schema_editor.quote_name
+    for nombre, valor in CAMPOS_ESTADISTICAS:
+        campo = PerfilUsuario._meta.get_field(nombre)
+        definicion, params = schema_editor.column_sql(PerfilUsuario, campo)
+        if comprobacion := campo.db_check(schema_editor.connection):
+            definicion += f' CHECK ({comprobacion})'
+        schema_editor.execute(
+            f'ALTER TABLE {qn(PerfilUsuario._meta.db_table)} ADD COLUMN {qn(campo.column)} '
+            f'{definicion} DEFAULT {schema_editor.quote_value(valor)}',
+            params,
+        )
+
+
+def quitar_columnas(apps, schema_editor):
+    PerfilUsuario = apps.get_model('reviews', 'PerfilUsuario')
+    for nombre, _ in CAMPOS_ESTADISTICAS:
+        schema_editor.remove_field(PerfilUsuario, PerfilUsuario._meta.get_field(nombre))
+
+
+def recalcular_estadisticas(apps, schema_editor):
+    """
+    Rellenar estadísticas y afinidades de los perfiles ya existentes
+    (dos GROUP BY sobre todas las reseñas y un bulk_update por lote)
+    """
+    PerfilUsuario = apps.get_model('reviews', 'PerfilUsuario')
+    Reseña = apps.get_model('reviews', 'Reseña')
+    AfinidadCategoria = apps.get_model('reviews', 'AfinidadCategoria')
+    reseñas = Reseña.objects.order_by()
+    histogramas, afinidades = defaultdict(Counter), defaultdict(list)
+    for fila in reseñas.values('usuario_id', 'puntuacion').annotate(n=Count('pk')):
+        histogramas[fila['usuario_id']][fila['puntuacion']] = fila['n']
+    for fila in (
+        reseñas.filter(juego__categorias__isnull=False)
+        .values('usuario_id', 'juego__categorias').annotate(n=Count('pk'))
+    ):
+        afinidades[fila['usuario_id']].append((-fila['n'], fila['juego__categorias']))
+    AfinidadCategoria.objects.bulk_create([
+        AfinidadCategoria(usuario_id=usuario_id, categoria_id=categoria_id, reseñas=-n)
+        for usuario_id, filas in afinidades.items()
+        for n, categoria_id in filas
+    ], batch_size=500)
+    perfiles = []
+    for perfil in PerfilUsuario.objects.filter(user_id__in=histogramas.keys()).only('pk', 'user_id').iterator():
+        histograma = histogramas[perfil.user_id]
+        for puntuacion in range(1, 11):
+            setattr(perfil, f'puntuaciones_{puntuacion}', histograma.get(puntuacion, 0))
+        perfil.total_reseñas = sum(histograma.values())
+        perfil.suma_puntuaciones = sum(p * n for p, n in histograma.items())
+        perfil.categorias_favoritas = [categoria_id for _, categoria_id in sorted(afinidades[perfil.user_id])[:3]]
+        perfiles.append(perfil)
+    PerfilUsuario.objects.bulk_update(perfiles, [nombre for nombre, _ in CAMPOS_ESTADISTICAS], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_indice_plataforma_id'),
+        ('reviews', '0004_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='categorias_favoritas',
+                field=models.JSONField(default=list, editable=False, help_text='Ids de las categorías más reseñadas, de más a menos', verbose_name='Categorías Favoritas'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_1',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 1'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_10',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 10'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_2',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 2'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_3',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 3'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_4',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 4'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_5',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 5'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_6',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 6'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_7',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 7'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_8',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 8'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='puntuaciones_9',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 9'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='suma_puntuaciones',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Suma de Puntuaciones'),
+            ),
+            migrations.AddField(
+                model_name='perfilusuario',
+                name='total_reseñas',
+                field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas Publicadas'),
+            ),
+        ]),
+        migrations.RunPython(añadir_columnas, quitar_columnas),
+        migrations.CreateModel(
+            name='AfinidadCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reseñas', models.IntegerField(default=0, verbose_name='Reseñas')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='afinidades', to='games.categoria', verbose_name='Categoría')),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='afinidades', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Afinidad por Categoría',
+                'verbose_name_plural': 'Afinidades por Categoría',
+                'unique_together': {('usuario', 'categoria')},
+            },
+        ),
+        migrations.RunPython(recalcular_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_estadisticas_perfil'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reseña',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Fecha'),
+        ),
+    ]
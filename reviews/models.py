@@ -1,7 +1,410 @@
-from django.db import models
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from games.models import Juego
+from django.dispatch import Signal
+from django.utils import timezone
+from games import busqueda as busqueda_juegos
+from games.models import Categoria, Juego
+from playhub import cache
+from . import busqueda
+
+
+# Lote máximo de ids por consulta `pk__in` (límite de variables de SQLite)
+LOTE_RECALCULO = 500
+
+# Categorías que se guardan como favoritas en cada perfil
+CATEGORIAS_FAVORITAS = 3
+
+# Enviada por las operaciones masivas de ReseñaQuerySet (que no envían
+# post_save) con juego_ids y cambios: tuplas (juego_id, puntuacion, signo),
+# -1 por cada reseña tal como estaba y 1 por cada una tal como queda
+reseñas_modificadas = Signal()
+
+
+def recalcular_valoraciones(juego_ids):
+    """
+    Reconstruir las valoraciones de los juegos indicados, por lotes,
+    e invalidar sus fragmentos en caché
+    """
+    juego_ids = list(juego_ids)
+    for i in range(0, len(juego_ids), LOTE_RECALCULO):
+        Juego.objects.filter(pk__in=juego_ids[i:i + LOTE_RECALCULO]).recalcular_valoraciones()
+    for juego_id in juego_ids:
+        cache.invalidar('juego', juego_id)
+    cache.invalidar('catalogo')
+
+
+def categorias_favoritas(afinidades):
+    """
+    Ids de las CATEGORIAS_FAVORITAS categorías con más reseñas a partir
+    de pares (categoria_id, reseñas); en caso de empate, la de menor id
+    """
+    ordenadas = sorted((-n, categoria_id) for categoria_id, n in afinidades if n > 0)
+    return [categoria_id for _, categoria_id in ordenadas[:CATEGORIAS_FAVORITAS]]
+
+
+def ajustar_estadisticas(cambios):
+    """
+    Aplicar a las estadísticas de los perfiles las reseñas creadas,
+    editadas o borradas. `cambios` son tuplas (usuario_id, juego_id,
+    puntuacion, signo): 1 por la reseña que aparece y -1 por la que
+    desaparece, así que una edición son dos tuplas que, si no cambia
+    nada de lo que cuenta, se anulan y no se escribe nada
+    """
+    netos = Counter()
+    for usuario_id, juego_id, puntuacion, signo in cambios:
+        netos[(usuario_id, juego_id, puntuacion)] += signo
+    netos = {clave: signo for clave, signo in netos.items() if signo}
+    if not netos:
+        return
+    Through = Juego.categorias.through
+    categorias = defaultdict(list)
+    for juego_id, categoria_id in Through.objects.filter(
+        juego_id__in={juego_id for _, juego_id, _ in netos}
+    ).values_list('juego_id', 'categoria_id'):
+        categorias[juego_id].append(categoria_id)
+    histogramas, afinidades = defaultdict(Counter), Counter()
+    for (usuario_id, juego_id, puntuacion), signo in netos.items():
+        histogramas[usuario_id][puntuacion] += signo
+        for categoria_id in categorias[juego_id]:
+            afinidades[(usuario_id, categoria_id)] += signo
+    # Las favoritas solo se releen si cambian las afinidades del usuario
+    con_afinidad = {usuario_id for (usuario_id, _), signo in afinidades.items() if signo}
+    # Quien publica una reseña y aún no tiene perfil lo recibe ya calculado.
+    # Los borrados no crean perfiles (p. ej. al eliminar un usuario en cascada)
+    con_nuevas = {usuario_id for (usuario_id, _, _), signo in netos.items() if signo > 0}
+    sin_perfil = []
+    with transaction.atomic():
+        sumar_afinidades(afinidades)
+        for usuario_id, histograma in histogramas.items():
+            favoritas = {}
+            if usuario_id in con_afinidad:
+                favoritas['categorias_favoritas'] = categorias_favoritas(
+                    AfinidadCategoria.objects.filter(usuario_id=usuario_id).values_list('categoria_id', 'reseñas')
+                )
+            filas = PerfilUsuario.objects.filter(user_id=usuario_id).ajustar_estadisticas(histograma, **favoritas)
+            if filas == 0 and usuario_id in con_nuevas:
+                sin_perfil.append(usuario_id)
+        if sin_perfil:
+            crear_perfiles(sin_perfil)
+    cache.invalidar_varios('perfil', list(histogramas))
+    cache.invalidar('perfiles')
+
+
+def sumar_afinidades(afinidades):
+    """
+    Sumar {(usuario_id, categoria_id): reseñas} a AfinidadCategoria: un
+    UPDATE por categoría y cantidad (con todos sus usuarios) y un
+    bulk_create de las que aún no existen y suben
+    """
+    grupos = defaultdict(list)
+    for (usuario_id, categoria_id), n in afinidades.items():
+        if n:
+            grupos[(categoria_id, n)].append(usuario_id)
+    for (categoria_id, n), usuario_ids in grupos.items():
+        for i in range(0, len(usuario_ids), LOTE_RECALCULO):
+            lote = usuario_ids[i:i + LOTE_RECALCULO]
+            filas = AfinidadCategoria.objects.filter(categoria_id=categoria_id, usuario_id__in=lote)
+            existentes = set(filas.values_list('usuario_id', flat=True))
+            if existentes:
+                filas.update(reseñas=F('reseñas') + n)
+            if n > 0:
+                AfinidadCategoria.objects.bulk_create([
+                    AfinidadCategoria(usuario_id=usuario_id, categoria_id=categoria_id, reseñas=n)
+                    for usuario_id in lote if usuario_id not in existentes
+                ])
+
+
+def actualizar_favoritas(usuario_ids):
+    """
+    Releer las categorías favoritas de los perfiles indicados a partir de
+    sus afinidades y guardar las que cambien (un bulk_update por lote)
+    """
+    usuario_ids = list(usuario_ids)
+    for i in range(0, len(usuario_ids), LOTE_RECALCULO):
+        lote = usuario_ids[i:i + LOTE_RECALCULO]
+        afinidades = defaultdict(list)
+        for usuario_id, categoria_id, n in AfinidadCategoria.objects.filter(
+            usuario_id__in=lote
+        ).values_list('usuario_id', 'categoria_id', 'reseñas'):
+            afinidades[usuario_id].append((categoria_id, n))
+        cambiados = []
+        for perfil in PerfilUsuario.objects.filter(user_id__in=lote).only('pk', 'user_id', 'categorias_favoritas'):
+            favoritas = categorias_favoritas(afinidades[perfil.user_id])
+            if favoritas != perfil.categorias_favoritas:
+                perfil.categorias_favoritas = favoritas
+                cambiados.append(perfil)
+        PerfilUsuario.objects.bulk_update(cambiados, ['categorias_favoritas'])
+        cache.invalidar_varios('perfil', [perfil.user_id for perfil in cambiados])
+    cache.invalidar('perfiles')
+
+
+def ajustar_afinidades(pares, signo):
+    """
+    Categorías añadidas (signo 1) o quitadas (-1) a juegos, como pares
+    (juego_id, categoria_id): cada autor de esos juegos gana o pierde una
+    reseña en la afinidad de la categoría y se releen sus favoritas, en
+    lugar de recalcular sus perfiles enteros
+    """
+    por_juego = defaultdict(list)
+    for juego_id, categoria_id in pares:
+        por_juego[juego_id].append(categoria_id)
+    afinidades = Counter()
+    for usuario_id, juego_id in Reseña.objects.filter(
+        juego_id__in=list(por_juego)
+    ).order_by().values_list('usuario_id', 'juego_id'):
+        for categoria_id in por_juego[juego_id]:
+            afinidades[(usuario_id, categoria_id)] += signo
+    if not afinidades:
+        return
+    with transaction.atomic():
+        sumar_afinidades(afinidades)
+        actualizar_favoritas({usuario_id for usuario_id, _ in afinidades})
+
+
+def recalcular_estadisticas(usuario_ids=None):
+    """
+    Reconstruir desde las reseñas las estadísticas de los perfiles
+    indicados (o de todos) por lotes: un GROUP BY por puntuación, otro
+    por categoría y un bulk_update de los perfiles del lote. Los usuarios
+    con reseñas y sin perfil lo reciben
+    """
+    if usuario_ids is None:
+        usuario_ids = PerfilUsuario.objects.order_by('user_id').values_list('user_id', flat=True)
+    usuario_ids = list(usuario_ids)
+    for i in range(0, len(usuario_ids), LOTE_RECALCULO):
+        lote = usuario_ids[i:i + LOTE_RECALCULO]
+        reseñas = Reseña.objects.filter(usuario_id__in=lote).order_by()
+        histogramas, afinidades = defaultdict(Counter), defaultdict(list)
+        for usuario_id, puntuacion, n in (
+            reseñas.values('usuario_id', 'puntuacion').annotate(n=Count('pk')).values_list('usuario_id', 'puntuacion', 'n')
+        ):
+            histogramas[usuario_id][puntuacion] = n
+        for usuario_id, categoria_id, n in (
+            reseñas.filter(juego__categorias__isnull=False)
+            .values('usuario_id', 'juego__categorias').annotate(n=Count('pk'))
+            .values_list('usuario_id', 'juego__categorias', 'n')
+        ):
+            afinidades[usuario_id].append((categoria_id, n))
+        with transaction.atomic():
+            AfinidadCategoria.objects.filter(usuario_id__in=lote).delete()
+            AfinidadCategoria.objects.bulk_create([
+                AfinidadCategoria(usuario_id=usuario_id, categoria_id=categoria_id, reseñas=n)
+                for usuario_id, filas in afinidades.items()
+                for categoria_id, n in filas
+            ])
+            perfiles = list(PerfilUsuario.objects.filter(user_id__in=lote).only('pk', 'user_id'))
+            # Autores que aún no tienen perfil (operaciones masivas): se crean ya calculados
+            existentes = {perfil.user_id for perfil in perfiles}
+            nuevos = [PerfilUsuario(user_id=usuario_id) for usuario_id in histogramas if usuario_id not in existentes]
+            for perfil in perfiles + nuevos:
+                perfil.fijar_estadisticas(histogramas[perfil.user_id], categorias_favoritas(afinidades[perfil.user_id]))
+            PerfilUsuario.objects.bulk_update(perfiles, PerfilUsuario.CAMPOS_ESTADISTICAS)
+            PerfilUsuario.objects.bulk_create(nuevos, ignore_conflicts=True)
+        cache.invalidar_varios('perfil', lote)
+    cache.invalidar('perfiles')
+
+
+def crear_perfiles(usuario_ids=None):
+    """
+    Crear los perfiles que faltan (de los usuarios indicados o de todos)
+    por lotes: un SELECT de usuarios sin perfil, un bulk_create y sus
+    estadísticas. Devuelve cuántos se han creado
+    """
+    usuarios = User.objects.filter(perfil__isnull=True).order_by('pk')
+    if usuario_ids is not None:
+        usuarios = usuarios.filter(pk__in=list(usuario_ids))
+    creados, ultimo = 0, 0
+    while lote := list(usuarios.filter(pk__gt=ultimo).values_list('pk', flat=True)[:LOTE_RECALCULO]):
+        with transaction.atomic():
+            PerfilUsuario.objects.bulk_create([PerfilUsuario(user_id=pk) for pk in lote], ignore_conflicts=True)
+            recalcular_estadisticas(lote)
+        creados += len(lote)
+        ultimo = lote[-1]
+    return creados
+
+
+def perfil_de(user):
+    """
+    Perfil del usuario o, si aún no tiene, uno sin guardar con los valores
+    por defecto: los perfiles se crean al guardarlos o al publicar la
+    primera reseña, nunca al leerlos. Con select_related('perfil') no consulta
+    """
+    try:
+        return user.perfil
+    except PerfilUsuario.DoesNotExist:
+        return PerfilUsuario(user=user)
+
+
+class ReseñaQuerySet(models.QuerySet):
+    """
+    Las operaciones masivas no envían signals, así que recalculan
+    las valoraciones de los juegos y las estadísticas de los perfiles
+    afectados al terminar, invalidan las versiones de las reseñas y
+    envían reseñas_modificadas con la diferencia. bulk_update() no se
+    redefine: Django lo ejecuta como un update() por lote
+    """
+    
+    CAMPOS_VALORACION = {'juego', 'juego_id', 'puntuacion'}
+    CAMPOS_ESTADISTICAS = CAMPOS_VALORACION | {'usuario', 'usuario_id'}
+    
+    def bulk_create(self, objs, *args, recalcular=True, **kwargs):
+        """
+        Con recalcular=False no se tocan valoraciones ni estadísticas: útil
+        en cargas masivas que terminan con un único
+        Juego.objects.recalcular_valoraciones() y recalcular_estadisticas().
+        Con ignore_conflicts o update_conflicts se releen las reseñas que
+        ya existían, antes y después, para saber qué ha cambiado
+        """
+        objs = list(objs)
+        if not recalcular:
+            return super().bulk_create(objs, *args, **kwargs)
+        conflictos = kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+        claves = {(obj.juego_id, obj.usuario_id) for obj in objs}
+        with transaction.atomic(using=self.db):
+            antes = self.model.objects.all()._filas_de_claves(claves) if conflictos else []
+            creadas = super().bulk_create(objs, *args, **kwargs)
+            if conflictos:
+                despues = self.model.objects.all()._filas_de_claves(claves)
+            else:
+                despues = [(obj.pk, obj.juego_id, obj.usuario_id, obj.puntuacion) for obj in objs]
+            self._recalcular(self.CAMPOS_ESTADISTICAS, antes, despues)
+        return creadas
+    
+    def _filas(self):
+        """
+        [(pk, juego_id, usuario_id, puntuacion)] de las reseñas
+        """
+        return list(self.order_by().values_list('pk', 'juego_id', 'usuario_id', 'puntuacion'))
+    
+    def _lotes(self, *campos):
+        """
+        Filas (pk, *campos) de las reseñas en lotes de LOTE_RECALCULO,
+        recorridas por pk sin cargarlas todas a la vez
+        """
+        filas = self.order_by('pk').values_list('pk', *campos)
+        ultimo = None
+        while True:
+            lote = list((filas if ultimo is None else filas.filter(pk__gt=ultimo))[:LOTE_RECALCULO])
+            if lote:
+                yield lote
+            if len(lote) < LOTE_RECALCULO:
+                return
+            ultimo = lote[-1][0]
+    
+    def _filas_de(self, pks):
+        filas = []
+        for i in range(0, len(pks), LOTE_RECALCULO):
+            filas += self.filter(pk__in=pks[i:i + LOTE_RECALCULO])._filas()
+        return filas
+    
+    def _filas_de_claves(self, claves):
+        """
+        Filas de las reseñas existentes con esos (juego_id, usuario_id)
+        """
+        juego_ids = sorted({juego_id for juego_id, _ in claves})
+        filas = []
+        for i in range(0, len(juego_ids), LOTE_RECALCULO):
+            filas += [
+                fila for fila in self.filter(juego_id__in=juego_ids[i:i + LOTE_RECALCULO])._filas()
+                if (fila[1], fila[2]) in claves
+            ]
+        return filas
+    
+    def _recalcular(self, campos, antes, despues):
+        """
+        Aplicar el cambio de las filas `antes` (leídas antes de escribir) a
+        `despues`. Solo se recalcula lo que dependa de los campos escritos
+        """
+        juego_ids = {fila[1] for fila in antes + despues}
+        if self.CAMPOS_ESTADISTICAS & campos:
+            usuario_ids = {fila[2] for fila in antes + despues}
+            if self.CAMPOS_VALORACION & campos:
+                recalcular_valoraciones(juego_ids)
+            recalcular_estadisticas(usuario_ids)
+            cambios = [(juego_id, puntuacion, -1) for _, juego_id, _, puntuacion in antes]
+            cambios += [(juego_id, puntuacion, 1) for _, juego_id, _, puntuacion in despues]
+            reseñas_modificadas.send(sender=self.model, juego_ids=juego_ids, cambios=cambios)
+        if not self.CAMPOS_VALORACION & campos:
+            # recalcular_valoraciones() ya las invalida: la ficha del juego
+            # muestra sus reseñas con la versión ('juego', pk)
+            cache.invalidar_varios('juego', juego_ids)
+        # La API sirve cada reseña con la versión ('resena', pk)
+        cache.invalidar_varios('resena', [fila[0] for fila in antes])
+        cache.invalidar('catalogo')
+    
+    def update(self, **kwargs):
+        """
+        Si no cambian juego, puntuación ni usuario (editar comentarios en
+        bloque) no hay nada que recalcular: se actualiza por lotes de pk y
+        solo se leen los ids que hay que invalidar en la caché
+        """
+        with transaction.atomic(using=self.db):
+            if not self.CAMPOS_ESTADISTICAS & kwargs.keys():
+                filas = 0
+                juego_ids = set()
+                for lote in self._lotes('juego_id'):
+                    pks = [pk for pk, _ in lote]
+                    filas += super(ReseñaQuerySet, self.filter(pk__in=pks)).update(**kwargs)
+                    juego_ids.update(juego_id for _, juego_id in lote)
+                    cache.invalidar_varios('resena', pks)
+                cache.invalidar_varios('juego', juego_ids)
+                cache.invalidar('catalogo')
+                return filas
+            antes = [fila for lote in self._lotes('juego_id', 'usuario_id', 'puntuacion') for fila in lote]
+            filas = super().update(**kwargs)
+            despues = self.model.objects.all()._filas_de([fila[0] for fila in antes])
+            self._recalcular(kwargs.keys(), antes, despues)
+        return filas
+    
+    def filtrar(self, juego=None, plataforma=None, puntuacion_min=None):
+        """
+        Filtros de la búsqueda de reseñas. Los valores vacíos se ignoran
+        """
+        qs = self
+        if juego:
+            qs = qs.filter(juego=juego)
+        if plataforma:
+            # EXISTS en lugar de JOIN, como PlataformaJuegoFilter del admin
+            qs = qs.filter(Exists(Juego.objects.filter(pk=OuterRef('juego_id'), plataforma=plataforma)))
+        if puntuacion_min:
+            qs = qs.filter(puntuacion__gte=puntuacion_min)
+        return qs
+    
+    def ids_busqueda(self, texto='', juego=None, plataforma=None, puntuacion_min=None):
+        """
+        Ids (como mucho busqueda.VENTANA) de las reseñas cuyo comentario
+        contiene todas las palabras de `texto` y cumplen los filtros, de más
+        a menos relevante; sin texto, de más nueva a más antigua. Con el
+        índice FTS5 en SQLite y con `icontains` en otros motores
+        """
+        juego_id = getattr(juego, 'pk', juego)
+        buscadas = busqueda.palabras(texto)
+        if not buscadas:
+            # Por id y no por fecha: SQLite recorre la tabla hacia atrás y se
+            # detiene al llenar la ventana, en lugar de ordenar lo filtrado
+            qs = self.filtrar(juego_id, plataforma, puntuacion_min).order_by('-id')
+            return list(qs.values_list('pk', flat=True)[:busqueda.VENTANA])
+        if busqueda_juegos.usa_fts(self.db):
+            filas = busqueda.coincidencias(
+                busqueda.consulta_fts(texto), juego_id, plataforma, puntuacion_min, using=self.db,
+            )
+        else:
+            qs = self.filtrar(juego_id, plataforma, puntuacion_min)
+            for palabra in busqueda.PALABRA.findall(texto):
+                qs = qs.filter(comentario__icontains=palabra)
+            filas = qs.order_by('-id').values_list('pk', 'comentario')[:busqueda.VENTANA]
+        return busqueda.relevancia(filas, buscadas)
+    
+    def buscar(self, texto):
+        """
+        Filtrar por el comentario (ver ids_busqueda), sin conservar el orden
+        de relevancia
+        """
+        return self.filter(pk__in=self.ids_busqueda(texto))
 
 
 class Reseña(models.Model):
@@ -14,28 +417,58 @@ class Reseña(models.Model):
         Juego,
         on_delete=models.CASCADE,
         related_name='reseñas',
-        verbose_name='Juego'
+        verbose_name='Juego',
+        # Cubierto por unique_together y resena_juego_fecha_idx
+        db_index=False
     )
     usuario = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='reseñas',
-        verbose_name='Usuario'
+        verbose_name='Usuario',
+        # Cubierto por resena_usuario_fecha_idx
+        db_index=False
     )
     puntuacion = models.IntegerField(verbose_name='Puntuación')
     comentario = models.TextField(verbose_name='Comentario')
-    fecha = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+    # Por defecto la hora del alta; la cola de reseñas en diferido guarda la del envío
+    fecha = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Fecha')
+    
+    objects = ReseñaQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Reseña'
         verbose_name_plural = 'Reseñas'
-        ordering = ['-fecha']
+        ordering = ['-fecha', '-id']
         # Evitar que un usuario reseñe el mismo juego múltiples veces
         unique_together = ['juego', 'usuario']
+        indexes = [
+            # Paginación por cursor sobre (fecha, id)
+            models.Index(fields=['-fecha', '-id'], name='resena_fecha_id_idx'),
+            # Reseñas de un juego (detalle) y de un usuario (perfil), ya en orden
+            models.Index(fields=['juego', '-fecha', '-id'], name='resena_juego_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='resena_usuario_fecha_idx'),
+            # Filtro por puntuación del admin (y sus opciones, SELECT DISTINCT)
+            models.Index(fields=['puntuacion', '-fecha', '-id'], name='resena_puntuacion_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Reseña de {self.usuario.username} para {self.juego.titulo}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Recordar juego, puntuación y autor tal como se leyeron de la base de
+        datos, para que el signal de post_save pueda aplicar solo la diferencia
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._valoracion_original = (
+            instance.__dict__.get('juego_id'),
+            instance.__dict__.get('puntuacion'),
+        )
+        instance._usuario_original = instance.__dict__.get('usuario_id')
+        return instance
+    
     def clean(self):
         """
         Validaciones personalizadas:
@@ -54,10 +487,37 @@ class Reseña(models.Model):
             })
 
 
+class PerfilUsuarioQuerySet(models.QuerySet):
+    """
+    QuerySet de PerfilUsuario con el mantenimiento de las estadísticas
+    """
+    
+    def ajustar_estadisticas(self, histograma, **campos):
+        """
+        Sumar el histograma {puntuacion: reseñas} (con reseñas negativas
+        para las que desaparecen) a contadores e histograma en un único
+        UPDATE. Devuelve las filas actualizadas, o None si no hay nada que escribir
+        """
+        for puntuacion, n in histograma.items():
+            if n:
+                campo = f'puntuaciones_{puntuacion}'
+                campos[campo] = F(campo) + n
+        reseñas = sum(histograma.values())
+        puntos = sum(puntuacion * n for puntuacion, n in histograma.items())
+        if reseñas:
+            campos['total_reseñas'] = F('total_reseñas') + reseñas
+        if puntos:
+            campos['suma_puntuaciones'] = F('suma_puntuaciones') + puntos
+        return self.update(**campos) if campos else None
+
+
 class PerfilUsuario(models.Model):
     """
     Modelo para extender el User de Django con información adicional.
-    Relación OneToOne con User.
+    Relación OneToOne con User; se crea al guardarlo por primera vez o al
+    publicar la primera reseña (ver perfil_de y crear_perfiles).
+    Las estadísticas (reseñas, puntuación media, histograma y categorías
+    favoritas) se mantienen al escribir reseñas (reviews/signals.py)
     """
     
     PLATAFORMA_CHOICES = [
@@ -91,9 +551,146 @@ class PerfilUsuario(models.Model):
         help_text='URL de tu imagen de perfil'
     )
     
+    # Estadísticas desnormalizadas (ver ajustar_estadisticas y recalcular_estadisticas)
+    total_reseñas = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas Publicadas')
+    suma_puntuaciones = models.PositiveIntegerField(default=0, editable=False, verbose_name='Suma de Puntuaciones')
+    puntuaciones_1 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 1')
+    puntuaciones_2 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 2')
+    puntuaciones_3 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 3')
+    puntuaciones_4 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 4')
+    puntuaciones_5 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 5')
+    puntuaciones_6 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 6')
+    puntuaciones_7 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 7')
+    puntuaciones_8 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 8')
+    puntuaciones_9 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 9')
+    puntuaciones_10 = models.PositiveIntegerField(default=0, editable=False, verbose_name='Reseñas con 10')
+    categorias_favoritas = models.JSONField(
+        default=list,
+        editable=False,
+        verbose_name='Categorías Favoritas',
+        help_text='Ids de las categorías más reseñadas, de más a menos'
+    )
+    
+    CAMPOS_HISTOGRAMA = [f'puntuaciones_{puntuacion}' for puntuacion in range(1, 11)]
+    CAMPOS_ESTADISTICAS = ['total_reseñas', 'suma_puntuaciones', *CAMPOS_HISTOGRAMA, 'categorias_favoritas']
+    
+    objects = PerfilUsuarioQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Perfil de Usuario'
         verbose_name_plural = 'Perfiles de Usuario'
+        indexes = [
+            # Filtro por plataforma del admin
+            models.Index(fields=['plataforma_favorita', 'user'], name='perfil_plataforma_user_idx'),
+        ]
     
     def __str__(self):
         return f"Perfil de {self.user.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Recordar los valores leídos para que save() escriba solo lo que cambie
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._originales = instance._valores_editables()
+        return instance
+    
+    @classmethod
+    def _campos_editables(cls):
+        return [
+            campo for campo in cls._meta.concrete_fields
+            if not campo.primary_key and campo.name not in cls.CAMPOS_ESTADISTICAS
+        ]
+    
+    def _valores_editables(self):
+        return {
+            campo.attname: self.__dict__[campo.attname]
+            for campo in self._campos_editables() if campo.attname in self.__dict__
+        }
+    
+    def campos_cambiados(self):
+        """
+        Campos (sin contar las estadísticas) que difieren de los leídos
+        """
+        originales = getattr(self, '_originales', {})
+        valores = self._valores_editables()
+        return [
+            campo.name for campo in self._campos_editables()
+            if campo.attname in valores and (
+                campo.attname not in originales or valores[campo.attname] != originales[campo.attname]
+            )
+        ]
+    
+    def save(self, **kwargs):
+        """
+        Un perfil ya guardado solo escribe los campos que han cambiado (si no
+        cambia ninguno no hay UPDATE) y nunca las estadísticas, que se
+        mantienen con UPDATE relativos
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            cambiados = self.campos_cambiados()
+            if not cambiados:
+                return
+            kwargs['update_fields'] = cambiados
+        super().save(**kwargs)
+        self._originales = self._valores_editables()
+    
+    def fijar_estadisticas(self, histograma, categorias_favoritas):
+        """
+        Asignar (sin guardar) las estadísticas a partir del histograma
+        {puntuacion: reseñas}
+        """
+        for puntuacion in range(1, 11):
+            setattr(self, f'puntuaciones_{puntuacion}', histograma.get(puntuacion, 0))
+        self.total_reseñas = sum(histograma.values())
+        self.suma_puntuaciones = sum(puntuacion * n for puntuacion, n in histograma.items())
+        self.categorias_favoritas = categorias_favoritas
+    
+    @property
+    def puntuacion_media(self):
+        if not self.total_reseñas:
+            return None
+        return self.suma_puntuaciones / self.total_reseñas
+    
+    @property
+    def histograma(self):
+        """
+        [(puntuacion, reseñas, porcentaje)] de 10 a 1, para las barras del perfil
+        """
+        filas = []
+        for puntuacion in range(10, 0, -1):
+            n = getattr(self, f'puntuaciones_{puntuacion}')
+            filas.append((puntuacion, n, round(100 * n / self.total_reseñas) if self.total_reseñas else 0))
+        return filas
+
+
+class AfinidadCategoria(models.Model):
+    """
+    Reseñas de cada usuario por categoría de los juegos reseñados, de
+    donde salen las categorías favoritas de su perfil
+    """
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='afinidades',
+        verbose_name='Usuario',
+        # Cubierto por unique_together
+        db_index=False
+    )
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        related_name='afinidades',
+        verbose_name='Categoría'
+    )
+    reseñas = models.IntegerField(default=0, verbose_name='Reseñas')
+    
+    class Meta:
+        verbose_name = 'Afinidad por Categoría'
+        verbose_name_plural = 'Afinidades por Categoría'
+        unique_together = ['usuario', 'categoria']
+    
+    def __str__(self):
+        return f"{self.usuario_id} - {self.categoria_id}: {self.reseñas}"
@@ -1,22 +1,182 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import PerfilUsuario
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from games.models import Categoria, Juego
+from playhub import cache
+from .models import AfinidadCategoria, PerfilUsuario, Reseña, ajustar_estadisticas, recalcular_estadisticas
+from .models import actualizar_favoritas, ajustar_afinidades
 
+Through = Juego.categorias.through
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+
+@receiver(post_save, sender=Reseña)
+def actualizar_estadisticas_al_guardar(sender, instance, created, **kwargs):
     """
-    Crear automáticamente un PerfilUsuario cuando se crea un User
+    Estadísticas del perfil del autor (y del anterior, si cambia).
+    Se conecta antes que actualizar_valoracion_al_guardar, que deja
+    _valoracion_original con los valores nuevos
     """
+    nueva = (instance.usuario_id, instance.juego_id, instance.puntuacion, 1)
+    juego_anterior, puntuacion_anterior = getattr(instance, '_valoracion_original', (None, None))
+    usuario_anterior = getattr(instance, '_usuario_original', None)
     if created:
-        PerfilUsuario.objects.create(user=instance)
+        ajustar_estadisticas([nueva])
+    elif None in (juego_anterior, puntuacion_anterior, usuario_anterior):
+        recalcular_estadisticas({instance.usuario_id})
+    else:
+        ajustar_estadisticas([(usuario_anterior, juego_anterior, puntuacion_anterior, -1), nueva])
+    instance._usuario_original = instance.usuario_id
+
+
+@receiver(post_save, sender=Reseña)
+def actualizar_valoracion_al_guardar(sender, instance, created, **kwargs):
+    """
+    Mantener las valoraciones desnormalizadas de Juego al crear o editar
+    una reseña, aplicando solo la diferencia con un UPDATE por juego
+    """
+    juego_anterior, puntuacion_anterior = getattr(instance, '_valoracion_original', (None, None))
+    if created:
+        Juego.objects.filter(pk=instance.juego_id).ajustar_valoraciones(1, instance.puntuacion)
+    elif juego_anterior is None or puntuacion_anterior is None:
+        # No sabemos qué había antes (instancia construida a mano o campos diferidos)
+        Juego.objects.filter(pk=instance.juego_id).recalcular_valoraciones()
+    elif juego_anterior != instance.juego_id:
+        Juego.objects.filter(pk=juego_anterior).ajustar_valoraciones(-1, -puntuacion_anterior)
+        Juego.objects.filter(pk=instance.juego_id).ajustar_valoraciones(1, instance.puntuacion)
+    elif puntuacion_anterior != instance.puntuacion:
+        Juego.objects.filter(pk=instance.juego_id).ajustar_valoraciones(
+            0, instance.puntuacion - puntuacion_anterior
+        )
+    instance._valoracion_original = (instance.juego_id, instance.puntuacion)
+    if juego_anterior is not None and juego_anterior != instance.juego_id:
+        cache.invalidar('juego', juego_anterior)
+    cache.invalidar('juego', instance.juego_id)
+    cache.invalidar('resena', instance.pk)
+    cache.invalidar('catalogo')
+
+
+@receiver(pre_delete, sender=Reseña)
+def recordar_reseña_eliminada(sender, instance, origin=None, **kwargs):
+    """
+    Al borrar una instancia (reseña.delete()) se descuentan los valores
+    guardados, no los que tenga en memoria, que pueden ser antiguos (p. ej.
+    tras un update()). En los borrados en cascada o de querysets las
+    instancias se acaban de leer y no hace falta
+    """
+    if origin is not instance:
+        return
+    guardada = Reseña.objects.filter(pk=instance.pk).values_list('juego_id', 'puntuacion', 'usuario_id').first()
+    if guardada is not None:
+        instance._valoracion_original = guardada[:2]
+        instance._usuario_original = guardada[2]
+
+
+@receiver(post_delete, sender=Reseña)
+def actualizar_valoracion_al_eliminar(sender, instance, **kwargs):
+    """
+    Descontar la reseña eliminada. También cubre los borrados en cascada
+    (p. ej. al eliminar un usuario), que envían post_delete por cada reseña
+    """
+    juego_id, puntuacion = getattr(instance, '_valoracion_original', (None, None))
+    if juego_id is None or puntuacion is None:
+        juego_id, puntuacion = instance.juego_id, instance.puntuacion
+    Juego.objects.filter(pk=juego_id).ajustar_valoraciones(-1, -puntuacion)
+    cache.invalidar('juego', juego_id)
+    cache.invalidar('resena', instance.pk)
+    cache.invalidar('catalogo')
+    usuario_id = getattr(instance, '_usuario_original', None) or instance.usuario_id
+    ajustar_estadisticas([(usuario_id, juego_id, puntuacion, -1)])
+
+
+@receiver(m2m_changed, sender=Through)
+def actualizar_afinidades_categorias(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Las categorías favoritas dependen de las categorías de los juegos
+    reseñados: cada par (juego, categoría) que aparece o desaparece suma o
+    resta una reseña a la afinidad de los autores del juego. Las bajas se
+    leen antes (pre_remove, pre_clear) porque pk_set puede incluir pares
+    que no existían y clear() no dice cuáles había
+    """
+    campo, otro = ('categoria_id', 'juego_id') if reverse else ('juego_id', 'categoria_id')
+    if action in ('pre_remove', 'pre_clear'):
+        pares = Through.objects.filter(**{campo: instance.pk})
+        if action == 'pre_remove':
+            pares = pares.filter(**{f'{otro}__in': pk_set})
+        instance._afinidades_quitadas = list(pares.values_list('juego_id', 'categoria_id'))
+    elif action in ('post_remove', 'post_clear'):
+        ajustar_afinidades(instance.__dict__.pop('_afinidades_quitadas', ()), -1)
+    elif action == 'post_add' and pk_set:
+        ajustar_afinidades([(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set], 1)
+
+
+@receiver(pre_delete, sender=Categoria)
+def recordar_afines_categoria(sender, instance, **kwargs):
+    """
+    Sus afinidades se borran en cascada: quienes la tenían pueden cambiar de favoritas
+    """
+    instance._afines = list(
+        AfinidadCategoria.objects.filter(categoria_id=instance.pk, reseñas__gt=0).values_list('usuario_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Categoria)
+def actualizar_favoritas_categoria(sender, instance, **kwargs):
+    actualizar_favoritas(instance.__dict__.pop('_afines', ()))
+
+
+@receiver(pre_delete, sender=Juego)
+def recordar_autores_juego(sender, instance, **kwargs):
+    """
+    Al borrar un juego sus categorías pueden desaparecer antes que sus
+    reseñas, y entonces el post_delete de cada reseña no sabe qué
+    afinidades descontar: se anotan los autores para recalcularlos
+    """
+    instance._autores = list(
+        Reseña.objects.filter(juego_id=instance.pk).order_by().values_list('usuario_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Juego)
+def recalcular_autores_juego(sender, instance, **kwargs):
+    recalcular_estadisticas(getattr(instance, '_autores', ()))
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_cache_perfil(sender, instance, **kwargs):
+    """
+    Versiones del perfil para la API (ETag)
+    """
+    cache.invalidar('perfil', instance.user_id)
+    cache.invalidar('perfiles')
+
+
+@receiver(pre_save, sender=User)
+def recordar_nombre_usuario(sender, instance, update_fields=None, **kwargs):
+    """
+    Nombre guardado del usuario: sus reseñas lo muestran. Iniciar sesión
+    guarda solo last_login y no lo consulta
+    """
+    instance._nombre_original = None
+    if instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._nombre_original = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+@receiver(post_delete, sender=User)
+def invalidar_cache_usuario(sender, instance, **kwargs):
     """
-    Guardar el perfil cuando se guarda el usuario
+    La API lista a todos los usuarios, tengan perfil o no. Al cambiar el
+    nombre caducan también sus reseñas, los juegos que ha reseñado (su
+    página de detalle) y el listado de reseñas
     """
-    if hasattr(instance, 'perfil'):
-        instance.perfil.save()
+    cache.invalidar('perfil', instance.pk)
+    cache.invalidar('perfiles')
+    anterior = instance.__dict__.pop('_nombre_original', None)
+    if anterior is not None and anterior != instance.username:
+        reseñas = list(Reseña.objects.filter(usuario_id=instance.pk).order_by().values_list('pk', 'juego_id'))
+        reseña_ids, juego_ids = zip(*reseñas) if reseñas else ((), ())
+        cache.invalidar_varios('resena', reseña_ids)
+        cache.invalidar_varios('juego', set(juego_ids))
+        cache.invalidar('catalogo')
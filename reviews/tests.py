@@ -1,3 +1,452 @@
-from django.test import TestCase
+import io
+import re
+import tempfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from games.models import Categoria, Juego
+from playhub.testing import PresupuestoConsultasTestCase
+from . import busqueda, cola
+from .models import AfinidadCategoria, PerfilUsuario, Reseña, recalcular_estadisticas
+
+
+class ReseñaPresupuestoConsultasTests(PresupuestoConsultasTestCase):
+    """
+    Número máximo de consultas por vista, independiente del número de filas
+    """
+    
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.get(username='usuario1')
+        self.reseña = Reseña.objects.filter(usuario=self.usuario).first()
+    
+    def test_reseña_list(self):
+        # página (con juego y usuario) + recuento acotado
+        self.assertPresupuestoConsultas(reverse('reviews:reseña_list'), 2)
+    
+    def test_perfil_detail(self):
+        # perfil con usuario (y estadísticas) + página de reseñas con juego + categorías (caché fría)
+        url = reverse('reviews:perfil_detail', args=[self.usuario.pk])
+        response = self.assertPresupuestoConsultas(url, 3)
+        perfil = response.context['perfil']
+        self.assertEqual(perfil.total_reseñas, 25)
+        self.assertEqual(len(response.context['categorias_favoritas']), 3)
+        # Las páginas del cursor recorren todas las reseñas del usuario, en orden
+        vistas = []
+        while True:
+            page = response.context['page_obj']
+            vistas += [reseña.pk for reseña in page]
+            if not page.has_next():
+                break
+            response = self.assertPresupuestoConsultas(f'{url}?cursor={page.next_cursor}', 2)
+        self.assertEqual(vistas, list(Reseña.objects.filter(usuario=self.usuario).values_list('pk', flat=True)))
+    
+    def test_reseña_buscar(self):
+        # ids de la ventana (FTS5) + página (con juego y usuario) + fragmentos
+        url = reverse('reviews:reseña_buscar') + '?q=validacion&plataforma=PC&puntuacion_min=1'
+        response = self.assertPresupuestoConsultas(url, 3)
+        self.assertTrue(response.context['reseñas'])
+        self.assertContains(response, '<mark>validación</mark>')
+        # Sin texto: ids + página
+        self.assertPresupuestoConsultas(reverse('reviews:reseña_buscar') + '?puntuacion_min=5', 2)
+    
+    def test_reseña_forms(self):
+        # sesión + usuario: el juego se elige con autocompletado, sin listar el catálogo
+        self.assertPresupuestoConsultas(reverse('reviews:reseña_create'), 2, self.usuario)
+        # + título del juego preseleccionado
+        juego = Juego.objects.order_by('pk').last()
+        url = reverse('reviews:reseña_create') + f'?juego={juego.pk}'
+        self.assertPresupuestoConsultas(url, 3, self.usuario)
+        self.assertContains(self.client.get(url), f'value="{juego}"')
+        self.assertPresupuestoConsultas(reverse('reviews:reseña_update', args=[self.reseña.pk]), 4, self.usuario)
+        self.assertPresupuestoConsultas(reverse('reviews:reseña_delete', args=[self.reseña.pk]), 3, self.usuario)
+        self.assertPresupuestoConsultas(reverse('reviews:perfil_edit'), 3, self.usuario)
+    
+    def test_reseña_form_juego_no_numerico(self):
+        # '²'.isdigit() es True, pero no es un id: formulario vacío o con error, no un 500
+        self.client.force_login(self.usuario)
+        url = reverse('reviews:reseña_create')
+        self.assertEqual(self.client.get(url, {'juego': '²'}).status_code, 200)
+        response = self.client.post(url, {'juego': '²', 'puntuacion': 8, 'comentario': 'x' * 60})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['juego'])
+    
+    def test_admin_changelists(self):
+        # sesión + usuario + MAX(id) + recuento + página
+        self.assertPresupuestoConsultas(reverse('admin:reviews_reseña_changelist'), 5, self.admin)
+        self.assertPresupuestoConsultas(reverse('admin:reviews_perfilusuario_changelist'), 5, self.admin)
+        self.assertPresupuestoConsultas(reverse('admin:auth_user_changelist'), 6, self.admin)
+        self.assertPresupuestoConsultas(
+            reverse('admin:reviews_reseña_change', args=[self.reseña.pk]), 8, self.admin
+        )
+
+
+class AdminTablaGrandeTests(PresupuestoConsultasTestCase):
+    """
+    Modo tabla grande del admin: búsqueda por índices, filtros de opciones
+    fijas, recuentos acotados y autocompletado de las ForeignKey
+    """
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:reviews_reseña_changelist')
+    
+    def recuento(self, **params):
+        return self.client.get(self.url, params).context['cl'].result_count
+    
+    def test_busqueda(self):
+        self.assertEqual(
+            self.recuento(q='usuario1'),
+            Reseña.objects.filter(usuario__username__startswith='usuario1').count(),
+        )
+        # Prefijo por palabra: "Juego 7" encuentra Juego 7 y Juego 70-79
+        titulos = [t for t in Juego.objects.values_list('titulo', flat=True) if re.fullmatch(r'Juego 7\d?', t)]
+        self.assertEqual(self.recuento(q='Juego 7'), Reseña.objects.filter(juego__titulo__in=titulos).count())
+    
+    def test_filtros(self):
+        self.assertEqual(
+            self.recuento(puntuacion=7, plataforma='PC'),
+            Reseña.objects.filter(puntuacion=7, juego__plataforma='PC').count(),
+        )
+    
+    @mock.patch('playhub.admin.LIMITE_RECUENTO', 100)
+    def test_recuentos(self):
+        self.assertEqual(self.recuento(), Reseña.objects.order_by('-pk').values_list('pk', flat=True)[0])
+        self.assertEqual(self.recuento(q='usuario1'), 100)
+    
+    def test_autocompletado(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'reviews', 'model_name': 'reseña', 'field_name': 'juego', 'term': 'Juego 12',
+        })
+        textos = {r['text'].split(' (')[0] for r in response.json()['results']}
+        self.assertEqual(textos, {'Juego 12'} | {f'Juego 12{i}' for i in range(10)})
+        response = self.client.get(reverse('admin:reviews_reseña_change', args=[Reseña.objects.first().pk]))
+        self.assertNotContains(response, '<option value="%s">' % Juego.objects.last().pk)
+
+
+@override_settings(RESEÑAS_DIFERIDAS=True)
+class ColaReseñasTests(TestCase):
+    """
+    Reseñas en diferido: se encolan al enviarlas y se guardan al volcar
+    """
+    
+    COMENTARIO = 'Comentario de prueba lo bastante largo para pasar la validación.'
+    
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(RESEÑAS_COLA_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.juego = Juego.objects.create(titulo='Juego', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+        self.ana, self.luis = User.objects.create_user('ana'), User.objects.create_user('luis')
+    
+    def enviar(self, usuario, puntuacion, comentario=COMENTARIO):
+        self.client.force_login(usuario)
+        datos = {'juego': self.juego.pk, 'puntuacion': puntuacion, 'comentario': comentario}
+        return self.client.post(reverse('reviews:reseña_create'), datos)
+    
+    def test_volcado(self):
+        self.assertRedirects(self.enviar(self.ana, 8), reverse('reviews:reseña_list'))
+        self.enviar(self.ana, 8)
+        self.enviar(self.ana, 3, self.COMENTARIO + ' Otra vez.')
+        self.enviar(self.luis, 6)
+        self.assertFalse(Reseña.objects.exists())
+        self.assertEqual(cola.pendientes(), 4)
+        
+        call_command('flush_reviews', stdout=io.StringIO())
+        self.assertEqual(cola.pendientes(), 0)
+        # El doble envío se descarta sin aviso y la segunda reseña de ana se rechaza
+        self.assertEqual(
+            sorted(Reseña.objects.values_list('usuario__username', 'puntuacion')), [('ana', 8), ('luis', 6)]
+        )
+        self.juego.refresh_from_db()
+        self.assertEqual((self.juego.total_reseñas, self.juego.suma_puntuaciones), (2, 14))
+        self.assertEqual(self.juego.puntuacion_promedio, 7)
+        perfil = PerfilUsuario.objects.get(user=self.ana)
+        self.assertEqual((perfil.total_reseñas, perfil.suma_puntuaciones, perfil.puntuaciones_8), (1, 8, 1))
+        
+        # El aviso se recoge en la siguiente petición y se muestra en la página que sigue
+        self.client.force_login(self.ana)
+        self.client.get(reverse('reviews:reseña_list'))
+        self.assertContains(self.client.get(reverse('reviews:reseña_list')), 'Ya habías reseñado')
+        self.assertEqual(cola.recoger_avisos(self.ana.pk), [])
+        self.assertEqual(cola.recoger_avisos(self.luis.pk), [])
+    
+    def test_fecha_de_envio(self):
+        self.enviar(self.ana, 8)
+        enviada = timezone.now()
+        call_command('flush_reviews', stdout=io.StringIO())
+        self.assertLess(Reseña.objects.get().fecha, enviada)
+    
+    def test_publicada_a_la_vez(self):
+        """
+        Otra reseña del mismo usuario y juego guardada justo antes del INSERT
+        del lote: el lote se guarda igual y la de la cola se rechaza
+        """
+        self.enviar(self.ana, 8)
+        publicada = []
+        
+        def publicar_antes(execute, sql, params, many, context):
+            if sql.startswith('INSERT') and 'reviews_rese' in sql and not publicada:
+                publicada.append(True)
+                Reseña.objects.create(juego=self.juego, usuario=self.ana, puntuacion=2, comentario=self.COMENTARIO)
+            return execute(sql, params, many, context)
+        
+        with connection.execute_wrapper(publicar_antes):
+            call_command('flush_reviews', stdout=io.StringIO())
+        self.assertEqual(cola.pendientes(), 0)
+        self.assertEqual(list(Reseña.objects.values_list('puntuacion', flat=True)), [2])
+        self.juego.refresh_from_db()
+        self.assertEqual((self.juego.total_reseñas, self.juego.suma_puntuaciones), (1, 2))
+        self.assertEqual(PerfilUsuario.objects.get(user=self.ana).total_reseñas, 1)
+        self.assertIn('Ya habías reseñado', cola.recoger_avisos(self.ana.pk)[0])
+
+
+class EstadisticasPerfilTests(TestCase):
+    """
+    Estadísticas del perfil mantenidas al escribir reseñas: deben coincidir
+    siempre con las que se reconstruyen desde cero
+    """
+    
+    COMENTARIO = 'Comentario de prueba lo bastante largo para pasar la validación.'
+    
+    def setUp(self):
+        self.rpg, self.indie, self.accion = (
+            Categoria.objects.create(nombre=nombre) for nombre in ('RPG', 'Indie', 'Acción')
+        )
+        self.juegos = [
+            Juego.objects.create(titulo=f'Juego {i}', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+            for i in range(3)
+        ]
+        self.juegos[0].categorias.set([self.rpg, self.indie])
+        self.juegos[1].categorias.set([self.rpg])
+        self.juegos[2].categorias.set([self.accion])
+        self.ana, self.luis = User.objects.create_user('ana'), User.objects.create_user('luis')
+    
+    def estadisticas(self, usuario):
+        campos = PerfilUsuario.CAMPOS_ESTADISTICAS
+        afinidades = sorted(
+            AfinidadCategoria.objects.filter(usuario=usuario, reseñas__gt=0).values_list('categoria_id', 'reseñas')
+        )
+        return PerfilUsuario.objects.values_list(*campos).get(user=usuario), afinidades
+    
+    def assertCoherentes(self, *usuarios):
+        """
+        Las estadísticas incrementales coinciden con las recalculadas
+        """
+        incrementales = [self.estadisticas(usuario) for usuario in usuarios]
+        recalcular_estadisticas([usuario.pk for usuario in usuarios])
+        self.assertEqual(incrementales, [self.estadisticas(usuario) for usuario in usuarios])
+    
+    def reseñar(self, usuario, juego, puntuacion):
+        return Reseña.objects.create(usuario=usuario, juego=juego, puntuacion=puntuacion, comentario=self.COMENTARIO)
+    
+    def test_incrementales(self):
+        primera = self.reseñar(self.ana, self.juegos[0], 8)
+        self.reseñar(self.ana, self.juegos[1], 6)
+        perfil = PerfilUsuario.objects.get(user=self.ana)
+        self.assertEqual((perfil.total_reseñas, perfil.puntuacion_media), (2, 7))
+        self.assertEqual((perfil.puntuaciones_8, perfil.puntuaciones_6), (1, 1))
+        self.assertEqual(perfil.categorias_favoritas, [self.rpg.pk, self.indie.pk])
+        self.assertCoherentes(self.ana)
+        
+        # Editar el comentario no escribe nada en el perfil
+        reseña = Reseña.objects.get(pk=primera.pk)
+        reseña.comentario += ' Editado.'
+        with self.assertNumQueries(1):
+            reseña.save(update_fields=['comentario'])
+        # Cambiar de juego, de puntuación y de autor
+        reseña.juego, reseña.puntuacion = self.juegos[2], 3
+        reseña.save()
+        self.assertCoherentes(self.ana)
+        reseña.usuario = self.luis
+        reseña.save()
+        self.assertCoherentes(self.ana, self.luis)
+        
+        reseña.delete()
+        self.assertCoherentes(self.ana, self.luis)
+        self.assertEqual(PerfilUsuario.objects.get(user=self.luis).total_reseñas, 0)
+    
+    def test_operaciones_masivas(self):
+        for juego in self.juegos:
+            self.reseñar(self.ana, juego, 5)
+        Reseña.objects.filter(juego=self.juegos[0]).update(puntuacion=9)
+        Reseña.objects.filter(juego=self.juegos[1]).update(usuario=self.luis)
+        self.assertCoherentes(self.ana, self.luis)
+        # Las categorías de un juego reseñado cambian sus afinidades
+        self.juegos[2].categorias.add(self.rpg)
+        self.assertCoherentes(self.ana, self.luis)
+        self.assertEqual(PerfilUsuario.objects.get(user=self.ana).categorias_favoritas[0], self.rpg.pk)
+        self.juegos[0].delete()
+        self.assertCoherentes(self.ana, self.luis)
+        self.assertEqual(PerfilUsuario.objects.get(user=self.ana).total_reseñas, 1)
+    
+    def test_update_por_lotes(self):
+        for usuario in (self.ana, self.luis):
+            for juego in self.juegos:
+                self.reseñar(usuario, juego, 5)
+        # Editar comentarios no relee las filas para recalcular: un SELECT
+        # de ids y un UPDATE por lote, dentro de un savepoint
+        with mock.patch('reviews.models.LOTE_RECALCULO', 4):
+            with self.assertNumQueries(2 + 2 * 2):
+                editadas = Reseña.objects.filter(comentario=self.COMENTARIO).update(comentario='Editado en bloque.')
+            self.assertEqual(editadas, 6)
+            self.assertEqual(Reseña.objects.filter(comentario='Editado en bloque.').count(), 6)
+            Reseña.objects.filter(usuario=self.ana).update(puntuacion=9)
+        self.assertCoherentes(self.ana, self.luis)
+        self.assertEqual(PerfilUsuario.objects.get(user=self.ana).puntuaciones_9, 3)
+    
+    def test_borrar_instancia_antigua(self):
+        reseña = self.reseñar(self.ana, self.juegos[0], 8)
+        Reseña.objects.filter(pk=reseña.pk).update(puntuacion=3)
+        # La instancia aún tiene 8: se descuenta lo guardado
+        reseña.delete()
+        self.assertCoherentes(self.ana)
+        self.juegos[0].refresh_from_db()
+        self.assertEqual((self.juegos[0].total_reseñas, self.juegos[0].suma_puntuaciones), (0, 0))
+    
+    def test_categorias(self):
+        for juego in self.juegos:
+            self.reseñar(self.ana, juego, 5)
+        self.reseñar(self.luis, self.juegos[0], 7)
+        self.juegos[0].categorias.set([self.indie, self.accion])
+        self.assertCoherentes(self.ana, self.luis)
+        self.rpg.juegos.add(self.juegos[2], self.juegos[0])
+        self.accion.juegos.remove(self.juegos[0], self.juegos[1])
+        self.assertCoherentes(self.ana, self.luis)
+        self.indie.juegos.clear()
+        self.assertCoherentes(self.ana, self.luis)
+        # Las favoritas no conservan categorías borradas
+        rpg = self.rpg.pk
+        self.assertIn(rpg, PerfilUsuario.objects.get(user=self.ana).categorias_favoritas)
+        self.rpg.delete()
+        self.assertCoherentes(self.ana, self.luis)
+        self.assertNotIn(rpg, PerfilUsuario.objects.get(user=self.ana).categorias_favoritas)
+    
+    def test_guardar_perfil_no_sobrescribe(self):
+        PerfilUsuario.objects.create(user=self.ana)
+        perfil = PerfilUsuario.objects.get(user=self.ana)
+        self.reseñar(self.ana, self.juegos[0], 8)
+        # Sin cambios no hay UPDATE; con cambios solo se escriben esos campos
+        with self.assertNumQueries(0):
+            perfil.save()
+        perfil.bio = 'Nueva biografía'
+        with self.assertNumQueries(1):
+            perfil.save()
+        perfil.refresh_from_db()
+        self.assertEqual((perfil.bio, perfil.total_reseñas), ('Nueva biografía', 1))
+
+
+class CicloPerfilTests(TestCase):
+    """
+    Los perfiles se crean al guardarlos o al publicar la primera reseña,
+    nunca al leerlos ni al guardar el usuario
+    """
+    
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', password='x')
+        self.juego = Juego.objects.create(titulo='Juego', plataforma='PC', precio=10, fecha_lanzamiento=date(2020, 1, 1))
+    
+    def test_sin_perfil(self):
+        self.assertFalse(PerfilUsuario.objects.exists())
+        # Iniciar sesión actualiza last_login sin tocar el perfil
+        with self.assertNumQueries(1):
+            self.ana.save(update_fields=['last_login'])
+        self.client.force_login(self.ana)
+        response = self.client.get(reverse('reviews:perfil_detail', args=[self.ana.pk]))
+        self.assertEqual((response.status_code, response.context['perfil'].total_reseñas), (200, 0))
+        self.assertEqual(self.client.get(reverse('reviews:perfil_edit')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('reviews:perfil_detail', args=[0])).status_code, 404)
+        self.assertFalse(PerfilUsuario.objects.exists())
+        
+        datos = {'bio': 'Hola', 'plataforma_favorita': 'Switch', 'avatar_url': ''}
+        self.client.post(reverse('reviews:perfil_edit'), datos)
+        self.assertEqual(PerfilUsuario.objects.get(user=self.ana).plataforma_favorita, 'Switch')
+    
+    def test_primera_reseña(self):
+        Reseña.objects.create(juego=self.juego, usuario=self.ana, puntuacion=7, comentario='x' * 50)
+        perfil = PerfilUsuario.objects.get(user=self.ana)
+        self.assertEqual((perfil.total_reseñas, perfil.puntuaciones_7), (1, 1))
+    
+    def test_backfill_profiles(self):
+        User.objects.bulk_create([User(username=f'masivo{i}') for i in range(3)])
+        salida = io.StringIO()
+        call_command('backfill_profiles', stdout=salida)
+        self.assertIn('4 perfiles creados', salida.getvalue())
+        self.assertEqual(PerfilUsuario.objects.count(), User.objects.count())
+        call_command('backfill_profiles', stdout=salida)
+        self.assertIn('0 perfiles creados', salida.getvalue())
+
+
+class BusquedaReseñasTests(TestCase):
+    """
+    Índice FTS5 de los comentarios: sincronizado con las escrituras,
+    relevancia, filtros y fragmentos
+    """
+    
+    def setUp(self):
+        self.juegos = [
+            Juego.objects.create(titulo=f'Juego {i}', plataforma=plataforma, precio=10, fecha_lanzamiento=date(2020, 1, 1))
+            for i, plataforma in enumerate(('PC', 'Switch'))
+        ]
+        self.usuarios = [User.objects.create_user(f'usuario{i}') for i in range(4)]
+    
+    def reseñar(self, usuario, juego, puntuacion, comentario):
+        return Reseña.objects.create(
+            usuario=self.usuarios[usuario], juego=self.juegos[juego], puntuacion=puntuacion,
+            comentario=comentario + ' ' + 'relleno ' * 8,
+        )
+    
+    def test_sincronizado(self):
+        reseña = self.reseñar(0, 0, 8, 'Una banda sonora magnífica')
+        self.assertEqual(Reseña.objects.ids_busqueda('MAGNIFICA'), [reseña.pk])
+        reseña.comentario = 'Los gráficos envejecieron mal ' + 'relleno ' * 8
+        reseña.save()
+        self.assertEqual(Reseña.objects.ids_busqueda('magnífica'), [])
+        self.assertEqual(Reseña.objects.ids_busqueda('graficos'), [reseña.pk])
+        Reseña.objects.filter(pk=reseña.pk).update(comentario='Texto masivo ' + 'relleno ' * 8)
+        self.assertEqual(Reseña.objects.ids_busqueda('masivo'), [reseña.pk])
+        reseña.delete()
+        self.assertEqual(Reseña.objects.ids_busqueda('masivo'), [])
+    
+    def test_relevancia_y_filtros(self):
+        una = self.reseñar(0, 0, 9, 'Combate ágil')
+        tres = self.reseñar(1, 0, 4, 'Combate, combate y más combate')
+        switch = self.reseñar(2, 1, 7, 'Combate por turnos')
+        self.assertEqual(Reseña.objects.ids_busqueda('combate')[0], tres.pk)
+        self.assertEqual(Reseña.objects.ids_busqueda('combate agil'), [una.pk])
+        self.assertEqual(Reseña.objects.ids_busqueda('combate', plataforma='Switch'), [switch.pk])
+        self.assertEqual(sorted(Reseña.objects.ids_busqueda('combate', puntuacion_min=7)), [una.pk, switch.pk])
+        self.assertEqual(Reseña.objects.ids_busqueda('combate', juego=self.juegos[0], puntuacion_min=5), [una.pk])
+        # Sin texto, solo filtros: de más nueva a más antigua
+        self.assertEqual(Reseña.objects.ids_busqueda(juego=self.juegos[0]), [tres.pk, una.pk])
+        # Palabras completas, no prefijos; los símbolos no rompen la consulta
+        self.assertEqual(Reseña.objects.ids_busqueda('comb'), [])
+        self.assertEqual(Reseña.objects.ids_busqueda('¡"Combate"!*'), Reseña.objects.ids_busqueda('combate'))
+    
+    def test_fragmentos(self):
+        reseña = self.reseñar(0, 0, 8, '<b>Historia</b> & personajes: la historia engancha')
+        busqueda.fragmentos('historia', [reseña])
+        self.assertEqual(reseña.fragmento.count('<mark>Historia</mark>'), 1)
+        self.assertIn('&lt;b&gt;', reseña.fragmento)
+        self.assertNotIn('<b>', reseña.fragmento)
+        # El recorte local (sin índice) marca las mismas palabras
+        local = busqueda.marcar(busqueda.fragmento_local(reseña.comentario, ['historia']))
+        self.assertIn('<mark>historia</mark>', local)
+        self.assertIn('&lt;b&gt;', local)
+    
+    def test_admin(self):
+        reseña = self.reseñar(0, 0, 8, 'Un plataformas exigente')
+        self.reseñar(1, 0, 8, 'Nada que ver')
+        admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:reviews_reseña_changelist') + '?q=exigente')
+        self.assertEqual([r.pk for r in response.context['cl'].result_list], [reseña.pk])
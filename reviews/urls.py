@@ -1,16 +1,24 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'reviews'
 
+# Con ASGI (ver playhub/asgi.py) las vistas de lectura son asíncronas
+if settings.VISTAS_ASYNC:
+    ListaView, PerfilView = views.ReseñaListAsyncView, views.PerfilUsuarioDetailAsyncView
+else:
+    ListaView, PerfilView = views.ReseñaListView, views.PerfilUsuarioDetailView
+
 urlpatterns = [
     # Reseñas
-    path('', views.ReseñaListView.as_view(), name='reseña_list'),
+    path('', ListaView.as_view(), name='reseña_list'),
+    path('buscar/', views.ReseñaBusquedaView.as_view(), name='reseña_buscar'),
     path('crear/', views.ReseñaCreateView.as_view(), name='reseña_create'),
     path('<int:pk>/editar/', views.ReseñaUpdateView.as_view(), name='reseña_update'),
     path('<int:pk>/eliminar/', views.ReseñaDeleteView.as_view(), name='reseña_delete'),
     
     # Perfiles de usuario
-    path('perfil/<int:pk>/', views.PerfilUsuarioDetailView.as_view(), name='perfil_detail'),
+    path('perfil/<int:pk>/', PerfilView.as_view(), name='perfil_detail'),
     path('perfil/editar/', views.PerfilUsuarioUpdateView.as_view(), name='perfil_edit'),
 ]
@@ -1,30 +1,111 @@
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404
-from .models import Reseña, PerfilUsuario
-from .forms import ReseñaForm, PerfilUsuarioForm
+from django.http import Http404, HttpResponseRedirect
+from games.forms import aopciones_categorias, opciones_categorias
+from playhub.asincrono import AsyncDetailMixin, AsyncListMixin
+from playhub.paginacion import CursorInvalido, CursorPaginationMixin, CursorPaginator
+from recomendaciones.models import VecinoJuego
+from . import busqueda, cola
+from .models import Reseña, PerfilUsuario, perfil_de
+from .forms import ReseñaBusquedaForm, ReseñaForm, PerfilUsuarioForm
 
 
-class ReseñaListView(ListView):
+class ObjetoCacheadoMixin:
     """
-    Vista para listar todas las reseñas
+    Evitar que test_func() y la propia vista carguen el objeto dos veces
+    """
+    
+    def get_object(self, queryset=None):
+        if not hasattr(self, '_objeto_cacheado'):
+            self._objeto_cacheado = super().get_object(queryset)
+        return self._objeto_cacheado
+
+
+class ReseñaListView(CursorPaginationMixin, ListView):
+    """
+    Vista para listar todas las reseñas.
+    Paginación por cursor sobre (fecha, id)
     """
     model = Reseña
     template_name = 'reviews/reseña_list.html'
     context_object_name = 'reseñas'
     paginate_by = 10
+    cursor_ordering = ('-fecha', '-id')
     
     def get_queryset(self):
         # Optimizar consultas con select_related
         return Reseña.objects.all().select_related('juego', 'usuario')
 
 
+class ReseñaListAsyncView(AsyncListMixin, ReseñaListView):
+    """
+    ReseñaListView con el ORM asíncrono (modo ASGI)
+    """
+
+
+class ReseñaBusquedaView(ReseñaListView):
+    """
+    Búsqueda pública de reseñas por palabras del comentario, con filtros
+    por juego, plataforma y puntuación mínima (parámetros GET de
+    ReseñaBusquedaForm). Resultados por relevancia con el fragmento que
+    coincide (ver reviews/busqueda.py), paginados por número sobre la
+    lista de ids encontrados: solo se cargan las reseñas de la página
+    """
+    template_name = 'reviews/reseña_busqueda.html'
+    page_kwarg = 'pagina'
+    
+    def get_filtros(self):
+        """
+        Validar los parámetros GET y devolver los filtros aplicables
+        """
+        if not hasattr(self, '_filtros'):
+            self.busqueda_form = ReseñaBusquedaForm(self.request.GET or None)
+            if self.busqueda_form.is_valid():
+                self._filtros = self.busqueda_form.cleaned_data
+            else:
+                self._filtros = {}
+        return self._filtros
+    
+    def get_ids(self):
+        if not hasattr(self, '_ids'):
+            filtros = self.get_filtros()
+            self._ids = []
+            if any(filtros.values()):
+                self._ids = Reseña.objects.ids_busqueda(
+                    filtros['q'], filtros['juego'], filtros['plataforma'], filtros['puntuacion_min'],
+                )
+        return self._ids
+    
+    def paginate_queryset(self, queryset, page_size):
+        paginator = Paginator(self.get_ids(), page_size)
+        pagina = paginator.get_page(self.request.GET.get(self.page_kwarg))
+        reseñas = queryset.in_bulk(pagina.object_list)
+        # Una reseña borrada entre las dos consultas simplemente no aparece
+        pagina.object_list = busqueda.fragmentos(
+            self.get_filtros().get('q'),
+            [reseñas[pk] for pk in pagina.object_list if pk in reseñas],
+        )
+        return paginator, pagina, pagina.object_list, pagina.has_other_pages()
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['busqueda_form'] = self.busqueda_form
+        context['hay_busqueda'] = any(self.get_filtros().values())
+        context['resultados_acotados'] = len(self.get_ids()) >= busqueda.VENTANA
+        return context
+
+
 class ReseñaCreateView(LoginRequiredMixin, CreateView):
     """
     Vista para crear una nueva reseña.
     Requiere autenticación y asigna automáticamente el usuario (FK).
+    Con RESEÑAS_DIFERIDAS la reseña validada se encola (reviews/cola.py)
+    en lugar de guardarse
     """
     model = Reseña
     form_class = ReseñaForm
@@ -34,15 +115,29 @@ class ReseñaCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         # Asignar automáticamente el usuario autenticado (ForeignKey)
         form.instance.usuario = self.request.user
+        if settings.RESEÑAS_DIFERIDAS:
+            cola.encolar(form.instance)
+            messages.info(self.request, 'Tu reseña se publicará en unos segundos.')
+            return HttpResponseRedirect(self.success_url)
         return super().form_valid(form)
     
+    def get_initial(self):
+        """
+        Juego preseleccionado desde su ficha (?juego=<id>)
+        """
+        initial = super().get_initial()
+        juego = self.request.GET.get('juego', '')
+        if juego.isdecimal():
+            initial['juego'] = juego
+        return initial
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo_pagina'] = 'Crear Reseña'
         return context
 
 
-class ReseñaUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class ReseñaUpdateView(LoginRequiredMixin, UserPassesTestMixin, ObjetoCacheadoMixin, UpdateView):
     """
     Vista para editar una reseña existente.
     Requiere autenticación y solo el autor puede editar.
@@ -57,7 +152,7 @@ class ReseñaUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         Verificar que el usuario actual es el autor de la reseña
         """
         reseña = self.get_object()
-        return self.request.user == reseña.usuario
+        return self.request.user.pk == reseña.usuario_id
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -65,7 +160,7 @@ class ReseñaUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class ReseñaDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class ReseñaDeleteView(LoginRequiredMixin, UserPassesTestMixin, ObjetoCacheadoMixin, DeleteView):
     """
     Vista para eliminar una reseña.
     Requiere autenticación y solo el autor puede eliminar.
@@ -75,36 +170,99 @@ class ReseñaDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     success_url = reverse_lazy('reviews:reseña_list')
     context_object_name = 'reseña'
     
+    def get_queryset(self):
+        return Reseña.objects.select_related('juego')
+    
     def test_func(self):
         """
         Verificar que el usuario actual es el autor de la reseña
         """
         reseña = self.get_object()
-        return self.request.user == reseña.usuario
+        return self.request.user.pk == reseña.usuario_id
 
 
 class PerfilUsuarioDetailView(DetailView):
     """
-    Vista para mostrar el perfil de un usuario
+    Vista para mostrar el perfil de un usuario.
+    Las estadísticas vienen guardadas en el propio perfil y sus reseñas
+    se paginan por cursor sobre (fecha, id) (índice resena_usuario_fecha_idx).
+    El propio usuario ve además sus juegos recomendados
     """
     model = PerfilUsuario
     template_name = 'reviews/perfil_detail.html'
     context_object_name = 'perfil'
+    paginate_by = 10
+    cursor_ordering = ('-fecha', '-id')
     
     def get_object(self):
         """
-        Obtener el perfil del usuario especificado
+        Obtener el perfil del usuario especificado: usuario y perfil en un
+        LEFT JOIN. Sin perfil se muestra uno por defecto, sin crearlo
         """
-        user = get_object_or_404(User, pk=self.kwargs['pk'])
-        # Crear perfil si no existe (por si acaso)
-        perfil, created = PerfilUsuario.objects.get_or_create(user=user)
-        return perfil
+        user = User.objects.select_related('perfil').filter(pk=self.kwargs['pk']).first()
+        if user is None:
+            raise Http404('No se encontró el usuario')
+        return perfil_de(user)
+    
+    def get_paginator(self):
+        reseñas = Reseña.objects.filter(usuario_id=self.object.user_id).select_related('juego')
+        return CursorPaginator(reseñas, self.paginate_by, self.cursor_ordering)
+    
+    def get_pagina(self):
+        try:
+            return self.get_paginator().page(self.request.GET.get('cursor'))
+        except CursorInvalido:
+            raise Http404('Cursor de paginación no válido')
+    
+    def get_categorias(self):
+        return opciones_categorias()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Obtener reseñas del usuario
-        context['reseñas_usuario'] = self.object.user.reseñas.all().select_related('juego')
+        page = self.get_pagina()
+        context['page_obj'] = page
+        context['reseñas_usuario'] = page.object_list
+        # Nombres de las favoritas desde la lista de categorías en caché
+        nombres = dict(self.get_categorias())
+        context['categorias_favoritas'] = [
+            nombres[pk] for pk in self.object.categorias_favoritas if pk in nombres
+        ]
+        if self.request.user.pk == self.object.user_id:
+            context['recomendados'] = self.get_recomendados()
         return context
+    
+    def get_recomendados(self):
+        return VecinoJuego.objects.para_perfil(self.object)
+
+
+class PerfilUsuarioDetailAsyncView(AsyncDetailMixin, PerfilUsuarioDetailView):
+    """
+    PerfilUsuarioDetailView con el ORM asíncrono (modo ASGI)
+    """
+    
+    async def aget_object(self, queryset=None):
+        user = await User.objects.select_related('perfil').filter(pk=self.kwargs['pk']).afirst()
+        if user is None:
+            raise Http404('No se encontró el usuario')
+        return perfil_de(user)
+    
+    async def aprecargar(self):
+        try:
+            self._pagina = await self.get_paginator().apage(self.request.GET.get('cursor'), contar=False)
+        except CursorInvalido:
+            raise Http404('Cursor de paginación no válido')
+        self._categorias = await aopciones_categorias()
+        if self.request.user.pk == self.object.user_id:
+            self._recomendados = await VecinoJuego.objects.apara_perfil(self.object)
+    
+    def get_pagina(self):
+        return self._pagina
+    
+    def get_categorias(self):
+        return self._categorias
+    
+    def get_recomendados(self):
+        return self._recomendados
 
 
 class PerfilUsuarioUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -121,14 +279,16 @@ class PerfilUsuarioUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateVie
         Verificar que el usuario está editando su propio perfil
         """
         perfil = self.get_object()
-        return self.request.user == perfil.user
+        return self.request.user.pk == perfil.user_id
     
     def get_object(self):
         """
-        Obtener el perfil del usuario actual
+        Obtener el perfil del usuario actual; si aún no tiene, se crea al
+        guardar el formulario
         """
-        perfil, created = PerfilUsuario.objects.get_or_create(user=self.request.user)
-        return perfil
+        if not hasattr(self, '_perfil'):
+            self._perfil = perfil_de(self.request.user)
+        return self._perfil
     
     def get_success_url(self):
         return reverse_lazy('reviews:perfil_detail', kwargs={'pk': self.request.user.pk})
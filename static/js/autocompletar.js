@@ -0,0 +1,53 @@
+/*
+ * Autocompletado de juegos (games/widgets.py): sugiere títulos con
+ * /api/juegos/autocompletar/ mientras se escribe y guarda el id del
+ * juego elegido en el campo oculto del formulario
+ */
+document.querySelectorAll('[data-autocompletar]').forEach(function (entrada) {
+    const destino = document.getElementById(entrada.dataset.destino);
+    const lista = document.getElementById(entrada.getAttribute('list'));
+    let opciones = {};
+    let espera = null;
+    let peticion = null;
+
+    if (destino.value) {
+        opciones[entrada.value] = destino.value;
+    }
+
+    function elegir() {
+        const id = opciones[entrada.value];
+        destino.value = id === undefined ? '' : id;
+    }
+
+    function sugerir(texto) {
+        if (peticion) {
+            peticion.abort();
+        }
+        peticion = new AbortController();
+        fetch(entrada.dataset.autocompletar + '?q=' + encodeURIComponent(texto), { signal: peticion.signal })
+            .then(function (respuesta) { return respuesta.json(); })
+            .then(function (datos) {
+                opciones = {};
+                lista.replaceChildren();
+                datos.results.forEach(function (juego) {
+                    const etiqueta = juego.titulo + ' (' + juego.plataforma + ')';
+                    opciones[etiqueta] = juego.id;
+                    const opcion = document.createElement('option');
+                    opcion.value = etiqueta;
+                    lista.appendChild(opcion);
+                });
+                elegir();
+            })
+            .catch(function () { /* petición cancelada por otra más reciente */ });
+    }
+
+    entrada.addEventListener('input', function () {
+        elegir();
+        clearTimeout(espera);
+        const texto = entrada.value.trim();
+        if (destino.value || texto.length < 2) {
+            return;
+        }
+        espera = setTimeout(function () { sugerir(texto); }, 200);
+    });
+});